@@ -30,12 +30,81 @@ import argparse
 
 # Imports of Modules for this App
 from scan_mods.mp_pinger import pinger
-from scan_mods.device_class import FoundDevice
+from scan_mods.device_class import FoundDevice, iter_saved_devices
+from scan_mods.result_index import ResultIndex, index_location_for_run
+from scan_mods.grabbing_mods.getter_profiles import (
+    CONFIG_TIMEOUT,
+    DEFAULT_GETTER_PROFILE,
+    GETTER_PROFILES,
+    GETTER_TIMEOUT,
+    check_getter_profile,
+    set_getter_timeouts,
+)
+from scan_mods.grabbing_mods.command_profiles import (
+    COMMAND_PROFILES,
+    DEFAULT_COMMAND_PROFILE,
+    set_command_profile,
+)
+from scan_mods.grabbing_mods.parse_pool import ParsePool, set_parse_pool
+from scan_mods.grabbing_mods.transcripts import (
+    TranscriptRecorder,
+    reparse_transcripts,
+    set_transcript_recorder,
+)
+from scan_mods.grab_scheduler import GRAB_WORKERS, SUBNET_PREFIX, GrabScheduler
+from scan_mods.output_sink import (
+    create_sink,
+    find_latest_run,
+    get_scans_directory,
+    OUTPUT_LAYOUTS,
+    MultiSink,
+    PerDeviceFileSink,
+    RecordFileSink,
+)
+from scan_mods.result_store import ResultStore, SQLiteSink
+from scan_mods.packfile import PackfileReader, PackfileSink
+from scan_mods.compression import COMPRESSION_CHOICES, set_compression
+from scan_mods.artifacts import artifact_exists, read_artifact_text, set_artifact_store
+from scan_mods.config_diff import ConfigHistory, update_histories
+from scan_mods.config_parser import ConfigFleet
+from scan_mods.compliance import device_platform, evaluate_fleet
+from scan_mods.search_index import (
+    SearchIndex,
+    render_command_output,
+    set_search_index,
+)
+from scan_mods.grabbing_mods.config_precheck import (
+    ConfigPrecheck,
+    set_config_precheck,
+)
+from scan_mods.grabbing_mods.capability_cache import (
+    CapabilityCache,
+    set_capability_cache,
+)
+from scan_mods.config_store import (
+    ConfigStore,
+    ConfigStoreArtifacts,
+    compare_manifests,
+)
+from scan_mods.serializers import (
+    OUTPUT_FORMATS,
+    convert_record_file,
+)
 import scan_mods.common_validation_checks.check_username
 import scan_mods.common_validation_checks.check_password
 import scan_mods.common_validation_checks.check_enable_password
 import scan_mods.mp_port_scanner
 
+# Configs kept in the config history and the key get_config_napalm saves their location under
+HISTORY_CONFIGS = {
+    "running": "Device_Running_Config_File_Location",
+    "startup": "Device_Startup_Config_File_Location",
+}
+# Rule packs checked by the compliance command when none are given
+COMPLIANCE_PACK_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), "Compliance_Packs"
+)
+
 
 def parse_my_args():
     """
@@ -75,6 +144,154 @@ def parse_my_args():
         help="Domain name to be used during testing",
         metavar="DOMAIN_NAME",
     )
+    my_parser.add_argument(
+        "-o",
+        "--output_layout",
+        action="store",
+        choices=OUTPUT_LAYOUTS,
+        default="ndjson",
+        help="How to write the results.  ndjson is one run file with a line per device, per-device is the <IP>_json_short/long.txt files",
+    )
+    my_parser.add_argument(
+        "-f",
+        "--output_format",
+        action="store",
+        choices=OUTPUT_FORMATS,
+        default="json",
+        help="Format of the run file.  msgpack and cbor are smaller and faster but need their packages installed",
+    )
+    my_parser.add_argument(
+        "-z",
+        "--compression",
+        action="store",
+        choices=COMPRESSION_CHOICES,
+        default="none",
+        help="Compress the run file, per device files and configs.  auto uses zstd if zstandard is installed and gzip if not",
+    )
+    my_parser.add_argument(
+        "--config_store",
+        action="store",
+        nargs="?",
+        const=True,
+        default=None,
+        metavar="DIRECTORY",
+        help="Save configs once by hash in a config store and only write a manifest of them for each run.  "
+        "Output/Configs is used if no DIRECTORY is given",
+    )
+    my_parser.add_argument(
+        "--skip_unchanged_configs",
+        action="store_true",
+        help="Send a short probe before pulling configs and use last run's configs if the device says nothing changed",
+    )
+    my_parser.add_argument(
+        "--capability_cache",
+        action="store_true",
+        help="Remember which show commands each platform and OS version rejected or timed out on and do not "
+        "send them again.  Kept in Output/Scans/command_capabilities.json",
+    )
+    my_parser.add_argument(
+        "--config_history",
+        action="store_true",
+        help="Keep every version of the running and startup configs as deltas and print what changed",
+    )
+    my_parser.add_argument(
+        "--database",
+        action="store",
+        nargs="?",
+        const=True,
+        default=None,
+        metavar="PATH",
+        help="Also save the run to a SQLite database.  Output/Scans/results.db is used if no PATH is given",
+    )
+    my_parser.add_argument(
+        "--transcripts",
+        action="store_true",
+        help="Save the raw output of every command sent to the SQLite database so the run can be parsed again "
+        "with networkscanner reparse.  Uses Output/Scans/results.db if --database is not given",
+    )
+    my_parser.add_argument(
+        "--search_index",
+        action="store",
+        nargs="?",
+        const=True,
+        default=None,
+        metavar="PATH",
+        help="Add the configs and command outputs to the full text search index as they are written.  "
+        "Output/Scans/search_index.db is used if no PATH is given",
+    )
+    my_parser.add_argument(
+        "--getter_profile",
+        action="store",
+        choices=list(GETTER_PROFILES),
+        default=DEFAULT_GETTER_PROFILE,
+        help="napalm getters to fetch from each device.  A CSV row's 7th column overrides it for that row.  "
+        f"Default is {DEFAULT_GETTER_PROFILE}",
+    )
+    my_parser.add_argument(
+        "--command_profile",
+        action="store",
+        choices=list(COMMAND_PROFILES),
+        default=DEFAULT_COMMAND_PROFILE,
+        help="Show commands to send to each device.  all sends a command for every NTC template of the platform.  "
+        f"Default is {DEFAULT_COMMAND_PROFILE}",
+    )
+    my_parser.add_argument(
+        "--command_budget",
+        action="store",
+        type=int,
+        default=None,
+        help="Most show commands to send to one device.  The most useful commands are sent first",
+    )
+    my_parser.add_argument(
+        "--getter_timeout",
+        action="store",
+        type=float,
+        default=GETTER_TIMEOUT,
+        help=f"Most seconds one napalm getter can take before it is recorded as an error.  Default is {GETTER_TIMEOUT:g}",
+    )
+    my_parser.add_argument(
+        "--config_timeout",
+        action="store",
+        type=float,
+        default=CONFIG_TIMEOUT,
+        help=f"Most seconds one config pull can take before it is recorded as an error.  Default is {CONFIG_TIMEOUT:g}",
+    )
+    my_parser.add_argument(
+        "--workers",
+        action="store",
+        type=int,
+        default=GRAB_WORKERS,
+        help=f"Most devices to grab at the same time.  Default is {GRAB_WORKERS}",
+    )
+    my_parser.add_argument(
+        "--parse_workers",
+        action="store",
+        type=int,
+        default=None,
+        help="Processes that parse command output while the grab threads move on to the next device.  "
+        "One per CPU if not given.  1 parses on the grab threads",
+    )
+    my_parser.add_argument(
+        "--per_subnet",
+        action="store",
+        type=int,
+        default=None,
+        help="Most devices to grab at the same time in one subnet, so one site or AAA server is not flooded",
+    )
+    my_parser.add_argument(
+        "--subnet_prefix",
+        action="store",
+        type=int,
+        default=SUBNET_PREFIX,
+        help=f"Prefix length of the subnets --per_subnet counts in.  Default is {SUBNET_PREFIX}",
+    )
+    my_parser.add_argument(
+        "--per_platform",
+        action="store",
+        type=int,
+        default=None,
+        help="Most devices to grab at the same time of one platform (Cisco, Linux, Other)",
+    )
 
     group = my_parser.add_mutually_exclusive_group(required=True)
     group.add_argument(
@@ -142,29 +359,1044 @@ def main():
             address_dict[address]["use_enable"],
             address_dict[address]["enable_password"],
             address_dict[address]["domain_name"],
+            address_dict[address].get("getter_profile") or args.getter_profile,
         )
         device_list.append(device)
 
+    set_compression(args.compression)
+    set_getter_timeouts(args.getter_timeout, args.config_timeout)
+    set_command_profile(args.command_profile, args.command_budget)
+    result_index = ResultIndex()
+    transcript_recorder = None
+    if args.transcripts:
+        if args.database is None:
+            args.database = True
+        transcript_recorder = TranscriptRecorder()
+        set_transcript_recorder(transcript_recorder)
+    output_sink = create_sink(args.output_layout, args.output_format)
+    if args.database is not None:
+        output_sink = MultiSink(
+            [
+                output_sink,
+                SQLiteSink(
+                    None if args.database is True else args.database,
+                    arguments={
+                        "output_layout": args.output_layout,
+                        "output_format": args.output_format,
+                        "addresses": len(device_list),
+                    },
+                ),
+            ]
+        )
+    config_precheck = None
+    if args.skip_unchanged_configs:
+        config_precheck = ConfigPrecheck()
+        set_config_precheck(config_precheck)
+    capability_cache = None
+    if args.capability_cache:
+        capability_cache = CapabilityCache()
+        set_capability_cache(capability_cache)
+    config_artifacts = None
+    if args.config_store is not None:
+        config_artifacts = ConfigStoreArtifacts(
+            None if args.config_store is True else ConfigStore(args.config_store)
+        )
+        previous_store = set_artifact_store(config_artifacts)
+    parse_pool = None
+    if (args.parse_workers or os.cpu_count() or 1) > 1:
+        # Started before the grab threads so the workers are forked from a quiet process
+        parse_pool = ParsePool(args.parse_workers)
+        set_parse_pool(parse_pool)
+    search_index = None
+    if args.search_index is not None:
+        search_index = SearchIndex(None if args.search_index is True else args.search_index)
+        set_search_index(search_index)
+    try:
+        with output_sink:
+
+            def finish_device(device, error):
+                # Called one device at a time as each grab finishes
+                result_index.add_device(device)
+                output_sink.write_device(device)
+
+            with GrabScheduler(
+                args.workers,
+                args.per_subnet,
+                args.per_platform,
+                args.subnet_prefix,
+                on_done=finish_device,
+            ) as scheduler:
+                for device in device_list:
+                    device.get_ports()
+                    scheduler.submit(device)
+            if scheduler.errors:
+                print(f"{len(scheduler.errors)} of {scheduler.completed} devices failed to be grabbed")
+    finally:
+        if transcript_recorder is not None:
+            set_transcript_recorder(None)
+            print(f"{transcript_recorder.recorded} command transcripts were recorded")
+        if parse_pool is not None:
+            set_parse_pool(None)
+            parse_pool.close()
+            print(f"{parse_pool.submitted} command outputs were parsed by {parse_pool.processes} processes")
+        if config_precheck is not None:
+            set_config_precheck(None)
+            precheck_location = config_precheck.save()
+            print(
+                f"Config pre-check saved to {precheck_location}.  {config_precheck.skipped} config pulls were skipped"
+            )
+        if capability_cache is not None:
+            set_capability_cache(None)
+            cache_location = capability_cache.save()
+            print(
+                f"Command capabilities saved to {cache_location}.  {capability_cache.skipped} known bad commands were not sent"
+            )
+        if config_artifacts is not None:
+            set_artifact_store(previous_store)
+            manifest_location = config_artifacts.save_manifest()
+            print(
+                f"Config manifest written to {manifest_location}.  {config_artifacts.blobs_written} new configs were stored"
+            )
+        if search_index is not None:
+            set_search_index(None)
+            print(f"{len(search_index)} files are in the search index {search_index.index_location}")
+            search_index.close()
+    if args.config_history:
+        record_config_history(
+            device_list, config_artifacts.config_store if config_artifacts is not None else None
+        )
+    index_location = result_index.save(index_location_for_run(sink_run_location(output_sink)))
+    print(f"Result index for {len(result_index)} devices written to {index_location}")
+
+
+def sink_run_location(output_sink):
+    """
+    Args:
+        output_sink (OutputSink|MultiSink) : sink the run was written to
+    return:
+        str : the run file or pack the sink wrote, or Output/Scans for the per device layout
+    """
+    sinks = output_sink.sinks if isinstance(output_sink, MultiSink) else [output_sink]
+    for sink in sinks:
+        if isinstance(sink, (RecordFileSink, PackfileSink)):
+            return sink.file_location
+    return get_scans_directory()
+
+
+def record_config_history(device_list, config_store=None):
+    """
+    Adds the running and startup configs of each device to the config history and prints what changed
+    Args:
+        device_list (list) : list of FoundDevice that have been grabbed
+        config_store (ConfigStore|None) : store the configs were saved to.  Output/Configs if None
+    return:
+        list : results from ConfigHistory.add_version
+    """
+    config_items = []
     for device in device_list:
-        device.get_ports()
-        device.device_info_grabber()
-        write_directory = None
-        if "Output" in os.listdir(os.getcwd()):
-            write_directory = f"{os.getcwd()}/Output/Scans/{device.IP}"
+        device_information = (
+            (device.device_info or {}).get("CONFIG", {}).get("Device_Information") or {}
+        )
+        for kind, key in HISTORY_CONFIGS.items():
+            location = device_information.get(key)
+            if location is not None and artifact_exists(location, config_store):
+                config_items.append((device.IP, kind, read_artifact_text(location, config_store)))
+    results = update_histories(config_items)
+    for result in results:
+        if result["changed"] and result["differences"] is not None:
+            differences = result["differences"]
+            print(
+                f"{result['address']} {result['kind']} config changed (version {result['version']}).  "
+                f"{len(differences['changed'])} sections changed, {len(differences['added'])} added, "
+                f"{len(differences['removed'])} removed"
+            )
+    return results
+
+
+def parse_diff_args(arg_list):
+    """
+    Parse the arguments for the diff command
+    Args:
+        arg_list (list) : command line arguments after the word diff
+    return:
+        <class 'argparse.Namespace'> : namespace of the diff arguments
+    """
+    diff_parser = argparse.ArgumentParser(
+        prog="networkscanner diff",
+        description="Show what changed between two versions of a device config saved with --config_history",
+    )
+    diff_parser.add_argument("address", action="store", help="IP of the device")
+    diff_parser.add_argument(
+        "--kind",
+        action="store",
+        choices=list(HISTORY_CONFIGS.keys()),
+        default="running",
+        help="Which config to look at",
+    )
+    diff_parser.add_argument(
+        "--from",
+        dest="from_version",
+        action="store",
+        type=int,
+        default=None,
+        help="Older version.  The version before --to if not given",
+    )
+    diff_parser.add_argument(
+        "--to",
+        dest="to_version",
+        action="store",
+        type=int,
+        default=None,
+        help="Newer version.  The newest version if not given",
+    )
+    return diff_parser.parse_args(arg_list)
+
+
+def run_diff(diff_args):
+    """
+    Prints the differences between two versions of a config
+    Args:
+        diff_args (<class 'argparse.Namespace'>) : arguments from parse_diff_args
+    return:
+        dict : differences from ConfigHistory.diff_versions
+    """
+    config_history = ConfigHistory()
+    versions = config_history.versions(diff_args.address, diff_args.kind)
+    if len(versions) < 2:
+        raise ValueError(
+            f"{diff_args.address} only has {len(versions)} versions of its {diff_args.kind} config"
+        )
+    to_version = (
+        diff_args.to_version if diff_args.to_version is not None else versions[-1]["version"]
+    )
+    from_version = (
+        diff_args.from_version if diff_args.from_version is not None else to_version - 1
+    )
+    differences = config_history.diff_versions(
+        diff_args.address, diff_args.kind, from_version, to_version
+    )
+    print(f"{diff_args.address} {diff_args.kind} config version {from_version} to {to_version}")
+    for key in differences["added"]:
+        print(f"+ {key}")
+    for key in differences["removed"]:
+        print(f"- {key}")
+    for key, diff_lines in differences["changed"].items():
+        print(f"~ {key}")
+        for line in diff_lines:
+            print(f"    {line}")
+    return differences
+
+
+def parse_configs_args(arg_list):
+    """
+    Parse the arguments for the configs command
+    Args:
+        arg_list (list) : command line arguments after the word configs
+    return:
+        <class 'argparse.Namespace'> : namespace of the configs arguments
+    """
+    configs_parser = argparse.ArgumentParser(
+        prog="networkscanner configs",
+        description="Find config sections across every device of a run.  "
+        "networkscanner configs --type interface --missing ^shutdown$ --missing ^description "
+        "is every interface that is up with no description",
+    )
+    configs_parser.add_argument(
+        "--type",
+        dest="section_type",
+        action="store",
+        required=True,
+        help="Section type like interface, router bgp or line vty",
+    )
+    configs_parser.add_argument(
+        "--match", action="store", default=None, help="Regex the section line has to match"
+    )
+    configs_parser.add_argument(
+        "--having",
+        action="append",
+        default=[],
+        help="Regex a line under the section has to match.  Can be given more than once",
+    )
+    configs_parser.add_argument(
+        "--missing",
+        action="append",
+        default=[],
+        help="Regex no line under the section can match.  Can be given more than once",
+    )
+    configs_parser.add_argument(
+        "--kind",
+        action="store",
+        choices=list(HISTORY_CONFIGS.keys()),
+        default="running",
+        help="Which config to look at",
+    )
+    configs_parser.add_argument(
+        "--run",
+        action="store",
+        default=None,
+        help="Run to read the devices from (directory, run file or pack).  The newest run file in Output/Scans "
+        "if not given, or the per device files in Output/Scans if there is no run file",
+    )
+    configs_parser.add_argument(
+        "--show", action="store_true", help="Print the whole section and not only its first line"
+    )
+    configs_parser.add_argument(
+        "--store",
+        action="store",
+        default=None,
+        help="Config store directory the run was saved to with --config_store.  Output/Configs if not given",
+    )
+    return configs_parser.parse_args(arg_list)
+
+
+def resolve_run_location(run_location=None):
+    """
+    Picks what to read a run from.  A directory with run files in it is read from its newest run file, since the
+    default layouts only write the run file and not the per device files
+    Args:
+        run_location (str|None) : directory, run file or pack.  Output/Scans if None
+    return:
+        str : the run file, pack or directory to read
+    """
+    if run_location is None:
+        run_location = get_scans_directory()
+    if os.path.isdir(run_location):
+        latest_run = find_latest_run(run_location)
+        if latest_run is not None:
+            print(f"Reading the devices from {latest_run}")
+            return latest_run
+    return run_location
+
+
+def open_config_store(store_directory=None):
+    """
+    Args:
+        store_directory (str|None) : config store directory from --store
+    return:
+        ConfigStore|None : the store, or None to read from Output/Configs
+    """
+    if store_directory is None:
+        return None
+    if not os.path.isdir(store_directory):
+        raise ValueError(f"{store_directory} is not a directory.  Give the directory of the config store")
+    return ConfigStore(store_directory)
+
+
+def check_devices_found(device_count, run_location):
+    """
+    Stops a command that read no devices so it does not report on an empty fleet as if it were clean
+    Args:
+        device_count (int) : number of devices read
+        run_location (str) : where they were read from
+    return:
+        None
+    """
+    if device_count == 0:
+        raise ValueError(
+            f"No devices were found in {run_location}.  Give the run file, pack or per device directory to read"
+        )
+
+
+def load_config_fleet(run_location, kind="running", config_store=None):
+    """
+    Parses the configs of every device of a run
+    Args:
+        run_location (str) : anything load_saved_devices can read
+        kind (str) : key of HISTORY_CONFIGS
+        config_store (ConfigStore|None) : store the configs were saved to.  Output/Configs if None
+    return:
+        ConfigFleet : the parsed configs
+    """
+    config_items = []
+    device_count = 0
+    for device in iter_saved_devices(run_location):
+        device_count += 1
+        device_information = (
+            (device.device_info or {}).get("CONFIG", {}).get("Device_Information") or {}
+        )
+        location = device_information.get(HISTORY_CONFIGS[kind])
+        if location is not None and artifact_exists(location, config_store):
+            config_items.append((device.IP, read_artifact_text(location, config_store)))
+    check_devices_found(device_count, run_location)
+    config_fleet = ConfigFleet()
+    parsed_count = config_fleet.add_configs(config_items)
+    print(
+        f"{len(config_fleet)} configs loaded.  {parsed_count} parsed, {len(config_items) - parsed_count} from the cache"
+    )
+    return config_fleet
+
+
+def run_configs(configs_args):
+    """
+    Prints the sections that match across the devices of a run
+    Args:
+        configs_args (<class 'argparse.Namespace'>) : arguments from parse_configs_args
+    return:
+        list : list of (address, ConfigLine) from ConfigFleet.query
+    """
+    run_location = resolve_run_location(configs_args.run)
+    config_fleet = load_config_fleet(
+        run_location, configs_args.kind, open_config_store(configs_args.store)
+    )
+    results = config_fleet.query(
+        configs_args.section_type,
+        match=configs_args.match,
+        having=configs_args.having,
+        missing=configs_args.missing,
+    )
+    for address, config_line in results:
+        if configs_args.show:
+            print(f"{address} :")
+            for line in config_line.lines():
+                print(f"    {line}")
         else:
-            path = "../"
-            while write_directory is None:
-                if "Output" in os.listdir(path):
-                    write_directory = f"{path}/Output/Scans/{device.IP}"
-                path += "../"
-        if not os.path.exists(write_directory):
-            os.makedirs(write_directory)
-        file_location = f"{write_directory}\\{device.IP}_json_short.txt"
-        with open(file_location, "w") as output_file:
-            output_file.write(device.print_json_short())
-        file_location = f"{write_directory}\\{device.IP}_json_long.txt"
-        with open(file_location, "w") as output_file:
-            output_file.write(device.print_json_long())
+            print(f"{address} : {config_line.text}")
+    print(f"{len(results)} sections found")
+    return results
+
+
+def parse_compliance_args(arg_list):
+    """
+    Parse the arguments for the compliance command
+    Args:
+        arg_list (list) : command line arguments after the word compliance
+    return:
+        <class 'argparse.Namespace'> : namespace of the compliance arguments
+    """
+    compliance_parser = argparse.ArgumentParser(
+        prog="networkscanner compliance",
+        description="Check the configs and command outputs of every device of a run against STIG/compliance rule packs",
+    )
+    compliance_parser.add_argument(
+        "packs",
+        action="store",
+        nargs="*",
+        help=f"Rule pack files or directories of them.  {COMPLIANCE_PACK_DIRECTORY} if not given",
+    )
+    compliance_parser.add_argument(
+        "--kind",
+        action="store",
+        choices=list(HISTORY_CONFIGS.keys()),
+        default="running",
+        help="Which config to check",
+    )
+    compliance_parser.add_argument(
+        "--run",
+        action="store",
+        default=None,
+        help="Run to read the devices from (directory, run file or pack).  The newest run file in Output/Scans "
+        "if not given, or the per device files in Output/Scans if there is no run file",
+    )
+    compliance_parser.add_argument(
+        "--processes",
+        action="store",
+        type=int,
+        default=None,
+        help="Number of processes to check the devices with.  One per CPU if not given",
+    )
+    compliance_parser.add_argument(
+        "--output",
+        action="store",
+        default=None,
+        help="Where to write the JSON report.  Output/Scans/compliance_<time>.json if not given",
+    )
+    compliance_parser.add_argument(
+        "--failures", action="store_true", help="Print every failed rule of every device"
+    )
+    compliance_parser.add_argument(
+        "--store",
+        action="store",
+        default=None,
+        help="Config store directory the run was saved to with --config_store.  Output/Configs if not given",
+    )
+    return compliance_parser.parse_args(arg_list)
+
+
+def load_compliance_items(run_location, kind="running", config_store=None):
+    """
+    Reads what the compliance rules are checked against from every device of a run
+    Args:
+        run_location (str) : anything load_saved_devices can read
+        kind (str) : key of HISTORY_CONFIGS
+        config_store (ConfigStore|None) : store the configs were saved to.  Output/Configs if None
+    return:
+        list : list of (address, platform, config text or None, Show_Info or None)
+    """
+    device_items = []
+    for device in iter_saved_devices(run_location):
+        config = (device.device_info or {}).get("CONFIG") or {}
+        location = (config.get("Device_Information") or {}).get(HISTORY_CONFIGS[kind])
+        config_text = None
+        if location is not None and artifact_exists(location, config_store):
+            config_text = read_artifact_text(location, config_store)
+        show_info = config.get("Show_Info")
+        if not isinstance(show_info, dict):
+            show_info = None
+        device_items.append(
+            (device.IP, device_platform(device.device_info), config_text, show_info)
+        )
+    check_devices_found(len(device_items), run_location)
+    return device_items
+
+
+def run_compliance(compliance_args):
+    """
+    Checks every device of a run against rule packs and writes the report
+    Args:
+        compliance_args (<class 'argparse.Namespace'>) : arguments from parse_compliance_args
+    return:
+        ComplianceReport : results of every device
+    """
+    pack_locations = compliance_args.packs or [COMPLIANCE_PACK_DIRECTORY]
+    run_location = resolve_run_location(compliance_args.run)
+    device_items = load_compliance_items(
+        run_location, compliance_args.kind, open_config_store(compliance_args.store)
+    )
+    report = evaluate_fleet(pack_locations, device_items, processes=compliance_args.processes)
+    print(
+        f"{len(device_items)} devices checked against {', '.join(report.pack_names)} in {report.run_time:.2f} seconds"
+    )
+    for rule_id, rule in report.by_rule().items():
+        print(
+            f"{rule_id} ({rule['severity']}) {rule['title']} : {rule['pass']} pass, {rule['fail']} fail, "
+            f"{rule['not_applicable']} not applicable, {rule['no_data']} no data"
+        )
+    if compliance_args.failures:
+        for result in report.failures():
+            print(f"{result['address']} {result['rule']} : {'; '.join(result['details'])}")
+    print(f"Report written to {report.save(compliance_args.output)}")
+    return report
+
+
+def parse_search_args(arg_list):
+    """
+    Parse the arguments for the search command
+    Args:
+        arg_list (list) : command line arguments after the word search
+    return:
+        <class 'argparse.Namespace'> : namespace of the search arguments
+    """
+    search_parser = argparse.ArgumentParser(
+        prog="networkscanner search",
+        description="Find the lines of the configs and command outputs that have every word.  "
+        "networkscanner search ACL-MGMT or networkscanner search snmp-server community",
+    )
+    search_parser.add_argument(
+        "terms",
+        action="store",
+        nargs="*",
+        help="Words that all have to be on the line.  End a word with * to match the start of words",
+    )
+    search_parser.add_argument(
+        "--address", action="store", default=None, help="Only search the files of this device"
+    )
+    search_parser.add_argument(
+        "--name",
+        action="store",
+        default=None,
+        help="Only search files with this in their name, like running or show_version",
+    )
+    search_parser.add_argument(
+        "--limit", action="store", type=int, default=100, help="Most lines to print"
+    )
+    search_parser.add_argument(
+        "--raw", action="store_true", help="The words are an SQLite FTS5 query and are used as they are"
+    )
+    search_parser.add_argument(
+        "--index",
+        action="store",
+        default=None,
+        help="Search index to use.  Output/Scans/search_index.db if not given",
+    )
+    search_parser.add_argument(
+        "--build",
+        action="store",
+        default=None,
+        metavar="RUN",
+        help="Index the configs and command outputs of a run (directory, run file or pack) first.  For a "
+        "directory with run files in it the newest run file is used",
+    )
+    search_parser.add_argument(
+        "--store",
+        action="store",
+        default=None,
+        help="Config store directory the run was saved to with --config_store.  Output/Configs if not given",
+    )
+    return search_parser.parse_args(arg_list)
+
+
+def iter_search_documents(run_location, config_store=None):
+    """
+    Reads the files to index from every device of a run
+    Args:
+        run_location (str) : anything load_saved_devices can read
+        config_store (ConfigStore|None) : store the configs were saved to.  Output/Configs if None
+    return:
+        generator : (address, name, text, location) for each config and command output
+    """
+    device_count = 0
+    for device in iter_saved_devices(run_location):
+        device_count += 1
+        config = (device.device_info or {}).get("CONFIG") or {}
+        for key, location in (config.get("Device_Information") or {}).items():
+            if not key.endswith("_File_Location") or not artifact_exists(location, config_store):
+                continue
+            # The same file name get_config_napalm gave it, like 192.168.1.1_running_full.txt
+            kind = key[len("Device_") :].split("_Config")[0].lower()
+            full = "_full" if key.endswith("_Full_File_Location") else ""
+            name = f"{device.IP}_{kind}{full}.txt"
+            yield (device.IP, name, read_artifact_text(location, config_store), location)
+        show_info = config.get("Show_Info")
+        if isinstance(show_info, dict):
+            for command_key, output in show_info.items():
+                if command_key == "ERROR":
+                    continue
+                yield (device.IP, command_key, render_command_output(output), None)
+    check_devices_found(device_count, run_location)
+
+
+def run_search(search_args):
+    """
+    Prints the lines that match from the search index
+    Args:
+        search_args (<class 'argparse.Namespace'>) : arguments from parse_search_args
+    return:
+        list : dicts from SearchIndex.search
+    """
+    results = []
+    with SearchIndex(search_args.index) as search_index:
+        if search_args.build is not None:
+            start_time = time.time()
+            indexed = search_index.add_documents(
+                iter_search_documents(
+                    resolve_run_location(search_args.build), open_config_store(search_args.store)
+                )
+            )
+            print(
+                f"{indexed} files indexed in {time.time() - start_time:.2f} seconds.  {len(search_index)} files are in the index"
+            )
+        if not search_args.terms:
+            return results
+        start_time = time.time()
+        results = search_index.search(
+            search_args.terms if not search_args.raw else " ".join(search_args.terms),
+            address=search_args.address,
+            name=search_args.name,
+            limit=search_args.limit,
+            raw=search_args.raw,
+        )
+        search_time = time.time() - start_time
+    for result in results:
+        print(f"{result['address']} {result['name']}:{result['line_number']} : {result['line'].strip()}")
+    print(f"{len(results)} lines found in {search_time * 1000:.1f} ms")
+    return results
+
+
+def parse_convert_args(arg_list):
+    """
+    Parse the arguments for the convert command
+    Args:
+        arg_list (list) : command line arguments after the word convert
+    return:
+        <class 'argparse.Namespace'> : namespace of the convert arguments
+    """
+    convert_parser = argparse.ArgumentParser(
+        prog="networkscanner convert",
+        description="Convert a run file to another format, or back to the per device JSON files",
+    )
+    convert_parser.add_argument(
+        "input_file",
+        action="store",
+        help="Run file to read (.ndjson, .msgpack or .cbor, optionally .gz or .zst compressed)",
+    )
+    convert_parser.add_argument(
+        "output",
+        action="store",
+        help="File to write, or a directory when --per-device is used",
+    )
+    convert_parser.add_argument(
+        "--to",
+        action="store",
+        choices=OUTPUT_FORMATS,
+        default=None,
+        help="Format to write.  Taken from the output file extension if not given",
+    )
+    convert_parser.add_argument(
+        "--per-device",
+        action="store_true",
+        help="Write <IP>/<IP>_json_short.txt and <IP>_json_long.txt files under the output directory",
+    )
+    return convert_parser.parse_args(arg_list)
+
+
+def run_convert(convert_args):
+    """
+    Converts a run file
+    Args:
+        convert_args (<class 'argparse.Namespace'>) : arguments from parse_convert_args
+    return:
+        int : number of devices converted
+    """
+    if convert_args.per_device:
+        device_count = 0
+        with PerDeviceFileSink(convert_args.output) as output_sink:
+            for device in iter_saved_devices(convert_args.input_file):
+                output_sink.write_device(device)
+                device_count += 1
+    else:
+        device_count = convert_record_file(
+            convert_args.input_file, convert_args.output, convert_args.to
+        )
+    print(f"Converted {device_count} devices to {convert_args.output}")
+    return device_count
+
+
+def parse_extract_args(arg_list):
+    """
+    Parse the arguments for the extract command
+    Args:
+        arg_list (list) : command line arguments after the word extract
+    return:
+        <class 'argparse.Namespace'> : namespace of the extract arguments
+    """
+    extract_parser = argparse.ArgumentParser(
+        prog="networkscanner extract",
+        description="List or pull files out of a run packfile without unpacking all of it",
+    )
+    extract_parser.add_argument("pack_file", action="store", help="Packfile of the run")
+    extract_parser.add_argument(
+        "names",
+        action="store",
+        nargs="*",
+        help="Entries to pull out like 192.168.1.1/192.168.1.1_running.txt or 192.168.1.1/record.json.  "
+        "Every entry of an IP is pulled out if only the IP is given",
+    )
+    extract_parser.add_argument(
+        "-o",
+        "--output_directory",
+        action="store",
+        default=None,
+        help="Directory to write the entries to.  They are printed if not given",
+    )
+    return extract_parser.parse_args(arg_list)
+
+
+def run_extract(extract_args):
+    """
+    Lists the entries of a packfile or pulls some of them out
+    Args:
+        extract_args (<class 'argparse.Namespace'>) : arguments from parse_extract_args
+    return:
+        list : names of the entries listed or pulled out
+    """
+    with PackfileReader(extract_args.pack_file) as pack:
+        if not extract_args.names:
+            names = pack.names()
+            for name in names:
+                print(name)
+            return names
+        names = []
+        for requested in extract_args.names:
+            if requested in pack:
+                names.append(requested)
+            else:
+                names.extend(name for name in pack.names() if name.startswith(f"{requested}/"))
+        if not names:
+            print(f"None of {extract_args.names} are in {extract_args.pack_file}")
+        for name in names:
+            if extract_args.output_directory is None:
+                print(pack.read_text(name))
+                continue
+            file_location = os.path.join(extract_args.output_directory, *name.split("/"))
+            os.makedirs(os.path.dirname(file_location), exist_ok=True)
+            with open(file_location, "wb") as output_file:
+                output_file.write(pack.read(name))
+            print(f"Wrote {file_location}")
+    return names
+
+
+def parse_changed_args(arg_list):
+    """
+    Parse the arguments for the changed command
+    Args:
+        arg_list (list) : command line arguments after the word changed
+    return:
+        <class 'argparse.Namespace'> : namespace of the changed arguments
+    """
+    changed_parser = argparse.ArgumentParser(
+        prog="networkscanner changed",
+        description="Show which devices changed config between two runs saved with --config_store",
+    )
+    changed_parser.add_argument(
+        "--run",
+        action="store",
+        default=None,
+        help="Run to look at.  The newest run if not given",
+    )
+    changed_parser.add_argument(
+        "--against",
+        action="store",
+        default=None,
+        help="Run to compare to.  The run before --run if not given",
+    )
+    changed_parser.add_argument(
+        "--store",
+        action="store",
+        default=None,
+        help="Config store directory.  Output/Configs if not given",
+    )
+    return changed_parser.parse_args(arg_list)
+
+
+def run_changed(changed_args):
+    """
+    Prints the devices that changed config between two runs
+    Args:
+        changed_args (<class 'argparse.Namespace'>) : arguments from parse_changed_args
+    return:
+        dict : comparison from compare_manifests
+    """
+    config_store = ConfigStore(changed_args.store)
+    run_names = config_store.manifests()
+    run_name = changed_args.run if changed_args.run is not None else (run_names or [None])[-1]
+    if run_name is None or run_name not in run_names:
+        raise ValueError(f"There is no manifest for {run_name}.  Runs are {run_names}")
+    against_name = changed_args.against
+    if against_name is None:
+        older_runs = run_names[: run_names.index(run_name)]
+        if not older_runs:
+            raise ValueError(f"There is no run before {run_name} to compare to")
+        against_name = older_runs[-1]
+    comparison = compare_manifests(
+        config_store.load_manifest(against_name), config_store.load_manifest(run_name)
+    )
+    print(f"Comparing {run_name} to {against_name}")
+    for key, addresses in comparison.items():
+        print(f"{key.capitalize()} ({len(addresses)}): {', '.join(addresses)}")
+    return comparison
+
+
+def parse_history_args(arg_list):
+    """
+    Parse the arguments for the history command
+    Args:
+        arg_list (list) : command line arguments after the word history
+    return:
+        <class 'argparse.Namespace'> : namespace of the history arguments
+    """
+    history_parser = argparse.ArgumentParser(
+        prog="networkscanner history",
+        description="Show what a port on a host looked like in every run saved to the database",
+    )
+    history_parser.add_argument("address", action="store", help="IP of the host")
+    history_parser.add_argument(
+        "--port", action="store", type=int, required=True, help="Port number"
+    )
+    history_parser.add_argument(
+        "--protocol",
+        action="store",
+        choices=["TCP", "UDP"],
+        default="TCP",
+        help="Protocol of the port",
+    )
+    history_parser.add_argument(
+        "--database",
+        action="store",
+        default=None,
+        help="Database to read.  Output/Scans/results.db if not given",
+    )
+    return history_parser.parse_args(arg_list)
+
+
+def run_history(history_args):
+    """
+    Prints the history of a port on a host
+    Args:
+        history_args (<class 'argparse.Namespace'>) : arguments from parse_history_args
+    return:
+        list : list of the results from ResultStore.port_history
+    """
+    with ResultStore(history_args.database) as result_store:
+        history = result_store.port_history(
+            history_args.address, history_args.protocol, history_args.port
+        )
+    for entry in history:
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["started"]))
+        detail = entry["reason"] if entry["banner"] is None else entry["banner"]
+        print(f"Run {entry['run_id']} ({started}) : {entry['state'].name} {detail}")
+    if not history:
+        print(
+            f"No results for {history_args.protocol}/{history_args.port} on {history_args.address}"
+        )
+    return history
+
+
+def parse_reparse_args(arg_list):
+    """
+    Parse the arguments for the reparse command
+    Args:
+        arg_list (list) : command line arguments after the word reparse
+    return:
+        <class 'argparse.Namespace'> : namespace of the reparse arguments
+    """
+    reparse_parser = argparse.ArgumentParser(
+        prog="networkscanner reparse",
+        description="Parse the command transcripts saved with --transcripts again with the NTC templates there "
+        "now, without logging into the devices",
+    )
+    reparse_parser.add_argument(
+        "--run",
+        action="store",
+        type=int,
+        default=None,
+        help="run_id to parse again.  The newest run if not given",
+    )
+    reparse_parser.add_argument(
+        "--address", action="store", default=None, help="Only parse the transcripts of this host"
+    )
+    reparse_parser.add_argument(
+        "--processes",
+        action="store",
+        type=int,
+        default=None,
+        help="Processes to parse with.  One per CPU if not given",
+    )
+    reparse_parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Write the outputs that parsed differently back to the command outputs of the run",
+    )
+    reparse_parser.add_argument(
+        "--database",
+        action="store",
+        default=None,
+        help="Database to read.  Output/Scans/results.db if not given",
+    )
+    return reparse_parser.parse_args(arg_list)
+
+
+def run_reparse(reparse_args):
+    """
+    Parses the saved transcripts of a run again and prints what changed and how long the parsing took
+    Args:
+        reparse_args (<class 'argparse.Namespace'>) : arguments from parse_reparse_args
+    return:
+        list : (ip, command key, output) tuples of the outputs that parsed differently than what was saved
+    """
+    with ResultStore(reparse_args.database) as result_store:
+        run_id = reparse_args.run if reparse_args.run is not None else result_store.latest_run()
+        transcripts = result_store.transcripts(run_id, reparse_args.address)
+        start_time = time.perf_counter()
+        results = reparse_transcripts(transcripts, reparse_args.processes)
+        elapsed = time.perf_counter() - start_time
+        changed = []
+        failed = 0
+        for result in results:
+            transcript = result["transcript"]
+            if result["error"] is not None:
+                failed += 1
+                print(f"{transcript['ip']} {transcript['command']} : {result['error']}")
+                continue
+            if transcript["command_key"] is None:
+                continue
+            saved = result_store.command_output(transcript["ip"], transcript["command_key"], run_id)
+            if saved is None and isinstance(result["parsed"], str):
+                # The device rejected the command or nothing was parsed then or now
+                continue
+            if saved != result["parsed"]:
+                changed.append((transcript["ip"], transcript["command_key"], result["parsed"]))
+                print(f"{transcript['ip']} {transcript['command_key']} parses differently now")
+        if reparse_args.update and changed:
+            result_store.update_command_outputs(run_id, changed)
+    parse_seconds = sum(result["seconds"] for result in results)
+    print(
+        f"Parsed {len(results)} of {len(transcripts)} transcripts from run {run_id} in {elapsed:.2f} seconds "
+        f"({parse_seconds:.3f} seconds in the templates).  {len(changed)} changed and {failed} failed"
+    )
+    if reparse_args.update:
+        print(f"{len(changed)} command outputs were updated")
+    return changed
+
+
+def parse_query_args(arg_list):
+    """
+    Parse the arguments for the query command
+    Args:
+        arg_list (list) : command line arguments after the word query
+    return:
+        <class 'argparse.Namespace'> : namespace of the query arguments
+    """
+    query_parser = argparse.ArgumentParser(
+        prog="networkscanner query",
+        description="Answer questions about a finished run from its result index",
+    )
+    query_parser.add_argument(
+        "--port",
+        action="store",
+        type=int,
+        help="Hosts with this port open",
+        metavar="PORT",
+    )
+    query_parser.add_argument(
+        "--protocol",
+        action="store",
+        choices=["TCP", "UDP", "tcp", "udp"],
+        default="TCP",
+        help="Protocol of the port.  Defaults to TCP",
+    )
+    query_parser.add_argument(
+        "--product",
+        action="store",
+        help="Hosts running this service or product (ssh, openssh, apache, cisco-1.25...)",
+        metavar="PRODUCT",
+    )
+    query_parser.add_argument(
+        "--banner",
+        action="store",
+        help="Hosts with every word of this text in a banner",
+        metavar="TEXT",
+    )
+    query_parser.add_argument(
+        "--run",
+        action="store",
+        default=None,
+        help="Run file, pack or directory whose index is read.  Defaults to the newest run in Output/Scans",
+        metavar="RUN",
+    )
+    query_parser.add_argument(
+        "--index",
+        action="store",
+        default=None,
+        help="Index file to read instead of the index of the run",
+        metavar="INDEX_FILE",
+    )
+    query_args = query_parser.parse_args(arg_list)
+    if query_args.port is None and query_args.product is None and query_args.banner is None:
+        query_parser.error("give at least one of --port, --product or --banner")
+    return query_args
+
+
+def run_query(query_args):
+    """
+    Loads the result index and prints the hosts that match the query
+    Args:
+        query_args (<class 'argparse.Namespace'>) : arguments from parse_query_args
+    return:
+        list : list of the hosts that matched
+    """
+    index_location = query_args.index
+    if index_location is None:
+        index_location = index_location_for_run(resolve_run_location(query_args.run))
+    result_index = ResultIndex.load(index_location)
+    hosts = result_index.query(
+        protocol=query_args.protocol,
+        port=query_args.port,
+        product=query_args.product,
+        banner=query_args.banner,
+    )
+    for host in hosts:
+        print(host)
+    return hosts
 
 
 def get_who_to_scan(addresses_to_test):
@@ -221,7 +1453,7 @@ def create_scan_dictionary(script_args, address_list, address_space):
     return:
         list : list of addressesto test
         dict : dictionary of following format
-            return_dict[address] = {"username":username,"password":password,"use_enable":use_enable,"enable_password":enable_password,"domain_name":domain_name,}
+            return_dict[address] = {"username":username,"password":password,"use_enable":use_enable,"enable_password":enable_password,"domain_name":domain_name,"getter_profile":getter_profile,}
     """
     return_dict = {}
     for address in address_list:
@@ -274,6 +1506,8 @@ def create_scan_dictionary(script_args, address_list, address_space):
     else:
         domain_name = None
 
+    getter_profile = getattr(script_args, "getter_profile", None)
+
     for address in address_list:
         return_dict[address] = {
             "username": username,
@@ -281,6 +1515,7 @@ def create_scan_dictionary(script_args, address_list, address_space):
             "use_enable": use_enable,
             "enable_password": enable_password,
             "domain_name": domain_name,
+            "getter_profile": getter_profile,
         }
     return (return_dict, address_list)
 
@@ -293,7 +1528,7 @@ def parse_csv_file(csv_file_location):
     return:
         list : list of addresses to test for pinger
         dict : dictionary of following format
-            return_dict[address] = {"username":username,"password":password,"use_enable":use_enable,"enable_password":enable_password,"domain_name":domain_name,}
+            return_dict[address] = {"username":username,"password":password,"use_enable":use_enable,"enable_password":enable_password,"domain_name":domain_name,"getter_profile":getter_profile,}
 
     """
     import csv
@@ -306,10 +1541,11 @@ def parse_csv_file(csv_file_location):
             if row[0].startswith("#"):
                 continue
             else:
-                if len(row) != 6:
+                if len(row) not in (6, 7):
                     raise ValueError(
                         f"CSV file was not in the right format.  Start over."
                     )
+                # The 7th column, the getter profile, is optional
                 (
                     address,
                     username,
@@ -317,7 +1553,10 @@ def parse_csv_file(csv_file_location):
                     domain_name,
                     enable_enabled,
                     enable_password,
-                ) = row
+                ) = row[:6]
+                getter_profile = None
+                if len(row) == 7 and row[6].strip() != "":
+                    getter_profile = check_getter_profile(row[6].strip())
                 address_list = []
                 address_list.append(address)
                 address_list_parsed = get_who_to_scan(address_list)
@@ -353,6 +1592,7 @@ def parse_csv_file(csv_file_location):
                         "use_enable": use_enable,
                         "enable_password": useable_enable_password,
                         "domain_name": usable_domain_name,
+                        "getter_profile": getter_profile,
                     }
     return (return_dict, return_address_list)
 
@@ -361,6 +1601,36 @@ if __name__ == "__main__":
 
     import pprint
 
+    if len(sys.argv) > 1 and sys.argv[1] == "query":
+        run_query(parse_query_args(sys.argv[2:]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "extract":
+        run_extract(parse_extract_args(sys.argv[2:]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "configs":
+        run_configs(parse_configs_args(sys.argv[2:]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "search":
+        run_search(parse_search_args(sys.argv[2:]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "compliance":
+        run_compliance(parse_compliance_args(sys.argv[2:]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "diff":
+        run_diff(parse_diff_args(sys.argv[2:]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "changed":
+        run_changed(parse_changed_args(sys.argv[2:]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "reparse":
+        run_reparse(parse_reparse_args(sys.argv[2:]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "history":
+        run_history(parse_history_args(sys.argv[2:]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "convert":
+        run_convert(parse_convert_args(sys.argv[2:]))
+        sys.exit(0)
     startTime = time.time()
     main()
     executionTime = time.time() - startTime
@@ -0,0 +1,289 @@
+#!python
+
+"""
+Where the files for a device (configs and the like) are written.
+
+Everything that saves a file for a device goes through write_artifact.  By default the file is written to
+Output/Scans/<IP>/<file name> like the program always has.  While a PackfileSink is open the files go into the
+run's packfile instead, and while a ConfigStoreArtifacts is set they go into the content addressed config store
+(the location is then sha256:<hash>).  The location returned is saved in the results and read_artifact reads it back either way.
+While a search index is set with scan_mods.search_index.set_search_index every file is also added to it.
+Files are compressed with the compression set in scan_mods.compression and read_artifact decompresses them.
+Packfiles that are read from are kept open, so reading the configs of every device of a pack loads its index once
+"""
+
+import atexit
+import collections
+import contextlib
+import os
+import sys
+import threading
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.output_sink import get_device_directory
+from scan_mods.compression import compressed_file_name, open_compressed
+from scan_mods.config_store import ConfigStore, HASH_PREFIX
+from scan_mods.search_index import index_artifact
+
+
+LOCATION_SEPARATOR = "::"
+# Most packfiles kept open for read_artifact and artifact_exists
+PACK_READER_CACHE_SIZE = 8
+
+_pack_readers = collections.OrderedDict()
+_pack_readers_lock = threading.Lock()
+
+
+class FileArtifactStore:
+    """
+    Writes each file to Output/Scans/<IP>/<file name>.  .gz or .zst is added to the name when compression is on
+    """
+
+    def write_artifact(self, address, file_name, data):
+        """
+        Args:
+            address (str) : IP of the device
+            file_name (str) : name of the file
+            data (bytes|str) : contents
+        Return:
+            str : path of the file
+        """
+        file_location = os.path.join(
+            get_device_directory(address), compressed_file_name(file_name)
+        )
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with open_compressed(file_location, "wb") as output_file:
+            output_file.write(data)
+        return file_location
+
+
+_artifact_store = FileArtifactStore()
+_artifact_store_lock = threading.Lock()
+
+
+def set_artifact_store(store):
+    """
+    Sets where write_artifact puts files
+    Args:
+        store : object with a write_artifact(address, file_name, data) method
+    Return:
+        the store that was being used before
+    """
+    global _artifact_store
+    if not callable(getattr(store, "write_artifact", None)):
+        raise TypeError(f"{store} does not have a write_artifact method")
+    with _artifact_store_lock:
+        previous_store = _artifact_store
+        _artifact_store = store
+    return previous_store
+
+
+def get_artifact_store():
+    """
+    Return:
+        the store write_artifact is using
+    """
+    return _artifact_store
+
+
+def write_artifact(address, file_name, data):
+    """
+    Writes a file for a device to the current store
+    Args:
+        address (str) : IP of the device
+        file_name (str) : name of the file like 192.168.1.1_running.txt
+        data (bytes|str) : contents
+    Return:
+        str : location of the file.  Give it to read_artifact to read it back
+    """
+    if not isinstance(address, str):
+        raise TypeError(f"{address} is not a string.  It is a {type(address).__name__}")
+    if not isinstance(file_name, str):
+        raise TypeError(f"{file_name} is not a string.  It is a {type(file_name).__name__}")
+    location = _artifact_store.write_artifact(address, file_name, data)
+    index_artifact(address, file_name, data, location)
+    return location
+
+
+def reference_artifact(address, file_name, location):
+    """
+    Records that a file written in an earlier run is part of this run too.  Stores that keep a manifest of the run
+    (ConfigStoreArtifacts) add it to the manifest.  The others have nothing to do
+    Args:
+        address (str) : IP of the device
+        file_name (str) : name of the file like 192.168.1.1_running.txt
+        location (str) : location returned by write_artifact in the earlier run
+    Return:
+        str : location of the file for this run
+    """
+    reference = getattr(_artifact_store, "reference", None)
+    if reference is None:
+        return location
+    return reference(address, file_name, location)
+
+
+def split_location(location):
+    """
+    Args:
+        location (str) : location returned by write_artifact
+    Return:
+        tuple : (pack path, entry name) for a file in a packfile, or (location, None) for a plain file
+    """
+    if LOCATION_SEPARATOR in location:
+        pack_location, name = location.split(LOCATION_SEPARATOR, 1)
+        return (pack_location, name)
+    return (location, None)
+
+
+class _CachedPack:
+    """
+    A packfile kept open by pack_reader with the number of reads using it
+    """
+
+    __slots__ = ("version", "pack", "users", "dropped")
+
+    def __init__(self, version, pack):
+        self.version = version
+        self.pack = pack
+        self.users = 0
+        self.dropped = False
+
+
+def _drop_cached_pack(cached):
+    # Called with the lock held.  The pack is closed now if nothing is reading it, or by the last read using it
+    cached.dropped = True
+    return [cached.pack] if cached.users == 0 else []
+
+
+@contextlib.contextmanager
+def pack_reader(file_location):
+    """
+    Opens a packfile once and keeps it open while it is not changed.  A pack that was written to since it was
+    opened is opened again.  Packs pushed out of the cache are closed once the last read using them is done
+    Args:
+        file_location (str) : path of the packfile
+    Return:
+        PackfileReader : the open reader, for the with block only.  Do not close it
+    """
+    # packfile imports this module so it is imported here
+    from scan_mods.packfile import PackfileReader
+
+    file_stat = os.stat(file_location)
+    version = (file_stat.st_mtime_ns, file_stat.st_size)
+    to_close = []
+    with _pack_readers_lock:
+        cached = _pack_readers.get(file_location)
+        if cached is None or cached.version != version:
+            if cached is not None:
+                to_close += _drop_cached_pack(cached)
+            cached = _CachedPack(version, PackfileReader(file_location))
+            _pack_readers[file_location] = cached
+        _pack_readers.move_to_end(file_location)
+        cached.users += 1
+        while len(_pack_readers) > PACK_READER_CACHE_SIZE:
+            to_close += _drop_cached_pack(_pack_readers.popitem(last=False)[1])
+    for pack in to_close:
+        pack.close()
+    try:
+        yield cached.pack
+    finally:
+        with _pack_readers_lock:
+            cached.users -= 1
+            close_pack = cached.dropped and cached.users == 0
+        if close_pack:
+            cached.pack.close()
+
+
+def close_pack_readers():
+    """
+    Closes every packfile kept open by pack_reader.  Packs still being read are closed when the read is done.  It
+    is called when the program exits
+    Return:
+        None
+    """
+    to_close = []
+    with _pack_readers_lock:
+        for cached in _pack_readers.values():
+            to_close += _drop_cached_pack(cached)
+        _pack_readers.clear()
+    for pack in to_close:
+        pack.close()
+
+
+atexit.register(close_pack_readers)
+
+
+def resolve_config_store(config_store=None):
+    """
+    Picks the config store sha256:<hash> locations are read from
+    Args:
+        config_store (ConfigStore|None) : store to use.  If None, the store of the ConfigStoreArtifacts being
+            written to, so a store in another directory is read back, or Output/Configs if there is none
+    Return:
+        ConfigStore : the store
+    """
+    if config_store is not None:
+        if not isinstance(config_store, ConfigStore):
+            raise TypeError(f"{config_store} is not a ConfigStore.  It is a {type(config_store).__name__}")
+        return config_store
+    writing_store = getattr(_artifact_store, "config_store", None)
+    if isinstance(writing_store, ConfigStore):
+        return writing_store
+    return ConfigStore()
+
+
+def read_artifact(location, config_store=None):
+    """
+    Reads a file written by write_artifact
+    Args:
+        location (str) : location returned by write_artifact
+        config_store (ConfigStore|None) : store a sha256:<hash> location is read from.  See resolve_config_store
+    Return:
+        bytes : contents of the file, decompressed
+    """
+    if not isinstance(location, str):
+        raise TypeError(f"{location} is not a string.  It is a {type(location).__name__}")
+    if location.startswith(HASH_PREFIX):
+        return resolve_config_store(config_store).get(location)
+    file_location, name = split_location(location)
+    if name is None:
+        with open_compressed(file_location, "rb") as input_file:
+            return input_file.read()
+    with pack_reader(file_location) as pack:
+        return pack.read(name)
+
+
+def artifact_exists(location, config_store=None):
+    """
+    Args:
+        location (str) : location returned by write_artifact
+        config_store (ConfigStore|None) : store a sha256:<hash> location is looked for in.  See resolve_config_store
+    Return:
+        bool : True if the file can still be read
+    """
+    if not isinstance(location, str):
+        return False
+    if location.startswith(HASH_PREFIX):
+        return resolve_config_store(config_store).has(location[len(HASH_PREFIX) :])
+    file_location, name = split_location(location)
+    if name is None:
+        return os.path.exists(file_location)
+    if not os.path.exists(file_location):
+        return False
+    with pack_reader(file_location) as pack:
+        return name in pack
+
+
+def read_artifact_text(location, config_store=None):
+    """
+    Args:
+        location (str) : location returned by write_artifact
+        config_store (ConfigStore|None) : store a sha256:<hash> location is read from.  See resolve_config_store
+    Return:
+        str : contents of the file as a string
+    """
+    return read_artifact(location, config_store).decode("utf-8")
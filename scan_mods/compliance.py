@@ -0,0 +1,572 @@
+#!python
+
+"""
+Compliance (STIG) rule engine for the configs and NTC command outputs of a run.
+
+Rules come in rule packs, JSON files like
+
+    {
+        "name": "ios_baseline",
+        "platforms": ["ios"],
+        "rules": [
+            {
+                "id": "IOS-001",
+                "title": "Passwords are encrypted",
+                "severity": "medium",
+                "required": ["^service password-encryption$"],
+                "forbidden": ["^ip http server$"]
+            },
+            {
+                "id": "IOS-002",
+                "title": "Only SSH on the VTY lines",
+                "severity": "high",
+                "section": {"type": "line vty", "required": ["^transport input ssh$"], "must_exist": true}
+            },
+            {
+                "id": "IOS-003",
+                "title": "Running a supported release",
+                "command": {"name": "show_version", "field": "VERSION", "forbidden": "^12\\."}
+            }
+        ]
+    }
+
+    required / forbidden : regexes that a line of the config must / must not match
+    section : every section of the type or list of types (and matching "match" if given) must have the "required" lines under it
+        and none of the "forbidden" ones.  With "must_exist" a config without the section fails
+    command : NTC output from Show_Info.  Every row's "field" must match "required" ("any": true for one row
+        is enough) and no row may match "forbidden"
+    platforms : the rule (or every rule of the pack) only applies to these napalm drivers
+
+Lines are matched on their stripped text.  The lines searched are joined into one string and searched with
+re.MULTILINE, so ^ and $ are the start and end of a line and each regex is one search no matter how big the
+config is.
+
+Each rule comes out as pass, fail, not_applicable (nothing in the config the rule is about) or no_data (no config
+or no command output to check).  Packs are compiled once, a compiled pack is reused until its file changes, and
+evaluate_fleet sends the devices to a process pool where each process compiles the packs one time
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.output_sink import get_scans_directory
+from scan_mods.config_parser import PLATFORMS, ConfigTree
+
+
+STATUSES = ("pass", "fail", "not_applicable", "no_data")
+SEVERITIES = ("high", "medium", "low")
+RULE_PACK_EXTENSION = ".json"
+OS_TYPE_PATTERN = re.compile(r"\((\w+)\)\.$")
+
+# Compiled packs by path.  A pack is compiled again when the size or time of its file changes
+_compiled_packs = {}
+# Packs compiled in each process of the evaluate_fleet pool
+_worker_packs = []
+
+
+def _compile_patterns(patterns, where):
+    if patterns is None:
+        return []
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    if not isinstance(patterns, list):
+        raise TypeError(f"{where} needs to be a regex or a list of regexes.  Not {type(patterns).__name__}")
+    compiled = []
+    for pattern in patterns:
+        try:
+            compiled.append(re.compile(pattern, re.MULTILINE))
+        except (re.error, TypeError) as ex:
+            raise ValueError(f"{pattern} in {where} is not a valid regex.  {ex}")
+    return compiled
+
+
+def _check_lines(text, required, forbidden, label=""):
+    """
+    Return:
+        list : a message for every required regex that did not match and every forbidden regex that did
+    """
+    problems = []
+    for pattern in required:
+        if not pattern.search(text):
+            problems.append(f"{label}missing {pattern.pattern}")
+    for pattern in forbidden:
+        match = pattern.search(text)
+        if match:
+            problems.append(f"{label}has {match.group(0)}")
+    return problems
+
+
+class ComplianceRule:
+    """
+    One compiled rule of a rule pack
+
+    Methods:
+        .applies_to() : see if the rule is for a platform
+        .evaluate() : check a device against the rule
+    """
+
+    __slots__ = (
+        "pack",
+        "rule_id",
+        "title",
+        "severity",
+        "platforms",
+        "required",
+        "forbidden",
+        "section_type",
+        "section_match",
+        "section_required",
+        "section_forbidden",
+        "section_must_exist",
+        "command_name",
+        "command_field",
+        "command_required",
+        "command_forbidden",
+        "command_any",
+    )
+
+    def __init__(self, rule, pack_name="", pack_platforms=None):
+        if not isinstance(rule, dict):
+            raise TypeError(f"{rule} is not a dict.  It is a {type(rule).__name__}")
+        if "id" not in rule:
+            raise ValueError(f"A rule in {pack_name} has no id")
+        self.pack = pack_name
+        self.rule_id = str(rule["id"])
+        where = f"{pack_name} {self.rule_id}"
+        self.title = rule.get("title", "")
+        self.severity = rule.get("severity", "medium")
+        if self.severity not in SEVERITIES:
+            raise ValueError(f"{self.severity} in {where} is not a severity.  Use one of {SEVERITIES}")
+        platforms = rule.get("platforms", pack_platforms)
+        self.platforms = frozenset(platforms) if platforms else None
+        self.required = _compile_patterns(rule.get("required"), f"{where} required")
+        self.forbidden = _compile_patterns(rule.get("forbidden"), f"{where} forbidden")
+        section = rule.get("section")
+        self.section_type = None
+        self.section_match = None
+        self.section_required = []
+        self.section_forbidden = []
+        self.section_must_exist = False
+        if section is not None:
+            if not isinstance(section, dict) or "type" not in section:
+                raise ValueError(f"The section of {where} needs to be a dict with a type")
+            section_types = section["type"]
+            if isinstance(section_types, str):
+                section_types = [section_types]
+            self.section_type = tuple(section_types)
+            if section.get("match") is not None:
+                self.section_match = _compile_patterns(section["match"], f"{where} section match")[0]
+            self.section_required = _compile_patterns(section.get("required"), f"{where} section required")
+            self.section_forbidden = _compile_patterns(section.get("forbidden"), f"{where} section forbidden")
+            self.section_must_exist = bool(section.get("must_exist", False))
+        command = rule.get("command")
+        self.command_name = None
+        self.command_field = None
+        self.command_required = None
+        self.command_forbidden = None
+        self.command_any = False
+        if command is not None:
+            if not isinstance(command, dict) or "name" not in command:
+                raise ValueError(f"The command of {where} needs to be a dict with a name")
+            self.command_name = command["name"]
+            self.command_field = command.get("field")
+            if command.get("required") is not None:
+                self.command_required = _compile_patterns(command["required"], f"{where} command required")[0]
+            if command.get("forbidden") is not None:
+                self.command_forbidden = _compile_patterns(command["forbidden"], f"{where} command forbidden")[0]
+            self.command_any = bool(command.get("any", False))
+        if not (self.required or self.forbidden or self.section_type or self.command_name):
+            raise ValueError(f"{where} has nothing to check.  Give it required, forbidden, section or command")
+
+    @property
+    def uses_config(self):
+        return bool(self.required or self.forbidden or self.section_type)
+
+    def applies_to(self, platform):
+        """
+        Args:
+            platform (str|None) : napalm driver of the device
+        Return:
+            bool : True if the rule is checked on the platform
+        """
+        return self.platforms is None or platform in self.platforms
+
+    def _evaluate_config(self, tree, config_text):
+        if tree is None:
+            return ("no_data", ["no config"])
+        problems = []
+        checked = False
+        if self.required or self.forbidden:
+            checked = True
+            problems += _check_lines(config_text, self.required, self.forbidden)
+        if self.section_type is not None:
+            sections = [
+                config_line
+                for wanted_type in self.section_type
+                for config_line in tree.sections(wanted_type)
+            ]
+            sections.sort(key=lambda config_line: config_line.position)
+            if self.section_match is not None:
+                sections = [config_line for config_line in sections if self.section_match.search(config_line.text)]
+            if sections:
+                checked = True
+                for config_line in sections:
+                    body = "\n".join([line.strip() for line in config_line.lines()[1:]])
+                    problems += _check_lines(
+                        body,
+                        self.section_required,
+                        self.section_forbidden,
+                        f"{config_line.text.strip()} : ",
+                    )
+            elif self.section_must_exist:
+                checked = True
+                problems.append(f"no {' or '.join(self.section_type)} section")
+        if problems:
+            return ("fail", problems)
+        return ("pass", []) if checked else ("not_applicable", [])
+
+    def _evaluate_command(self, show_info):
+        output = (show_info or {}).get(self.command_name)
+        if not output:
+            return ("no_data", [f"no {self.command_name} output"])
+        if isinstance(output, str):
+            values = [output]
+        else:
+            values = []
+            for row in output:
+                if self.command_field is None:
+                    values.append(json.dumps(row, sort_keys=True))
+                else:
+                    value = row.get(self.command_field) if isinstance(row, dict) else None
+                    if isinstance(value, list):
+                        value = " ".join(str(item) for item in value)
+                    values.append("" if value is None else str(value))
+        problems = []
+        if self.command_required is not None:
+            matched = [value for value in values if self.command_required.search(value)]
+            if self.command_any and not matched:
+                problems.append(f"{self.command_name} : no row matches {self.command_required.pattern}")
+            elif not self.command_any and len(matched) != len(values):
+                problems.append(
+                    f"{self.command_name} : {len(values) - len(matched)} rows do not match {self.command_required.pattern}"
+                )
+        if self.command_forbidden is not None:
+            for value in values:
+                if self.command_forbidden.search(value):
+                    problems.append(f"{self.command_name} : has {value}")
+        return ("fail", problems) if problems else ("pass", [])
+
+    def evaluate(self, tree, config_text, show_info):
+        """
+        Args:
+            tree (ConfigTree|None) : parsed config of the device
+            config_text (str|None) : stripped lines of the config joined with new lines
+            show_info (dict|None) : Show_Info of the device
+        Return:
+            tuple : (status, list of messages about what failed)
+        """
+        outcomes = []
+        if self.uses_config:
+            outcomes.append(self._evaluate_config(tree, config_text))
+        if self.command_name is not None:
+            outcomes.append(self._evaluate_command(show_info))
+        statuses = [status for status, _ in outcomes]
+        details = [message for _, messages in outcomes for message in messages]
+        for status in ("fail", "no_data", "pass"):
+            if status in statuses:
+                return (status, details)
+        return ("not_applicable", details)
+
+
+class RulePack:
+    """
+    A compiled rule pack
+
+    Methods:
+        .from_dict() : compile a pack from its JSON
+        .rules_for() : the rules for a platform
+    """
+
+    def __init__(self, name, rules, source=None):
+        self.name = name
+        self.rules = rules
+        self.source = source
+        self._platform_rules = {}
+
+    @classmethod
+    def from_dict(cls, pack_dict, source=None):
+        """
+        Args:
+            pack_dict (dict) : the rule pack
+            source (str|None) : file it came from
+        Return:
+            RulePack : the compiled pack
+        """
+        if not isinstance(pack_dict, dict):
+            raise TypeError(f"{pack_dict} is not a dict.  It is a {type(pack_dict).__name__}")
+        if not isinstance(pack_dict.get("rules"), list):
+            raise ValueError(f"The rule pack {source} needs a list of rules")
+        name = pack_dict.get("name") or (
+            os.path.splitext(os.path.basename(source))[0] if source else "rules"
+        )
+        rules = [ComplianceRule(rule, name, pack_dict.get("platforms")) for rule in pack_dict["rules"]]
+        rule_ids = [rule.rule_id for rule in rules]
+        if len(set(rule_ids)) != len(rule_ids):
+            raise ValueError(f"The rule pack {name} uses a rule id more than once")
+        return cls(name, rules, source)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def rules_for(self, platform):
+        """
+        Args:
+            platform (str|None) : napalm driver of the device
+        Return:
+            list : the rules that apply to the platform
+        """
+        if platform not in self._platform_rules:
+            self._platform_rules[platform] = [rule for rule in self.rules if rule.applies_to(platform)]
+        return self._platform_rules[platform]
+
+
+def find_rule_packs(locations):
+    """
+    Args:
+        locations (str|list) : rule pack files or directories of them
+    Return:
+        list : paths of the rule pack files
+    """
+    if isinstance(locations, str):
+        locations = [locations]
+    pack_files = []
+    for location in locations:
+        if os.path.isdir(location):
+            pack_files += sorted(
+                os.path.join(location, file_name)
+                for file_name in os.listdir(location)
+                if file_name.endswith(RULE_PACK_EXTENSION)
+            )
+        elif os.path.isfile(location):
+            pack_files.append(location)
+        else:
+            raise FileNotFoundError(f"{location} is not a rule pack or a directory of rule packs")
+    return pack_files
+
+
+def load_rule_pack(pack_location):
+    """
+    Reads and compiles a rule pack.  The compiled pack is reused until the file changes
+    Args:
+        pack_location (str) : path of the rule pack
+    Return:
+        RulePack : the compiled pack
+    """
+    if not isinstance(pack_location, str):
+        raise TypeError(f"{pack_location} is not a string.  It is a {type(pack_location).__name__}")
+    real_location = os.path.realpath(pack_location)
+    file_stat = os.stat(real_location)
+    key = (file_stat.st_mtime_ns, file_stat.st_size)
+    cached = _compiled_packs.get(real_location)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(real_location) as input_file:
+        try:
+            pack_dict = json.load(input_file)
+        except json.JSONDecodeError as ex:
+            raise ValueError(f"{pack_location} is not valid JSON.  {ex}")
+    rule_pack = RulePack.from_dict(pack_dict, pack_location)
+    _compiled_packs[real_location] = (key, rule_pack)
+    return rule_pack
+
+
+def evaluate_device(rule_packs, address, platform, config_text, show_info=None):
+    """
+    Checks one device against rule packs
+    Args:
+        rule_packs (list) : RulePack objects
+        address (str) : IP of the device
+        platform (str|None) : napalm driver of the device
+        config_text (str|None) : config of the device
+        show_info (dict|None) : Show_Info of the device
+    Return:
+        list : dicts of address, pack, rule, severity, status and details for each rule that applies
+    """
+    tree = None
+    joined_text = None
+    if config_text:
+        tree = ConfigTree.parse(config_text, platform if platform in PLATFORMS else None)
+        joined_text = "\n".join([line.strip() for line in tree.lines])
+    results = []
+    for rule_pack in rule_packs:
+        for rule in rule_pack.rules_for(platform):
+            status, details = rule.evaluate(tree, joined_text, show_info)
+            results.append(
+                {
+                    "address": address,
+                    "pack": rule_pack.name,
+                    "rule": rule.rule_id,
+                    "title": rule.title,
+                    "severity": rule.severity,
+                    "status": status,
+                    "details": details,
+                }
+            )
+    return results
+
+
+def device_platform(device_info):
+    """
+    Args:
+        device_info (dict|None) : device_info of a FoundDevice
+    Return:
+        str|None : napalm driver of the device or None if it is not known
+    """
+    config = (device_info or {}).get("CONFIG") or {}
+    if config.get("OS_Type"):
+        return config["OS_Type"]
+    # Runs from before OS_Type was saved only have it in the message
+    match = OS_TYPE_PATTERN.search(config.get("Open_Close_Msg") or "")
+    return match.group(1) if match else None
+
+
+def _init_worker(pack_items):
+    global _worker_packs
+    _worker_packs = [RulePack.from_dict(pack_dict, source) for source, pack_dict in pack_items]
+
+
+def _evaluate_worker(device_item):
+    return evaluate_device(_worker_packs, *device_item)
+
+
+def evaluate_fleet(pack_locations, device_items, processes=None):
+    """
+    Checks many devices against rule packs with a process pool
+    Args:
+        pack_locations (str|list) : rule pack files or directories of them
+        device_items (list) : list of (address, platform, config text, show info)
+        processes (int|None) : number of processes.  One per CPU if None
+    Return:
+        ComplianceReport : results of every device
+    """
+    pack_files = find_rule_packs(pack_locations)
+    # Compiled here first so a bad pack fails before the pool starts
+    rule_packs = [load_rule_pack(pack_file) for pack_file in pack_files]
+    pack_names = [rule_pack.name for rule_pack in rule_packs]
+    device_items = [tuple(device_item) for device_item in device_items]
+    start_time = time.time()
+    if len(device_items) < 2 or processes == 1:
+        device_results = [evaluate_device(rule_packs, *device_item) for device_item in device_items]
+    else:
+        pack_items = []
+        for pack_file in pack_files:
+            with open(pack_file) as input_file:
+                pack_items.append((pack_file, json.load(input_file)))
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(pack_items,)) as pool:
+            device_results = pool.map(
+                _evaluate_worker, device_items, chunksize=max(1, len(device_items) // 64)
+            )
+    results = [result for results in device_results for result in results]
+    return ComplianceReport(results, pack_names, time.time() - start_time)
+
+
+class ComplianceReport:
+    """
+    Results of a compliance run
+
+    Methods:
+        .by_device() : counts and failed rules of each device
+        .by_rule() : counts and failed devices of each rule
+        .failures() : the results that failed
+        .save() : write the report as JSON
+    """
+
+    def __init__(self, results, pack_names=(), run_time=0.0):
+        self.results = results
+        self.pack_names = list(pack_names)
+        self.run_time = run_time
+
+    def __len__(self):
+        return len(self.results)
+
+    def failures(self):
+        """
+        Return:
+            list : results with a status of fail
+        """
+        return [result for result in self.results if result["status"] == "fail"]
+
+    def by_device(self):
+        """
+        Return:
+            dict : {IP: {status: count, ..., "failed_rules": [rule ids]}} sorted by IP
+        """
+        devices = {}
+        for result in self.results:
+            device = devices.setdefault(
+                result["address"], dict({status: 0 for status in STATUSES}, failed_rules=[])
+            )
+            device[result["status"]] += 1
+            if result["status"] == "fail":
+                device["failed_rules"].append(result["rule"])
+        return dict(sorted(devices.items()))
+
+    def by_rule(self):
+        """
+        Return:
+            dict : {rule id: {"pack", "title", "severity", status: count, ..., "failed_devices": [IPs]}}
+        """
+        rules = {}
+        for result in self.results:
+            rule = rules.setdefault(
+                result["rule"],
+                dict(
+                    {status: 0 for status in STATUSES},
+                    pack=result["pack"],
+                    title=result["title"],
+                    severity=result["severity"],
+                    failed_devices=[],
+                ),
+            )
+            rule[result["status"]] += 1
+            if result["status"] == "fail":
+                rule["failed_devices"].append(result["address"])
+        for rule in rules.values():
+            rule["failed_devices"].sort()
+        return rules
+
+    def to_dict(self):
+        """
+        Return:
+            dict : the whole report
+        """
+        return {
+            "packs": self.pack_names,
+            "run_time": self.run_time,
+            "devices": self.by_device(),
+            "rules": self.by_rule(),
+            "results": self.results,
+        }
+
+    def save(self, file_location=None):
+        """
+        Args:
+            file_location (str|None) : where to write the report.  Output/Scans/compliance_<time>.json if None
+        Return:
+            str : path of the report
+        """
+        if file_location is None:
+            file_location = os.path.join(
+                get_scans_directory(), f"compliance_{time.strftime('%Y%m%d_%H%M%S')}.json"
+            )
+        with open(file_location, "w") as output_file:
+            json.dump(self.to_dict(), output_file, indent=4)
+        return file_location
@@ -0,0 +1,181 @@
+#!python
+
+"""
+Compression for the files the program writes.
+
+Compressions
+    none : files are written as they always have been (default)
+    gzip : .gz files.  Always available
+    zstd : .zst files.  Needs the zstandard package
+    auto : zstd if zstandard is installed, gzip if not
+
+The compression picked with set_compression is used by the artifact store, the packfile and the output sinks.
+Everything that reads the files works out the compression from the file name, so compressed and plain files
+can be read the same way
+"""
+
+import gzip
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+COMPRESSION_CHOICES = COMPRESSIONS + ("auto",)
+# Codec numbers saved in the header of each packfile entry
+CODEC_IDS = {"none": 0, "gzip": 1, "zstd": 2}
+CODEC_NAMES = {value: key for key, value in CODEC_IDS.items()}
+FILE_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+
+_compression = "none"
+_compression_lock = threading.Lock()
+
+
+def resolve_compression(compression):
+    """
+    Args:
+        compression (str) : one of COMPRESSION_CHOICES
+    Return:
+        str : one of COMPRESSIONS.  auto is turned into zstd or gzip
+    """
+    if compression not in COMPRESSION_CHOICES:
+        raise ValueError(
+            f"{compression} is not a compression.  Use one of {COMPRESSION_CHOICES}"
+        )
+    if compression == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if compression == "zstd" and zstandard is None:
+        raise ImportError("zstd compression needs the zstandard package.  pip install zstandard")
+    return compression
+
+
+def set_compression(compression):
+    """
+    Sets the compression used for the files written from now on
+    Args:
+        compression (str) : one of COMPRESSION_CHOICES
+    Return:
+        str : the compression that was being used before
+    """
+    global _compression
+    resolved = resolve_compression(compression)
+    with _compression_lock:
+        previous_compression = _compression
+        _compression = resolved
+    return previous_compression
+
+
+def get_compression():
+    """
+    Return:
+        str : the compression being used, one of COMPRESSIONS
+    """
+    return _compression
+
+
+def compress(data, compression=None):
+    """
+    Args:
+        data (bytes) : data to compress
+        compression (str|None) : one of COMPRESSIONS.  The current compression if None
+    Return:
+        bytes : compressed data
+    """
+    if compression is None:
+        compression = _compression
+    if compression == "none":
+        return bytes(data)
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"{compression} is not a compression.  Use one of {COMPRESSIONS}")
+
+
+def decompress(data, compression):
+    """
+    Args:
+        data (bytes) : compressed data
+        compression (str) : one of COMPRESSIONS
+    Return:
+        bytes : the data
+    """
+    if compression == "none":
+        return bytes(data)
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("The data is zstd compressed.  pip install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"{compression} is not a compression.  Use one of {COMPRESSIONS}")
+
+
+def compressed_file_name(file_name, compression=None):
+    """
+    Args:
+        file_name (str) : name of the file without a compression suffix
+        compression (str|None) : one of COMPRESSIONS.  The current compression if None
+    Return:
+        str : file name with .gz or .zst added when it is compressed
+    """
+    if compression is None:
+        compression = _compression
+    return file_name + FILE_SUFFIXES.get(compression, "")
+
+
+def compression_for_file(file_location):
+    """
+    Args:
+        file_location (str) : path of the file
+    Return:
+        str : compression of the file from its suffix, one of COMPRESSIONS
+    """
+    for compression, suffix in FILE_SUFFIXES.items():
+        if file_location.lower().endswith(suffix):
+            return compression
+    return "none"
+
+
+def strip_compression_suffix(file_location):
+    """
+    Args:
+        file_location (str) : path of the file
+    Return:
+        str : the path without a .gz or .zst suffix
+    """
+    compression = compression_for_file(file_location)
+    if compression == "none":
+        return file_location
+    return file_location[: -len(FILE_SUFFIXES[compression])]
+
+
+def open_compressed(file_location, mode="rb"):
+    """
+    Opens a file and compresses or decompresses it as a stream.  The compression comes from the file suffix
+    Args:
+        file_location (str) : path of the file
+        mode (str) : mode like open().  rb, wb, rt, wt, r and w are supported
+    Return:
+        file object
+    """
+    compression = compression_for_file(file_location)
+    if compression == "none":
+        return open(file_location, mode)
+    if mode in ("r", "w"):
+        mode = f"{mode}t"
+    if compression == "gzip":
+        return gzip.open(file_location, mode, compresslevel=GZIP_LEVEL)
+    if zstandard is None:
+        raise ImportError(f"{file_location} is zstd compressed.  pip install zstandard to use it")
+    if mode.startswith("w"):
+        return zstandard.open(
+            file_location, mode, cctx=zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        )
+    return zstandard.open(file_location, mode)
+
@@ -0,0 +1,366 @@
+#!python
+
+"""
+Config diff engine.
+
+Text configs are parsed with scan_mods.config_parser and split into sections.  A section is a line with no indent
+plus every indented line under it, so
+"interface GigabitEthernet0/1" and all of its settings are one section.  Each section is hashed, so two versions
+of a config are compared section by section and only the sections whose hash changed are diffed line by line.
+
+Every version of a device's config is kept in Output/Configs/history/<IP>_<kind>.jsonl, one JSON entry per line.
+A full snapshot is written every SNAPSHOT_INTERVAL versions.  The versions in between only hold the order of the
+sections, the new sections and difflib opcodes for the changed ones.  A config that did not change does not add
+a version.
+
+Lines that change without the config changing (Building configuration, Last configuration change, ntp
+clock-period, ...) are dropped before anything is compared
+"""
+
+import difflib
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.output_sink import find_output_root
+from scan_mods.config_parser import ConfigTree
+
+
+SNAPSHOT_INTERVAL = 20
+
+
+def get_history_directory():
+    """
+    Return:
+        str : path of Output/Configs/history.  It is created if it does not exist
+    """
+    history_directory = os.path.join(find_output_root(), "Configs", "history")
+    os.makedirs(history_directory, exist_ok=True)
+    return history_directory
+
+
+def split_sections(config_text):
+    """
+    Splits a config into sections.  A section key that is used more than once gets #2, #3... added
+    Args:
+        config_text (str) : text of the config
+    Return:
+        list : list of (key, list of lines) in the order they are in the config
+    """
+    sections = []
+    seen_keys = {}
+    for config_line in ConfigTree.parse(config_text).top_level():
+        key = config_line.text.strip()
+        seen_keys[key] = seen_keys.get(key, 0) + 1
+        if seen_keys[key] > 1:
+            key = f"{key} #{seen_keys[key]}"
+        sections.append((key, config_line.lines()))
+    return sections
+
+
+def hash_section(lines):
+    """
+    Args:
+        lines (list) : lines of the section
+    Return:
+        str : hash of the section
+    """
+    return hashlib.blake2b("\n".join(lines).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def join_sections(sections):
+    """
+    Args:
+        sections (list) : list of (key, lines) from split_sections
+    Return:
+        str : the config text
+    """
+    return "\n".join(line for _, lines in sections for line in lines)
+
+
+def diff_sections(old_sections, new_sections):
+    """
+    Compares two versions of a config section by section.  Only sections whose hash changed are diffed by line
+    Args:
+        old_sections (list) : list of (key, lines) of the older version
+        new_sections (list) : list of (key, lines) of the newer version
+    Return:
+        dict : {"added": [keys], "removed": [keys], "changed": {key: unified diff lines}}
+    """
+    old_dict = dict(old_sections)
+    new_dict = dict(new_sections)
+    old_hashes = {key: hash_section(lines) for key, lines in old_sections}
+    differences = {"added": [], "removed": [], "changed": {}}
+    for key, lines in new_sections:
+        if key not in old_dict:
+            differences["added"].append(key)
+        elif hash_section(lines) != old_hashes[key]:
+            differences["changed"][key] = list(
+                difflib.unified_diff(old_dict[key], lines, lineterm="", n=1)
+            )[2:]
+    differences["removed"] = [key for key, _ in old_sections if key not in new_dict]
+    return differences
+
+
+def diff_configs(old_text, new_text):
+    """
+    Args:
+        old_text (str) : older config
+        new_text (str) : newer config
+    Return:
+        dict : see diff_sections
+    """
+    return diff_sections(split_sections(old_text), split_sections(new_text))
+
+
+def line_opcodes(old_lines, new_lines):
+    """
+    Args:
+        old_lines (list) : lines of the old section
+        new_lines (list) : lines of the new section
+    Return:
+        list : [tag, old start, old end, new lines] for every part that is not the same
+    """
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        [tag, old_start, old_end, new_lines[new_start:new_end]]
+        for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_opcodes(old_lines, opcodes):
+    """
+    Args:
+        old_lines (list) : lines of the old section
+        opcodes (list) : opcodes from line_opcodes
+    Return:
+        list : lines of the new section
+    """
+    new_lines = []
+    position = 0
+    for tag, old_start, old_end, lines in opcodes:
+        new_lines.extend(old_lines[position:old_start])
+        new_lines.extend(lines)
+        position = old_end
+    new_lines.extend(old_lines[position:])
+    return new_lines
+
+
+class ConfigHistory:
+    """
+    Every version of the configs of each device, stored as snapshots and deltas
+
+    Methods:
+        .add_version() : add a config if it changed and return what changed
+        .get_version() : rebuild a version of a config
+        .versions() : list of the versions of a config
+        .diff_versions() : compare two versions
+    """
+
+    def __init__(self, history_directory=None):
+        if history_directory is None:
+            history_directory = get_history_directory()
+        if not isinstance(history_directory, str):
+            raise TypeError(
+                f"{history_directory} is not a string.  It is a {type(history_directory).__name__}"
+            )
+        os.makedirs(history_directory, exist_ok=True)
+        self.history_directory = history_directory
+
+    def _history_location(self, address, kind):
+        return os.path.join(self.history_directory, f"{address}_{kind}.jsonl")
+
+    def _read_entries(self, address, kind, last_version=None):
+        """
+        Reads the entries needed to rebuild a version.  Only the entries from the snapshot before the version
+        are parsed
+        """
+        history_location = self._history_location(address, kind)
+        if not os.path.exists(history_location):
+            return []
+        with open(history_location) as input_file:
+            lines = input_file.read().splitlines()
+        if last_version is not None:
+            lines = lines[: last_version + 1]
+        start = 0
+        for position in range(len(lines) - 1, -1, -1):
+            if lines[position].startswith('{"type":"snapshot"'):
+                start = position
+                break
+        return [json.loads(line) for line in lines[start:]]
+
+    def _rebuild(self, entries):
+        sections = []
+        for entry in entries:
+            if entry["type"] == "snapshot":
+                sections = [(key, lines) for key, lines in entry["sections"]]
+                continue
+            old_dict = dict(sections)
+            sections = []
+            for key in entry["order"]:
+                if key in entry["added"]:
+                    sections.append((key, entry["added"][key]))
+                elif key in entry["changed"]:
+                    sections.append((key, apply_opcodes(old_dict[key], entry["changed"][key])))
+                else:
+                    sections.append((key, old_dict[key]))
+        return sections
+
+    def get_sections(self, address, kind, version=None):
+        """
+        Args:
+            address (str) : IP of the device
+            kind (str) : which config like running or startup
+            version (int|None) : version to rebuild.  The newest if None
+        Return:
+            list : list of (key, lines) of the version.  Empty if there is no history
+        """
+        return self._rebuild(self._read_entries(address, kind, version))
+
+    def get_version(self, address, kind, version=None):
+        """
+        Args:
+            address (str) : IP of the device
+            kind (str) : which config like running or startup
+            version (int|None) : version to rebuild.  The newest if None
+        Return:
+            str : the config of the version, cleaned of volatile lines
+        """
+        return join_sections(self.get_sections(address, kind, version))
+
+    def versions(self, address, kind):
+        """
+        Args:
+            address (str) : IP of the device
+            kind (str) : which config like running or startup
+        Return:
+            list : dicts of version, time, hash and type of each version, oldest first
+        """
+        history_location = self._history_location(address, kind)
+        if not os.path.exists(history_location):
+            return []
+        versions = []
+        with open(history_location) as input_file:
+            for line in input_file:
+                entry = json.loads(line)
+                versions.append(
+                    {
+                        "version": entry["version"],
+                        "time": entry["time"],
+                        "hash": entry["hash"],
+                        "type": entry["type"],
+                    }
+                )
+        return versions
+
+    def add_version(self, address, kind, config_text):
+        """
+        Adds a config to the history if it is not the same as the newest version
+        Args:
+            address (str) : IP of the device
+            kind (str) : which config like running or startup
+            config_text (str) : text of the config
+        Return:
+            dict : {"address", "kind", "version", "changed" (bool), "differences" (from diff_sections or None)}
+        """
+        for item in [address, kind, config_text]:
+            if not isinstance(item, str):
+                raise TypeError(f"{item} is not a string.  It is a {type(item).__name__}")
+        new_sections = split_sections(config_text)
+        config_hash = hash_section([line for _, lines in new_sections for line in lines])
+        entries = self._read_entries(address, kind)
+        result = {"address": address, "kind": kind, "changed": False, "differences": None}
+        if entries and entries[-1]["hash"] == config_hash:
+            result["version"] = entries[-1]["version"]
+            return result
+        version = entries[-1]["version"] + 1 if entries else 0
+        old_sections = self._rebuild(entries)
+        if not entries or version % SNAPSHOT_INTERVAL == 0:
+            entry = {
+                "type": "snapshot",
+                "version": version,
+                "time": time.time(),
+                "hash": config_hash,
+                "sections": new_sections,
+            }
+        else:
+            old_dict = dict(old_sections)
+            old_hashes = {key: hash_section(lines) for key, lines in old_sections}
+            added = {}
+            changed = {}
+            for key, lines in new_sections:
+                if key not in old_dict:
+                    added[key] = lines
+                elif hash_section(lines) != old_hashes[key]:
+                    changed[key] = line_opcodes(old_dict[key], lines)
+            entry = {
+                "type": "delta",
+                "version": version,
+                "time": time.time(),
+                "hash": config_hash,
+                "order": [key for key, _ in new_sections],
+                "added": added,
+                "changed": changed,
+            }
+        with open(self._history_location(address, kind), "a") as output_file:
+            output_file.write(json.dumps(entry, separators=(",", ":")))
+            output_file.write("\n")
+        result["version"] = version
+        result["changed"] = True
+        if entries:
+            result["differences"] = diff_sections(old_sections, new_sections)
+        return result
+
+    def diff_versions(self, address, kind, old_version, new_version=None):
+        """
+        Args:
+            address (str) : IP of the device
+            kind (str) : which config like running or startup
+            old_version (int) : older version
+            new_version (int|None) : newer version.  The newest if None
+        Return:
+            dict : see diff_sections
+        """
+        return diff_sections(
+            self.get_sections(address, kind, old_version),
+            self.get_sections(address, kind, new_version),
+        )
+
+
+def _add_version_worker(work_item):
+    history_directory, address, kind, config_text = work_item
+    return ConfigHistory(history_directory).add_version(address, kind, config_text)
+
+
+def update_histories(config_items, history_directory=None, processes=None):
+    """
+    Adds many configs to their histories with a process pool
+    Args:
+        config_items (list) : list of (address, kind, config text).  Only one item per address and kind is allowed
+            so two processes never write the same history file
+        history_directory (str|None) : history directory.  Output/Configs/history if None
+        processes (int|None) : number of processes.  One per CPU if None
+    Return:
+        list : results from ConfigHistory.add_version in the same order as config_items
+    """
+    if history_directory is None:
+        history_directory = get_history_directory()
+    seen = set()
+    work_items = []
+    for address, kind, config_text in config_items:
+        if (address, kind) in seen:
+            raise ValueError(f"{address} {kind} is in the list more than once")
+        seen.add((address, kind))
+        work_items.append((history_directory, address, kind, config_text))
+    if len(work_items) < 2 or processes == 1:
+        return [_add_version_worker(work_item) for work_item in work_items]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(_add_version_worker, work_items, chunksize=max(1, len(work_items) // 64))
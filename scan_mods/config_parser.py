@@ -0,0 +1,470 @@
+#!python
+
+"""
+Hierarchical parser and index for IOS, NX-OS, IOS-XR and EOS text configs.
+
+A config is turned into a parent/child tree by indent, so "interface GigabitEthernet0/1" is the parent of its
+" description ..." and " shutdown" lines and "router bgp 65000" is the parent of " address-family ipv4" which is
+the parent of its networks.  The tree is kept as flat lists in the order of the config (the text, depth and where
+the children of each line end) so a parsed config is small and quick to send between processes.  ConfigLine
+objects are only made when a line is looked at.
+
+Every parent line and every line with no indent is indexed by section type, like interface, router bgp,
+line vty or ip access-list, so finding the sections of a type does not walk the config.
+
+ConfigFleet parses many configs in a process pool and saves each parsed config by the hash of its text, so
+asking again about a config that did not change does not parse it again
+"""
+
+import hashlib
+import multiprocessing
+import os
+import pickle
+import re
+import sys
+from array import array
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.output_sink import find_output_root
+
+
+PARSER_VERSION = 1
+PLATFORMS = ("ios", "nxos", "nxos_ssh", "iosxr", "eos")
+# Lines that change without the config changing
+VOLATILE_LINE_PATTERN = re.compile(
+    r"^\s*(?:Building configuration|Current configuration\s*:|!+\s*Last configuration change"
+    r"|!+\s*NVRAM config last updated|!+\s*No configuration change|!+\s*Time:|!+\s*Running configuration last done"
+    r"|ntp clock-period)"
+)
+# Section types that are named by their first two words
+TWO_WORD_SECTION_TYPES = {
+    "router",
+    "line",
+    "ip",
+    "ipv6",
+    "crypto",
+    "address-family",
+    "aaa",
+    "snmp-server",
+    "spanning-tree",
+    "vrf",
+}
+
+
+def clean_config_lines(config_text):
+    """
+    Args:
+        config_text (str) : text of the config
+    Return:
+        list : lines of the config without trailing spaces, blank lines, lines that are only ! and volatile lines
+    """
+    if not isinstance(config_text, str):
+        raise TypeError(f"{config_text} is not a string.  It is a {type(config_text).__name__}")
+    lines = []
+    for line in config_text.splitlines():
+        line = line.rstrip()
+        if not line or line.strip() == "!" or VOLATILE_LINE_PATTERN.match(line):
+            continue
+        lines.append(line)
+    return lines
+
+
+def section_type(text):
+    """
+    Args:
+        text (str) : line of the config
+    Return:
+        str : section type of the line like interface, router bgp or line vty
+    """
+    words = text.split()
+    if not words:
+        return ""
+    if words[0] == "no" and len(words) > 1:
+        words = words[1:]
+    if words[0] in TWO_WORD_SECTION_TYPES and len(words) > 1:
+        return f"{words[0]} {words[1]}"
+    return words[0]
+
+
+def hash_config(config_text):
+    """
+    Args:
+        config_text (str) : text of the config
+    Return:
+        str : sha256 as hex of the config without its volatile lines, so a pull where only those changed is still
+            found in the parse cache
+    """
+    return hashlib.sha256("\n".join(clean_config_lines(config_text)).encode("utf-8")).hexdigest()
+
+
+class ConfigLine:
+    """
+    One line of a parsed config
+
+    Attributes:
+        .text = the line as it is in the config
+        .depth = 0 for lines with no indent, 1 for their children and so on
+        .section_type = section type of the line
+
+    Methods:
+        .children() / .descendants() / .parent() : move around the tree
+        .has_child() : see if any line under this one matches a regex
+        .child_values() : what comes after a keyword in the lines under this one
+    """
+
+    __slots__ = ("tree", "position")
+
+    def __init__(self, tree, position):
+        self.tree = tree
+        self.position = position
+
+    @property
+    def text(self):
+        return self.tree.lines[self.position]
+
+    @property
+    def depth(self):
+        return self.tree.depths[self.position]
+
+    @property
+    def section_type(self):
+        return section_type(self.text)
+
+    def parent(self):
+        """
+        Return:
+            ConfigLine|None : the line this one is under or None if it has no indent
+        """
+        depth = self.depth
+        if depth == 0:
+            return None
+        for position in range(self.position - 1, -1, -1):
+            if self.tree.depths[position] < depth:
+                return ConfigLine(self.tree, position)
+        return None
+
+    def children(self):
+        """
+        Return:
+            list : ConfigLine for each line directly under this one
+        """
+        child_depth = self.depth + 1
+        return [
+            ConfigLine(self.tree, position)
+            for position in range(self.position + 1, self.tree.ends[self.position])
+            if self.tree.depths[position] == child_depth
+        ]
+
+    def descendants(self):
+        """
+        Return:
+            list : ConfigLine for every line under this one
+        """
+        return [
+            ConfigLine(self.tree, position)
+            for position in range(self.position + 1, self.tree.ends[self.position])
+        ]
+
+    def lines(self):
+        """
+        Return:
+            list : text of this line and every line under it
+        """
+        return self.tree.lines[self.position : self.tree.ends[self.position]]
+
+    def has_child(self, pattern):
+        """
+        Args:
+            pattern (str|re.Pattern) : regex searched for in the stripped text of the lines under this one
+        Return:
+            bool : True if any line under this one matches
+        """
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+        lines = self.tree.lines
+        for position in range(self.position + 1, self.tree.ends[self.position]):
+            if pattern.search(lines[position].strip()):
+                return True
+        return False
+
+    def child_values(self, keyword):
+        """
+        Args:
+            keyword (str) : first words of a child line like "description" or "ip address"
+        Return:
+            list : the rest of each line under this one that starts with the keyword
+        """
+        prefix = f"{keyword} "
+        values = []
+        for line in self.tree.lines[self.position + 1 : self.tree.ends[self.position]]:
+            stripped = line.strip()
+            if stripped.startswith(prefix):
+                values.append(stripped[len(prefix) :])
+        return values
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ConfigLine)
+            and self.tree is other.tree
+            and self.position == other.position
+        )
+
+    def __hash__(self):
+        return hash((id(self.tree), self.position))
+
+    def __repr__(self):
+        return f"ConfigLine({self.text!r})"
+
+
+class ConfigTree:
+    """
+    A parsed config
+
+    Attributes:
+        .lines = list of the lines of the config
+        .depths = array of the depth of each line
+        .ends = array of the position after the last line under each line
+        .index = dict of section type to array of the positions of the lines of that type
+
+    Methods:
+        .parse() : parse a config
+        .sections() : lines of a section type
+        .find() : lines that match a regex
+    """
+
+    __slots__ = ("platform", "config_hash", "lines", "depths", "ends", "index")
+
+    def __init__(self, lines, depths, ends, index, platform=None, config_hash=None):
+        self.lines = lines
+        self.depths = depths
+        self.ends = ends
+        self.index = index
+        self.platform = platform
+        self.config_hash = config_hash
+
+    @classmethod
+    def parse(cls, config_text, platform=None):
+        """
+        Args:
+            config_text (str) : text of the config
+            platform (str|None) : one of PLATFORMS.  They are all parsed by indent, it is kept with the tree
+        Return:
+            ConfigTree : the parsed config
+        """
+        if platform is not None and platform not in PLATFORMS:
+            raise ValueError(f"{platform} is not a platform that can be parsed.  Use one of {PLATFORMS}")
+        lines = clean_config_lines(config_text)
+        depths = array("H", bytes(2 * len(lines)))
+        ends = array("I", bytes(4 * len(lines)))
+        index = {}
+        # stack of (indent, position) of the lines that the current line could be under
+        stack = []
+        for position, line in enumerate(lines):
+            indent = len(line) - len(line.lstrip())
+            while stack and stack[-1][0] >= indent:
+                ends[stack.pop()[1]] = position
+            depths[position] = len(stack)
+            stack.append((indent, position))
+        for _, position in stack:
+            ends[position] = len(lines)
+        for position, line in enumerate(lines):
+            if depths[position] == 0 or ends[position] > position + 1:
+                index.setdefault(section_type(line), array("I")).append(position)
+        return cls(lines, depths, ends, index, platform, hash_config(config_text))
+
+    def __len__(self):
+        return len(self.lines)
+
+    def top_level(self):
+        """
+        Return:
+            list : ConfigLine for each line with no indent
+        """
+        return [
+            ConfigLine(self, position)
+            for position in range(len(self.lines))
+            if self.depths[position] == 0
+        ]
+
+    def sections(self, wanted_type=None):
+        """
+        Args:
+            wanted_type (str|None) : section type like interface or router bgp.  Every indexed line if None
+        Return:
+            list : ConfigLine for each line of the type in config order
+        """
+        if wanted_type is None:
+            positions = sorted(position for value in self.index.values() for position in value)
+        else:
+            positions = self.index.get(wanted_type, ())
+        return [ConfigLine(self, position) for position in positions]
+
+    def find(self, pattern):
+        """
+        Args:
+            pattern (str|re.Pattern) : regex searched for in the stripped text of each line
+        Return:
+            list : ConfigLine for each line that matches
+        """
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+        return [
+            ConfigLine(self, position)
+            for position, line in enumerate(self.lines)
+            if pattern.search(line.strip())
+        ]
+
+
+def get_parse_cache_directory():
+    """
+    Return:
+        str : path of Output/Configs/parsed.  It is created if it does not exist
+    """
+    cache_directory = os.path.join(find_output_root(), "Configs", "parsed")
+    os.makedirs(cache_directory, exist_ok=True)
+    return cache_directory
+
+
+def _parse_worker(work_item):
+    config_text, platform = work_item
+    return ConfigTree.parse(config_text, platform)
+
+
+class ConfigFleet:
+    """
+    Parsed configs of many devices
+
+    Methods:
+        .add_configs() : parse configs in a process pool, using the cache for configs seen before
+        .query() : sections across every device that match
+    """
+
+    def __init__(self, cache_directory=None, use_disk_cache=True):
+        self.trees = {}
+        self.use_disk_cache = use_disk_cache
+        self._cache_directory = cache_directory
+        self._memory_cache = {}
+
+    @property
+    def cache_directory(self):
+        if self._cache_directory is None:
+            self._cache_directory = get_parse_cache_directory()
+        return self._cache_directory
+
+    def _cache_location(self, config_hash):
+        return os.path.join(self.cache_directory, f"{config_hash}.v{PARSER_VERSION}.pickle")
+
+    def _load_cached(self, config_hash):
+        tree = self._memory_cache.get(config_hash)
+        if tree is not None or not self.use_disk_cache:
+            return tree
+        cache_location = self._cache_location(config_hash)
+        if os.path.exists(cache_location):
+            with open(cache_location, "rb") as input_file:
+                tree = pickle.load(input_file)
+            self._memory_cache[config_hash] = tree
+        return tree
+
+    def _save_cached(self, tree):
+        self._memory_cache[tree.config_hash] = tree
+        if self.use_disk_cache:
+            cache_location = self._cache_location(tree.config_hash)
+            temp_location = f"{cache_location}.{os.getpid()}.tmp"
+            with open(temp_location, "wb") as output_file:
+                pickle.dump(tree, output_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_location, cache_location)
+
+    def add_configs(self, config_items, processes=None):
+        """
+        Parses configs and adds them to the fleet.  A device added again is replaced
+        Args:
+            config_items (list) : list of (address, config text) or (address, config text, platform)
+            processes (int|None) : number of processes.  One per CPU if None
+        Return:
+            int : number of configs that had to be parsed.  The rest came from the cache
+        """
+        to_parse = {}
+        for config_item in config_items:
+            address, config_text = config_item[0], config_item[1]
+            platform = config_item[2] if len(config_item) > 2 else None
+            if not isinstance(address, str) or not isinstance(config_text, str):
+                raise TypeError(f"{config_item} needs to be a tuple of strings")
+            config_hash = hash_config(config_text)
+            tree = self._load_cached(config_hash)
+            if tree is not None:
+                self.trees[address] = tree
+            else:
+                to_parse.setdefault(config_hash, (config_text, platform, []))[2].append(address)
+        work_items = [(config_text, platform) for config_text, platform, _ in to_parse.values()]
+        if len(work_items) < 2 or processes == 1:
+            trees = [_parse_worker(work_item) for work_item in work_items]
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                trees = pool.map(
+                    _parse_worker, work_items, chunksize=max(1, len(work_items) // 64)
+                )
+        for tree, (_, _, addresses) in zip(trees, to_parse.values()):
+            self._save_cached(tree)
+            for address in addresses:
+                self.trees[address] = tree
+        return len(work_items)
+
+    def __len__(self):
+        return len(self.trees)
+
+    def query(self, wanted_type, match=None, having=(), missing=()):
+        """
+        Finds the sections across every device that match all the criteria
+        ConfigFleet.query("interface", missing=["^shutdown$", "^description "]) is every interface that is not
+        shut down and has no description
+        Args:
+            wanted_type (str) : section type like interface or router bgp
+            match (str|None) : regex the section line itself has to match
+            having (list) : regexes that each have to match a line under the section
+            missing (list) : regexes that must not match any line under the section
+        Return:
+            list : sorted list of (address, ConfigLine)
+        """
+        if isinstance(having, str):
+            having = [having]
+        if isinstance(missing, str):
+            missing = [missing]
+        match_pattern = re.compile(match) if match is not None else None
+        # The lines under a section are searched as one string, so ^ and $ are per line
+        having_patterns = [re.compile(pattern, re.MULTILINE) for pattern in having]
+        missing_patterns = [re.compile(pattern, re.MULTILINE) for pattern in missing]
+        # Devices with the same config share a tree so each tree is only searched once
+        tree_results = {}
+        results = []
+        for address in sorted(self.trees):
+            tree = self.trees[address]
+            positions = tree_results.get(id(tree))
+            if positions is None:
+                positions = self._query_tree(
+                    tree, wanted_type, match_pattern, having_patterns, missing_patterns
+                )
+                tree_results[id(tree)] = positions
+            results.extend((address, ConfigLine(tree, position)) for position in positions)
+        return results
+
+    @staticmethod
+    def _query_tree(tree, wanted_type, match_pattern, having_patterns, missing_patterns):
+        lines = tree.lines
+        ends = tree.ends
+        positions = []
+        for position in tree.index.get(wanted_type, ()):
+            if match_pattern is not None and not match_pattern.search(lines[position]):
+                continue
+            if having_patterns or missing_patterns:
+                body = "\n".join(
+                    [line.strip() for line in lines[position + 1 : ends[position]]]
+                )
+                if not all(pattern.search(body) for pattern in having_patterns):
+                    continue
+                if any(pattern.search(body) for pattern in missing_patterns):
+                    continue
+            positions.append(position)
+        return positions
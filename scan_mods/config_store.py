@@ -0,0 +1,278 @@
+#!python
+
+"""
+Content addressed store for the config files of each device.
+
+Each config is saved once as a blob named by the sha256 of its contents in Output/Configs/objects/<ab>/<hash>.
+A run only writes a manifest, Output/Configs/manifests/<run>.json, of {IP: {file name: hash}}.  A config that did
+not change since the last run is already in the store so it costs no bytes and no writes, and finding the devices
+whose config changed is a compare of the hashes in two manifests
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.output_sink import find_output_root
+from scan_mods.compression import (
+    FILE_SUFFIXES,
+    compress,
+    compressed_file_name,
+    compression_for_file,
+    decompress,
+)
+
+
+HASH_PREFIX = "sha256:"
+MANIFEST_VERSION = 1
+
+
+def get_config_store_directory():
+    """
+    Return:
+        str : path of Output/Configs.  It is created if it does not exist
+    """
+    config_directory = os.path.join(find_output_root(), "Configs")
+    os.makedirs(config_directory, exist_ok=True)
+    return config_directory
+
+
+def hash_config(data):
+    """
+    Args:
+        data (bytes|str) : contents of the config
+    Return:
+        str : sha256 of the contents as hex
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class ConfigStore:
+    """
+    Blobs named by the hash of their contents
+
+    Methods:
+        .put() : save a blob if it is not already there and return its hash
+        .get() : read a blob back
+        .has() : see if a blob is in the store
+        .save_manifest() / .load_manifest() / .manifests() : the manifest of each run
+    """
+
+    def __init__(self, store_directory=None):
+        if store_directory is None:
+            store_directory = get_config_store_directory()
+        if not isinstance(store_directory, str):
+            raise TypeError(
+                f"{store_directory} is not a string.  It is a {type(store_directory).__name__}"
+            )
+        self.store_directory = store_directory
+        self.objects_directory = os.path.join(store_directory, "objects")
+        self.manifests_directory = os.path.join(store_directory, "manifests")
+        os.makedirs(self.objects_directory, exist_ok=True)
+        os.makedirs(self.manifests_directory, exist_ok=True)
+
+    def _blob_location(self, config_hash):
+        return os.path.join(self.objects_directory, config_hash[:2], config_hash)
+
+    def _find_blob(self, config_hash):
+        blob_location = self._blob_location(config_hash)
+        for suffix in ("",) + tuple(FILE_SUFFIXES.values()):
+            if os.path.exists(blob_location + suffix):
+                return blob_location + suffix
+        return None
+
+    def has(self, config_hash):
+        """
+        Args:
+            config_hash (str) : hash of the blob
+        Return:
+            bool : True if the blob is in the store
+        """
+        return self._find_blob(config_hash) is not None
+
+    def put(self, data):
+        """
+        Saves a blob.  Nothing is written if a blob with the same contents is already in the store
+        Args:
+            data (bytes|str) : contents
+        Return:
+            tuple : (hash, bool) where the bool is True if the blob was written and False if it was already there
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not isinstance(data, (bytes, bytearray)):
+            raise TypeError(f"The data needs to be bytes or a string.  Not {type(data).__name__}")
+        config_hash = hash_config(data)
+        if self.has(config_hash):
+            return (config_hash, False)
+        blob_location = compressed_file_name(self._blob_location(config_hash))
+        os.makedirs(os.path.dirname(blob_location), exist_ok=True)
+        # Written to a temp file first so a blob is never seen half written.  Two writers of the same blob
+        # write the same bytes so it does not matter which one wins
+        temp_location = f"{blob_location}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_location, "wb") as output_file:
+            output_file.write(compress(data))
+        os.replace(temp_location, blob_location)
+        return (config_hash, True)
+
+    def get(self, config_hash):
+        """
+        Args:
+            config_hash (str) : hash of the blob.  The sha256: prefix is allowed
+        Return:
+            bytes : contents of the blob
+        """
+        if config_hash.startswith(HASH_PREFIX):
+            config_hash = config_hash[len(HASH_PREFIX) :]
+        blob_location = self._find_blob(config_hash)
+        if blob_location is None:
+            raise KeyError(f"{config_hash} is not in {self.store_directory}")
+        with open(blob_location, "rb") as input_file:
+            return decompress(input_file.read(), compression_for_file(blob_location))
+
+    def save_manifest(self, run_name, manifest):
+        """
+        Args:
+            run_name (str) : name of the run like run_20210101_120000
+            manifest (dict) : {IP: {file name: hash}}
+        Return:
+            str : path of the manifest file
+        """
+        manifest_location = os.path.join(self.manifests_directory, f"{run_name}.json")
+        temp_location = f"{manifest_location}.tmp"
+        with open(temp_location, "w") as output_file:
+            json.dump(
+                {"version": MANIFEST_VERSION, "run": run_name, "devices": manifest},
+                output_file,
+                indent=4,
+                sort_keys=True,
+            )
+        os.replace(temp_location, manifest_location)
+        return manifest_location
+
+    def load_manifest(self, run_name):
+        """
+        Args:
+            run_name (str) : name of the run
+        Return:
+            dict : {IP: {file name: hash}} of the run
+        """
+        with open(os.path.join(self.manifests_directory, f"{run_name}.json")) as input_file:
+            manifest = json.load(input_file)
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(
+                f"Manifest version {manifest.get('version')} is not supported.  Version {MANIFEST_VERSION} is needed"
+            )
+        return manifest["devices"]
+
+    def manifests(self):
+        """
+        Return:
+            list : names of the runs with a manifest, oldest first
+        """
+        return sorted(
+            file_name[: -len(".json")]
+            for file_name in os.listdir(self.manifests_directory)
+            if file_name.endswith(".json")
+        )
+
+
+class ConfigStoreArtifacts:
+    """
+    Artifact store that saves config files in a ConfigStore and keeps the manifest of the run.
+    Give it to scan_mods.artifacts.set_artifact_store.  The locations it returns are sha256:<hash>
+
+    Methods:
+        .write_artifact() : save a file for a device
+        .reference() : add a file saved in an earlier run to the manifest of this run
+        .save_manifest() : write the manifest of the run when it is done
+    """
+
+    def __init__(self, config_store=None, run_name=None):
+        if config_store is None:
+            config_store = ConfigStore()
+        if run_name is None:
+            run_name = f"run_{time.strftime('%Y%m%d_%H%M%S')}"
+        self.config_store = config_store
+        self.run_name = run_name
+        self.manifest = {}
+        self.blobs_written = 0
+        self._lock = threading.Lock()
+
+    def write_artifact(self, address, file_name, data):
+        config_hash, written = self.config_store.put(data)
+        with self._lock:
+            self.manifest.setdefault(address, {})[file_name] = config_hash
+            if written:
+                self.blobs_written += 1
+        return f"{HASH_PREFIX}{config_hash}"
+
+    def reference(self, address, file_name, location):
+        """
+        Adds a file that was not pulled again, like a config the pre-check found unchanged, to the manifest of
+        this run.  A file from a run that did not use the config store is read and saved in the store
+        Args:
+            address (str) : IP of the device
+            file_name (str) : name of the file
+            location (str) : location the file was written to
+        Return:
+            str : sha256:<hash> location of the file
+        """
+        if not location.startswith(HASH_PREFIX):
+            # artifacts imports this module so it is imported here
+            from scan_mods.artifacts import read_artifact
+
+            return self.write_artifact(address, file_name, read_artifact(location, self.config_store))
+        config_hash = location[len(HASH_PREFIX) :]
+        if not self.config_store.has(config_hash):
+            raise KeyError(f"{config_hash} is not in {self.config_store.store_directory}")
+        with self._lock:
+            self.manifest.setdefault(address, {})[file_name] = config_hash
+        return location
+
+    def save_manifest(self):
+        """
+        Return:
+            str : path of the manifest file
+        """
+        with self._lock:
+            manifest = {address: dict(files) for address, files in self.manifest.items()}
+        return self.config_store.save_manifest(self.run_name, manifest)
+
+
+def compare_manifests(previous_manifest, current_manifest):
+    """
+    Compares the config hashes of two runs
+    Args:
+        previous_manifest (dict) : {IP: {file name: hash}} of the older run
+        current_manifest (dict) : {IP: {file name: hash}} of the newer run
+    Return:
+        dict : sorted lists of IPs under "changed", "unchanged", "new" (only in the newer run) and
+            "missing" (only in the older run)
+    """
+    for manifest in (previous_manifest, current_manifest):
+        if not isinstance(manifest, dict):
+            raise TypeError(f"{manifest} is not a dict.  It is a {type(manifest).__name__}")
+    comparison = {"changed": [], "unchanged": [], "new": [], "missing": []}
+    for address, files in current_manifest.items():
+        if address not in previous_manifest:
+            comparison["new"].append(address)
+        elif files == previous_manifest[address]:
+            comparison["unchanged"].append(address)
+        else:
+            comparison["changed"].append(address)
+    comparison["missing"] = [
+        address for address in previous_manifest if address not in current_manifest
+    ]
+    for addresses in comparison.values():
+        addresses.sort()
+    return comparison
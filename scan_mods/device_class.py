@@ -10,6 +10,9 @@ import re
 import time
 import json
 import sys
+import enum
+import threading
+from array import array
 
 # sys.path.append("../")
 
@@ -27,7 +30,111 @@ else:
             path += "../"
 
 from scan_mods.grabbing_mods.device_grabber import device_grab
+from scan_mods.grabbing_mods.getter_profiles import DEFAULT_GETTER_PROFILE, check_getter_profile
+from scan_mods.grabbing_mods.parse_pool import resolve_parse_results
 from scan_mods.mp_port_scanner import port_scanner
+from scan_mods.output_sink import get_device_directory
+from scan_mods.serializers import format_for_file, iter_record_file
+from scan_mods.packfile import PackfileReader, PACK_FILE_EXTENSION
+from scan_mods.compression import open_compressed, strip_compression_suffix
+
+
+class PortState(enum.IntEnum):
+    """
+    State of a single scanned port.  Stored in the low two bits of each entry of a device's port array
+    """
+
+    NOT_SCANNED = 0
+    OPEN = 1
+    CLOSED = 2
+    FILTERED = 3
+
+
+# Error messages that mean nothing answered rather than the port being refused
+FILTERED_ERROR_PREFIXES = (
+    "TimeoutError",
+    "Socket Timed Out",
+    "DNSTimeOutDNS",
+)
+
+# Version of the record written by FoundDevice.to_record.  Bump it when the record changes
+RECORD_SCHEMA_VERSION = 1
+# Closed ports read back from print_json_short output only have their port number
+SHORT_OUTPUT_ERROR = "Unknown -- only the port number was saved"
+
+# Every device scans (nearly) the same ports, so the port -> array slot mapping and the
+# error messages are kept once for the whole process instead of once per device
+_PORT_SLOTS = {"TCP": {}, "UDP": {}}
+_SLOT_PORTS = {"TCP": [], "UDP": []}
+_SORTED_SLOTS = {"TCP": (), "UDP": ()}
+_ERROR_REASONS = [None]
+_ERROR_CODES = {}
+_TABLE_LOCK = threading.Lock()
+
+
+def _port_slot(protocol, port_number):
+    """
+    Returns the slot for the port in the device port arrays.  Adds the port to the shared table if it is new
+    Args:
+        protocol (str) : either TCP or UDP
+        port_number (int) : port number
+    Return:
+        int : slot in the port array
+    """
+    slot = _PORT_SLOTS[protocol].get(port_number)
+    if slot is not None:
+        return slot
+    with _TABLE_LOCK:
+        slot = _PORT_SLOTS[protocol].get(port_number)
+        if slot is None:
+            slot = len(_SLOT_PORTS[protocol])
+            _SLOT_PORTS[protocol].append(port_number)
+            _PORT_SLOTS[protocol][port_number] = slot
+            _SORTED_SLOTS[protocol] = tuple(
+                sorted(
+                    range(len(_SLOT_PORTS[protocol])),
+                    key=lambda index: _SLOT_PORTS[protocol][index],
+                )
+            )
+    return slot
+
+
+def _reason_code(reason):
+    """
+    Returns the code for an error message.  Adds the message to the shared table if it is new
+    Args:
+        reason (str) : error message returned from the port scanner
+    Return:
+        int : code of the error message
+    """
+    code = _ERROR_CODES.get(reason)
+    if code is not None:
+        return code
+    with _TABLE_LOCK:
+        code = _ERROR_CODES.get(reason)
+        if code is None:
+            code = len(_ERROR_REASONS)
+            _ERROR_REASONS.append(reason)
+            _ERROR_CODES[reason] = code
+    return code
+
+
+def classify_port(header):
+    """
+    Works out the state of a port from what the port scanner returned for it
+    A port is closed or filtered if the only thing returned was an ERROR
+    Args:
+        header (dict) : header or error dictionary returned for the port
+    Return:
+        PortState : state of the port
+    """
+    if not isinstance(header, dict):
+        raise TypeError(f"{header} is not a dict.  It was {type(header).__name__}")
+    if len(header) == 1 and "ERROR" in header:
+        if str(header["ERROR"]).startswith(FILTERED_ERROR_PREFIXES):
+            return PortState.FILTERED
+        return PortState.CLOSED
+    return PortState.OPEN
 
 
 class FoundDevice:
@@ -37,15 +144,33 @@ class FoundDevice:
     Attributes:
         ._IP = string that can be an IPaddress object
         ._response_time = response time tuple from pinger
-        ._ports = dict of open ports and headers
+        ._tcp_ports / ._udp_ports = array of port states and error codes indexed by the shared port slots
+        ._tcp_banners / ._udp_banners = dict of headers for the open ports only
 
     Methods:
         .__init__() : initializes the class using the return time from ping and the IP of the device.  Sets the other attributes to blanks
-        .open_ports() : property to set and get ._open_ports attribute
+        .all_ports() : property to set and get all the ports scanned
+        .open_tcp_ports() etc : properties that build the open and closed ports from the port arrays
         .response_time() : property method to get ._response_time attribute
         .IP() : property method to get .IP attribute
     """
 
+    __slots__ = (
+        "_IP",
+        "_response_time",
+        "_tcp_ports",
+        "_udp_ports",
+        "_tcp_banners",
+        "_udp_banners",
+        "_username",
+        "_password",
+        "_use_enable",
+        "_enable_password",
+        "_domain_name",
+        "_getter_profile",
+        "device_info",
+    )
+
     def __init__(
         self,
         address,
@@ -55,6 +180,7 @@ class FoundDevice:
         use_enable=False,
         enable_password=None,
         domain_name=None,
+        getter_profile=None,
     ):
         if not isinstance(address, str):
             raise TypeError("address it not of valid type string.  Please try again.")
@@ -73,16 +199,16 @@ class FoundDevice:
                 raise TypeError(f"The tuple is not a tuple of length 3 floats")
         self._IP = address
         self._response_time = time_tuple
-        self._all_ports = None
-        self._open_tcp_ports = {}
-        self._open_udp_ports = {}
-        self._closed_tcp_ports = {}
-        self._closed_udp_ports = {}
+        self._tcp_ports = None
+        self._udp_ports = None
+        self._tcp_banners = {}
+        self._udp_banners = {}
         self._username = username
         self._password = password
         self._use_enable = use_enable
         self._enable_password = enable_password
         self._domain_name = domain_name
+        self._getter_profile = check_getter_profile(getter_profile)
         self.device_info = None
 
     @property
@@ -113,6 +239,10 @@ class FoundDevice:
             return "Enable password for device has been given"
         return "Not using Enable password for this device"
 
+    @property
+    def getter_profile(self):
+        return self._getter_profile
+
     @property
     def domain_name(self):
         if self._domain_name is None:
@@ -120,131 +250,206 @@ class FoundDevice:
         return self._domain_name
 
     def get_ports(self):
-        self.all_ports = port_scanner(self.IP, self.domain_name)
+        # Results are merged as each port finishes.  Only ports that did not stream in are merged from the return
+        streamed_ports = set()
+
+        def merge_streamed(ports_headers):
+            self.merge_ports(ports_headers)
+            for protocol_key, ports in ports_headers.items():
+                streamed_ports.update((protocol_key, port_key) for port_key in ports)
+
+        ports_headers = port_scanner(self.IP, self.domain_name, result_callback=merge_streamed)
+        if isinstance(ports_headers, dict):
+            ports_headers = {
+                protocol_key: {
+                    port_key: header
+                    for port_key, header in ports.items()
+                    if (protocol_key, port_key) not in streamed_ports
+                }
+                if isinstance(ports, dict)
+                else ports
+                for protocol_key, ports in ports_headers.items()
+            }
+        self.merge_ports(ports_headers)
 
     @property
     def all_ports(self):
         """
-        returns the _all_ports attribute.  If None, return False
+        returns all the ports scanned in the format {"TCP": {<port>: <header>}, "UDP": {...}}.  If nothing has been scanned, return None
         """
-        if self._all_ports is None:
+        if self._tcp_ports is None:
             return None
-        return self._all_ports
+        return {
+            "TCP": self._ports_in_state("TCP", PortState),
+            "UDP": self._ports_in_state("UDP", PortState),
+        }
 
     @all_ports.setter
     def all_ports(self, ports_headers):
         """
         all_ports setter to set the all ports section
         ONce the ports are set, the ports are split as well into tcp open and closed
-            as well as UDP open and closed
+            as well as UDP open and closed.  Only the ports that changed are reclassified
         Args:
-            ports_headers (dict) : key is either TCP<Port_number> or UDP_<Port_Number> and value is the header or error message
+            ports_headers (dict) : key is either TCP or UDP and value is a dict of <Port_number>: header or error message
         """
-        if isinstance(ports_headers, dict):
-            if self._all_ports is None:
-                self._all_ports = {"TCP": {}, "UDP": {}}
-                for key in ports_headers.keys():
-                    if key == "TCP" or key == "UDP":
-                        if isinstance(ports_headers[key], dict):
-                            self._all_ports[key] = ports_headers[key]
-                        else:
-                            raise TypeError(
-                                f"{ports_headers[key]} is not a dictionary.  "
-                                f"It was {type(ports_headers[key]).__name__}"
-                            )
-                    else:
-                        raise KeyError(
-                            f"{key} does not follow standard of 'TCP' or 'UDP'"
-                        )
-            else:
-                for key in ports_headers.keys():
-                    if key == "TCP" or key == "UDP":
-                        if isinstance(ports_headers[key], dict):
-                            for port_key in ports_headers[key].keys():
-                                if isinstance(ports_headers[key][port_key], dict):
-                                    self._all_ports[key][port_key] = ports_headers[key][
-                                        port_key
-                                    ]
-                                else:
-                                    raise TypeError(
-                                        f"{ports_headers[key]} is not a dictionary.  "
-                                        f"It was {type(ports_headers[key]).__name__}"
-                                    )
-                        else:
-                            raise TypeError(
-                                f"{ports_headers[key]} is not a dictionary.  "
-                                f"It was {type(ports_headers[key]).__name__}"
-                            )
-                    else:
-                        raise KeyError(
-                            f"{key} does not follow standard of 'TCP' or 'UDP'"
-                        )
-        else:
+        self.merge_ports(ports_headers)
+
+    def merge_ports(self, ports_headers):
+        """
+        Merges a full or partial port scan result into the device.  This is what the port scanner calls
+        as each port result streams in, so only the ports passed are looked at and only the ones whose
+        state or header changed are reclassified
+        Args:
+            ports_headers (dict) : key is either TCP or UDP and value is a dict of <Port_number>: header or error message
+        Return:
+            list : list of (protocol, port_number) tuples for the ports that changed
+        """
+        if not isinstance(ports_headers, dict):
             raise TypeError(
                 f"ports variable passed in was not a dictionary.  It was {type(ports_headers).__name__}."
                 f"  You may want to fix that."
             )
-        self.set_private_closed_open_ports()
+        for key in ports_headers.keys():
+            if key == "TCP" or key == "UDP":
+                if not isinstance(ports_headers[key], dict):
+                    raise TypeError(
+                        f"{ports_headers[key]} is not a dictionary.  "
+                        f"It was {type(ports_headers[key]).__name__}"
+                    )
+            else:
+                raise KeyError(f"{key} does not follow standard of 'TCP' or 'UDP'")
+        if self._tcp_ports is None:
+            self._tcp_ports = array("I")
+            self._udp_ports = array("I")
+        return self.set_private_closed_open_ports(ports_headers)
 
-    def set_private_closed_open_ports(self):
+    def set_private_closed_open_ports(self, ports_headers):
         """
-        This will take the all_ports attribute and get the open and closed ports from it.
+        This will take the ports passed in and store the state of each one in the port arrays.
+        Headers are only kept for the open ports.  Closed and filtered ports only keep the code of their error message
         Args:
-            None
+            ports_headers (dict) : key is either TCP or UDP and value is a dict of <Port_number>: header or error message
         Return:
-            None
-        """
-        for protocol_key in self._all_ports.keys():
-            if protocol_key == "TCP":
-                for port_key in self._all_ports["TCP"].keys():
-                    if isinstance(self._all_ports["TCP"][port_key], dict):
-                        if (
-                            len(list(self._all_ports["TCP"][port_key].keys())) == 1
-                            and list(self._all_ports["TCP"][port_key].keys())[0]
-                            == "ERROR"
-                        ):
-                            self._closed_tcp_ports[port_key] = self._all_ports["TCP"][
-                                port_key
-                            ]
-                        else:
-                            self._open_tcp_ports[port_key] = self._all_ports["TCP"][
-                                port_key
-                            ]
-                    else:
-                        raise TypeError(f"{type(port_key).__name__} is not a dict.")
-            if protocol_key == "UDP":
-                for port_key in self._all_ports["UDP"].keys():
-                    if isinstance(self._all_ports["UDP"][port_key], dict):
-                        if (
-                            len(list(self._all_ports["UDP"][port_key].keys())) == 1
-                            and list(self._all_ports["UDP"][port_key].keys())[0]
-                            == "ERROR"
-                        ):
-                            self._closed_udp_ports[port_key] = self._all_ports["UDP"][
-                                port_key
-                            ]
-                        else:
-                            self._open_udp_ports[port_key] = self._all_ports["UDP"][
-                                port_key
-                            ]
-                    else:
-                        raise TypeError(f"{type(port_key).__name__} is not a dict.")
-        try:
-            assert len(self._all_ports["TCP"]) == len(self._open_tcp_ports) + len(
-                self._closed_tcp_ports
-            )
-        except AssertionError:
-            raise AssertionError(
-                f"The length of the ports categorized does not equal the length of the number of ports for TCP"
-            )
+            list : list of (protocol, port_number) tuples for the ports that changed
+        """
+        changed_ports = []
+        for protocol_key in ("TCP", "UDP"):
+            for port_key, header in ports_headers.get(protocol_key, {}).items():
+                if not isinstance(header, dict):
+                    raise TypeError(f"{type(header).__name__} is not a dict.")
+                if self._store_port(protocol_key, port_key, header):
+                    changed_ports.append((protocol_key, int(port_key)))
+        return changed_ports
+
+    def update_port(self, protocol, port, header):
+        """
+        Sets the result for a single port
+        Args:
+            protocol (str) : either TCP or UDP
+            port (str|int) : port number
+            header (dict) : header or error message returned from the port scanner
+        Return:
+            bool : True if the port changed, False if it was already stored that way
+        """
+        return bool(self.merge_ports({protocol: {port: header}}))
+
+    def _store_port(self, protocol, port_key, header):
+        """
+        Stores the state of one port in the port array for the protocol.  The open port index (the banners dict)
+        is updated at the same time so a port that flips state is only ever in one place
+        Args:
+            protocol (str) : either TCP or UDP
+            port_key (str|int) : port number
+            header (dict) : header or error message returned from the port scanner
+        Return:
+            bool : True if the port changed, False if it was already stored that way
+        """
         try:
-            assert len(self._all_ports["UDP"]) == len(self._open_udp_ports) + len(
-                self._closed_udp_ports
-            )
-        except AssertionError:
-            raise AssertionError(
-                f"The length of the ports categorized does not equal the length of the number of ports for UDP"
-            )
+            port_number = int(port_key)
+        except (TypeError, ValueError):
+            raise KeyError(f"{port_key} is not a valid port number")
+        if port_number < 0 or port_number > 65535:
+            raise KeyError(f"{port_key} is not a valid port number")
+        state = classify_port(header)
+        slot = _port_slot(protocol, port_number)
+        if protocol == "TCP":
+            port_array, banners = self._tcp_ports, self._tcp_banners
+        else:
+            port_array, banners = self._udp_ports, self._udp_banners
+        if slot >= len(port_array):
+            port_array.extend([PortState.NOT_SCANNED] * (slot + 1 - len(port_array)))
+        if state is PortState.OPEN:
+            if port_array[slot] == state and banners.get(port_number) == header:
+                return False
+            port_array[slot] = state
+            banners[port_number] = header
+        else:
+            value = (_reason_code(str(header["ERROR"])) << 2) | state
+            if port_array[slot] == value:
+                return False
+            port_array[slot] = value
+            banners.pop(port_number, None)
+        return True
+
+    def port_state(self, protocol, port):
+        """
+        Returns the state of a single port
+        Args:
+            protocol (str) : either TCP or UDP
+            port (str|int) : port number
+        Return:
+            PortState : state of the port.  NOT_SCANNED if the port was never scanned
+        """
+        port_array = self._tcp_ports if protocol == "TCP" else self._udp_ports
+        slot = _PORT_SLOTS[protocol].get(int(port))
+        if port_array is None or slot is None or slot >= len(port_array):
+            return PortState.NOT_SCANNED
+        return PortState(port_array[slot] & 0b11)
+
+    def _ports_in_state(self, protocol, states):
+        """
+        Builds the port dictionary for the ports that are in one of the states passed
+        Args:
+            protocol (str) : either TCP or UDP
+            states (iterable) : PortState values to include
+        Return:
+            dict : dictionary of the ports in port_number: header
+        """
+        if protocol == "TCP":
+            port_array, banners = self._tcp_ports, self._tcp_banners
+        else:
+            port_array, banners = self._udp_ports, self._udp_banners
+        return_dict = {}
+        if not port_array:
+            return return_dict
+        wanted = {state for state in states if state is not PortState.NOT_SCANNED}
+        array_length = len(port_array)
+        slot_ports = _SLOT_PORTS[protocol]
+        for slot in _SORTED_SLOTS[protocol]:
+            if slot >= array_length:
+                continue
+            value = port_array[slot]
+            state = value & 0b11
+            if state not in wanted:
+                continue
+            port_number = slot_ports[slot]
+            if state == PortState.OPEN:
+                return_dict[str(port_number)] = banners[port_number]
+            else:
+                return_dict[str(port_number)] = {"ERROR": _ERROR_REASONS[value >> 2]}
+        return return_dict
+
+    @staticmethod
+    def _open_ports(banners):
+        """
+        Builds the open port dictionary from the open port index without walking the port array
+        Args:
+            banners (dict) : the open port index of port_number: header
+        Return:
+            dict : dictionary of the open ports in port_number: header
+        """
+        return {str(port_number): banners[port_number] for port_number in sorted(banners)}
 
     @property
     def open_tcp_ports(self):
@@ -253,7 +458,7 @@ class FoundDevice:
         Return:
             dict : dictionary of the open ports in port_number: header
         """
-        return self._open_tcp_ports
+        return self._open_ports(self._tcp_banners)
 
     @property
     def open_udp_ports(self):
@@ -262,25 +467,25 @@ class FoundDevice:
         Return:
             dict : dictionary of the open ports in port_number: header
         """
-        return self._open_udp_ports
+        return self._open_ports(self._udp_banners)
 
     @property
     def closed_tcp_ports(self):
         """
-        Getter for the closed TCP ports for the device
+        Getter for the closed TCP ports for the device.  Includes the filtered ports
         Return:
             dict : dictionary of the closed ports in port_number: header
         """
-        return self._closed_tcp_ports
+        return self._ports_in_state("TCP", (PortState.CLOSED, PortState.FILTERED))
 
     @property
     def closed_udp_ports(self):
         """
-        Getter for the closed UDP ports for the device
+        Getter for the closed UDP ports for the device.  Includes the filtered ports
         Return:
             dict : dictionary of the closed ports in port_number: header
         """
-        return self._closed_udp_ports
+        return self._ports_in_state("UDP", (PortState.CLOSED, PortState.FILTERED))
 
     def __hash__(self) -> int:
         return hash(self.IP)
@@ -317,9 +522,12 @@ class FoundDevice:
             return False
         return False
 
-    def device_info_grabber(self):
+    def device_info_grabber(self, wait_for_parses=True):
         """
         This will use the scan_mods.device_grabber to get the information from each device and return it in a JSON format
+        Args:
+            wait_for_parses (bool) : if False, show output still being parsed by the parse pool is left for
+                resolve_parse_results.  The device connection is closed either way
         """
         self.device_info = device_grab(
             address=self.IP,
@@ -328,7 +536,10 @@ class FoundDevice:
             password=self._password,
             enable_password_needed=self._use_enable,
             enable_password=self._enable_password,
+            getter_profile=self._getter_profile,
         )
+        if wait_for_parses:
+            resolve_parse_results(self.device_info, self.IP)
 
     def __repr__(self) -> str:
         # This needs to be expanded and the test updated for it too
@@ -434,6 +645,193 @@ class FoundDevice:
             output[self.IP]["Device_Info"] = self.device_info
         return json.dumps(output, indent=4)
 
+    def to_record(self):
+        """
+        Will take the class and make the versioned record that is saved to disk and read back with from_json.
+        Passwords are never part of the record
+        ARgs:
+            none
+        Return:
+            dict : record of the device
+        """
+        return {
+            "schema_version": RECORD_SCHEMA_VERSION,
+            "IP": self.IP,
+            "ping_response_times": list(self.response_time),
+            "username": self._username,
+            "use_enable": self._use_enable,
+            "domain_name": self._domain_name,
+            "ports": self.all_ports,
+            "device_info": self.device_info,
+        }
+
+    @classmethod
+    def _from_trusted(
+        cls, address, time_tuple, username=None, use_enable=False, domain_name=None
+    ):
+        """
+        Builds a device from values that were already validated when they were first saved.
+        Skips the checks in __init__ so loading a previous run does not pay for them
+        """
+        device = cls.__new__(cls)
+        device._IP = address
+        device._response_time = time_tuple
+        device._tcp_ports = None
+        device._udp_ports = None
+        device._tcp_banners = {}
+        device._udp_banners = {}
+        device._username = username
+        device._password = None
+        device._use_enable = use_enable
+        device._enable_password = None
+        device._domain_name = domain_name
+        device._getter_profile = DEFAULT_GETTER_PROFILE
+        device.device_info = None
+        return device
+
+    @classmethod
+    def from_json(cls, json_input):
+        """
+        Rebuilds a device from saved output.  Takes either a versioned record from to_record or the older
+        print_json_long / print_json_short output
+        Args:
+            json_input (str|bytes|dict) : JSON string or the already loaded dict
+        Return:
+            FoundDevice : the device.  Passwords are not saved so they are always None
+        """
+        if isinstance(json_input, (str, bytes, bytearray)):
+            json_input = json.loads(json_input)
+        if not isinstance(json_input, dict):
+            raise TypeError(
+                f"{json_input} is not a dict or JSON string.  It is a {type(json_input).__name__}"
+            )
+        if "schema_version" in json_input:
+            return cls._from_record(json_input)
+        if len(json_input) != 1:
+            raise ValueError(
+                f"Saved output should have one device in it.  It had {len(json_input)}"
+            )
+        return cls._from_printed_json(*json_input.items())
+
+    @classmethod
+    def _from_record(cls, record):
+        if record["schema_version"] > RECORD_SCHEMA_VERSION:
+            raise ValueError(
+                f"Record schema version {record['schema_version']} is newer than this code understands ({RECORD_SCHEMA_VERSION})"
+            )
+        device = cls._from_trusted(
+            record["IP"],
+            tuple(record["ping_response_times"]),
+            username=record.get("username"),
+            use_enable=record.get("use_enable", False),
+            domain_name=record.get("domain_name"),
+        )
+        if record.get("ports") is not None:
+            device.merge_ports(record["ports"])
+        device.device_info = record.get("device_info")
+        return device
+
+    @classmethod
+    def _from_printed_json(cls, address_and_output):
+        address, output = address_and_output
+        username = output.get("username")
+        if username == "Username has not been set yet":
+            username = None
+        domain_name = output.get("domain_name")
+        if domain_name == "Domain name has not been set yet":
+            domain_name = None
+        device = cls._from_trusted(
+            address,
+            tuple(output["ping_response_times"]),
+            username=username,
+            use_enable=output.get("enable_password")
+            != "Not using Enable password for this device",
+            domain_name=domain_name,
+        )
+        if "Open_TCP_Ports_List" in output:
+            ports = {"TCP": {}, "UDP": {}}
+            for protocol in ("TCP", "UDP"):
+                for state in ("Open", "Closed"):
+                    saved_ports = output.get(f"{state}_{protocol}_Ports_List", {})
+                    if isinstance(saved_ports, list):
+                        # print_json_short only saved the port numbers
+                        saved_ports = {
+                            port: {} if state == "Open" else {"ERROR": SHORT_OUTPUT_ERROR}
+                            for port in saved_ports
+                        }
+                    ports[protocol].update(saved_ports)
+            device.merge_ports(ports)
+        if "Device_Info" in output:
+            if isinstance(output["Device_Info"], dict):
+                device.device_info = output["Device_Info"]
+            else:
+                device.device_info = {"Version_Info": output["Device_Info"]}
+        return device
+
+
+def iter_saved_devices(location):
+    """
+    Reads the devices back from a previous run without going through the prompts and checks in FoundDevice.__init__
+    Args:
+        location (str) : one of
+            a directory, which is walked for <IP>_json_long.txt files (<IP>_json_short.txt if there is no long one)
+            Any of the files can be .gz or .zst compressed
+            a JSON file with one device in it
+            an NDJSON file with one record per line
+            a .msgpack or .cbor run file
+            a .pack archive
+    Return:
+        generator : FoundDevice for each device found
+    """
+    if location.endswith(f".{PACK_FILE_EXTENSION}"):
+        with PackfileReader(location) as pack:
+            for record in pack.iter_records():
+                yield FoundDevice.from_json(record)
+        return
+    if format_for_file(location) in ("msgpack", "cbor"):
+        for record in iter_record_file(location):
+            yield FoundDevice.from_json(record)
+        return
+    if os.path.isdir(location):
+        for directory_path, directory_names, file_names in os.walk(location):
+            plain_names = {strip_compression_suffix(file_name) for file_name in file_names}
+            for file_name in sorted(file_names):
+                plain_name = strip_compression_suffix(file_name)
+                if plain_name.endswith("_json_long.txt") or (
+                    plain_name.endswith("_json_short.txt")
+                    and plain_name.replace("_json_short.txt", "_json_long.txt")
+                    not in plain_names
+                ):
+                    with open_compressed(
+                        os.path.join(directory_path, file_name), "rt"
+                    ) as input_file:
+                        yield FoundDevice.from_json(input_file.read())
+        return
+    with open_compressed(location, "rt") as input_file:
+        first_line = input_file.readline()
+        rest = input_file.read()
+    try:
+        first_record = json.loads(first_line)
+    except json.JSONDecodeError:
+        # Not one record per line, so the whole file is one indented JSON document
+        yield FoundDevice.from_json(first_line + rest)
+        return
+    yield FoundDevice.from_json(first_record)
+    for line in rest.splitlines():
+        if line.strip():
+            yield FoundDevice.from_json(line)
+
+
+def load_saved_devices(location):
+    """
+    Loads all the devices from a previous run.  See iter_saved_devices for what location can be
+    Args:
+        location (str) : directory or file to read
+    Return:
+        list : list of FoundDevice
+    """
+    return list(iter_saved_devices(location))
+
 
 if __name__ == "__main__":
     start_time = time.time()
@@ -547,18 +945,8 @@ if __name__ == "__main__":
 
     for device in device_list:
         print(device.print_json_short())
-        write_directory = None
-        if "Output" in os.listdir(os.getcwd()):
-            write_directory = f"{os.getcwd()}/Output/Scans/{device.IP}"
-        else:
-            path = "../"
-            while write_directory is None:
-                if "Output" in os.listdir(path):
-                    write_directory = f"{path}/Output/Scans/{device.IP}"
-                path += "../"
-        if not os.path.exists(write_directory):
-            os.makedirs(write_directory)
-        file_location = f"{write_directory}\\{device.IP}_json_short.txt"
+        write_directory = get_device_directory(device.IP)
+        file_location = os.path.join(write_directory, f"{device.IP}_json_short.txt")
         with open(file_location, "w") as output_file:
             output_file.write(device.print_json_short())
 
@@ -566,18 +954,8 @@ if __name__ == "__main__":
 
     for device in device_list:
         print(device.print_json_long())
-        write_directory = None
-        if "Output" in os.listdir(os.getcwd()):
-            write_directory = f"{os.getcwd()}/Output/Scans/{device.IP}"
-        else:
-            path = "../"
-            while write_directory is None:
-                if "Output" in os.listdir(path):
-                    write_directory = f"{path}/Output/Scans/{device.IP}"
-                path += "../"
-        if not os.path.exists(write_directory):
-            os.makedirs(write_directory)
-        file_location = f"{write_directory}\\{device.IP}_json_long.txt"
+        write_directory = get_device_directory(device.IP)
+        file_location = os.path.join(write_directory, f"{device.IP}_json_long.txt")
         with open(file_location, "w") as output_file:
             output_file.write(device.print_json_long())
 
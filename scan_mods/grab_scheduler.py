@@ -0,0 +1,256 @@
+#!python
+
+"""
+Grabs many devices at the same time.
+
+GrabScheduler runs device_info_grabber for many devices on a thread pool.  Besides the number of devices grabbed at
+once (max_workers) it can cap
+    per_subnet   : devices grabbed at once in the same subnet (/24 by default), so one site's WAN link, TACACS
+                   server or firewall is not hit by every thread
+    per_platform : devices grabbed at once of the same platform, so slow control planes of one kind are not piled on
+A device is only handed to a thread once all of its caps have room, so a full subnet never holds up devices in
+other subnets.  Devices are started in the order they were submitted when they can be.
+
+on_done is called as each device finishes, one call at a time, so results can be written to the output sink as
+they come in and not after the whole run.
+
+With a parse pool set, a device's slot is given to the next device as soon as its session is closed, and its
+output is waited for on a separate thread, so parsing does not hold back logins
+"""
+
+import collections
+import ipaddress
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.grabbing_mods.device_grabber import check_ports
+from scan_mods.grabbing_mods.parse_pool import (
+    get_parse_pool,
+    has_pending_parses,
+    resolve_parse_results,
+)
+
+
+GRAB_WORKERS = 8
+SUBNET_PREFIX = 24
+
+
+def subnet_key(device, prefix=SUBNET_PREFIX):
+    """
+    Args:
+        device (FoundDevice) : device to grab
+        prefix (int) : prefix length of the subnet
+    Return:
+        str : subnet of the device like 192.168.1.0/24
+    """
+    return str(ipaddress.ip_network(f"{device.IP}/{prefix}", strict=False))
+
+
+def platform_key(device):
+    """
+    What the device is before it is grabbed, from the SSH banner found by the port scan
+    Args:
+        device (FoundDevice) : device to grab
+    Return:
+        str : Cisco, Linux, Other or None if SSH was not found
+    """
+    try:
+        _, header = check_ports(device.open_tcp_ports or {})
+    except (TypeError, AttributeError):
+        return None
+    return header or None
+
+
+class GrabScheduler:
+    """
+    Thread pool for device_info_grabber with global, per subnet and per platform caps
+
+    Methods:
+        .submit() : add a device to be grabbed
+        .wait() : wait for every device submitted to finish
+        .close() : wait and shut down the threads
+    """
+
+    def __init__(
+        self,
+        max_workers=GRAB_WORKERS,
+        per_subnet=None,
+        per_platform=None,
+        subnet_prefix=SUBNET_PREFIX,
+        on_done=None,
+        platform_function=platform_key,
+    ):
+        """
+        Args:
+            max_workers (int) : most devices grabbed at once
+            per_subnet (int|None) : most devices grabbed at once in one subnet.  No cap if None
+            per_platform (int|None) : most devices grabbed at once of one platform.  No cap if None
+            subnet_prefix (int) : prefix length of the subnets for per_subnet
+            on_done (callable|None) : called with (device, exception or None) as each device finishes
+            platform_function (callable) : gives the platform of a device for per_platform
+        """
+        for name, value in [("max_workers", max_workers), ("per_subnet", per_subnet), ("per_platform", per_platform)]:
+            if value is None and name != "max_workers":
+                continue
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise TypeError(f"{name} needs to be an int.  Not {type(value).__name__}")
+            if value < 1:
+                raise ValueError(f"{name} needs to be 1 or more.  It was {value}")
+        if not isinstance(subnet_prefix, int) or not 0 <= subnet_prefix <= 32:
+            raise ValueError(f"subnet_prefix needs to be between 0 and 32.  It was {subnet_prefix}")
+        self.max_workers = max_workers
+        self.per_subnet = per_subnet
+        self.per_platform = per_platform
+        self.subnet_prefix = subnet_prefix
+        self.on_done = on_done
+        self.platform_function = platform_function
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="grabber")
+        self._parse_waiters = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="parse_waiter")
+        self._condition = threading.Condition()
+        self._callback_lock = threading.Lock()
+        self._pending = collections.deque()
+        self._running = 0
+        self._finishing = 0
+        self._subnet_counts = collections.Counter()
+        self._platform_counts = collections.Counter()
+        self.completed = 0
+        self.errors = {}
+        self.grab_times = {}
+
+    def _has_room(self, keys):
+        subnet, platform = keys
+        if self.per_subnet is not None and self._subnet_counts[subnet] >= self.per_subnet:
+            return False
+        if self.per_platform is not None and self._platform_counts[platform] >= self.per_platform:
+            return False
+        return True
+
+    def _dispatch(self):
+        """
+        Starts every pending device that has room.  Called with the condition held
+        """
+        while self._running < self.max_workers and self._pending:
+            for position, (device, keys) in enumerate(self._pending):
+                if self._has_room(keys):
+                    break
+            else:
+                return
+            del self._pending[position]
+            self._running += 1
+            self._subnet_counts[keys[0]] += 1
+            self._platform_counts[keys[1]] += 1
+            self._executor.submit(self._grab, device, keys)
+
+    def submit(self, device):
+        """
+        Adds a device to be grabbed.  It starts as soon as there is room
+        Args:
+            device (FoundDevice) : device that has been port scanned
+        Return:
+            None
+        """
+        keys = (
+            subnet_key(device, self.subnet_prefix) if self.per_subnet is not None else None,
+            self.platform_function(device) if self.per_platform is not None else None,
+        )
+        with self._condition:
+            self._pending.append((device, keys))
+            self._dispatch()
+
+    def _grab(self, device, keys):
+        start_time = time.time()
+        error = None
+        parse_pool = get_parse_pool()
+        try:
+            if parse_pool is None:
+                device.device_info_grabber()
+            else:
+                device.device_info_grabber(wait_for_parses=False)
+        except Exception as ex:
+            error = ex
+            print(f"Grabbing {device.IP} failed with {type(ex).__name__}: {ex}")
+            if getattr(device, "device_info", None) is None:
+                device.device_info = {"Version_Info": f"[ERROR] {type(ex).__name__}: {ex}"}
+        grab_time = time.time() - start_time
+        if error is None and parse_pool is not None and has_pending_parses(device.device_info):
+            # The session is closed so the next device can start while the output is parsed
+            with self._condition:
+                self._release(keys)
+                self._finishing += 1
+                self._dispatch()
+            self._parse_waiters.submit(self._wait_for_parses, device, grab_time)
+            return
+        self._finish(device, error, grab_time, keys)
+
+    def _wait_for_parses(self, device, grab_time):
+        error = None
+        try:
+            resolve_parse_results(device.device_info, device.IP)
+        except Exception as ex:
+            error = ex
+            print(f"Parsing the output of {device.IP} failed with {type(ex).__name__}: {ex}")
+        self._finish(device, error, grab_time)
+
+    def _release(self, keys):
+        """
+        Frees the slot of a device.  Called with the condition held
+        """
+        self._running -= 1
+        self._subnet_counts[keys[0]] -= 1
+        self._platform_counts[keys[1]] -= 1
+
+    def _finish(self, device, error, grab_time, keys=None):
+        """
+        Hands the device to on_done.  keys is None if its slot was already freed
+        """
+        try:
+            if self.on_done is not None:
+                with self._callback_lock:
+                    self.on_done(device, error)
+        except Exception as ex:
+            print(f"Saving {device.IP} failed with {type(ex).__name__}: {ex}")
+            if error is None:
+                error = ex
+        finally:
+            with self._condition:
+                if keys is None:
+                    self._finishing -= 1
+                else:
+                    self._release(keys)
+                self.completed += 1
+                self.grab_times[device.IP] = grab_time
+                if error is not None:
+                    self.errors[device.IP] = error
+                self._dispatch()
+                self._condition.notify_all()
+
+    def wait(self):
+        """
+        Waits for every device submitted to finish
+        Return:
+            None
+        """
+        with self._condition:
+            while self._pending or self._running or self._finishing:
+                self._condition.wait()
+
+    def close(self):
+        """
+        Waits for every device and shuts down the threads
+        """
+        self.wait()
+        self._executor.shutdown(wait=True)
+        self._parse_waiters.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
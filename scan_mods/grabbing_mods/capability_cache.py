@@ -0,0 +1,234 @@
+#!python
+
+"""
+Which show commands each platform and OS version answers, learned from earlier runs.
+
+device_info_getter sends the commands of the command profile and drops the ones the device answers with
+% Invalid input detected or % Incomplete command.  The same device on the same software gives the same answer
+every run, so while a CapabilityCache is set with set_capability_cache the outcome of each command is saved
+under the NTC platform and the OS version from Version_Info
+    supported   : the device gave output
+    unsupported : the device rejected the command.  It is not sent again to that platform and version
+    timed_out   : reading the output timed out.  It is not sent again after TIMEOUT_SKIP_AFTER timeouts in a row
+When a device comes back on another OS version, what was learned for its old version is dropped if no other
+device is still on it, and the commands are tried again.  Entries not seen for MAX_AGE_DAYS are dropped when the
+cache is loaded.  Devices whose version can not be read from Version_Info are not cached.
+
+The cache is kept in Output/Scans/command_capabilities.json
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.output_sink import get_scans_directory
+
+
+CAPABILITY_VERSION = 1
+CAPABILITY_FILE_NAME = "command_capabilities.json"
+SUPPORTED = "supported"
+UNSUPPORTED = "unsupported"
+TIMED_OUT = "timed_out"
+COMMAND_STATUSES = (SUPPORTED, UNSUPPORTED, TIMED_OUT)
+TIMEOUT_SKIP_AFTER = 2
+MAX_AGE_DAYS = 90
+
+# Cisco IOS/IOS-XE/IOS-XR "Version 15.6(2)T," and NX-OS "system:    version 7.0(3)I7(4)"
+VERSION_PATTERN = re.compile(r"\bversion:?\s+([0-9][^\s,]*)", re.IGNORECASE)
+
+
+def os_version_key(version_info):
+    """
+    Pulls the OS version out of the Version_Info of get_device_type
+    Args:
+        version_info (list|str) : lines of show version or uname -a
+    Return:
+        str|None : the OS version or None if it could not be found
+    """
+    if not isinstance(version_info, list):
+        return None
+    for line in version_info:
+        if not isinstance(line, str):
+            continue
+        if line.startswith("Linux "):
+            # uname -a is Linux <hostname> <kernel release> ...
+            fields = line.split()
+            return fields[2] if len(fields) > 2 else None
+        match = VERSION_PATTERN.search(line)
+        if match is not None:
+            return match.group(1)
+    return None
+
+
+class CapabilityCache:
+    """
+    Outcome of each command by platform and OS version
+
+    Methods:
+        .observe_device() : note the version a device is on and drop what was learned for its old one
+        .commands_to_skip() : commands known not to work on a platform and version
+        .record() : save the outcome of a command
+        .save() : write the cache file
+    """
+
+    def __init__(self, file_location=None, max_age_days=MAX_AGE_DAYS):
+        if file_location is None:
+            file_location = os.path.join(get_scans_directory(), CAPABILITY_FILE_NAME)
+        if not isinstance(file_location, str):
+            raise TypeError(
+                f"{file_location} is not a string.  It is a {type(file_location).__name__}"
+            )
+        self.file_location = file_location
+        self._lock = threading.Lock()
+        self.versions = {}
+        self.devices = {}
+        self.skipped = 0
+        if os.path.exists(file_location):
+            with open(file_location) as input_file:
+                state = json.load(input_file)
+            if state.get("version") == CAPABILITY_VERSION:
+                oldest = time.time() - max_age_days * 86400
+                self.versions = {
+                    version_key: entry
+                    for version_key, entry in state["versions"].items()
+                    if entry["updated"] >= oldest
+                }
+                self.devices = {
+                    address: version_key
+                    for address, version_key in state["devices"].items()
+                    if version_key in self.versions
+                }
+            else:
+                print(f"{file_location} is from another version.  Every command will be sent")
+
+    @staticmethod
+    def version_key(platform, os_version):
+        """
+        Args:
+            platform (str) : NTC platform like cisco_ios
+            os_version (str) : OS version from os_version_key
+        Return:
+            str : key of the platform and version in the cache
+        """
+        return f"{platform}|{os_version}"
+
+    def observe_device(self, address, platform, os_version):
+        """
+        Notes the version a device is on.  If it was on another version last time, what was learned for the old
+        version is dropped unless another device is still on it
+        Args:
+            address (str) : IP of the device
+            platform (str) : NTC platform like cisco_ios
+            os_version (str) : OS version from os_version_key
+        Return:
+            bool : True if the device changed version since it was last seen
+        """
+        version_key = self.version_key(platform, os_version)
+        with self._lock:
+            previous_key = self.devices.get(address)
+            self.devices[address] = version_key
+            if previous_key is None or previous_key == version_key:
+                return False
+            if previous_key not in self.devices.values():
+                self.versions.pop(previous_key, None)
+        print(f"{address} went from {previous_key} to {version_key}.  Its commands will be tried again")
+        return True
+
+    def commands_to_skip(self, platform, os_version):
+        """
+        Args:
+            platform (str) : NTC platform like cisco_ios
+            os_version (str) : OS version from os_version_key
+        Return:
+            set : command keys that were rejected or kept timing out
+        """
+        with self._lock:
+            entry = self.versions.get(self.version_key(platform, os_version))
+            if entry is None:
+                return set()
+            return {
+                command_key
+                for command_key, outcome in entry["commands"].items()
+                if outcome["status"] == UNSUPPORTED
+                or (outcome["status"] == TIMED_OUT and outcome["count"] >= TIMEOUT_SKIP_AFTER)
+            }
+
+    def record(self, platform, os_version, command_key, status):
+        """
+        Saves the outcome of a command.  The count is how many times in a row the command had this outcome
+        Args:
+            platform (str) : NTC platform like cisco_ios
+            os_version (str) : OS version from os_version_key
+            command_key (str) : command key like show_version
+            status (str) : one of supported, unsupported or timed_out
+        Return:
+            None
+        """
+        if status not in COMMAND_STATUSES:
+            raise ValueError(f"{status} is not a command status.  Use one of {', '.join(COMMAND_STATUSES)}")
+        now = time.time()
+        with self._lock:
+            entry = self.versions.setdefault(
+                self.version_key(platform, os_version), {"commands": {}, "updated": now}
+            )
+            entry["updated"] = now
+            previous = entry["commands"].get(command_key)
+            count = previous["count"] + 1 if previous is not None and previous["status"] == status else 1
+            entry["commands"][command_key] = {"status": status, "count": count, "seen": now}
+
+    def add_skipped(self, count):
+        with self._lock:
+            self.skipped += count
+
+    def save(self):
+        """
+        Writes the cache file
+        Return:
+            str : path of the cache file
+        """
+        with self._lock:
+            state = {
+                "version": CAPABILITY_VERSION,
+                "versions": dict(self.versions),
+                "devices": dict(self.devices),
+            }
+            temp_location = f"{self.file_location}.tmp"
+            with open(temp_location, "w") as output_file:
+                json.dump(state, output_file, indent=4, sort_keys=True)
+        os.replace(temp_location, self.file_location)
+        return self.file_location
+
+
+_capability_cache = None
+
+
+def set_capability_cache(capability_cache):
+    """
+    Turns the capability cache on for device_info_getter.  None turns it off
+    Args:
+        capability_cache (CapabilityCache|None) : cache to use
+    Return:
+        CapabilityCache|None : the cache that was being used before
+    """
+    global _capability_cache
+    if capability_cache is not None and not isinstance(capability_cache, CapabilityCache):
+        raise TypeError(f"{capability_cache} is not a CapabilityCache")
+    previous_cache = _capability_cache
+    _capability_cache = capability_cache
+    return previous_cache
+
+
+def get_capability_cache():
+    """
+    Return:
+        CapabilityCache|None : the cache being used or None if it is off
+    """
+    return _capability_cache
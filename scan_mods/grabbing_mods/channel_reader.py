@@ -0,0 +1,224 @@
+#!python
+
+"""
+Expect style reading of an interactive SSH shell.
+
+Sending a command and sleeping a fixed time before one recv is slow on fast devices and cuts off slow ones.  Here
+the channel is read until the device prompt shows up at the end of the output, a password prompt shows up, or
+the output has been idle for idle_timeout, all under a deadline.  A --More-- pager is answered with a space so
+long output is never cut off even if terminal length 0 was not taken.
+
+ExpectShell opens the shell, learns the prompt, and goes to enable mode only when the prompt says it is not
+already there, so a device that logs straight into enable mode costs no extra round trips
+"""
+
+import os
+import re
+import sys
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+
+READ_SIZE = 65535
+POLL_INTERVAL = 0.01
+COMMAND_TIMEOUT = 30.0
+IDLE_TIMEOUT = 2.0
+# Prompts like Router>, Router#, switch(config)#, RP/0/RSP0/CPU0:XR1#
+PROMPT_PATTERN = re.compile(r"(?:^|[\r\n])([\w.\-@/:()~]{1,80}[>#$])\s?$")
+PASSWORD_PATTERN = re.compile(r"(?i)password:\s?$")
+MORE_PATTERN = re.compile(r"(?i)\s*-+\s?more\s?-+\s*$")
+ANSI_PATTERN = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+
+class PromptTimeout(Exception):
+    """
+    The prompt did not show up before the deadline
+    """
+
+    def __init__(self, message, output=""):
+        super().__init__(message)
+        self.output = output
+
+
+def read_until(channel, patterns, timeout=COMMAND_TIMEOUT, idle_timeout=IDLE_TIMEOUT):
+    """
+    Reads a channel until the end of the output matches one of the patterns
+    Args:
+        channel : paramiko Channel (anything with recv_ready, recv, send and closed)
+        patterns (list) : compiled regexes checked against the end of the output
+        timeout (float) : most seconds to read for
+        idle_timeout (float|None) : return when nothing was received for this many seconds.  Never if None
+    Return:
+        tuple : (output str, index of the pattern that matched or None if the output went idle)
+    """
+    deadline = time.monotonic() + timeout
+    last_data = time.monotonic()
+    output = ""
+    while True:
+        if channel.recv_ready():
+            data = channel.recv(READ_SIZE)
+            if not data:
+                return (output, None)
+            output += ANSI_PATTERN.sub("", data.decode("utf-8", errors="replace"))
+            last_data = time.monotonic()
+            # Only the end of the output can hold the prompt
+            tail = output[-256:]
+            if MORE_PATTERN.search(tail):
+                output = MORE_PATTERN.sub("\n", output)
+                channel.send(" ")
+                continue
+            for position, pattern in enumerate(patterns):
+                if pattern.search(tail):
+                    return (output, position)
+            continue
+        now = time.monotonic()
+        if getattr(channel, "closed", False):
+            return (output, None)
+        if idle_timeout is not None and output and now - last_data >= idle_timeout:
+            return (output, None)
+        if now >= deadline:
+            raise PromptTimeout(f"Timed out after {timeout} seconds waiting for the prompt", output)
+        time.sleep(POLL_INTERVAL)
+
+
+def read_until_prompt(channel, timeout=COMMAND_TIMEOUT, idle_timeout=IDLE_TIMEOUT, prompt=None):
+    """
+    Args:
+        channel : paramiko Channel
+        timeout (float) : most seconds to read for
+        idle_timeout (float|None) : return when nothing was received for this many seconds
+        prompt (str|None) : the exact prompt to wait for.  Any prompt if None
+    Return:
+        str : output up to and including the prompt
+    """
+    if prompt is None:
+        pattern = PROMPT_PATTERN
+    else:
+        pattern = re.compile(r"(?:^|[\r\n])" + re.escape(prompt) + r"\s?$")
+    output, _ = read_until(channel, [pattern], timeout, idle_timeout)
+    return output
+
+
+def find_prompt(output):
+    """
+    Args:
+        output (str) : output that ends with a prompt
+    Return:
+        str|None : the prompt or None if the output does not end with one
+    """
+    match = PROMPT_PATTERN.search(output)
+    return match.group(1) if match else None
+
+
+def clean_command_output(output, command, prompt=None):
+    """
+    Drops the echoed command, the prompt at the end and blank lines
+    Args:
+        output (str) : what was read after sending the command
+        command (str) : the command that was sent
+        prompt (str|None) : prompt of the device
+    Return:
+        list : lines of the output
+    """
+    lines = [line.rstrip() for line in output.replace("\r", "").split("\n")]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if lines and (find_prompt(lines[-1]) is not None or (prompt and lines[-1].strip() == prompt)):
+        lines.pop()
+    if lines and lines[0].strip().endswith(command):
+        lines.pop(0)
+    return [line for line in lines if line.strip()]
+
+
+class ExpectShell:
+    """
+    Interactive shell on a device that waits for the prompt instead of sleeping
+
+    Attributes:
+        .prompt = prompt of the device like Router#
+        .enabled = True if the shell is in enable mode
+
+    Methods:
+        .enable() : go to enable mode if not already there
+        .send_command() : send a command and return its output lines
+    """
+
+    def __init__(self, channel, timeout=COMMAND_TIMEOUT, idle_timeout=IDLE_TIMEOUT):
+        self.channel = channel
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        output = read_until_prompt(channel, timeout, idle_timeout)
+        self.prompt = find_prompt(output)
+        if self.prompt is None:
+            # Some devices only print the prompt after a new line
+            channel.send("\n")
+            self.prompt = find_prompt(read_until_prompt(channel, timeout, idle_timeout))
+        if self.prompt is None:
+            raise PromptTimeout("Could not find the prompt of the device", output)
+
+    @classmethod
+    def open(cls, ssh_client, timeout=COMMAND_TIMEOUT, idle_timeout=IDLE_TIMEOUT):
+        """
+        Args:
+            ssh_client (paramiko.SSHClient) : connected client
+            timeout (float) : most seconds to wait for each prompt
+            idle_timeout (float|None) : return when nothing was received for this many seconds
+        Return:
+            ExpectShell : the shell
+        """
+        return cls(ssh_client.invoke_shell(), timeout, idle_timeout)
+
+    @property
+    def enabled(self):
+        return self.prompt is not None and self.prompt.endswith("#")
+
+    def enable(self, enable_password):
+        """
+        Goes to enable mode.  Nothing is sent if the prompt already ends in #
+        Args:
+            enable_password (str|None) : enable password
+        Return:
+            bool : True if the shell is in enable mode
+        """
+        if self.enabled:
+            return True
+        self.channel.send("enable\n")
+        output, matched = read_until(
+            self.channel, [PASSWORD_PATTERN, PROMPT_PATTERN], self.timeout, self.idle_timeout
+        )
+        if matched == 0:
+            if enable_password is None:
+                raise ValueError("The device asked for an enable password and none was given")
+            self.channel.send(f"{enable_password}\n")
+            output, matched = read_until(
+                self.channel, [PASSWORD_PATTERN, PROMPT_PATTERN], self.timeout, self.idle_timeout
+            )
+            if matched == 0:
+                # Asked again so the password was wrong.  Get back to the prompt
+                self.channel.send("\n")
+                output = read_until_prompt(self.channel, self.timeout, self.idle_timeout)
+        prompt = find_prompt(output)
+        if prompt is not None:
+            self.prompt = prompt
+        return self.enabled
+
+    def send_command(self, command, timeout=None):
+        """
+        Args:
+            command (str) : command to send
+            timeout (float|None) : most seconds to wait for the prompt.  The shell timeout if None
+        Return:
+            list : lines of the output without the echoed command and the prompt
+        """
+        self.channel.send(f"{command}\n")
+        output = read_until_prompt(
+            self.channel, timeout or self.timeout, self.idle_timeout, self.prompt
+        )
+        return clean_command_output(output, command, self.prompt)
+
+    def close(self):
+        self.channel.close()
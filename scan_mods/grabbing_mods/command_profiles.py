@@ -0,0 +1,184 @@
+#!python
+
+"""
+Named lists of show commands for device_info_getter, in the order they are worth sending.
+
+device_info_getter used to send a show command for every NTC template of the platform, over 90 for cisco_ios,
+and most of them came back with % Invalid input on any one device.  A profile lists the commands that are sent
+    minimal  : version, inventory, interfaces and neighbors
+    standard : about 15 commands for inventory, interfaces, neighbors, L2 and routing.  This is the default
+    all      : every template of the platform like before, with the standard commands first
+Commands are named like the NTC templates, show_ip_route for cisco_ios_show_ip_route.textfsm, and only commands
+with a template are sent.  The budget is the most commands sent to one device.  The commands are in priority
+order so the budget drops the least useful ones
+"""
+
+import os
+import sys
+import threading
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+
+STANDARD_COMMANDS = {
+    "cisco_ios": (
+        "show_version",
+        "show_inventory",
+        "show_interfaces",
+        "show_ip_interface_brief",
+        "show_interfaces_status",
+        "show_cdp_neighbors_detail",
+        "show_lldp_neighbors_detail",
+        "show_ip_route",
+        "show_ip_arp",
+        "show_mac-address-table",
+        "show_vlan",
+        "show_spanning-tree",
+        "show_etherchannel_summary",
+        "show_ip_bgp_summary",
+        "show_ip_ospf_neighbor",
+    ),
+    "cisco_nxos": (
+        "show_version",
+        "show_inventory",
+        "show_interface",
+        "show_ip_interface_brief",
+        "show_interface_status",
+        "show_cdp_neighbors_detail",
+        "show_lldp_neighbors_detail",
+        "show_ip_route",
+        "show_ip_arp",
+        "show_mac_address-table",
+        "show_vlan",
+        "show_port-channel_summary",
+        "show_vpc",
+        "show_ip_bgp_summary",
+        "show_ip_ospf_neighbor",
+    ),
+    "cisco_xr": (
+        "show_version",
+        "admin_show_inventory",
+        "show_interfaces",
+        "show_ip_interface_brief",
+        "show_cdp_neighbors_detail",
+        "show_lldp_neighbors",
+        "show_ip_route",
+        "show_arp",
+        "show_bgp_vrf_all_ipv4_unicast_summary",
+        "show_ospf_neighbor",
+        "show_isis_neighbors",
+        "show_mpls_ldp_neighbor_brief",
+        "show_bfd_sessions",
+        "show_redundancy_summary",
+        "show_processes_cpu",
+    ),
+    "linux": ("arp_-a",),
+}
+MINIMAL_COMMANDS = {
+    "cisco_ios": ("show_version", "show_inventory", "show_ip_interface_brief", "show_cdp_neighbors_detail"),
+    "cisco_nxos": ("show_version", "show_inventory", "show_ip_interface_brief", "show_cdp_neighbors_detail"),
+    "cisco_xr": ("show_version", "admin_show_inventory", "show_ip_interface_brief", "show_cdp_neighbors_detail"),
+    "linux": ("arp_-a",),
+}
+# None is every template of the platform
+COMMAND_PROFILES = {
+    "minimal": MINIMAL_COMMANDS,
+    "standard": STANDARD_COMMANDS,
+    "all": None,
+}
+DEFAULT_COMMAND_PROFILE = "standard"
+
+_command_profile = (DEFAULT_COMMAND_PROFILE, None)
+_command_profile_lock = threading.Lock()
+
+
+def check_command_profile(profile):
+    """
+    Args:
+        profile (str|None) : name of a command profile.  None is the default profile
+    Return:
+        str : the profile name
+    """
+    if profile is None or profile == "":
+        return DEFAULT_COMMAND_PROFILE
+    if not isinstance(profile, str):
+        raise TypeError(f"The command profile needs to be a string.  It was a {type(profile).__name__}")
+    if profile not in COMMAND_PROFILES:
+        raise ValueError(
+            f"{profile} is not a command profile.  Use one of {', '.join(COMMAND_PROFILES)}"
+        )
+    return profile
+
+
+def check_command_budget(budget):
+    """
+    Args:
+        budget (int|None) : most commands to send to one device.  None is no limit
+    Return:
+        int|None : the budget
+    """
+    if budget is None:
+        return None
+    if not isinstance(budget, int) or isinstance(budget, bool):
+        raise TypeError(f"The command budget needs to be an int.  It was a {type(budget).__name__}")
+    if budget < 1:
+        raise ValueError(f"The command budget needs to be 1 or more.  It was {budget}")
+    return budget
+
+
+def set_command_profile(profile=None, budget=None):
+    """
+    Sets the command profile and budget used for the devices grabbed from now on
+    Args:
+        profile (str|None) : name of the command profile.  The default profile if None
+        budget (int|None) : most commands to send to one device.  No limit if None
+    Return:
+        tuple : the (profile, budget) that were being used before
+    """
+    global _command_profile
+    new_setting = (check_command_profile(profile), check_command_budget(budget))
+    with _command_profile_lock:
+        previous_setting = _command_profile
+        _command_profile = new_setting
+    return previous_setting
+
+
+def get_command_profile():
+    """
+    Return:
+        tuple : (profile, budget) being used
+    """
+    return _command_profile
+
+
+def prioritize_commands(available_commands, platform, profile=None, budget=None):
+    """
+    Picks the commands of the profile that have a template and puts them in priority order
+    Args:
+        available_commands (iterable) : command names that have a template for the platform, like show_ip_route
+        platform (str) : NTC platform like cisco_ios
+        profile (str|None) : name of the command profile.  The default profile if None
+        budget (int|None) : most commands to return.  No limit if None
+    Return:
+        list : command names in the order to send them
+    """
+    profile = check_command_profile(profile)
+    budget = check_command_budget(budget)
+    available_commands = set(available_commands)
+    wanted_commands = COMMAND_PROFILES[profile]
+    if wanted_commands is None:
+        # Everything, with the standard commands first
+        ordered_commands = [
+            command for command in STANDARD_COMMANDS.get(platform, ()) if command in available_commands
+        ]
+        ordered_commands += sorted(available_commands - set(ordered_commands))
+    else:
+        ordered_commands = [
+            command for command in wanted_commands.get(platform, ()) if command in available_commands
+        ]
+    if budget is not None:
+        ordered_commands = ordered_commands[:budget]
+    return ordered_commands
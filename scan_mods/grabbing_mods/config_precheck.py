@@ -0,0 +1,231 @@
+#!python
+
+"""
+Cheap check to see if a device's config changed since the last run.
+
+Pulling the config with get_config() and get_config(full=True) is slow on big configs.  Before pulling them
+get_config_napalm sends one short probe command for the platform and compares what it gets back with what was
+saved the last time.  If the probe is the same, the device has not rebooted and the configs from last time can
+still be read, the pull is skipped and the last run's config locations are used.
+
+Probes
+    ios           : last configuration change and NVRAM config last updated lines of the running config
+    iosxr         : newest commit id
+    nxos/nxos_ssh : running configuration last done at line
+    junos         : newest commit
+    eos           : no probe, the config is always pulled
+The uptime from Device_Facts is saved as well so a reboot always causes a pull.
+
+A save to startup (copy run start, write memory) only changes the probe on ios, iosxr and junos.  On the other
+platforms only the running config from last time is reused and the startup config is still pulled.  The probe
+saves sending the config over the connection, not the work on the device: show running-config | include still
+has the device build the whole running config.
+
+The probe values are kept in Output/Scans/config_precheck.json
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.output_sink import get_scans_directory
+from scan_mods.artifacts import artifact_exists
+
+
+PRECHECK_VERSION = 1
+PRECHECK_FILE_NAME = "config_precheck.json"
+
+# driver : (command, regex to pull the value out of the output)
+PROBE_COMMANDS = {
+    "ios": (
+        "show running-config | include configuration change|NVRAM config last updated",
+        re.compile(
+            r"^!\s*((?:Last|No) configuration change.*?|NVRAM config last updated.*?)\s*$",
+            re.MULTILINE,
+        ),
+    ),
+    "iosxr": (
+        "show configuration commit list 1",
+        re.compile(r"^\s*1\s+(\d+\s+.*?)\s*$", re.MULTILINE),
+    ),
+    "nxos": (
+        "show running-config | include last done",
+        re.compile(r"^!\s*(Running configuration last done at.*?)\s*$", re.MULTILINE),
+    ),
+    "nxos_ssh": (
+        "show running-config | include last done",
+        re.compile(r"^!\s*(Running configuration last done at.*?)\s*$", re.MULTILINE),
+    ),
+    "junos": (
+        "show system commit",
+        re.compile(r"^0\s+(.*?)\s*$", re.MULTILINE),
+    ),
+}
+
+# Drivers whose probe changes when the running config is saved to startup.  IOS has the NVRAM config line, IOS-XR
+# and Junos only have the committed config
+STARTUP_IN_PROBE = ("ios", "iosxr", "junos")
+STARTUP_LOCATION_KEYS = (
+    "Device_Startup_Config_File_Location",
+    "Device_Startup_Config_Full_File_Location",
+)
+
+
+def probe_config_change(device, dev_driver):
+    """
+    Sends the probe command for the platform
+    Args:
+        device : open napalm device
+        dev_driver (str) : napalm driver of the device
+    Return:
+        str|None : value of the probe or None if the platform has no probe or the output could not be read.  Each
+            line the pattern matched is joined with " / "
+    """
+    if dev_driver not in PROBE_COMMANDS:
+        return None
+    command, pattern = PROBE_COMMANDS[dev_driver]
+    try:
+        output = device.cli([command]).get(command, "")
+    except Exception as ex:
+        print(f"Config change probe failed with {type(ex).__name__}.  The config will be pulled")
+        return None
+    matches = pattern.findall(output)
+    if not matches:
+        return None
+    return " / ".join(matches)
+
+
+class ConfigPrecheck:
+    """
+    Probe values and config locations of each device from the last run
+
+    Methods:
+        .is_unchanged() : see if the configs from last time can be used
+        .record() : save the probe value and config locations after a pull
+        .save() : write the state file
+    """
+
+    def __init__(self, file_location=None):
+        if file_location is None:
+            file_location = os.path.join(get_scans_directory(), PRECHECK_FILE_NAME)
+        if not isinstance(file_location, str):
+            raise TypeError(
+                f"{file_location} is not a string.  It is a {type(file_location).__name__}"
+            )
+        self.file_location = file_location
+        self._lock = threading.Lock()
+        self.devices = {}
+        self.skipped = 0
+        if os.path.exists(file_location):
+            with open(file_location) as input_file:
+                state = json.load(input_file)
+            if state.get("version") == PRECHECK_VERSION:
+                self.devices = state["devices"]
+            else:
+                print(f"{file_location} is from another version.  Every config will be pulled")
+
+    def is_unchanged(self, address, dev_driver, probe_value, uptime=None):
+        """
+        Args:
+            address (str) : IP of the device
+            dev_driver (str) : napalm driver of the device
+            probe_value (str|None) : value from probe_config_change
+            uptime (int|float|None) : uptime from Device_Facts in seconds
+        Return:
+            dict|None : config locations from last time if the pull can be skipped, None if the config needs pulling
+        """
+        if probe_value is None:
+            return None
+        with self._lock:
+            previous = self.devices.get(address)
+        if previous is None:
+            return None
+        if previous["driver"] != dev_driver or previous["probe"] != probe_value:
+            return None
+        if uptime is not None and previous.get("uptime") is not None and uptime < previous["uptime"]:
+            # The device rebooted since the last run
+            return None
+        locations = previous["config_locations"]
+        if not all(artifact_exists(location) for location in locations.values()):
+            return None
+        with self._lock:
+            self.skipped += 1
+            previous["uptime"] = uptime
+            previous["checked"] = time.time()
+        return dict(locations)
+
+    def record(self, address, dev_driver, probe_value, config_locations, uptime=None):
+        """
+        Saves the probe value and config locations of a device after its config was pulled
+        Args:
+            address (str) : IP of the device
+            dev_driver (str) : napalm driver of the device
+            probe_value (str|None) : value from probe_config_change.  Nothing is saved if None
+            config_locations (dict) : keys like Device_Running_Config_File_Location to the location of the file
+            uptime (int|float|None) : uptime from Device_Facts in seconds
+        Return:
+            None
+        """
+        if probe_value is None:
+            return
+        if not isinstance(config_locations, dict):
+            raise TypeError(
+                f"{config_locations} is not a dict.  It is a {type(config_locations).__name__}"
+            )
+        with self._lock:
+            self.devices[address] = {
+                "driver": dev_driver,
+                "probe": probe_value,
+                "uptime": uptime,
+                "config_locations": dict(config_locations),
+                "checked": time.time(),
+            }
+
+    def save(self):
+        """
+        Writes the state file
+        Return:
+            str : path of the state file
+        """
+        with self._lock:
+            state = {"version": PRECHECK_VERSION, "devices": dict(self.devices)}
+        temp_location = f"{self.file_location}.tmp"
+        with open(temp_location, "w") as output_file:
+            json.dump(state, output_file, indent=4, sort_keys=True)
+        os.replace(temp_location, self.file_location)
+        return self.file_location
+
+
+_config_precheck = None
+
+
+def set_config_precheck(config_precheck):
+    """
+    Turns the pre-check on for get_config_napalm.  None turns it off
+    Args:
+        config_precheck (ConfigPrecheck|None) : pre-check to use
+    Return:
+        ConfigPrecheck|None : the pre-check that was being used before
+    """
+    global _config_precheck
+    if config_precheck is not None and not isinstance(config_precheck, ConfigPrecheck):
+        raise TypeError(f"{config_precheck} is not a ConfigPrecheck")
+    previous_precheck = _config_precheck
+    _config_precheck = config_precheck
+    return previous_precheck
+
+
+def get_config_precheck():
+    """
+    Return:
+        ConfigPrecheck|None : the pre-check being used or None if it is off
+    """
+    return _config_precheck
@@ -27,6 +27,25 @@ from scan_mods.common_validation_checks.check_enable_password import (
     check_enable_password,
 )
 from scan_mods.grabbing_mods.device_specific_info_getter import device_info_getter
+from scan_mods.output_sink import get_device_directory
+from scan_mods.artifacts import reference_artifact, write_artifact
+from scan_mods.grabbing_mods.config_precheck import (
+    STARTUP_IN_PROBE,
+    STARTUP_LOCATION_KEYS,
+    get_config_precheck,
+    probe_config_change,
+)
+from scan_mods.grabbing_mods.channel_reader import ExpectShell, PromptTimeout
+from scan_mods.grabbing_mods.session_broker import DeviceSession
+from scan_mods.grabbing_mods.transcripts import record_transcript
+from scan_mods.grabbing_mods.capability_cache import os_version_key
+from scan_mods.grabbing_mods.getter_profiles import (
+    DEFAULT_GETTER_PROFILE,
+    LazyGetters,
+    check_getter_profile,
+    get_getter_consumer,
+    get_getter_timeouts,
+)
 import ipaddress
 import time
 import getpass
@@ -36,6 +55,14 @@ import json
 import datetime
 
 
+# Config napalm returns : start of the key its file location is saved under
+CONFIG_LOCATION_NAMES = {
+    "startup": "Device_Startup_Config",
+    "running": "Device_Running_Config",
+    "candidate": "Device_Candidate_Config",
+}
+
+
 def check_ports(port_dictionary):
     """
     This will run through the ports that are supposedly open and see if 22 is listed.  If so, it will return the device type if it can be determined
@@ -83,7 +110,35 @@ def check_ports(port_dictionary):
     return (False, False)
 
 
-def get_device_type(address, port, username, password, enable_password, header):
+def shell_show_version(ssh_open, enable_password, session=None):
+    """
+    Goes to enable mode on an interactive shell and gets show version.  Each step waits for the prompt so it
+    takes as long as the device does and long output is read all the way to the prompt
+    Args:
+        ssh_open (paramiko.SSHClient) : connected client
+        enable_password (str) : string of the enable password
+        session (DeviceSession|None) : if given its shell is used and is left open for the later stages
+    return:
+        list : lines of show version
+    """
+    try:
+        if session is not None:
+            shell = session.shell()
+        else:
+            shell = ExpectShell.open(ssh_open)
+            if not shell.enable(enable_password):
+                print(f"Could not get to enable mode.  The prompt is {shell.prompt}")
+        shell.send_command("terminal length 0")
+        output_list = [line.strip() for line in shell.send_command("show version")]
+    except PromptTimeout as ex:
+        print(ex)
+        output_list = [line.strip() for line in ex.output.splitlines() if line.strip()]
+    return output_list
+
+
+def get_device_type(
+    address, port, username, password, enable_password, header, session=None
+):
     """
     Will attempt to connect to a device and determine the device type for napalm
     Args:
@@ -93,6 +148,7 @@ def get_device_type(address, port, username, password, enable_password, header):
         password (str): string of the password
         enable_password (str): string of the enable password
         open (str): string of the type device is thought to be
+        session (DeviceSession|None) : if given the device is logged into through it and it is left open
     return:
         str : string of either device type known or if it is unknown.  Types will be used for napalm
     """
@@ -114,14 +170,17 @@ def get_device_type(address, port, username, password, enable_password, header):
             f"{enable_password} is not a string.  It is a {type(port).__name__}"
         )
 
-    ssh_open = paramiko.SSHClient()
-    ssh_open.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    print(f"Attempting connection to {address}")
     try:
-        # to work for Cisco added in the look_for_keys and allow_agent parameters
-        ssh_open.connect(
-            address, port, username, password, look_for_keys=False, allow_agent=False
-        )
+        if session is not None:
+            ssh_open = session.client
+        else:
+            ssh_open = paramiko.SSHClient()
+            ssh_open.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            print(f"Attempting connection to {address}")
+            # to work for Cisco added in the look_for_keys and allow_agent parameters
+            ssh_open.connect(
+                address, port, username, password, look_for_keys=False, allow_agent=False
+            )
     except paramiko.AuthenticationException:
         return_dict = {
             "Version Info": f"[ERROR] paramiko.AuthenticationException: Authentication failed for device {address}"
@@ -145,30 +204,17 @@ def get_device_type(address, port, username, password, enable_password, header):
             )
             if stderr_lines.readlines():
                 raise ValueError(f"Something happened when connecting to {address}")
+            stdout_list = stdout_lines.readlines()
+            record_transcript(address, "paramiko", "show version", "".join(stdout_list))
             output_list = []
-            for line in stdout_lines.readlines():
+            for line in stdout_list:
                 if line.strip() == "":
                     continue
                 output_list.append(line.strip())
         elif enable_password is not None:
             # this means we have to invoke a shell and start issuing commands :)
-            shell_connection = ssh_open.invoke_shell()
-            shell_connection.send("enable\n")
-            time.sleep(0.5)
-            shell_connection.send(f"{enable_password}\n")
-            time.sleep(0.5)
-            shell_connection.send("term length 0\n")
-            time.sleep(0.5)
-            output_bytes = shell_connection.recv(65535)
-            shell_connection.send("show version\n")
-            time.sleep(0.5)
-            output_bytes = shell_connection.recv(65535)
-            output_list = []
-            temp_list = output_bytes.decode("utf-8").splitlines()
-            for item in temp_list:
-                if item == "":
-                    continue
-                output_list.append(item)
+            output_list = shell_show_version(ssh_open, enable_password, session)
+            record_transcript(address, "paramiko", "show version", "\n".join(output_list))
         else:
             raise ValueError(
                 f"Enable password parameter has something jacked up with it.  enable_password = {enable_password}"
@@ -192,16 +238,19 @@ def get_device_type(address, port, username, password, enable_password, header):
             elif "IOSv" in line:
                 return_dict["OS Type"] = "ios"
                 break
-        ssh_open.close()
+        if session is None:
+            ssh_open.close()
         return return_dict
     elif header == "Linux":
         stdin_lines, stdout_lines, stderr_lines = ssh_open.exec_command("uname -a")
         if stderr_lines.readlines():
             raise ValueError(f"Something happened when connecting to {address}")
         stdout_list = stdout_lines.readlines()
+        record_transcript(address, "paramiko", "uname -a", "".join(stdout_list))
         return_dict = {"Version Info": [stdout_list[0].strip()]}
         return_dict["OS Type"] = "linux"
-        ssh_open.close()
+        if session is None:
+            ssh_open.close()
         return return_dict
     elif header == "Other":
         if enable_password is None:
@@ -210,8 +259,10 @@ def get_device_type(address, port, username, password, enable_password, header):
             )
             if stderr_lines.readlines():
                 raise ValueError(f"Something happened when connecting to {address}")
+            stdout_list = stdout_lines.readlines()
+            record_transcript(address, "paramiko", "show version", "".join(stdout_list))
             output_list = []
-            for line in stdout_lines.readlines():
+            for line in stdout_list:
                 if line.strip() == "":
                     continue
                 output_list.append(line.strip())
@@ -223,29 +274,16 @@ def get_device_type(address, port, username, password, enable_password, header):
                 if stderr_lines.readlines():
                     raise ValueError(f"Something happened when connecting to {address}")
                 stdout_list = stdout_lines.readlines()
+                record_transcript(address, "paramiko", "uname -a", "".join(stdout_list))
                 return_dict = {"Version Info": [stdout_list[0].strip()]}
                 return_dict["OS Type"] = "linux"
-                ssh_open.close()
+                if session is None:
+                    ssh_open.close()
                 return return_dict
         elif enable_password is not None:
             # this means we have to invoke a shell and start issuing commands :)
-            shell_connection = ssh_open.invoke_shell()
-            shell_connection.send("enable\n")
-            time.sleep(0.5)
-            shell_connection.send(f"{enable_password}\n")
-            time.sleep(0.5)
-            shell_connection.send("term length 0\n")
-            time.sleep(0.5)
-            output_bytes = shell_connection.recv(65535)
-            shell_connection.send("show version\n")
-            time.sleep(0.5)
-            output_bytes = shell_connection.recv(65535)
-            output_list = []
-            temp_list = output_bytes.decode("utf-8").splitlines()
-            for item in temp_list:
-                if item == "":
-                    continue
-                output_list.append(item)
+            output_list = shell_show_version(ssh_open, enable_password, session)
+            record_transcript(address, "paramiko", "show version", "\n".join(output_list))
         else:
             raise ValueError(
                 f"Enable password parameter has something jacked up with it.  enable_password = {enable_password}"
@@ -268,9 +306,11 @@ def get_device_type(address, port, username, password, enable_password, header):
             elif "IOSv" in line:
                 return_dict["OS Type"] = "ios"
                 break
-        ssh_open.close()
+        if session is None:
+            ssh_open.close()
         return return_dict
-    ssh_open.close()
+    if session is None:
+        ssh_open.close()
 
 
 def get_config_napalm(
@@ -280,6 +320,9 @@ def get_config_napalm(
     usern=None,
     passw=None,
     enable_password=None,
+    session=None,
+    getter_profile=DEFAULT_GETTER_PROFILE,
+    getter_consumer=None,
 ):
     """
     Will use napalm to connect to the device.  It will return a dictionary of the configs cleaned with no new lines, etc
@@ -292,7 +335,13 @@ def get_config_napalm(
         usern (str) : username to use to connect to the device
         passw (str) : password to use to connect to the device
         enable_password (str|None) : enable_password will be None if no enable password is needed else it will be a string of the enable password
+        session (DeviceSession|None) : if given napalm uses its connection instead of logging in again
+        getter_profile (str) : name of the getter profile.  Getters outside it are only called if looked up
+        getter_consumer (callable|None) : called as getter_consumer(host, getters) with the LazyGetters while the
+            device is connected.  Getters it looks up are fetched then and returned with the rest.  The one from
+            set_getter_consumer if None
     """
+    getter_profile = check_getter_profile(getter_profile)
     for item in [dev_driver, host, usern, passw]:
         if not isinstance(item, str):
             raise TypeError(f"{item} is not a string.  It is a {type(item).__name__}")
@@ -328,48 +377,152 @@ def get_config_napalm(
                 optional_args = {}
             optional_args["secret"] = enable_password
     try:
-        with device_driver(host, usern, passw, optional_args=optional_args) as device:
+        if session is not None:
+            device_context = session.napalm_device(dev_driver, optional_args)
+        else:
+            device_context = device_driver(
+                host, usern, passw, optional_args=optional_args
+            )
+        with device_context as device:
             print("Attempting to get the device configuration...")
-            return_dict = {}
-            inputs_dict = {
-                "Device_Facts": device.get_facts,
-                "Device_Optics": device.get_optics,
-                "Device_Network_Instances": device.get_network_instances,
-                "Device_LLDP_Detail": device.get_lldp_neighbors_detail,
-                "Device_LLDP": device.get_lldp_neighbors,
-                "Device_Environment": device.get_environment,
-                "Device_Interfaces": device.get_interfaces,
-                "Device_Interfaces_IP": device.get_interfaces_ip,
-                "Device_SNMP_Information": device.get_snmp_information,
-                "Device_Users": device.get_users,
-            }
-            for key, value in inputs_dict.items():
+            if session is not None:
+                reconnect = lambda: session.reconnect_napalm(device, dev_driver)
+            else:
+                reconnect = lambda: reopen_napalm_device(device)
+            getters = LazyGetters(device, getter_profile, reconnect=reconnect)
+            if getter_consumer is None:
+                getter_consumer = get_getter_consumer()
+            if getter_consumer is not None:
                 try:
-                    return_dict[key] = value()
-                except NotImplementedError:
-                    return_dict[key] = {"Not_Implemented": "Not_Implemented"}
-
-            device_config = device.get_config()
-            device_config_full = device.get_config(full=True)
+                    getter_consumer(host, getters)
+                except Exception as ex:
+                    print(f"The getter consumer failed for {host} with {type(ex).__name__}: {ex}")
+
+            config_precheck = get_config_precheck()
+            probe_value = None
+            uptime = None
+            if config_precheck is not None:
+                probe_value = probe_config_change(device, dev_driver)
+                # Fetches the facts if the profile did not
+                uptime = getters.get("Device_Facts", {}).get("uptime")
+                if not isinstance(uptime, (int, float)) or uptime < 0:
+                    uptime = None
+                previous_locations = config_precheck.is_unchanged(
+                    host, dev_driver, probe_value, uptime
+                )
+                if previous_locations is not None:
+                    startup_config = startup_config_full = None
+                    if dev_driver not in STARTUP_IN_PROBE:
+                        # The probe does not change when the running config is saved so startup is still pulled
+                        for key in STARTUP_LOCATION_KEYS:
+                            previous_locations.pop(key, None)
+                        config_timeout = get_getter_timeouts()[1]
+                        _, startup_config = getters.call(
+                            "Startup_Config",
+                            device.get_config,
+                            retrieve="startup",
+                            timeout=config_timeout,
+                        )
+                        _, startup_config_full = getters.call(
+                            "Startup_Config_Full",
+                            device.get_config,
+                            retrieve="startup",
+                            full=True,
+                            timeout=config_timeout,
+                        )
+                    getters.close()
+                    return_dict = getter_results(getters)
+                    print(
+                        "The config has not changed since the last run.  Skipping the running config pull"
+                    )
+                    # The files from last time are part of this run too, so a config store lists them in its manifest
+                    for key, value in CONFIG_LOCATION_NAMES.items():
+                        for suffix, location_key in (
+                            ("", f"{value}_File_Location"),
+                            ("_full", f"{value}_Full_File_Location"),
+                        ):
+                            if location_key in previous_locations:
+                                previous_locations[location_key] = reference_artifact(
+                                    host, f"{host}_{key}{suffix}.txt", previous_locations[location_key]
+                                )
+                    return_dict.update(previous_locations)
+                    if startup_config is not None:
+                        return_dict["Device_Startup_Config_File_Location"] = write_artifact(
+                            host, f"{host}_startup.txt", startup_config["startup"]
+                        )
+                    if startup_config_full is not None:
+                        return_dict["Device_Startup_Config_Full_File_Location"] = write_artifact(
+                            host, f"{host}_startup_full.txt", startup_config_full["startup"]
+                        )
+                    return_dict["Config_Unchanged"] = True
+                    return return_dict
+
+            config_timeout = get_getter_timeouts()[1]
+            _, device_config = getters.call(
+                "Config", device.get_config, timeout=config_timeout
+            )
+            _, device_config_full = getters.call(
+                "Config_Full", device.get_config, full=True, timeout=config_timeout
+            )
+            getters.close()
+            return_dict = getter_results(getters)
     except ValueError as ex:
         print(ex)
         return {}
-    write_directory = directory_checker(host)
-    config_dict = {
-        "startup": "Device_Startup_Config",
-        "running": "Device_Running_Config",
-        "candidate": "Device_Candidate_Config",
-    }
-    for key, value in config_dict.items():
-        file_location = f"{write_directory}\\{host}_{key}.txt"
-        with open(file_location, "w") as output:
-            output.write(device_config[key])
-        return_dict[f"{value}_File_Location"] = file_location
-    for key, value in config_dict.items():
-        file_location = f"{write_directory}\\{host}_{key}_full.txt"
-        with open(file_location, "w") as output:
-            output.write(device_config_full[key])
-        return_dict[f"{value}_Full_File_Location"] = file_location
+    # write_artifact puts the files in Output/Scans/<host> or in the run's packfile if one is open
+    # A config pull that failed is in Getter_Errors and has no files
+    if device_config is not None:
+        for key, value in CONFIG_LOCATION_NAMES.items():
+            return_dict[f"{value}_File_Location"] = write_artifact(
+                host, f"{host}_{key}.txt", device_config[key]
+            )
+    if device_config_full is not None:
+        for key, value in CONFIG_LOCATION_NAMES.items():
+            return_dict[f"{value}_Full_File_Location"] = write_artifact(
+                host, f"{host}_{key}_full.txt", device_config_full[key]
+            )
+    # Only a complete pull is remembered so a partial one is pulled again next run
+    if config_precheck is not None and device_config is not None and device_config_full is not None:
+        config_precheck.record(
+            host,
+            dev_driver,
+            probe_value,
+            {
+                key: value
+                for key, value in return_dict.items()
+                if key.endswith("_File_Location")
+            },
+            uptime,
+        )
+    return return_dict
+
+
+def reopen_napalm_device(device):
+    """
+    Closes and opens a napalm driver so a call that timed out is not still using its connection
+    Args:
+        device : napalm driver
+    Return:
+        None
+    """
+    try:
+        device.close()
+    except Exception as ex:
+        print(f"Closing the napalm connection failed with {type(ex).__name__}")
+    device.open()
+
+
+def getter_results(getters):
+    """
+    Args:
+        getters (LazyGetters) : getters of a device
+    Return:
+        dict : the getters that were fetched plus Getter_Timings and Getter_Errors if any failed
+    """
+    return_dict = getters.fetched()
+    return_dict["Getter_Timings"] = dict(getters.timings)
+    if getters.errors:
+        return_dict["Getter_Errors"] = dict(getters.errors)
     return return_dict
 
 
@@ -386,18 +539,7 @@ def directory_checker(address):
         raise ValueError(f"{address} needs to be a string and not None")
     if not isinstance(address, str):
         raise ValueError(f"{address} needs to be a string and not None")
-    write_directory = None
-    if "Output" in os.listdir(os.getcwd()):
-        write_directory = f"{os.getcwd()}/Output/Scans/{address}"
-    else:
-        path = "../"
-        while write_directory is None:
-            if "Output" in os.listdir(path):
-                write_directory = f"{path}/Output/Scans/{address}"
-            path += "../"
-    if not os.path.exists(write_directory):
-        os.makedirs(write_directory)
-    return write_directory
+    return get_device_directory(address)
 
 
 def device_grab(
@@ -407,6 +549,7 @@ def device_grab(
     password=None,
     enable_password_needed=False,
     enable_password=None,
+    getter_profile=DEFAULT_GETTER_PROFILE,
 ):
     """
     This will do a bunch of things.  The main one is iterate through the ports the user passes over
@@ -421,6 +564,7 @@ def device_grab(
         password (str) : strin of the password.  If not given, user will be asked
         enable_password_needed (bool) : if True, enable password needs to either be passed or will be asked for.  If False, enable password check is skipped and password set to None
         enable_password (str) : string of the enable password.  If not given, user will be asked
+        getter_profile (str) : name of the napalm getter profile to fetch
 
     Return:
         dictionary of dictionaries : dictionary will contain full and not full config and full and not full will contain start, run, and candidate
@@ -455,6 +599,36 @@ def device_grab(
         raise ValueError(
             f"You set the enable_password_needed option to something besides True or False.  Not Cool man.  enable_password_needed = {enable_password_needed}"
         )
+    # The one login to the device.  Detection, napalm and the show commands all use it
+    with DeviceSession(
+        connect_address, ssh_port, ssh_username, ssh_password, ssh_enable_password
+    ) as session:
+        return _grab_with_session(
+            session,
+            connect_address,
+            ssh_port,
+            ssh_username,
+            ssh_password,
+            ssh_enable_password,
+            ssh_open,
+            enable_password_needed,
+            enable_password,
+            getter_profile,
+        )
+
+
+def _grab_with_session(
+    session,
+    connect_address,
+    ssh_port,
+    ssh_username,
+    ssh_password,
+    ssh_enable_password,
+    ssh_open,
+    enable_password_needed,
+    enable_password,
+    getter_profile=DEFAULT_GETTER_PROFILE,
+):
     device_type = get_device_type(
         connect_address,
         ssh_port,
@@ -462,6 +636,7 @@ def device_grab(
         ssh_password,
         ssh_enable_password,
         ssh_open,
+        session,
     )
     if "[ERROR] " in device_type["Version Info"]:
         return_dict = {
@@ -473,6 +648,7 @@ def device_grab(
         "CONFIG": {
             "Open_Close": False,
             "Open_Close_Msg": f"Config for type device not yet supported ({device_type['OS Type']}).",
+            "OS_Type": device_type["OS Type"],
             "Device_Information": {},
         },
     }
@@ -489,6 +665,7 @@ def device_grab(
             "CONFIG": {
                 "Open_Close": True,
                 "Open_Close_Msg": f"SSH is open and Device Type is known ({device_type['OS Type']}).",
+                "OS_Type": device_type["OS Type"],
             },
         }
         device_information = get_config_napalm(
@@ -498,6 +675,8 @@ def device_grab(
             usern=ssh_username,
             passw=ssh_password,
             enable_password=ssh_enable_password,
+            session=session,
+            getter_profile=getter_profile,
         )
         return_dict["CONFIG"]["Device_Information"] = device_information
     return_dict["CONFIG"]["Show_Info"] = device_info_getter(
@@ -508,6 +687,8 @@ def device_grab(
         enable_password_needed=enable_password_needed,
         enable_password=enable_password,
         port_to_use=ssh_port,
+        session=session,
+        os_version=os_version_key(device_type["Version Info"]),
     )
     return return_dict
 
@@ -27,6 +27,22 @@ from scan_mods.common_validation_checks.check_password import check_password
 from scan_mods.common_validation_checks.check_enable_password import (
     check_enable_password,
 )
+from scan_mods.search_index import index_artifact, render_command_output
+from scan_mods.grabbing_mods.command_profiles import (
+    check_command_budget,
+    check_command_profile,
+    get_command_profile,
+    prioritize_commands,
+)
+from scan_mods.grabbing_mods.template_registry import template_commands
+from scan_mods.grabbing_mods.parse_pool import PendingParse, parse_output
+from scan_mods.grabbing_mods.transcripts import record_transcript
+from scan_mods.grabbing_mods.capability_cache import (
+    SUPPORTED,
+    TIMED_OUT,
+    UNSUPPORTED,
+    get_capability_cache,
+)
 
 import time
 import json
@@ -34,6 +50,11 @@ import netmiko
 import textfsm
 
 
+# Start of the OSError netmiko 3 raises when a read times out, and what is saved as the output of the command then
+READ_TIMEOUT_MESSAGE = "Search pattern never detected"
+TIMED_OUT_OUTPUT = "Timed-out reading channel, data not available."
+
+
 def check_device_type(device_type, address):
     """
     Validate that the device type will return the correct string for NetMiko
@@ -75,6 +96,10 @@ def device_info_getter(
     enable_password_needed=False,
     enable_password=None,
     port_to_use=22,
+    session=None,
+    command_profile=None,
+    command_budget=None,
+    os_version=None,
 ):
     """
     Will connect to a device using netmiko and pull information from the device
@@ -87,6 +112,11 @@ def device_info_getter(
         enable_password_needed (bool) : boolean on if the enable password is needed or not
         enable_password (str) : string of the enable password
         port_to_use (int) : if the default ssh port is different
+        session (DeviceSession|None) : if given its connection is used instead of logging in again and it is not closed
+        command_profile (str|None) : name of the command profile to send.  The one from set_command_profile if None
+        command_budget (int|None) : most commands to send.  The one from set_command_profile if None
+        os_version (str|None) : OS version from os_version_key.  Commands the capability cache knows this version
+            does not answer are not sent.  Nothing is cached if None
 
     REturns:
         dict : dict of all info pulled from the device in JSON format
@@ -114,6 +144,14 @@ def device_info_getter(
             connect_port = 22
     else:
         connect_port = 22
+    # Only None means the run setting.  An explicit budget of 0 is an error and not the run budget
+    run_profile, run_budget = get_command_profile()
+    command_profile = check_command_profile(
+        run_profile if command_profile is None else command_profile
+    )
+    command_budget = check_command_budget(
+        run_budget if command_budget is None else command_budget
+    )
     if enable_password_needed:
         device_parameters = {
             "device_type": valid_device_type,
@@ -136,8 +174,18 @@ def device_info_getter(
     print(
         f"Attempting connection to {valid_address} to get device specific information"
     )
+    device_connection = None
+    if session is not None:
+        try:
+            device_connection = session.netmiko(valid_device_type)
+        except Exception as ex:
+            print(
+                f"Could not use the open session to {valid_address} ({type(ex).__name__}).  Logging in again"
+            )
+            session = None
     try:
-        device_connection = netmiko.ConnectHandler(**device_parameters)
+        if device_connection is None:
+            device_connection = netmiko.ConnectHandler(**device_parameters)
     except netmiko.ssh_exception.NetmikoTimeoutException:
         output_dict["ERROR"] = {
             "NetmikoTimeoutException": f"Device Connection Timed Out for {valid_address}"
@@ -151,38 +199,112 @@ def device_info_getter(
     except Exception as ex:
         print(ex)
         raise
-    command_dict = find_commands(valid_textfsm_string)
+    capability_cache = get_capability_cache() if os_version is not None else None
+    skip_commands = set()
+    if capability_cache is not None:
+        capability_cache.observe_device(valid_address, valid_textfsm_string, os_version)
+        skip_commands = capability_cache.commands_to_skip(valid_textfsm_string, os_version)
+    if skip_commands:
+        command_dict = find_commands(
+            valid_textfsm_string,
+            command_profile,
+            command_budget,
+            skip_commands,
+        )
+        # Only the commands of the profile would have been sent, whatever the budget
+        profile_commands = prioritize_commands(
+            template_commands(valid_textfsm_string),
+            valid_textfsm_string,
+            command_profile,
+        )
+        skipped_count = len(skip_commands & set(profile_commands))
+        capability_cache.add_skipped(skipped_count)
+        print(
+            f"Not sending {skipped_count} commands because {valid_address} is known not to answer them"
+        )
+    else:
+        command_dict = find_commands(
+            valid_textfsm_string,
+            command_profile,
+            command_budget,
+        )
     print(f"Sending commands to {valid_address} for device specific information")
     for command_key, command_value in command_dict.items():
+        received = False
         try:
-            output_string = device_connection.send_command(
-                command_value, use_textfsm=True
-            )
+            output_string = device_connection.send_command(command_value)
+            received = True
         except textfsm.parser.TextFSMError:
             output_string = "% Invalid input detected "
-        except OSError:
-            output_string = "% Invalid input detected "
+        except OSError as ex:
+            # netmiko 3 raises OSError when the prompt is not seen before the read times out
+            if READ_TIMEOUT_MESSAGE in str(ex):
+                output_string = TIMED_OUT_OUTPUT
+            else:
+                output_string = "% Invalid input detected "
         except netmiko.ssh_exception.NetmikoTimeoutException:
-            output_string = "Timed-out reading channel, data not available."
+            output_string = TIMED_OUT_OUTPUT
         except Exception as ex:
             print(ex)
             output_string = "% Invalid input detected "
             raise
-        if (
+        if received:
+            record_transcript(
+                valid_address,
+                "netmiko",
+                command_value,
+                output_string,
+                platform=valid_textfsm_string,
+                command_key=command_key,
+                prompt=getattr(device_connection, "base_prompt", None),
+            )
+        rejected = (
             "% Invalid input detected " in output_string
             or "% Incomplete command" in output_string
-        ):
+        )
+        if capability_cache is not None:
+            if received:
+                status = UNSUPPORTED if rejected else SUPPORTED
+            elif output_string == TIMED_OUT_OUTPUT:
+                status = TIMED_OUT
+            else:
+                status = None
+            if status is not None:
+                capability_cache.record(
+                    valid_textfsm_string, os_version, command_key, status
+                )
+        if rejected:
             continue
+        if received:
+            # Parsed with the compiled templates shared by every device instead of netmiko building a CliTable.
+            # Big outputs go to the parse pool if there is one and are resolved after the session is closed
+            try:
+                output_string = parse_output(
+                    valid_textfsm_string, command_value, output_string
+                )
+            except textfsm.parser.TextFSMError:
+                continue
         output_dict[command_key] = output_string
-    device_connection.disconnect()
+        if not isinstance(output_string, PendingParse):
+            index_artifact(
+                valid_address, command_key, render_command_output(output_string)
+            )
+    if session is None:
+        device_connection.disconnect()
     return output_dict
 
 
-def find_commands(device_type):
+def find_commands(
+    device_type, command_profile="all", command_budget=None, skip_commands=()
+):
     """
-    This will read through the list of available commands in the NTC templates and will return a list of comands available for the device type
+    This will read through the list of available commands in the NTC templates and will return the comands of the command profile
+    available for the device type in the order they should be sent
     Args:
         device_type (str) : string of the device_type to look for in the NTC templates
+        command_profile (str) : name of the command profile.  all is every template for the device type
+        command_budget (int|None) : most commands to return.  No limit if None
+        skip_commands (iterable) : command names to leave out before the budget is taken
 
     Return:
         dict : dict of commands for the device type where key is the command name with underscores and value is the command
@@ -192,26 +314,16 @@ def find_commands(device_type):
             f"Device Type should be a string.  Not {type(device_type).__name__}"
         )
     commands_found = {}
-    print(f"Grabbing all commands for device type {device_type}")
-    ntc_template_path = None
-    if "NTC_Templates" in os.listdir(os.getcwd()):
-        ntc_template_path = (
-            f"{os.getcwd()}/NTC_Templates/ntc-templates/ntc_templates/templates/"
-        )
-    else:
-        path = "../"
-        while ntc_template_path is None:
-            if "NTC_Templates" in os.listdir(path):
-                ntc_template_path = (
-                    f"{path}/NTC_Templates/ntc-templates/ntc_templates/templates/"
-                )
-            path += "../"
-    os.environ["NTC_TEMPLATES_DIR"] = ntc_template_path
-    for template_name in os.listdir(ntc_template_path):
-        if device_type in template_name:
-            command_name = template_name[len(device_type) + 1 : -8]
-            command_value = " ".join(command_name.split("_"))
-            commands_found[command_name] = command_value
+    print(f"Grabbing the {command_profile} commands for device type {device_type}")
+    # The templates directory is found and listed once per process
+    available_commands = template_commands(device_type)
+    if skip_commands:
+        available_commands = set(available_commands) - set(skip_commands)
+    for command_name in prioritize_commands(
+        available_commands, device_type, command_profile, command_budget
+    ):
+        command_value = " ".join(command_name.split("_"))
+        commands_found[command_name] = command_value
     return commands_found
 
 
@@ -0,0 +1,321 @@
+#!python
+
+"""
+Named sets of napalm getters so a run only asks devices for what it needs.
+
+Every device used to be asked for all ten getters before its configs were pulled, and some of them (optics,
+environment, LLDP detail) take tens of seconds on a large chassis.  A profile names the getters that are fetched
+for every device
+    inventory   : facts, interfaces, optics, environment and users
+    topology    : facts, interfaces, interface IPs, LLDP and network instances
+    config-only : no getters, just the configs
+    full        : every getter.  This is the default and what was always done before
+The configs are pulled with every profile.
+
+LazyGetters fetches the profile's getters and fetches any other getter only the first time it is looked up while
+the device is connected, so a getter that is never looked at is never called.  Code outside get_config_napalm
+looks getters up through a getter consumer, set with set_getter_consumer or passed to get_config_napalm.  It is
+called with the LazyGetters of each device while the device is still connected, and every getter it looks up is
+returned in Device_Information with the profile's getters.
+
+Each getter and config pull runs under its own deadline on a helper thread.  One that times out or fails is kept in
+.errors as a structured error and the device keeps everything else it got.  A timed out call may still be reading
+from the connection, so the connection is reopened with the reconnect function before anything else is sent.  How
+long each call took is kept in .timings so the timeouts can be tuned
+"""
+
+import collections.abc
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+
+# Key in Device_Information and the napalm getter it comes from
+NAPALM_GETTERS = {
+    "Device_Facts": "get_facts",
+    "Device_Optics": "get_optics",
+    "Device_Network_Instances": "get_network_instances",
+    "Device_LLDP_Detail": "get_lldp_neighbors_detail",
+    "Device_LLDP": "get_lldp_neighbors",
+    "Device_Environment": "get_environment",
+    "Device_Interfaces": "get_interfaces",
+    "Device_Interfaces_IP": "get_interfaces_ip",
+    "Device_SNMP_Information": "get_snmp_information",
+    "Device_Users": "get_users",
+}
+GETTER_PROFILES = {
+    "inventory": (
+        "Device_Facts",
+        "Device_Interfaces",
+        "Device_Optics",
+        "Device_Environment",
+        "Device_Users",
+    ),
+    "topology": (
+        "Device_Facts",
+        "Device_Interfaces",
+        "Device_Interfaces_IP",
+        "Device_LLDP",
+        "Device_LLDP_Detail",
+        "Device_Network_Instances",
+    ),
+    "config-only": (),
+    "full": tuple(NAPALM_GETTERS),
+}
+DEFAULT_GETTER_PROFILE = "full"
+NOT_IMPLEMENTED = {"Not_Implemented": "Not_Implemented"}
+GETTER_TIMEOUT = 60.0
+CONFIG_TIMEOUT = 180.0
+
+_getter_timeouts = (GETTER_TIMEOUT, CONFIG_TIMEOUT)
+_getter_timeouts_lock = threading.Lock()
+_getter_consumer = None
+_getter_consumer_lock = threading.Lock()
+
+
+class GetterTimeout(Exception):
+    """
+    A getter or config pull did not finish before its deadline
+    """
+
+
+def set_getter_timeouts(getter_timeout=None, config_timeout=None):
+    """
+    Sets the deadlines used for the getters and config pulls from now on
+    Args:
+        getter_timeout (float|None) : most seconds for one getter.  Unchanged if None
+        config_timeout (float|None) : most seconds for one config pull.  Unchanged if None
+    Return:
+        tuple : the (getter_timeout, config_timeout) that were being used before
+    """
+    global _getter_timeouts
+    for item in [getter_timeout, config_timeout]:
+        if item is None:
+            continue
+        if not isinstance(item, (int, float)) or isinstance(item, bool):
+            raise TypeError(f"{item} is not a number of seconds.  It is a {type(item).__name__}")
+        if item <= 0:
+            raise ValueError(f"Timeouts need to be more than 0 seconds.  It was {item}")
+    with _getter_timeouts_lock:
+        previous_timeouts = _getter_timeouts
+        _getter_timeouts = (
+            previous_timeouts[0] if getter_timeout is None else float(getter_timeout),
+            previous_timeouts[1] if config_timeout is None else float(config_timeout),
+        )
+    return previous_timeouts
+
+
+def get_getter_timeouts():
+    """
+    Return:
+        tuple : (getter_timeout, config_timeout) in seconds
+    """
+    return _getter_timeouts
+
+
+def call_with_deadline(function, timeout, *args, **kwargs):
+    """
+    Runs a function on a helper thread and waits at most timeout seconds for it.  The thread is a daemon so a call
+    that never comes back does not keep the program open
+    Args:
+        function (callable) : what to call
+        timeout (float) : most seconds to wait
+    Return:
+        what the function returned.  Its exception is raised if it raised one and GetterTimeout if it ran out of time
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args, **kwargs))
+        except BaseException as ex:
+            future.set_exception(ex)
+
+    threading.Thread(target=run, name="getter", daemon=True).start()
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        raise GetterTimeout(f"Did not finish in {timeout} seconds") from None
+
+
+def set_getter_consumer(consumer):
+    """
+    Sets what get_config_napalm hands the getters of each device to while the device is connected
+    Args:
+        consumer (callable|None) : called as consumer(address, getters) with the LazyGetters.  Nothing is called
+            if None
+    Return:
+        callable|None : the consumer that was being used before
+    """
+    global _getter_consumer
+    if consumer is not None and not callable(consumer):
+        raise TypeError(f"{consumer} is not callable.  It is a {type(consumer).__name__}")
+    with _getter_consumer_lock:
+        previous_consumer = _getter_consumer
+        _getter_consumer = consumer
+    return previous_consumer
+
+
+def get_getter_consumer():
+    """
+    Return:
+        callable|None : the consumer being used
+    """
+    return _getter_consumer
+
+
+def check_getter_profile(profile):
+    """
+    Args:
+        profile (str|None) : name of a getter profile.  None is the default profile
+    Return:
+        str : the profile name
+    """
+    if profile is None or profile == "":
+        return DEFAULT_GETTER_PROFILE
+    if not isinstance(profile, str):
+        raise TypeError(f"The getter profile needs to be a string.  It was a {type(profile).__name__}")
+    if profile not in GETTER_PROFILES:
+        raise ValueError(
+            f"{profile} is not a getter profile.  Use one of {', '.join(GETTER_PROFILES)}"
+        )
+    return profile
+
+
+class LazyGetters(collections.abc.Mapping):
+    """
+    Results of the napalm getters for one device.  The profile's getters are fetched when it is made.  Any other
+    getter is fetched the first time its key is looked up, while the device is still open
+
+    Only getters that were fetched without an error are iterated over, so turning it into a dict never calls one
+
+    Attributes:
+        .errors = key to {"Error_Type", "Message", "Timed_Out", "Seconds"} for each call that failed
+        .timings = key to seconds each call took, failed or not
+
+    Methods:
+        .call() : run any device call under the deadline, like the config pulls
+        .fetched() : dict of the getters fetched so far
+        .close() : stop fetching, the device connection is closed
+    """
+
+    def __init__(self, device, profile=DEFAULT_GETTER_PROFILE, timeout=None, reconnect=None):
+        """
+        Args:
+            device : open napalm driver
+            profile (str) : name of the getter profile to fetch now
+            timeout (float|None) : most seconds for one getter.  The value from set_getter_timeouts if None
+            reconnect (callable|None) : reopens the connection after a call timed out.  No more calls are made
+                after a time out if None
+        """
+        self.profile = check_getter_profile(profile)
+        self.timeout = get_getter_timeouts()[0] if timeout is None else timeout
+        self.errors = {}
+        self.timings = {}
+        self._device = device
+        self._reconnect = reconnect
+        self._results = {}
+        self._closed = False
+        for key in GETTER_PROFILES[self.profile]:
+            self.get(key)
+
+    @property
+    def connected(self):
+        return self._device is not None
+
+    def call(self, key, function, *args, timeout=None, **kwargs):
+        """
+        Runs one call to the device under its deadline and keeps how long it took.  A failure is kept in .errors
+        Args:
+            key (str) : name the timing and error are kept under
+            function (callable) : the call, like device.get_config
+            timeout (float|None) : most seconds to wait.  The getter timeout if None
+        Return:
+            tuple : (True, result) or (False, None) if it failed, timed out or the device is not connected
+        """
+        if self._device is None:
+            self.errors[key] = {
+                "Error_Type": "NotConnected",
+                "Message": "The connection was lost before this was asked for",
+                "Timed_Out": False,
+                "Seconds": 0.0,
+            }
+            return (False, None)
+        timeout = self.timeout if timeout is None else timeout
+        start_time = time.monotonic()
+        try:
+            result = call_with_deadline(function, timeout, *args, **kwargs)
+        except NotImplementedError:
+            self.timings[key] = round(time.monotonic() - start_time, 3)
+            raise
+        except Exception as ex:
+            seconds = round(time.monotonic() - start_time, 3)
+            self.timings[key] = seconds
+            timed_out = isinstance(ex, GetterTimeout)
+            self.errors[key] = {
+                "Error_Type": type(ex).__name__,
+                "Message": str(ex),
+                "Timed_Out": timed_out,
+                "Seconds": seconds,
+            }
+            print(f"{key} failed with {type(ex).__name__}: {ex}")
+            if timed_out:
+                self._after_timeout()
+            return (False, None)
+        self.timings[key] = round(time.monotonic() - start_time, 3)
+        return (True, result)
+
+    def _after_timeout(self):
+        # The timed out call can still be reading from the connection so it is not used again as is
+        if self._reconnect is None:
+            self._device = None
+            return
+        try:
+            self._reconnect()
+        except Exception as ex:
+            print(f"Could not reconnect after a time out.  {type(ex).__name__}: {ex}")
+            self._device = None
+
+    def __getitem__(self, key):
+        if key in self._results:
+            return self._results[key]
+        if key not in NAPALM_GETTERS or key in self.errors or self._closed:
+            raise KeyError(key)
+        try:
+            succeeded, result = self.call(key, getattr(self._device, NAPALM_GETTERS[key], None))
+        except NotImplementedError:
+            succeeded, result = True, dict(NOT_IMPLEMENTED)
+        if not succeeded:
+            raise KeyError(key)
+        self._results[key] = result
+        return result
+
+    def __contains__(self, key):
+        # Asking if a getter was fetched does not fetch it
+        return key in self._results
+
+    def __iter__(self):
+        return iter(list(self._results))
+
+    def __len__(self):
+        return len(self._results)
+
+    def fetched(self):
+        """
+        Return:
+            dict : key to result for every getter fetched so far
+        """
+        return dict(self._results)
+
+    def close(self):
+        self._closed = True
+        self._device = None
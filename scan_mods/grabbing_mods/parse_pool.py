@@ -0,0 +1,222 @@
+#!python
+
+"""
+Parses command output in other processes so the SSH session is not held while the CPU works.
+
+device_info_getter used to parse each output on the thread that held the device connection, so a big show
+interfaces or show ip route kept the session open while TextFSM ran.  With a ParsePool set, device_info_getter
+only sends the commands and keeps the raw output.  Each output is sent to the pool and a PendingParse is kept in
+its place, the session is closed, and resolve_parse_results swaps in the parsed rows once the pool has them.
+The grab scheduler lets the next device log in while the parses finish, so how many devices are logged into and
+how fast output is parsed do not hold each other up.
+
+Small outputs parse faster than they can be sent to another process, so they are still parsed right away.  Each
+worker loads its own template registry once when it starts
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.grabbing_mods.template_registry import (
+    get_template_registry,
+    parse_command_output,
+)
+from scan_mods.search_index import index_artifact, render_command_output
+
+import textfsm
+
+
+# Outputs shorter than this are parsed on the spot
+PARSE_INLINE_SIZE = 4096
+PARSE_TIMEOUT = 300.0
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    get_template_registry()
+
+
+def _parse_worker(platform, command, output):
+    return parse_command_output(platform, command, output)
+
+
+class PendingParse:
+    """
+    Output of a command that is being parsed by the pool
+    """
+
+    __slots__ = ("result", "platform", "command", "output")
+
+    def __init__(self, result, platform, command, output):
+        self.result = result
+        self.platform = platform
+        self.command = command
+        self.output = output
+
+    def get(self, timeout=PARSE_TIMEOUT):
+        """
+        Waits for the parsed rows.  If the pool could not parse it, it is parsed here
+        Args:
+            timeout (float) : most seconds to wait for the pool
+        Return:
+            list|str : parsed rows or the output if it could not be parsed
+        """
+        try:
+            return self.result.get(timeout)
+        except textfsm.parser.TextFSMError:
+            raise
+        except Exception as ex:
+            print(f"The parse pool failed on {self.command} ({type(ex).__name__}).  Parsing it here")
+            return parse_command_output(self.platform, self.command, self.output)
+
+
+class ParsePool:
+    """
+    Process pool for parsing command output
+
+    Methods:
+        .parse() : parsed rows, or a PendingParse for big outputs
+        .close() : wait for the parses and stop the workers
+    """
+
+    def __init__(self, processes=None, inline_size=PARSE_INLINE_SIZE):
+        """
+        Args:
+            processes (int|None) : number of processes.  One per CPU if None
+            inline_size (int) : outputs shorter than this are parsed on the spot
+        """
+        if processes is not None and (not isinstance(processes, int) or processes < 1):
+            raise ValueError(f"processes needs to be an int of 1 or more.  It was {processes}")
+        self.processes = processes or os.cpu_count() or 1
+        self.inline_size = inline_size
+        self.submitted = 0
+        # The workers are started here, before the grab threads, and load the templates once each
+        self._pool = multiprocessing.Pool(self.processes, initializer=_init_worker)
+
+    def parse(self, platform, command, output):
+        """
+        Args:
+            platform (str) : NTC platform like cisco_ios
+            command (str) : command that was sent
+            output (str) : output of the command
+        Return:
+            list|str|PendingParse : parsed rows or the output, or a PendingParse if it went to the pool
+        """
+        if not isinstance(output, str) or len(output) < self.inline_size:
+            return parse_command_output(platform, command, output)
+        self.submitted += 1
+        return PendingParse(
+            self._pool.apply_async(_parse_worker, (platform, command, output)),
+            platform,
+            command,
+            output,
+        )
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.terminate()
+            self._pool.join()
+
+
+def set_parse_pool(parse_pool):
+    """
+    Sets the pool the command output is parsed with from now on
+    Args:
+        parse_pool (ParsePool|None) : pool to use.  Output is parsed on the spot if None
+    Return:
+        ParsePool|None : the pool that was being used before
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        previous_pool = _parse_pool
+        _parse_pool = parse_pool
+    return previous_pool
+
+
+def get_parse_pool():
+    """
+    Return:
+        ParsePool|None : the pool being used
+    """
+    return _parse_pool
+
+
+def parse_output(platform, command, output):
+    """
+    Parses with the pool if one is set and on the spot if not
+    Args:
+        platform (str) : NTC platform like cisco_ios
+        command (str) : command that was sent
+        output (str) : output of the command
+    Return:
+        list|str|PendingParse : parsed rows or the output, or a PendingParse if it went to the pool
+    """
+    parse_pool = _parse_pool
+    if parse_pool is None:
+        return parse_command_output(platform, command, output)
+    return parse_pool.parse(platform, command, output)
+
+
+def has_pending_parses(device_info):
+    """
+    Args:
+        device_info (dict|None) : device_info of a FoundDevice
+    Return:
+        bool : True if any show output is still being parsed
+    """
+    show_info = _show_info(device_info)
+    return any(isinstance(value, PendingParse) for value in show_info.values())
+
+
+def resolve_parse_results(device_info, address=None):
+    """
+    Waits for the show output of a device that is still being parsed and puts the parsed rows in its place.  An
+    output the template rejected is dropped like one the device rejected.  Resolved output goes to the search index
+    Args:
+        device_info (dict|None) : device_info of a FoundDevice
+        address (str|None) : IP of the device for the search index
+    Return:
+        int : number of outputs that were waited for
+    """
+    show_info = _show_info(device_info)
+    resolved = 0
+    for command_key, value in list(show_info.items()):
+        if not isinstance(value, PendingParse):
+            continue
+        resolved += 1
+        try:
+            output = value.get()
+        except textfsm.parser.TextFSMError:
+            del show_info[command_key]
+            continue
+        show_info[command_key] = output
+        if address is not None:
+            index_artifact(address, command_key, render_command_output(output))
+    return resolved
+
+
+def _show_info(device_info):
+    if not isinstance(device_info, dict):
+        return {}
+    config = device_info.get("CONFIG")
+    if not isinstance(config, dict) or not isinstance(config.get("Show_Info"), dict):
+        return {}
+    return config["Show_Info"]
@@ -0,0 +1,251 @@
+#!python
+
+"""
+One SSH login per device, shared by every stage of the grab.
+
+A device used to be logged into three times: paramiko in get_device_type, napalm in get_config_napalm and netmiko
+in device_info_getter.  Each login is a key exchange plus the AAA (TACACS/RADIUS) round trips.  DeviceSession
+logs in once and hands the same connection to each stage
+    detection         : exec_command channels and an ExpectShell on the one paramiko transport
+    netmiko           : a netmiko connection built on the ExpectShell's channel instead of its own login.  Another
+                        device type gets its own connection on a new shell channel of the same login
+    napalm            : the ios and nxos_ssh drivers are netmiko based, so the shared netmiko connection is given to
+                        them as driver.device in place of the one open() would make
+Other napalm drivers (eos uses eAPI, junos NETCONF, iosxr its own XML agent) can not use an SSH shell, so they
+still open their own connection
+"""
+
+import contextlib
+import os
+import re
+import sys
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.grabbing_mods.channel_reader import ExpectShell
+import napalm
+import netmiko
+import paramiko
+
+
+# napalm drivers that run over a netmiko connection and the netmiko device type they open it with
+SHARED_NAPALM_DRIVERS = {"ios": "cisco_ios", "nxos_ssh": "cisco_nxos"}
+TERMINAL_WIDTH = 511
+TERMINAL_HEIGHT = 1000
+# netmiko releases whose private _try_session_preparation() is known to be callable with no arguments
+PRIVATE_PREPARATION_VERSIONS = ((3, 0), (5, 0))
+NETMIKO_VERSION = tuple(
+    int(part) for part in re.match(r"(\d+)\.(\d+)", netmiko.__version__).groups()
+)
+
+
+def prepare_session(connection):
+    """
+    Runs what netmiko does after its login (finding the prompt, turning off paging) on a connection that was
+    handed a channel that is already logged in.  netmiko has no public call that also handles a failed
+    preparation, so its private one is only used on the releases it is known to work on
+    Args:
+        connection : netmiko connection with remote_conn set
+    Return:
+        None
+    """
+    lowest_version, highest_version = PRIVATE_PREPARATION_VERSIONS
+    if lowest_version <= NETMIKO_VERSION < highest_version and hasattr(
+        connection, "_try_session_preparation"
+    ):
+        connection._try_session_preparation()
+    else:
+        connection.session_preparation()
+
+
+class DeviceSession:
+    """
+    The one SSH login to a device
+
+    Attributes:
+        .logins = number of times the device was logged into.  1 once it is open
+
+    Methods:
+        .client : the connected paramiko SSHClient
+        .shell() : ExpectShell on the session, in enable mode if there is an enable password
+        .netmiko() : netmiko connection on the same shell
+        .napalm_device() : napalm driver using the same connection when it can
+        .close() : log out
+    """
+
+    def __init__(self, address, port, username, password, enable_password=None, timeout=30):
+        for item in [address, username, password]:
+            if not isinstance(item, str):
+                raise TypeError(f"{item} is not a string.  It is a {type(item).__name__}")
+        if enable_password is not None and not isinstance(enable_password, str):
+            raise TypeError(
+                f"{enable_password} is not a string.  It is a {type(enable_password).__name__}"
+            )
+        self.address = address
+        self.port = port
+        self.username = username
+        self.password = password
+        self.enable_password = enable_password
+        self.timeout = timeout
+        self.logins = 0
+        self._client = None
+        self._shell = None
+        self._netmiko = {}
+
+    @property
+    def client(self):
+        """
+        Return:
+            paramiko.SSHClient : the client, logged in the first time it is asked for
+        """
+        if self._client is None:
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            print(f"Attempting connection to {self.address}")
+            # to work for Cisco added in the look_for_keys and allow_agent parameters
+            client.connect(
+                self.address,
+                self.port,
+                self.username,
+                self.password,
+                look_for_keys=False,
+                allow_agent=False,
+                timeout=self.timeout,
+            )
+            self.logins += 1
+            self._client = client
+        return self._client
+
+    def shell(self):
+        """
+        Return:
+            ExpectShell : interactive shell on the session.  It is opened once and goes to enable mode if there is
+                an enable password
+        """
+        if self._shell is None:
+            channel = self.client.invoke_shell(
+                term="vt100", width=TERMINAL_WIDTH, height=TERMINAL_HEIGHT
+            )
+            self._shell = ExpectShell(channel, self.timeout)
+            if self.enable_password is not None and not self._shell.enable(self.enable_password):
+                print(f"Could not get to enable mode on {self.address}.  The prompt is {self._shell.prompt}")
+        return self._shell
+
+    def netmiko(self, device_type="cisco_ios"):
+        """
+        Builds a netmiko connection on the session instead of logging in again.  There is one connection for each
+        device type.  The first uses the session's shell and the others get a new shell channel on the same login
+        Args:
+            device_type (str) : netmiko device type like cisco_ios
+        Return:
+            netmiko connection
+        """
+        connection = self._netmiko.get(device_type)
+        if connection is None:
+            if self._netmiko:
+                channel = self.client.invoke_shell(
+                    term="vt100", width=TERMINAL_WIDTH, height=TERMINAL_HEIGHT
+                )
+            else:
+                channel = self.shell().channel
+            connection_parameters = {
+                "device_type": device_type,
+                "host": self.address,
+                "username": self.username,
+                "password": self.password,
+                "port": self.port,
+                "timeout": self.timeout,
+                "auto_connect": False,
+            }
+            if self.enable_password is not None:
+                connection_parameters["secret"] = self.enable_password
+            connection = netmiko.ConnectHandler(**connection_parameters)
+            # What establish_connection would have done, with the channel that is already logged in
+            connection.remote_conn_pre = self.client
+            connection.remote_conn = channel
+            connection.remote_conn.settimeout(connection.blocking_timeout)
+            prepare_session(connection)
+            if self.enable_password is not None and not connection.check_enable_mode():
+                connection.enable()
+            self._netmiko[device_type] = connection
+        return connection
+
+    @contextlib.contextmanager
+    def napalm_device(self, dev_driver, optional_args=None):
+        """
+        Context manager for a napalm driver.  ios and nxos_ssh use the session's netmiko connection and are not
+        closed on exit, the session is.  Other drivers, or a shared connection that could not be made, open and
+        close their own connection
+        Args:
+            dev_driver (str) : napalm driver
+            optional_args (dict|None) : napalm optional_args
+        Return:
+            napalm driver that is open
+        """
+        device_driver = napalm.get_network_driver(dev_driver)
+        connection = None
+        if dev_driver in SHARED_NAPALM_DRIVERS:
+            try:
+                connection = self.netmiko(SHARED_NAPALM_DRIVERS[dev_driver])
+            except Exception as ex:
+                print(
+                    f"Could not use the open session to {self.address} ({type(ex).__name__}).  napalm will log in again"
+                )
+        if connection is None:
+            with device_driver(
+                self.address, self.username, self.password, optional_args=optional_args
+            ) as device:
+                yield device
+            return
+        device = device_driver(
+            self.address, self.username, self.password, optional_args=optional_args
+        )
+        # What the driver's open() sets, without its own login
+        device.device = connection
+        yield device
+
+    def reconnect_napalm(self, device, dev_driver):
+        """
+        Gives a napalm driver a new connection after a call on the old one timed out.  A driver on the shared
+        connection gets a new shared connection, so the later stages do not use the one that is still busy
+        Args:
+            device : napalm driver from napalm_device
+            dev_driver (str) : napalm driver name
+        Return:
+            None
+        """
+        print(f"Reconnecting to {self.address}")
+        for device_type, connection in self._netmiko.items():
+            if getattr(device, "device", None) is connection:
+                self.close()
+                device.device = self.netmiko(device_type)
+                return
+        try:
+            device.close()
+        except Exception as ex:
+            print(f"Closing the napalm connection to {self.address} failed with {type(ex).__name__}")
+        device.open()
+
+    def close(self):
+        """
+        Logs out of the device
+        """
+        for connection in self._netmiko.values():
+            try:
+                connection.disconnect()
+            except Exception as ex:
+                print(f"Closing the netmiko connection to {self.address} failed with {type(ex).__name__}")
+        self._netmiko = {}
+        self._shell = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,283 @@
+#!python
+
+"""
+The NTC templates, loaded once per process.
+
+send_command(use_textfsm=True) builds a CliTable for every command.  It looks up the templates directory, goes
+through every row of the index to find the template, and reads and compiles the TextFSM template again.  The
+TemplateRegistry does each of those once
+    index     : the ntc-templates index file is read once into platform -> rows, and a (platform, command) lookup
+                is remembered so later devices do not go through the rows again
+    templates : each TextFSM template is compiled the first time it is used and the one compiled template is
+                shared by every device and thread.  A TextFSM object keeps state while it parses, so each template
+                has a lock and is reset before each parse
+Commands with more than one template (cisco_ios show module) are merged on their Key values like CliTable does.
+template_commands lists the templates directory of the registry, so the commands picked for a device are the ones
+that have a template to parse them with.
+Parsed rows are dicts with lower case keys like netmiko returns, and the raw output is returned when there is no
+template or nothing was parsed
+"""
+
+import collections
+import functools
+import os
+import sys
+import threading
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+import textfsm
+from textfsm import clitable, texttable
+from netmiko.utilities import get_template_dir
+
+
+INDEX_FILE_NAME = "index"
+TEMPLATE_EXTENSION = ".textfsm"
+NTC_TEMPLATES_PATH = os.path.join("NTC_Templates", "ntc-templates", "ntc_templates", "templates")
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def find_template_directory():
+    """
+    Looks in the working directory and then each directory above it for NTC_Templates
+    Return:
+        str : path of the ntc-templates templates directory
+    """
+    path = os.getcwd()
+    while True:
+        if "NTC_Templates" in os.listdir(path):
+            return os.path.join(path, NTC_TEMPLATES_PATH)
+        parent_path = os.path.dirname(path)
+        if parent_path == path:
+            raise FileNotFoundError(
+                f"Could not find NTC_Templates in {os.getcwd()} or any directory above it"
+            )
+        path = parent_path
+
+
+def parser_template_directory():
+    """
+    The templates netmiko parsed with when asked to use TextFSM, so the parsed output does not change.  That is
+    NET_TEXTFSM or the pip installed ntc-templates, and the NTC_Templates of the repo if neither is there
+    Return:
+        str : path of the templates directory
+    """
+    try:
+        return get_template_dir()
+    except ValueError:
+        return find_template_directory()
+
+
+@functools.lru_cache(maxsize=None)
+def _template_file_names(template_directory):
+    return tuple(
+        sorted(name for name in os.listdir(template_directory) if name.endswith(TEMPLATE_EXTENSION))
+    )
+
+
+def template_commands(platform, template_directory=None):
+    """
+    Lists the directory once per process
+    Args:
+        platform (str) : NTC platform like cisco_ios
+        template_directory (str|None) : templates directory.  The one the template registry parses with if None
+    Return:
+        list : command names from the template file names, like show_ip_route
+    """
+    if template_directory is None:
+        template_directory = get_template_registry().template_directory
+    prefix = f"{platform}_"
+    return [
+        name[len(prefix) : -len(TEMPLATE_EXTENSION)]
+        for name in _template_file_names(template_directory)
+        if name.startswith(prefix)
+    ]
+
+
+class CompiledTemplate:
+    """
+    One TextFSM template compiled once and shared.  parse() holds the lock since TextFSM keeps state
+    """
+
+    __slots__ = ("name", "fsm", "keys", "lock")
+
+    def __init__(self, name, template_location):
+        self.name = name
+        with open(template_location) as template_file:
+            self.fsm = textfsm.TextFSM(template_file)
+        self.keys = set(self.fsm.GetValuesByAttrib("Key"))
+        self.lock = threading.Lock()
+
+    def parse(self, output):
+        """
+        Args:
+            output (str) : output of the command
+        Return:
+            texttable.TextTable : table of the values found
+        """
+        table = texttable.TextTable()
+        with self.lock:
+            self.fsm.Reset()
+            records = self.fsm.ParseText(output)
+            table.header = list(self.fsm.header)
+        for record in records:
+            table.Append(record)
+        return table
+
+
+class TemplateRegistry:
+    """
+    Index of the NTC templates by platform and command with the compiled templates
+
+    Methods:
+        .commands() : template command names for a platform
+        .lookup() : template names for a platform and command
+        .template() : the compiled template
+        .parse() : parse command output into a list of dicts
+    """
+
+    def __init__(self, template_directory=None):
+        """
+        Args:
+            template_directory (str|None) : directory with the templates and index file.  The one netmiko uses if
+                None
+        """
+        if template_directory is None:
+            template_directory = parser_template_directory()
+        self.template_directory = template_directory
+        # The IndexTable turns sh[[ow]] ver[[sion]] in the index into regexes
+        index = clitable.CliTable(INDEX_FILE_NAME, template_directory).index
+        self._platform_rows = collections.defaultdict(list)
+        for compiled_row in index.compiled:
+            row = index.index[compiled_row.row]
+            self._platform_rows[row["Platform"]].append(
+                (compiled_row["Command"], tuple(row["Template"].split(":")))
+            )
+        self._lookups = {}
+        self._lookups_lock = threading.Lock()
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def commands(self, platform):
+        """
+        Args:
+            platform (str) : NTC platform like cisco_ios
+        Return:
+            list : command names from the template file names, like show_ip_route
+        """
+        return template_commands(platform, self.template_directory)
+
+    def lookup(self, platform, command):
+        """
+        Args:
+            platform (str) : NTC platform like cisco_ios
+            command (str) : command as it was sent like show ip int brief
+        Return:
+            tuple : template names for the command.  Empty if there is none
+        """
+        command = " ".join(command.split())
+        lookup_key = (platform, command)
+        templates = self._lookups.get(lookup_key)
+        if templates is None:
+            with self._lookups_lock:
+                templates = self._lookups.get(lookup_key)
+                if templates is None:
+                    templates = ()
+                    for command_pattern, row_templates in self._platform_rows.get(platform, ()):
+                        if command_pattern.match(command):
+                            templates = row_templates
+                            break
+                    self._lookups[lookup_key] = templates
+        return templates
+
+    def template(self, template_name):
+        """
+        Args:
+            template_name (str) : file name of the template
+        Return:
+            CompiledTemplate : the template, compiled the first time it is asked for
+        """
+        template = self._templates.get(template_name)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(template_name)
+                if template is None:
+                    template = CompiledTemplate(
+                        template_name, os.path.join(self.template_directory, template_name)
+                    )
+                    self._templates[template_name] = template
+        return template
+
+    def parse(self, platform, command, output):
+        """
+        Args:
+            platform (str) : NTC platform like cisco_ios
+            command (str) : command that was sent
+            output (str) : output of the command
+        Return:
+            list|str : list of dicts with lower case keys, or the output if there is no template or nothing was found
+        """
+        if not isinstance(output, str):
+            return output
+        template_names = self.lookup(platform, command)
+        if not template_names:
+            return output
+        table = None
+        keys = set()
+        for template_name in template_names:
+            template = self.template(template_name)
+            item_table = template.parse(output)
+            if table is None:
+                table = item_table
+                keys = template.keys
+            else:
+                # Columns from the other templates are added to the rows with the same key values
+                table.extend(item_table, keys)
+        header = [column.lower() for column in table.header]
+        parsed_rows = [dict(zip(header, row.values)) for row in table]
+        return parsed_rows if parsed_rows else output
+
+
+def get_template_registry():
+    """
+    Return:
+        TemplateRegistry : the registry of this process, loaded the first time it is asked for
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TemplateRegistry()
+    return _registry
+
+
+def set_template_registry(registry):
+    """
+    Sets the registry used from now on
+    Args:
+        registry (TemplateRegistry|None) : registry to use.  None loads it again the next time it is asked for
+    Return:
+        TemplateRegistry|None : the registry that was being used before
+    """
+    global _registry
+    with _registry_lock:
+        previous_registry = _registry
+        _registry = registry
+    return previous_registry
+
+
+def parse_command_output(platform, command, output):
+    """
+    Args:
+        platform (str) : NTC platform like cisco_ios
+        command (str) : command that was sent
+        output (str) : output of the command
+    Return:
+        list|str : parsed rows or the output if it could not be parsed
+    """
+    return get_template_registry().parse(platform, command, output)
@@ -0,0 +1,187 @@
+#!python
+
+"""
+Raw transcripts of the commands sent to each device, so the output can be parsed again without logging in.
+
+While a TranscriptRecorder is set with set_transcript_recorder, device_info_getter and get_device_type hand every
+command they send to record_transcript with the raw output, the time it was read and the prompt of the device.
+The SQLiteSink takes the transcripts of each device as it is written and saves them to the transcripts table of
+the run store.
+
+reparse_transcripts runs the NTC templates over saved transcripts again in a process pool.  When a template is
+fixed or added, networkscanner reparse shows what it now parses from a run that is already saved, and can write
+the new rows back, without touching the network.  It also times the parsing so templates can be benchmarked
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.grabbing_mods.template_registry import (
+    get_template_registry,
+    parse_command_output,
+)
+
+import textfsm
+
+
+# Transcripts sent to each worker at a time
+REPARSE_CHUNK_SIZE = 16
+
+_transcript_recorder = None
+_transcript_recorder_lock = threading.Lock()
+
+
+class TranscriptRecorder:
+    """
+    Keeps the transcripts of each device until the device is written out
+
+    Methods:
+        .record() : add a command that was sent to a device
+        .take() : the transcripts of a device, which are then dropped from the recorder
+    """
+
+    def __init__(self):
+        self.recorded = 0
+        self._transcripts = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, address, source, command, output, platform=None, command_key=None, prompt=None
+    ):
+        """
+        Args:
+            address (str) : IP of the device
+            source (str) : what sent the command, netmiko or paramiko
+            command (str) : command that was sent
+            output (str) : raw output of the command
+            platform (str|None) : NTC platform the output is parsed with, like cisco_ios
+            command_key (str|None) : key of the command in Show_Info, like show_version
+            prompt (str|None) : prompt of the device
+        Return:
+            None
+        """
+        transcript = {
+            "source": source,
+            "platform": platform,
+            "command_key": command_key,
+            "command": command,
+            "recorded": time.time(),
+            "prompt": prompt if isinstance(prompt, str) else None,
+            "output": output,
+        }
+        with self._lock:
+            self._transcripts.setdefault(address, []).append(transcript)
+            self.recorded += 1
+
+    def take(self, address):
+        """
+        Args:
+            address (str) : IP of the device
+        Return:
+            list : transcripts of the device in the order the commands were sent
+        """
+        with self._lock:
+            return self._transcripts.pop(address, [])
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(transcripts) for transcripts in self._transcripts.values())
+
+
+def set_transcript_recorder(recorder):
+    """
+    Sets the recorder the commands are recorded to from now on
+    Args:
+        recorder (TranscriptRecorder|None) : recorder to use.  Nothing is recorded if None
+    Return:
+        TranscriptRecorder|None : the recorder that was being used before
+    """
+    global _transcript_recorder
+    with _transcript_recorder_lock:
+        previous_recorder = _transcript_recorder
+        _transcript_recorder = recorder
+    return previous_recorder
+
+
+def get_transcript_recorder():
+    """
+    Return:
+        TranscriptRecorder|None : the recorder being used
+    """
+    return _transcript_recorder
+
+
+def record_transcript(address, source, command, output, platform=None, command_key=None, prompt=None):
+    """
+    Records a command to the recorder if one is set and does nothing if not.  Takes the same arguments as
+    TranscriptRecorder.record
+    """
+    recorder = _transcript_recorder
+    if recorder is None or not isinstance(output, str):
+        return
+    recorder.record(address, source, command, output, platform, command_key, prompt)
+
+
+def take_transcripts(address):
+    """
+    Args:
+        address (str) : IP of the device
+    Return:
+        list : transcripts of the device from the recorder being used.  Empty if there is no recorder
+    """
+    recorder = _transcript_recorder
+    if recorder is None:
+        return []
+    return recorder.take(address)
+
+
+def _init_worker():
+    get_template_registry()
+
+
+def _reparse_worker(transcript):
+    start_time = time.perf_counter()
+    try:
+        parsed = parse_command_output(
+            transcript["platform"], transcript["command"], transcript["output"]
+        )
+    except textfsm.parser.TextFSMError as ex:
+        parsed = None
+        error = str(ex)
+    else:
+        error = None
+    return parsed, error, time.perf_counter() - start_time
+
+
+def reparse_transcripts(transcripts, processes=None):
+    """
+    Parses saved transcripts again with the templates that are there now.  Transcripts without a platform, like
+    the show version of get_device_type, are skipped
+    Args:
+        transcripts (list) : transcript dicts like ResultStore.transcripts returns
+        processes (int|None) : number of processes.  One per CPU if None.  1 parses in this process
+    Return:
+        list : one dict per transcript parsed with the transcript, parsed (rows, or the output if nothing was
+            parsed, or None if the template failed), error and seconds
+    """
+    if processes is not None and (not isinstance(processes, int) or processes < 1):
+        raise ValueError(f"processes needs to be an int of 1 or more.  It was {processes}")
+    transcripts = [transcript for transcript in transcripts if transcript.get("platform")]
+    processes = min(processes or os.cpu_count() or 1, max(len(transcripts), 1))
+    if processes == 1:
+        results = [_reparse_worker(transcript) for transcript in transcripts]
+    else:
+        with multiprocessing.Pool(processes, initializer=_init_worker) as pool:
+            results = pool.map(_reparse_worker, transcripts, chunksize=REPARSE_CHUNK_SIZE)
+    return [
+        {"transcript": transcript, "parsed": parsed, "error": error, "seconds": seconds}
+        for transcript, (parsed, error, seconds) in zip(transcripts, results)
+    ]
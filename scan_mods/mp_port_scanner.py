@@ -216,7 +216,7 @@ def udp_scanner(address_port_domain_name_tuple):
         return (UDP_key, udp_return_dict)
 
 
-def port_scanner(address, domain_name=None):
+def port_scanner(address, domain_name=None, result_callback=None):
     """
     This will scan an address for standard ports to see what is open. If it is open, it will then grab a header if applicable.
     It returns a dictionary of ports and headers to the calling function
@@ -224,6 +224,7 @@ def port_scanner(address, domain_name=None):
     Args:
         address (str) : IPv4 address object to scan
         domain_name (str) : string of the domain name to test with other places like DNS
+        result_callback (callable) : if given, called with {"TCP"|"UDP": {<port>: <header>}} as each port result comes back
 
     Return:
         dict : dictionary of ports and headers that are open on the box
@@ -299,6 +300,8 @@ def port_scanner(address, domain_name=None):
         raise ValueError(f"{address} since it is not an IPv4Address")
     if domain_name is not None and not isinstance(domain_name, str):
         raise TypeError(f"{domain_name} is not a string")
+    if result_callback is not None and not callable(result_callback):
+        raise TypeError(f"{result_callback} is not callable")
     return_dict = {
         "TCP": {},
         "UDP": {},
@@ -312,27 +315,35 @@ def port_scanner(address, domain_name=None):
     for i in range(len(UDP_PORTS)):
         udp_port_to_domain_list.append((address, UDP_PORTS[i], domain_name))
     with multiprocessing.Pool() as pool:
-        tcp_results = pool.map(tcp_scanner, tcp_port_to_domain_list)
-    for result in tcp_results:
-        if len(result) != 2:
-            print(f"\n\n{result}\n\n")
-            raise ValueError("TCP Scanner returned something incorrectly.")
-        if len(result[1]) < 1:
-            scan_output = {"Nothing": "Nothing returned from the server"}
-        else:
-            scan_output = result[1]
-        return_dict["TCP"][result[0][4:]] = scan_output
+        for result in pool.imap_unordered(tcp_scanner, tcp_port_to_domain_list):
+            if len(result) != 2:
+                print(f"\n\n{result}\n\n")
+                raise ValueError("TCP Scanner returned something incorrectly.")
+            if len(result[1]) < 1:
+                scan_output = {"Nothing": "Nothing returned from the server"}
+            else:
+                scan_output = result[1]
+            return_dict["TCP"][result[0][4:]] = scan_output
+            if result_callback is not None:
+                result_callback({"TCP": {result[0][4:]: scan_output}})
     with multiprocessing.Pool() as pool:
-        udp_results = pool.map(udp_scanner, udp_port_to_domain_list)
-    for result in udp_results:
-        if len(result) != 2:
-            print(f"\n\n{result}\n\n")
-            raise ValueError("UDP Scanner returned something incorrectly.")
-        if len(result[1]) < 1:
-            scan_output = {"Nothing": "Nothing returned from the server"}
-        else:
-            scan_output = result[1]
-        return_dict["UDP"][result[0][4:]] = scan_output
+        for result in pool.imap_unordered(udp_scanner, udp_port_to_domain_list):
+            if len(result) != 2:
+                print(f"\n\n{result}\n\n")
+                raise ValueError("UDP Scanner returned something incorrectly.")
+            if len(result[1]) < 1:
+                scan_output = {"Nothing": "Nothing returned from the server"}
+            else:
+                scan_output = result[1]
+            return_dict["UDP"][result[0][4:]] = scan_output
+            if result_callback is not None:
+                result_callback({"UDP": {result[0][4:]: scan_output}})
+    # Results come back as each port finishes, so put the ports back in the order they were scanned
+    for protocol_key in ("TCP", "UDP"):
+        return_dict[protocol_key] = {
+            port_key: return_dict[protocol_key][port_key]
+            for port_key in sorted(return_dict[protocol_key], key=int)
+        }
 
     return return_dict
 
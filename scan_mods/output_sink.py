@@ -0,0 +1,310 @@
+#!python
+
+"""
+Output sinks for the results of a run.
+
+The Output directory is found once per process.  Devices handed to a sink are put on a queue and written by a
+background thread so the scan loop never waits on the disk.
+
+Layouts
+    ndjson      : one compact record per device in Output/Scans/run_<time>.ndjson (default).  With a binary
+                  output format the file is run_<time>.msgpack or run_<time>.cbor instead
+    per-device  : the older Output/Scans/<IP>/<IP>_json_short.txt and <IP>_json_long.txt files
+    both        : both of the above
+    archive     : one packfile, Output/Scans/run_<time>.pack, with the records and config files of every device
+
+When compression is set in scan_mods.compression the run file and the per device files get a .gz or .zst suffix
+and are compressed as they are written
+"""
+
+import os
+import queue
+import threading
+import time
+import sys
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.serializers import get_serializer
+from scan_mods.compression import (
+    compressed_file_name,
+    open_compressed,
+    strip_compression_suffix,
+)
+
+
+OUTPUT_LAYOUTS = ("ndjson", "per-device", "both", "archive")
+# Extensions of the run level files, before any compression suffix
+RUN_FILE_EXTENSIONS = ("ndjson", "msgpack", "cbor", "pack")
+
+_output_root = None
+_output_root_lock = threading.Lock()
+
+
+def find_output_root():
+    """
+    Finds the Output directory by walking up from the current directory.  This is only done the first time,
+    after that the saved path is returned
+    Return:
+        str : absolute path of the Output directory
+    """
+    global _output_root
+    if _output_root is not None:
+        return _output_root
+    with _output_root_lock:
+        if _output_root is None:
+            path = os.getcwd()
+            while "Output" not in os.listdir(path):
+                parent = os.path.dirname(path)
+                if parent == path:
+                    raise FileNotFoundError(
+                        f"Could not find an Output directory above {os.getcwd()}"
+                    )
+                path = parent
+            _output_root = os.path.join(path, "Output")
+    return _output_root
+
+
+def get_scans_directory():
+    """
+    Return:
+        str : path of Output/Scans.  It is created if it does not exist
+    """
+    scans_directory = os.path.join(find_output_root(), "Scans")
+    os.makedirs(scans_directory, exist_ok=True)
+    return scans_directory
+
+
+def find_latest_run(directory=None):
+    """
+    Finds the newest run file, run_<time>.ndjson/.msgpack/.cbor/.pack with or without a .gz or .zst suffix
+    Args:
+        directory (str|None) : directory to look in.  Output/Scans if None
+    Return:
+        str|None : path of the newest run file or None if there are none
+    """
+    if directory is None:
+        directory = get_scans_directory()
+    run_files = []
+    for file_name in os.listdir(directory):
+        plain_name = strip_compression_suffix(file_name)
+        if not plain_name.startswith("run_") or plain_name.rsplit(".", 1)[-1] not in RUN_FILE_EXTENSIONS:
+            continue
+        file_location = os.path.join(directory, file_name)
+        if os.path.isfile(file_location):
+            run_files.append((os.path.getmtime(file_location), file_name, file_location))
+    if not run_files:
+        return None
+    return max(run_files)[2]
+
+
+def get_device_directory(address):
+    """
+    Args:
+        address (str) : IP of the device
+    Return:
+        str : path of Output/Scans/<address>.  It is created if it does not exist
+    """
+    if not isinstance(address, str):
+        raise ValueError(f"{address} needs to be a string and not None")
+    device_directory = os.path.join(find_output_root(), "Scans", address)
+    os.makedirs(device_directory, exist_ok=True)
+    return device_directory
+
+
+class OutputSink:
+    """
+    Base class for the sinks.  Devices are queued by write_device and written by a background thread
+
+    Methods:
+        .write_device() : queue a device to be written.  Never waits on the disk
+        .close() : wait for everything queued to be written and close the sink
+        ._write() : subclasses write one device here.  Runs on the writer thread
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._writer_loop, name=f"{type(self).__name__}-writer", daemon=True
+        )
+        self._thread.start()
+
+    def write_device(self, device):
+        """
+        Queues the device to be written
+        Args:
+            device (FoundDevice) : device that is finished
+        Return:
+            None
+        """
+        if self._closed:
+            raise ValueError(f"{type(self).__name__} is already closed")
+        if self._error is not None:
+            raise self._error
+        self._queue.put(self._prepare(device))
+
+    def _prepare(self, device):
+        """
+        Runs on the calling thread.  Takes what is needed from the device so the writer thread does not share it
+        """
+        return device
+
+    def _writer_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue
+            try:
+                self._write(item)
+            except Exception as ex:
+                self._error = ex
+        try:
+            self._finish()
+        except Exception as ex:
+            if self._error is None:
+                self._error = ex
+
+    def _write(self, item):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+    def close(self):
+        """
+        Waits for all queued devices to be written.  Raises the first error the writer thread hit
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RecordFileSink(OutputSink):
+    """
+    Writes one FoundDevice.to_record() per device to a run level record file in any of the serializers formats
+    """
+
+    def __init__(self, file_location=None, output_format="json"):
+        self.serializer = get_serializer(output_format)
+        if file_location is None:
+            file_location = os.path.join(
+                get_scans_directory(),
+                compressed_file_name(
+                    f"run_{time.strftime('%Y%m%d_%H%M%S')}.{self.serializer.file_extension}"
+                ),
+            )
+        self.file_location = file_location
+        self._output_file = open_compressed(file_location, "wb")
+        super().__init__()
+
+    def _prepare(self, device):
+        return device.to_record()
+
+    def _write(self, record):
+        self.serializer.write_record(self._output_file, record)
+
+    def _finish(self):
+        self._output_file.close()
+
+
+class NDJSONSink(RecordFileSink):
+    """
+    Writes one compact FoundDevice.to_record() per line to a run level NDJSON file
+    """
+
+    def __init__(self, file_location=None):
+        super().__init__(file_location, output_format="json")
+
+
+class PerDeviceFileSink(OutputSink):
+    """
+    Writes <IP>_json_short.txt and <IP>_json_long.txt into Output/Scans/<IP> like the program always has
+    """
+
+    def __init__(self, scans_directory=None):
+        if scans_directory is None:
+            scans_directory = get_scans_directory()
+        self.scans_directory = scans_directory
+        super().__init__()
+
+    def _prepare(self, device):
+        return (device.IP, device.print_json_short(), device.print_json_long())
+
+    def _write(self, item):
+        address, json_short, json_long = item
+        write_directory = os.path.join(self.scans_directory, address)
+        os.makedirs(write_directory, exist_ok=True)
+        for file_name, json_output in (
+            (f"{address}_json_short.txt", json_short),
+            (f"{address}_json_long.txt", json_long),
+        ):
+            file_location = os.path.join(write_directory, compressed_file_name(file_name))
+            with open_compressed(file_location, "wt") as output_file:
+                output_file.write(json_output)
+
+
+class MultiSink:
+    """
+    Hands every device to more than one sink
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def write_device(self, device):
+        for sink in self.sinks:
+            sink.write_device(device)
+
+    def close(self):
+        errors = []
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as ex:
+                errors.append(ex)
+        if errors:
+            raise errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def create_sink(layout="ndjson", output_format="json"):
+    """
+    Creates the sink for an output layout
+    Args:
+        layout (str) : one of OUTPUT_LAYOUTS
+        output_format (str) : format of the run file.  One of serializers.OUTPUT_FORMATS
+    Return:
+        OutputSink|MultiSink : sink to hand the devices to
+    """
+    if layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"{layout} is not an output layout.  Use one of {OUTPUT_LAYOUTS}")
+    if layout == "ndjson":
+        return RecordFileSink(output_format=output_format)
+    if layout == "per-device":
+        return PerDeviceFileSink()
+    if layout == "archive":
+        # packfile builds on this module so it is imported here
+        from scan_mods.packfile import PackfileSink
+
+        return PackfileSink()
+    return MultiSink([RecordFileSink(output_format=output_format), PerDeviceFileSink()])
@@ -0,0 +1,300 @@
+#!python
+
+"""
+Packfile archive for the output of a run.
+
+A packfile is one append-only file per run that holds every scan record and config file of the run.  Entries are
+written one after the other and an index of where each entry starts is written at the end when the pack is closed.
+A reader mmaps the file, reads the index from the end and slices out any entry without unpacking the rest.
+
+Layout
+    b"NSPACK01"
+    entry ...       : <BIQ> codec, name length, data length, then the name (utf-8) and the data
+    index           : JSON {"version": 1, "entries": {name: [data offset, data length, codec]}}
+    trailer         : <QQ> index offset, index length, then b"NSPKIDX1"
+
+Each entry is compressed on its own with the compression set in scan_mods.compression so one entry can still be
+read without the others.
+
+If a run dies before the pack is closed there is no index.  The reader then walks the entry headers from the start,
+so everything written before the crash can still be read
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.output_sink import OutputSink, get_scans_directory
+from scan_mods.artifacts import LOCATION_SEPARATOR, set_artifact_store
+from scan_mods.compression import (
+    CODEC_IDS,
+    CODEC_NAMES,
+    compress,
+    decompress,
+    get_compression,
+)
+
+
+PACK_MAGIC = b"NSPACK01"
+INDEX_MAGIC = b"NSPKIDX1"
+PACK_VERSION = 1
+PACK_FILE_EXTENSION = "pack"
+ENTRY_HEADER = struct.Struct("<BIQ")
+TRAILER = struct.Struct("<QQ")
+RECORD_FILE_NAME = "record.json"
+
+
+def entry_name(address, file_name):
+    """
+    Args:
+        address (str) : IP of the device
+        file_name (str) : name of the file for the device like 192.168.1.1_running.txt
+    Return:
+        str : name of the entry in the pack, <address>/<file_name>
+    """
+    if not isinstance(address, str) or not isinstance(file_name, str):
+        raise TypeError(f"The address and file name need to be strings.  Not {address} and {file_name}")
+    return f"{address}/{file_name}"
+
+
+class PackfileWriter:
+    """
+    Appends entries to a packfile.  Entries can be added from more than one thread
+
+    Methods:
+        .add() : append an entry
+        .write_artifact() : append a file for a device and return where it was put
+        .close() : write the index and trailer
+    """
+
+    def __init__(self, file_location):
+        if not isinstance(file_location, str):
+            raise TypeError(
+                f"{file_location} is not a string.  It is a {type(file_location).__name__}"
+            )
+        self.file_location = file_location
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._output_file = open(file_location, "wb")
+        self._output_file.write(PACK_MAGIC)
+        self._offset = len(PACK_MAGIC)
+        self._closed = False
+
+    def add(self, name, data, compression=None):
+        """
+        Appends an entry.  If the name is already in the pack the newest entry is the one that is read
+        Args:
+            name (str) : name of the entry
+            data (bytes|str) : contents.  str is written as utf-8
+            compression (str|None) : one of compression.COMPRESSIONS.  The current compression if None
+        Return:
+            None
+        """
+        if not isinstance(name, str):
+            raise TypeError(f"{name} is not a string.  It is a {type(name).__name__}")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            raise TypeError(f"The data for {name} needs to be bytes or a string.  Not {type(data).__name__}")
+        if compression is None:
+            compression = get_compression()
+        codec = CODEC_IDS[compression]
+        data = compress(data, compression)
+        encoded_name = name.encode("utf-8")
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"{self.file_location} is already closed")
+            self._output_file.write(ENTRY_HEADER.pack(codec, len(encoded_name), len(data)))
+            self._output_file.write(encoded_name)
+            self._output_file.write(data)
+            data_offset = self._offset + ENTRY_HEADER.size + len(encoded_name)
+            self._entries[name] = [data_offset, len(data), codec]
+            self._offset = data_offset + len(data)
+
+    def write_artifact(self, address, file_name, data):
+        """
+        Appends a file for a device
+        Args:
+            address (str) : IP of the device
+            file_name (str) : file name for the device
+            data (bytes|str) : contents
+        Return:
+            str : location of the entry as <pack path>::<entry name>
+        """
+        name = entry_name(address, file_name)
+        self.add(name, data)
+        return f"{self.file_location}{LOCATION_SEPARATOR}{name}"
+
+    def close(self):
+        """
+        Writes the index and trailer and closes the file
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            index = json.dumps(
+                {"version": PACK_VERSION, "entries": self._entries}, separators=(",", ":")
+            ).encode("utf-8")
+            self._output_file.write(index)
+            self._output_file.write(TRAILER.pack(self._offset, len(index)))
+            self._output_file.write(INDEX_MAGIC)
+            self._output_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PackfileReader:
+    """
+    Random access to the entries of a packfile through mmap
+
+    Methods:
+        .names() : names of every entry
+        .read() : bytes of one entry, decompressed
+        .read_text() : one entry as a string
+        .iter_records() : every scan record in the pack
+    """
+
+    def __init__(self, file_location):
+        if not isinstance(file_location, str):
+            raise TypeError(
+                f"{file_location} is not a string.  It is a {type(file_location).__name__}"
+            )
+        self.file_location = file_location
+        self._input_file = open(file_location, "rb")
+        try:
+            self._map = mmap.mmap(self._input_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._input_file.close()
+            raise ValueError(f"{file_location} is empty.  It is not a packfile")
+        if self._map[: len(PACK_MAGIC)] != PACK_MAGIC:
+            self.close()
+            raise ValueError(f"{file_location} is not a packfile")
+        self.complete = self._map[-len(INDEX_MAGIC) :] == INDEX_MAGIC
+        if self.complete:
+            self._entries = self._read_index()
+        else:
+            print(f"{file_location} was not closed.  Rebuilding the index from the entries")
+            self._entries = self._scan_entries()
+
+    def _read_index(self):
+        trailer_start = len(self._map) - len(INDEX_MAGIC) - TRAILER.size
+        index_offset, index_length = TRAILER.unpack_from(self._map, trailer_start)
+        index = json.loads(self._map[index_offset : index_offset + index_length])
+        if index.get("version") != PACK_VERSION:
+            raise ValueError(
+                f"Packfile version {index.get('version')} is not supported.  Version {PACK_VERSION} is needed"
+            )
+        return {name: tuple(value) for name, value in index["entries"].items()}
+
+    def _scan_entries(self):
+        entries = {}
+        offset = len(PACK_MAGIC)
+        end = len(self._map)
+        while offset + ENTRY_HEADER.size <= end:
+            codec, name_length, data_length = ENTRY_HEADER.unpack_from(self._map, offset)
+            name_start = offset + ENTRY_HEADER.size
+            data_start = name_start + name_length
+            if data_start + data_length > end:
+                # The last entry was only partly written
+                break
+            name = self._map[name_start:data_start].decode("utf-8")
+            entries[name] = (data_start, data_length, codec)
+            offset = data_start + data_length
+        return entries
+
+    def names(self):
+        """
+        Return:
+            list : sorted names of the entries
+        """
+        return sorted(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def read(self, name):
+        """
+        Args:
+            name (str) : name of the entry
+        Return:
+            bytes : contents of the entry
+        """
+        if name not in self._entries:
+            raise KeyError(f"{name} is not in {self.file_location}")
+        data_offset, data_length, codec = self._entries[name]
+        if codec not in CODEC_NAMES:
+            raise ValueError(f"{name} uses codec {codec} which is not known")
+        return decompress(self._map[data_offset : data_offset + data_length], CODEC_NAMES[codec])
+
+    def read_text(self, name):
+        """
+        Args:
+            name (str) : name of the entry
+        Return:
+            str : contents of the entry as a string
+        """
+        return self.read(name).decode("utf-8")
+
+    def iter_records(self):
+        """
+        Return:
+            generator : the scan record of each device in the pack, in address order
+        """
+        for name in self.names():
+            if name.endswith(f"/{RECORD_FILE_NAME}"):
+                yield json.loads(self.read(name))
+
+    def close(self):
+        self._map.close()
+        self._input_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PackfileSink(OutputSink):
+    """
+    Writes the scan record of each device into a packfile.  While the sink is open, config files written through
+    scan_mods.artifacts go into the same pack
+    """
+
+    def __init__(self, file_location=None):
+        if file_location is None:
+            file_location = os.path.join(
+                get_scans_directory(),
+                f"run_{time.strftime('%Y%m%d_%H%M%S')}.{PACK_FILE_EXTENSION}",
+            )
+        self.file_location = file_location
+        self.writer = PackfileWriter(file_location)
+        self._previous_store = set_artifact_store(self.writer)
+        super().__init__()
+
+    def _prepare(self, device):
+        return (device.IP, json.dumps(device.to_record(), separators=(",", ":")))
+
+    def _write(self, item):
+        address, record = item
+        self.writer.add(entry_name(address, RECORD_FILE_NAME), record)
+
+    def _finish(self):
+        set_artifact_store(self._previous_store)
+        self.writer.close()
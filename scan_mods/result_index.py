@@ -0,0 +1,327 @@
+#!python
+
+"""
+Inverted index over the scan results of a run.
+
+It is built while the run is going by adding each FoundDevice as it finishes and is saved next to the other
+outputs.  It maps
+    port (TCP/22)                 -> hosts with the port open
+    service or product (openssh)  -> hosts
+    banner token (cisco, 1.25)    -> hosts
+so questions like "which hosts have TCP 23 open" can be answered without opening every device's JSON file.
+Each run file or pack gets its own index next to it, run_<time>.index.json, so an older run is queried with the
+index of that run
+"""
+
+import json
+import os
+import re
+import time
+
+
+INDEX_VERSION = 1
+INDEX_FILE_NAME = "result_index.json"
+RUN_INDEX_SUFFIX = ".index.json"
+
+# Service names for the ports the port scanner looks at
+SERVICE_NAMES = {
+    20: "ftp-data",
+    21: "ftp",
+    22: "ssh",
+    23: "telnet",
+    25: "smtp",
+    37: "time",
+    43: "whois",
+    53: "dns",
+    67: "dhcp",
+    69: "tftp",
+    79: "finger",
+    80: "http",
+    88: "kerberos",
+    109: "pop2",
+    110: "pop3",
+    115: "sftp",
+    118: "sql",
+    123: "ntp",
+    143: "imap",
+    161: "snmp",
+    162: "snmp-trap",
+    179: "bgp",
+    194: "irc",
+    389: "ldap",
+    443: "https",
+    464: "kerberos-password",
+    465: "smtps",
+    514: "syslog",
+    515: "lpd",
+    530: "rpc",
+    543: "kerberos-login",
+    544: "rtsp",
+    547: "dhcpv6",
+    993: "imaps",
+    995: "pop3s",
+    1080: "socks",
+    3128: "proxy",
+    3306: "mysql",
+    3389: "rdp",
+    5432: "postgresql",
+    5900: "vnc",
+    5938: "teamviewer",
+    8080: "http-alt",
+    8443: "https-alt",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+SSH_BANNER_PATTERN = re.compile(r"^SSH-[\d.]+-(\S+)")
+FTP_BANNER_PATTERN = re.compile(r"^220[ -]\(?([A-Za-z][\w.-]*)[ /]?([\d.]+\w*)?")
+SERVER_HEADER_PATTERN = re.compile(r"^([A-Za-z][\w.-]*)(?:/([\w.-]+))?")
+
+
+def index_location_for_run(run_location):
+    """
+    Args:
+        run_location (str) : run file or pack, or the directory of a run saved with the per device layout
+    Return:
+        str : path of the index of the run.  run_<time>.index.json next to a run file, or result_index.json in
+            the directory
+    """
+    if os.path.isdir(run_location):
+        return os.path.join(run_location, INDEX_FILE_NAME)
+    run_name = os.path.basename(run_location).split(".", 1)[0]
+    return os.path.join(os.path.dirname(run_location), f"{run_name}{RUN_INDEX_SUFFIX}")
+
+
+def tokenize(text):
+    """
+    Splits banner text into lower case tokens.  Dots are kept inside tokens so version numbers stay whole
+    Args:
+        text (str) : text to split
+    Return:
+        list : list of tokens
+    """
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def extract_products(port_number, header):
+    """
+    Works out the service and product names for an open port from its header
+    Args:
+        port_number (int) : port number
+        header (dict) : header returned from the port scanner for the port
+    Return:
+        set : set of lower case service/product names.  Products are given both with and without the version
+    """
+    products = set()
+    if port_number in SERVICE_NAMES:
+        products.add(SERVICE_NAMES[port_number])
+    banner = header.get("Return Information")
+    if isinstance(banner, str):
+        ssh_match = SSH_BANNER_PATTERN.match(banner)
+        ftp_match = FTP_BANNER_PATTERN.match(banner)
+        if ssh_match:
+            products.add("ssh")
+            software = ssh_match.group(1).lower()
+            products.add(software)
+            products.add(re.split(r"[_-]", software)[0])
+        elif ftp_match:
+            products.add("ftp")
+            products.add(ftp_match.group(1).lower())
+            if ftp_match.group(2):
+                products.add(f"{ftp_match.group(1)}/{ftp_match.group(2)}".lower())
+    server = header.get("Server")
+    if isinstance(server, str):
+        server_match = SERVER_HEADER_PATTERN.match(server)
+        if server_match:
+            products.add(server_match.group(1).lower())
+            if server_match.group(2):
+                products.add(server_match.group(0).lower())
+    return products
+
+
+class ResultIndex:
+    """
+    Inverted index of ports, products and banner tokens to hosts
+
+    Attributes:
+        ._hosts = list of host addresses.  Position in the list is the host id used in the postings
+        ._host_ids = dict of host address to host id
+        ._ports = dict of "<protocol>/<port>" to set of host ids with the port open
+        ._products = dict of service/product name to set of host ids
+        ._tokens = dict of banner token to set of host ids
+
+    Methods:
+        .add_device() : adds the open ports of a FoundDevice to the index
+        .query() : returns the hosts that match every criteria given
+        .save() / .load() : write and read the index file
+    """
+
+    def __init__(self):
+        self._hosts = []
+        self._host_ids = {}
+        self._ports = {}
+        self._products = {}
+        self._tokens = {}
+
+    def __len__(self):
+        return len(self._hosts)
+
+    def _host_id(self, address):
+        host_id = self._host_ids.get(address)
+        if host_id is None:
+            host_id = len(self._hosts)
+            self._hosts.append(address)
+            self._host_ids[address] = host_id
+        return host_id
+
+    def add_device(self, device):
+        """
+        Adds a device to the index
+        Args:
+            device (FoundDevice) : device that has been port scanned
+        Return:
+            None
+        """
+        self.add_ports(device.IP, {"TCP": device.open_tcp_ports, "UDP": device.open_udp_ports})
+
+    def add_ports(self, address, open_ports):
+        """
+        Adds the open ports of a host to the index
+        Args:
+            address (str) : IP address of the host
+            open_ports (dict) : {"TCP": {<port>: <header>}, "UDP": {...}} of the open ports only
+        Return:
+            None
+        """
+        if not isinstance(address, str):
+            raise TypeError(f"{address} is not a string.  It is a {type(address).__name__}")
+        if not isinstance(open_ports, dict):
+            raise TypeError(
+                f"{open_ports} is not a dict.  It is a {type(open_ports).__name__}"
+            )
+        host_id = self._host_id(address)
+        for protocol, ports in open_ports.items():
+            for port, header in ports.items():
+                port_number = int(port)
+                self._ports.setdefault(f"{protocol}/{port_number}", set()).add(host_id)
+                for product in extract_products(port_number, header):
+                    self._products.setdefault(product, set()).add(host_id)
+                for value in header.values():
+                    for token in tokenize(value):
+                        self._tokens.setdefault(token, set()).add(host_id)
+
+    def hosts_with_port(self, protocol, port):
+        """
+        Args:
+            protocol (str) : TCP or UDP
+            port (str|int) : port number
+        Return:
+            list : hosts with the port open
+        """
+        return self._to_hosts(self._ports.get(f"{protocol.upper()}/{int(port)}", set()))
+
+    def hosts_with_product(self, product):
+        """
+        Args:
+            product (str) : service or product name like ssh, openssh or openssh_8.2p1
+        Return:
+            list : hosts running the service or product
+        """
+        return self._to_hosts(self._products.get(product.lower(), set()))
+
+    def hosts_with_banner(self, text):
+        """
+        Args:
+            text (str) : text to look for in the banners.  Every token in the text has to be in a banner of the host
+        Return:
+            list : hosts that have all the tokens in their banners
+        """
+        return self._to_hosts(self._banner_ids(text))
+
+    def _banner_ids(self, text):
+        tokens = tokenize(text)
+        if not tokens:
+            return set()
+        postings = sorted((self._tokens.get(token, set()) for token in tokens), key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def query(self, protocol="TCP", port=None, product=None, banner=None):
+        """
+        Returns the hosts that match every criteria given
+        Args:
+            protocol (str) : TCP or UDP for the port
+            port (str|int|None) : port that has to be open
+            product (str|None) : service or product that has to be running
+            banner (str|None) : text that has to be in a banner
+        Return:
+            list : sorted list of the matching hosts
+        """
+        matches = []
+        if port is not None:
+            matches.append(self._ports.get(f"{protocol.upper()}/{int(port)}", set()))
+        if product is not None:
+            matches.append(self._products.get(product.lower(), set()))
+        if banner is not None:
+            matches.append(self._banner_ids(banner))
+        if not matches:
+            raise ValueError("You need to give at least one of port, product or banner")
+        matches.sort(key=len)
+        return self._to_hosts(set(matches[0]).intersection(*matches[1:]))
+
+    def _to_hosts(self, host_ids):
+        return sorted(self._hosts[host_id] for host_id in host_ids)
+
+    def to_dict(self):
+        """
+        Return:
+            dict : the index with the postings written as sorted lists of host ids
+        """
+        return {
+            "version": INDEX_VERSION,
+            "created": time.time(),
+            "hosts": self._hosts,
+            "ports": {key: sorted(value) for key, value in self._ports.items()},
+            "products": {key: sorted(value) for key, value in self._products.items()},
+            "tokens": {key: sorted(value) for key, value in self._tokens.items()},
+        }
+
+    def save(self, file_location):
+        """
+        Writes the index to a file.  It is written to a temp file first so a reader never sees half an index
+        Args:
+            file_location (str) : path of the index file
+        Return:
+            str : path of the index file
+        """
+        temp_location = f"{file_location}.tmp"
+        with open(temp_location, "w") as output_file:
+            json.dump(self.to_dict(), output_file, separators=(",", ":"))
+        os.replace(temp_location, file_location)
+        return file_location
+
+    @classmethod
+    def from_dict(cls, index_dict):
+        if index_dict.get("version") != INDEX_VERSION:
+            raise ValueError(
+                f"Index version {index_dict.get('version')} is not supported.  Version {INDEX_VERSION} is needed"
+            )
+        index = cls()
+        index._hosts = list(index_dict["hosts"])
+        index._host_ids = {address: host_id for host_id, address in enumerate(index._hosts)}
+        index._ports = {key: set(value) for key, value in index_dict["ports"].items()}
+        index._products = {
+            key: set(value) for key, value in index_dict["products"].items()
+        }
+        index._tokens = {key: set(value) for key, value in index_dict["tokens"].items()}
+        return index
+
+    @classmethod
+    def load(cls, file_location):
+        """
+        Reads an index file written by save()
+        Args:
+            file_location (str) : path of the index file
+        Return:
+            ResultIndex : the index
+        """
+        with open(file_location) as input_file:
+            return cls.from_dict(json.load(input_file))
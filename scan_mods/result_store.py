@@ -0,0 +1,477 @@
+#!python
+
+"""
+SQLite store for the results of every run.
+
+Each run is written to a local SQLite database (Output/Scans/results.db by default) so results from many runs
+can be queried together without opening thousands of files.  Tables
+    runs            : one row per run
+    hosts           : one row per device per run with its ping response times
+    ports           : one row per scanned port with its state, reason and banner
+    device_facts    : one row per napalm getter that get_config_napalm returned
+    command_outputs : one row per NTC command that device_info_getter returned
+    transcripts     : one row per command sent with its raw output, when a TranscriptRecorder is set
+
+Only the SQLiteSink writer thread writes.  Devices are written in batches, one transaction per batch
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.device_class import PortState, classify_port
+from scan_mods.output_sink import OutputSink, get_scans_directory
+from scan_mods.grabbing_mods.transcripts import take_transcripts
+
+
+STORE_VERSION = 2
+DATABASE_FILE_NAME = "results.db"
+BATCH_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    host_count INTEGER NOT NULL DEFAULT 0,
+    arguments TEXT
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    host_id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    ip TEXT NOT NULL,
+    rtt_1 REAL,
+    rtt_2 REAL,
+    rtt_3 REAL,
+    domain_name TEXT,
+    username TEXT,
+    version_info TEXT,
+    UNIQUE (run_id, ip)
+);
+CREATE TABLE IF NOT EXISTS ports (
+    host_id INTEGER NOT NULL REFERENCES hosts(host_id),
+    protocol TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    state INTEGER NOT NULL,
+    reason TEXT,
+    banner TEXT,
+    PRIMARY KEY (host_id, protocol, port)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS device_facts (
+    host_id INTEGER NOT NULL REFERENCES hosts(host_id),
+    getter TEXT NOT NULL,
+    data TEXT,
+    PRIMARY KEY (host_id, getter)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS command_outputs (
+    host_id INTEGER NOT NULL REFERENCES hosts(host_id),
+    command TEXT NOT NULL,
+    output TEXT,
+    PRIMARY KEY (host_id, command)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS transcripts (
+    host_id INTEGER NOT NULL REFERENCES hosts(host_id),
+    sequence INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    platform TEXT,
+    command_key TEXT,
+    command TEXT NOT NULL,
+    recorded REAL NOT NULL,
+    prompt TEXT,
+    output TEXT NOT NULL,
+    PRIMARY KEY (host_id, sequence)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS hosts_ip ON hosts (ip, run_id);
+CREATE INDEX IF NOT EXISTS ports_lookup ON ports (protocol, port, state);
+CREATE INDEX IF NOT EXISTS device_facts_getter ON device_facts (getter);
+"""
+
+
+def get_database_location():
+    """
+    Return:
+        str : path of the default database, Output/Scans/results.db
+    """
+    return os.path.join(get_scans_directory(), DATABASE_FILE_NAME)
+
+
+def record_to_rows(record):
+    """
+    Splits a FoundDevice.to_record() into the rows for each table
+    Args:
+        record (dict) : record of the device
+    Return:
+        dict : {"host": tuple, "ports": list, "device_facts": list, "command_outputs": list}.  The host_id is not
+            in the rows, it is added when they are written
+    """
+    if not isinstance(record, dict):
+        raise TypeError(f"{record} is not a dict.  It is a {type(record).__name__}")
+    response_times = list(record.get("ping_response_times") or [])
+    response_times += [None] * (3 - len(response_times))
+    device_info = record.get("device_info") or {}
+    config = device_info.get("CONFIG") or {}
+    version_info = device_info.get("Version_Info")
+    port_rows = []
+    for protocol, ports in (record.get("ports") or {}).items():
+        for port, header in ports.items():
+            state = classify_port(header)
+            if state == PortState.OPEN:
+                port_rows.append((protocol, int(port), int(state), None, json.dumps(header)))
+            else:
+                port_rows.append((protocol, int(port), int(state), header["ERROR"], None))
+    fact_rows = [
+        (getter, json.dumps(data))
+        for getter, data in (config.get("Device_Information") or {}).items()
+    ]
+    command_rows = [
+        (command, json.dumps(output))
+        for command, output in (config.get("Show_Info") or {}).items()
+    ]
+    return {
+        "host": (
+            record["IP"],
+            response_times[0],
+            response_times[1],
+            response_times[2],
+            record.get("domain_name"),
+            record.get("username"),
+            None if version_info is None else json.dumps(version_info),
+        ),
+        "ports": port_rows,
+        "device_facts": fact_rows,
+        "command_outputs": command_rows,
+    }
+
+
+class ResultStore:
+    """
+    SQLite database of the results of every run
+
+    Methods:
+        .start_run() / .finish_run() : add and close out a row in runs
+        .write_devices() : write the rows from record_to_rows for many devices in one transaction
+        .runs() : list of the runs
+        .hosts_with_port() : hosts that had a port in a state, by run
+        .port_history() : every result for one port on one host across runs
+        .device_facts() : a getter's output for a host
+        .transcripts() : the raw commands and output saved for a run
+        .update_command_outputs() : replace the parsed output of commands, like after a reparse
+    """
+
+    def __init__(self, database_location=None):
+        if database_location is None:
+            database_location = get_database_location()
+        if not isinstance(database_location, str):
+            raise TypeError(
+                f"{database_location} is not a string.  It is a {type(database_location).__name__}"
+            )
+        self.database_location = database_location
+        # The sink opens the store on the calling thread and writes to it from its writer thread
+        self._connection = sqlite3.connect(database_location, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+            self._connection.execute(f"PRAGMA user_version={STORE_VERSION}")
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start_run(self, arguments=None):
+        """
+        Args:
+            arguments (dict|None) : arguments the run was started with.  Saved as JSON
+        Return:
+            int : run_id of the new run
+        """
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (started, arguments) VALUES (?, ?)",
+                (time.time(), None if arguments is None else json.dumps(arguments)),
+            )
+        return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        """
+        Sets the finish time and host count of a run
+        Args:
+            run_id (int) : run to finish
+        Return:
+            None
+        """
+        with self._connection:
+            self._connection.execute(
+                "UPDATE runs SET finished = ?, host_count = "
+                "(SELECT COUNT(*) FROM hosts WHERE run_id = ?) WHERE run_id = ?",
+                (time.time(), run_id, run_id),
+            )
+
+    def write_devices(self, run_id, device_rows):
+        """
+        Writes many devices in one transaction.  A device already in the run is replaced
+        Args:
+            run_id (int) : run the devices belong to
+            device_rows (list) : list of dicts from record_to_rows
+        Return:
+            None
+        """
+        with self._connection:
+            for rows in device_rows:
+                self._delete_host(run_id, rows["host"][0])
+                host_id = self._connection.execute(
+                    "INSERT INTO hosts (run_id, ip, rtt_1, rtt_2, rtt_3, domain_name, username, version_info) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id,) + rows["host"],
+                ).lastrowid
+                self._connection.executemany(
+                    "INSERT INTO ports (host_id, protocol, port, state, reason, banner) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(host_id,) + row for row in rows["ports"]],
+                )
+                self._connection.executemany(
+                    "INSERT INTO device_facts (host_id, getter, data) VALUES (?, ?, ?)",
+                    [(host_id,) + row for row in rows["device_facts"]],
+                )
+                self._connection.executemany(
+                    "INSERT INTO command_outputs (host_id, command, output) VALUES (?, ?, ?)",
+                    [(host_id,) + row for row in rows["command_outputs"]],
+                )
+                self._connection.executemany(
+                    "INSERT INTO transcripts (host_id, sequence, source, platform, command_key, command, recorded, "
+                    "prompt, output) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            host_id,
+                            sequence,
+                            transcript["source"],
+                            transcript["platform"],
+                            transcript["command_key"],
+                            transcript["command"],
+                            transcript["recorded"],
+                            transcript["prompt"],
+                            transcript["output"],
+                        )
+                        for sequence, transcript in enumerate(rows.get("transcripts", ()))
+                    ],
+                )
+
+    def _delete_host(self, run_id, address):
+        for (host_id,) in self._connection.execute(
+            "SELECT host_id FROM hosts WHERE run_id = ? AND ip = ?", (run_id, address)
+        ).fetchall():
+            for table in ("ports", "device_facts", "command_outputs", "transcripts"):
+                self._connection.execute(f"DELETE FROM {table} WHERE host_id = ?", (host_id,))
+            self._connection.execute("DELETE FROM hosts WHERE host_id = ?", (host_id,))
+
+    def runs(self):
+        """
+        Return:
+            list : dicts of run_id, started, finished and host_count for every run, oldest first
+        """
+        return [
+            {"run_id": row[0], "started": row[1], "finished": row[2], "host_count": row[3]}
+            for row in self._connection.execute(
+                "SELECT run_id, started, finished, host_count FROM runs ORDER BY run_id"
+            )
+        ]
+
+    def latest_run(self):
+        """
+        Return:
+            int|None : run_id of the newest run or None if there are no runs
+        """
+        return self._connection.execute("SELECT MAX(run_id) FROM runs").fetchone()[0]
+
+    def hosts_with_port(self, protocol, port, state=PortState.OPEN, run_id=None):
+        """
+        Args:
+            protocol (str) : TCP or UDP
+            port (str|int) : port number
+            state (PortState) : state the port has to be in
+            run_id (int|None) : only look in this run.  Every run is looked at if None
+        Return:
+            list : sorted list of (run_id, ip) tuples
+        """
+        query = (
+            "SELECT hosts.run_id, hosts.ip FROM ports JOIN hosts ON hosts.host_id = ports.host_id "
+            "WHERE ports.protocol = ? AND ports.port = ? AND ports.state = ?"
+        )
+        parameters = [protocol.upper(), int(port), int(state)]
+        if run_id is not None:
+            query += " AND hosts.run_id = ?"
+            parameters.append(run_id)
+        return sorted(self._connection.execute(query, parameters).fetchall())
+
+    def port_history(self, address, protocol, port):
+        """
+        Every result for one port on one host across the runs
+        Args:
+            address (str) : IP of the host
+            protocol (str) : TCP or UDP
+            port (str|int) : port number
+        Return:
+            list : dicts of run_id, started, state, reason and banner, oldest run first
+        """
+        rows = self._connection.execute(
+            "SELECT runs.run_id, runs.started, ports.state, ports.reason, ports.banner "
+            "FROM hosts JOIN runs ON runs.run_id = hosts.run_id "
+            "JOIN ports ON ports.host_id = hosts.host_id "
+            "WHERE hosts.ip = ? AND ports.protocol = ? AND ports.port = ? ORDER BY runs.run_id",
+            (address, protocol.upper(), int(port)),
+        )
+        return [
+            {
+                "run_id": row[0],
+                "started": row[1],
+                "state": PortState(row[2]),
+                "reason": row[3],
+                "banner": None if row[4] is None else json.loads(row[4]),
+            }
+            for row in rows
+        ]
+
+    def device_facts(self, address, getter, run_id=None):
+        """
+        Args:
+            address (str) : IP of the host
+            getter (str) : key from get_config_napalm like Device_Facts
+            run_id (int|None) : run to read from.  The newest run with the getter if None
+        Return:
+            dict|None : output of the getter or None if it was never stored
+        """
+        query = (
+            "SELECT device_facts.data FROM hosts JOIN device_facts ON device_facts.host_id = hosts.host_id "
+            "WHERE hosts.ip = ? AND device_facts.getter = ?"
+        )
+        parameters = [address, getter]
+        if run_id is not None:
+            query += " AND hosts.run_id = ?"
+            parameters.append(run_id)
+        row = self._connection.execute(
+            query + " ORDER BY hosts.run_id DESC LIMIT 1", parameters
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def command_output(self, address, command, run_id=None):
+        """
+        Args:
+            address (str) : IP of the host
+            command (str) : command key from device_info_getter like show_version
+            run_id (int|None) : run to read from.  The newest run with the command if None
+        Return:
+            list|str|None : parsed output of the command or None if it was never stored
+        """
+        query = (
+            "SELECT command_outputs.output FROM hosts "
+            "JOIN command_outputs ON command_outputs.host_id = hosts.host_id "
+            "WHERE hosts.ip = ? AND command_outputs.command = ?"
+        )
+        parameters = [address, command]
+        if run_id is not None:
+            query += " AND hosts.run_id = ?"
+            parameters.append(run_id)
+        row = self._connection.execute(
+            query + " ORDER BY hosts.run_id DESC LIMIT 1", parameters
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def transcripts(self, run_id=None, address=None):
+        """
+        Args:
+            run_id (int|None) : run to read.  The newest run if None
+            address (str|None) : only this host.  Every host of the run if None
+        Return:
+            list : dicts of ip, source, platform, command_key, command, recorded, prompt and output in the order
+                the commands were sent
+        """
+        if run_id is None:
+            run_id = self.latest_run()
+        query = (
+            "SELECT hosts.ip, transcripts.source, transcripts.platform, transcripts.command_key, "
+            "transcripts.command, transcripts.recorded, transcripts.prompt, transcripts.output "
+            "FROM hosts JOIN transcripts ON transcripts.host_id = hosts.host_id WHERE hosts.run_id = ?"
+        )
+        parameters = [run_id]
+        if address is not None:
+            query += " AND hosts.ip = ?"
+            parameters.append(address)
+        rows = self._connection.execute(
+            query + " ORDER BY hosts.ip, transcripts.sequence", parameters
+        )
+        keys = ("ip", "source", "platform", "command_key", "command", "recorded", "prompt", "output")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def update_command_outputs(self, run_id, outputs):
+        """
+        Replaces the parsed output of commands in one transaction
+        Args:
+            run_id (int) : run the hosts are in
+            outputs (list) : (ip, command key, output) tuples
+        Return:
+            int : number of outputs written
+        """
+        written = 0
+        with self._connection:
+            for address, command, output in outputs:
+                row = self._connection.execute(
+                    "SELECT host_id FROM hosts WHERE run_id = ? AND ip = ?", (run_id, address)
+                ).fetchone()
+                if row is None:
+                    continue
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO command_outputs (host_id, command, output) VALUES (?, ?, ?)",
+                    (row[0], command, json.dumps(output)),
+                )
+                written += 1
+        return written
+
+
+class SQLiteSink(OutputSink):
+    """
+    Writes each device of a run to the ResultStore.  The writer thread is the only writer and it commits
+    once every batch_size devices and once more at close
+    """
+
+    def __init__(self, database_location=None, arguments=None, batch_size=BATCH_SIZE):
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError(f"batch_size needs to be an int of 1 or more.  Not {batch_size}")
+        self.store = ResultStore(database_location)
+        self.run_id = self.store.start_run(arguments)
+        self.batch_size = batch_size
+        self._pending = []
+        super().__init__()
+
+    def _prepare(self, device):
+        rows = record_to_rows(device.to_record())
+        rows["transcripts"] = take_transcripts(device.IP)
+        return rows
+
+    def _write(self, rows):
+        self._pending.append(rows)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self.store.write_devices(self.run_id, self._pending)
+            self._pending = []
+
+    def _finish(self):
+        try:
+            if self._error is None:
+                self._flush()
+            self.store.finish_run(self.run_id)
+        finally:
+            self.store.close()
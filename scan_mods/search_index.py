@@ -0,0 +1,356 @@
+#!python
+
+"""
+Full text search over the configs and command outputs of every device.
+
+The index is a SQLite database, Output/Scans/search_index.db, with an FTS5 table that is an on disk inverted
+index of the tokens of every line.  Each line is a row whose rowid is (document id << 20) + line number, so a
+hit gives the device, the file and the line straight from the index and all the lines of a file can be dropped
+with one rowid range.  . - _ / : are part of a token so 10.1.1.1, ACL-MGMT and GigabitEthernet0/1 are one
+token each.
+
+While a SearchIndex is set with set_search_index, every file written with write_artifact (the configs from
+get_config_napalm) and every output of device_info_getter is added to it as it is written.  A file whose
+contents did not change since it was last indexed is not indexed again.  networkscanner search --build indexes
+a run that was saved without it
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.output_sink import get_scans_directory
+
+
+INDEX_FILE_NAME = "search_index.db"
+INDEX_VERSION = 1
+LINE_BITS = 20
+MAX_LINES = (1 << LINE_BITS) - 1
+TOKEN_CHARACTERS = ".-_/:"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id INTEGER PRIMARY KEY,
+    address TEXT NOT NULL,
+    name TEXT NOT NULL,
+    location TEXT,
+    content_hash TEXT NOT NULL,
+    line_count INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (address, name)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines USING fts5(
+    text,
+    tokenize = "unicode61 tokenchars '{TOKEN_CHARACTERS}'"
+);
+"""
+
+
+def get_index_location():
+    """
+    Return:
+        str : path of the default index, Output/Scans/search_index.db
+    """
+    return os.path.join(get_scans_directory(), INDEX_FILE_NAME)
+
+
+def build_match_query(terms):
+    """
+    Turns what the user typed into an FTS5 query.  Each word has to be on the line, a word ending in * is a prefix
+    Args:
+        terms (str|list) : words to look for
+    Return:
+        str : FTS5 match query
+    """
+    if isinstance(terms, str):
+        terms = terms.split()
+    parts = []
+    for term in terms:
+        prefix = term.endswith("*")
+        term = term.rstrip("*")
+        if not term:
+            continue
+        term = term.replace('"', '""')
+        parts.append(f'"{term}"*' if prefix else f'"{term}"')
+    if not parts:
+        raise ValueError("Nothing to search for")
+    return " AND ".join(parts)
+
+
+def render_command_output(output):
+    """
+    Args:
+        output (list|str) : output of a command from device_info_getter, a list of TextFSM rows or the raw text
+    Return:
+        str : text to index with one line for each row as KEY=value pairs
+    """
+    if isinstance(output, str):
+        return output
+    lines = []
+    for row in output or []:
+        if not isinstance(row, dict):
+            lines.append(str(row))
+            continue
+        values = []
+        for key, value in row.items():
+            if isinstance(value, list):
+                value = ",".join(str(item) for item in value)
+            if value not in ("", None):
+                values.append(f"{key}={value}")
+        lines.append("  ".join(values))
+    return "\n".join(lines)
+
+
+class SearchIndex:
+    """
+    Inverted index of the lines of every file of every device
+
+    Methods:
+        .add_document() : index a file, skipped if it did not change
+        .add_documents() : index many files in one transaction
+        .remove_document() : drop a file from the index
+        .search() : find the lines that have every word
+        .documents() : the files in the index
+    """
+
+    def __init__(self, index_location=None):
+        if index_location is None:
+            index_location = get_index_location()
+        if not isinstance(index_location, str):
+            raise TypeError(
+                f"{index_location} is not a string.  It is a {type(index_location).__name__}"
+            )
+        self.index_location = index_location
+        self._lock = threading.Lock()
+        # Files are added from the grabbing threads so the connection is shared behind the lock
+        self._connection = sqlite3.connect(index_location, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with self._connection:
+                self._connection.executescript(SCHEMA)
+                self._connection.execute(f"PRAGMA user_version={INDEX_VERSION}")
+        except sqlite3.OperationalError as ex:
+            self._connection.close()
+            raise RuntimeError(f"The search index needs SQLite with FTS5.  {ex}")
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def _delete_lines(self, doc_id):
+        self._connection.execute(
+            "DELETE FROM lines WHERE rowid BETWEEN ? AND ?",
+            (doc_id << LINE_BITS, (doc_id << LINE_BITS) + MAX_LINES),
+        )
+
+    def _add_document(self, address, name, text, location):
+        if isinstance(text, (bytes, bytearray)):
+            text = text.decode("utf-8", errors="replace")
+        for item in [address, name, text]:
+            if not isinstance(item, str):
+                raise TypeError(f"{item} is not a string.  It is a {type(item).__name__}")
+        content_hash = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        row = self._connection.execute(
+            "SELECT doc_id, content_hash FROM documents WHERE address = ? AND name = ?",
+            (address, name),
+        ).fetchone()
+        if row is not None and row[1] == content_hash:
+            self._connection.execute(
+                "UPDATE documents SET location = ?, updated = ? WHERE doc_id = ?",
+                (location, time.time(), row[0]),
+            )
+            return False
+        lines = text.splitlines()[:MAX_LINES]
+        if row is None:
+            doc_id = self._connection.execute(
+                "INSERT INTO documents (address, name, location, content_hash, line_count, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (address, name, location, content_hash, len(lines), time.time()),
+            ).lastrowid
+        else:
+            doc_id = row[0]
+            self._delete_lines(doc_id)
+            self._connection.execute(
+                "UPDATE documents SET location = ?, content_hash = ?, line_count = ?, updated = ? WHERE doc_id = ?",
+                (location, content_hash, len(lines), time.time(), doc_id),
+            )
+        self._connection.executemany(
+            "INSERT INTO lines (rowid, text) VALUES (?, ?)",
+            [
+                ((doc_id << LINE_BITS) + line_number, line)
+                for line_number, line in enumerate(lines, start=1)
+                if line.strip()
+            ],
+        )
+        return True
+
+    def add_document(self, address, name, text, location=None):
+        """
+        Indexes a file.  Nothing is done if the file has the same contents as when it was last indexed
+        Args:
+            address (str) : IP of the device
+            name (str) : name of the file like 192.168.1.1_running.txt or show_ip_interface_brief
+            text (str|bytes) : contents
+            location (str|None) : where the file can be read with read_artifact
+        Return:
+            bool : True if the file was indexed, False if it had not changed
+        """
+        with self._lock, self._connection:
+            return self._add_document(address, name, text, location)
+
+    def add_documents(self, documents):
+        """
+        Indexes many files in one transaction
+        Args:
+            documents (iterable) : (address, name, text, location) for each file
+        Return:
+            int : number of files indexed.  Files that had not changed are not counted
+        """
+        indexed = 0
+        with self._lock, self._connection:
+            for address, name, text, location in documents:
+                if self._add_document(address, name, text, location):
+                    indexed += 1
+        return indexed
+
+    def remove_document(self, address, name):
+        """
+        Args:
+            address (str) : IP of the device
+            name (str) : name of the file
+        Return:
+            bool : True if the file was in the index
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT doc_id FROM documents WHERE address = ? AND name = ?", (address, name)
+            ).fetchone()
+            if row is None:
+                return False
+            self._delete_lines(row[0])
+            self._connection.execute("DELETE FROM documents WHERE doc_id = ?", (row[0],))
+        return True
+
+    def search(self, terms, address=None, name=None, limit=100, raw=False):
+        """
+        Args:
+            terms (str|list) : words that all have to be on the line.  A word ending in * is a prefix
+            address (str|None) : only look at this device
+            name (str|None) : only look at files with this in their name
+            limit (int|None) : most hits to return.  Every hit if None
+            raw (bool) : terms is an FTS5 query and is used as it is
+        Return:
+            list : dicts of address, name, location, line_number and line sorted by address, name and line
+        """
+        match_query = terms if raw else build_match_query(terms)
+        query = (
+            "SELECT documents.address, documents.name, documents.location, lines.rowid, lines.text "
+            "FROM lines JOIN documents ON documents.doc_id = (lines.rowid >> ?) "
+            "WHERE lines MATCH ?"
+        )
+        parameters = [LINE_BITS, match_query]
+        if address is not None:
+            query += " AND documents.address = ?"
+            parameters.append(address)
+        if name is not None:
+            query += " AND instr(documents.name, ?) > 0"
+            parameters.append(name)
+        query += " ORDER BY documents.address, documents.name, lines.rowid"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(int(limit))
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+        return [
+            {
+                "address": row[0],
+                "name": row[1],
+                "location": row[2],
+                "line_number": row[3] & MAX_LINES,
+                "line": row[4],
+            }
+            for row in rows
+        ]
+
+    def documents(self, address=None):
+        """
+        Args:
+            address (str|None) : only this device.  Every device if None
+        Return:
+            list : dicts of address, name, location, line_count and updated for each file
+        """
+        query = "SELECT address, name, location, line_count, updated FROM documents"
+        parameters = []
+        if address is not None:
+            query += " WHERE address = ?"
+            parameters.append(address)
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY address, name", parameters).fetchall()
+        return [
+            {"address": row[0], "name": row[1], "location": row[2], "line_count": row[3], "updated": row[4]}
+            for row in rows
+        ]
+
+
+_search_index = None
+
+
+def set_search_index(search_index):
+    """
+    Turns on indexing of the files as they are written.  None turns it off
+    Args:
+        search_index (SearchIndex|None) : index to add the files to
+    Return:
+        SearchIndex|None : the index that was being used before
+    """
+    global _search_index
+    if search_index is not None and not isinstance(search_index, SearchIndex):
+        raise TypeError(f"{search_index} is not a SearchIndex")
+    previous_index = _search_index
+    _search_index = search_index
+    return previous_index
+
+
+def get_search_index():
+    """
+    Return:
+        SearchIndex|None : the index being used or None if indexing is off
+    """
+    return _search_index
+
+
+def index_artifact(address, name, text, location=None):
+    """
+    Adds a file to the search index if one is set.  A failure is printed and does not stop the scan
+    Args:
+        address (str) : IP of the device
+        name (str) : name of the file
+        text (str|bytes) : contents
+        location (str|None) : where the file can be read with read_artifact
+    Return:
+        bool : True if the file was indexed
+    """
+    search_index = _search_index
+    if search_index is None:
+        return False
+    try:
+        return search_index.add_document(address, name, text, location)
+    except sqlite3.Error as ex:
+        print(f"Could not add {name} for {address} to the search index.  {ex}")
+        return False
@@ -0,0 +1,215 @@
+#!python
+
+"""
+Serializers for the result records written by the output sinks.
+
+Formats
+    json    : one compact JSON record per line (NDJSON).  Uses orjson when it is installed, the json module if not
+    msgpack : MessagePack records back to back.  Needs the msgpack package
+    cbor    : CBOR records back to back.  Needs the cbor2 package
+
+Every format is read and written the same way, so a run written in a binary format can be converted back
+to NDJSON for anything that only reads JSON.  Any of the files can also be .gz or .zst compressed
+"""
+
+import io
+import json
+import os
+import sys
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from scan_mods.compression import open_compressed, strip_compression_suffix
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class JSONSerializer:
+    """
+    One compact JSON document per line
+    """
+
+    name = "json"
+    file_extension = "ndjson"
+
+    def available(self):
+        return True
+
+    def dumps(self, record):
+        if orjson is not None:
+            return orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(record, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data):
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def write_record(self, output_file, record):
+        output_file.write(self.dumps(record))
+        output_file.write(b"\n")
+
+    def iter_records(self, input_file):
+        for line in input_file:
+            if line.strip():
+                yield self.loads(line)
+
+
+class MsgpackSerializer:
+    """
+    MessagePack records written back to back
+    """
+
+    name = "msgpack"
+    file_extension = "msgpack"
+
+    def available(self):
+        return msgpack is not None
+
+    def dumps(self, record):
+        return msgpack.packb(record, use_bin_type=True)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+    def write_record(self, output_file, record):
+        output_file.write(self.dumps(record))
+
+    def iter_records(self, input_file):
+        unpacker = msgpack.Unpacker(input_file, raw=False, strict_map_key=False)
+        for record in unpacker:
+            yield record
+
+
+class CBORSerializer:
+    """
+    CBOR records written back to back
+    """
+
+    name = "cbor"
+    file_extension = "cbor"
+
+    def available(self):
+        return cbor2 is not None
+
+    def dumps(self, record):
+        return cbor2.dumps(record)
+
+    def loads(self, data):
+        return cbor2.loads(data)
+
+    def write_record(self, output_file, record):
+        output_file.write(self.dumps(record))
+
+    def iter_records(self, input_file):
+        data = input_file.read()
+        stream = io.BytesIO(data)
+        decoder = cbor2.CBORDecoder(stream)
+        while stream.tell() < len(data):
+            yield decoder.decode()
+
+
+SERIALIZERS = {
+    serializer.name: serializer
+    for serializer in (JSONSerializer(), MsgpackSerializer(), CBORSerializer())
+}
+OUTPUT_FORMATS = tuple(SERIALIZERS.keys())
+
+
+def available_formats():
+    """
+    Return:
+        list : names of the formats whose packages are installed
+    """
+    return [name for name, serializer in SERIALIZERS.items() if serializer.available()]
+
+
+def get_serializer(output_format="json"):
+    """
+    Args:
+        output_format (str) : one of OUTPUT_FORMATS
+    Return:
+        serializer for the format
+    """
+    if output_format not in SERIALIZERS:
+        raise ValueError(
+            f"{output_format} is not a known format.  Use one of {OUTPUT_FORMATS}"
+        )
+    serializer = SERIALIZERS[output_format]
+    if not serializer.available():
+        raise ImportError(
+            f"The {output_format} format needs its package installed.  pip install {'cbor2' if output_format == 'cbor' else output_format}"
+        )
+    return serializer
+
+
+def format_for_file(file_location):
+    """
+    Works out the format of a record file from its extension.  A .gz or .zst suffix is looked past
+    Args:
+        file_location (str) : path of the file
+    Return:
+        str|None : name of the format or None if the extension is not one of the record formats
+    """
+    extension = os.path.splitext(strip_compression_suffix(file_location))[1].lstrip(".").lower()
+    for name, serializer in SERIALIZERS.items():
+        if extension == serializer.file_extension:
+            return name
+    return None
+
+
+def iter_record_file(file_location, output_format=None):
+    """
+    Reads the records from a record file
+    Args:
+        file_location (str) : path of the file
+        output_format (str|None) : format of the file.  Taken from the extension if None
+    Return:
+        generator : each record in the file
+    """
+    if output_format is None:
+        output_format = format_for_file(file_location) or "json"
+    serializer = get_serializer(output_format)
+    with open_compressed(file_location, "rb") as input_file:
+        for record in serializer.iter_records(input_file):
+            yield record
+
+
+def convert_record_file(input_location, output_location, output_format=None):
+    """
+    Converts a record file from one format to another.  Used to hand binary runs to tools that only read JSON
+    Args:
+        input_location (str) : file to read.  Format is taken from the extension
+        output_location (str) : file to write
+        output_format (str|None) : format to write.  Taken from the output extension if None
+    Return:
+        int : number of records converted
+    """
+    if output_format is None:
+        output_format = format_for_file(output_location)
+        if output_format is None:
+            raise ValueError(
+                f"Could not tell the format of {output_location} from its extension.  Give the format"
+            )
+    serializer = get_serializer(output_format)
+    record_count = 0
+    with open_compressed(output_location, "wb") as output_file:
+        for record in iter_record_file(input_location):
+            serializer.write_record(output_file, record)
+            record_count += 1
+    return record_count
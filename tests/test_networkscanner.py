@@ -7,12 +7,18 @@ import ipaddress
 import unittest
 import os
 import sys
+import tempfile
+from unittest.mock import patch
 
 currentdir = os.path.dirname(os.path.realpath(__file__))
 parentdir = os.path.dirname(currentdir)
 sys.path.append(parentdir)
 
 import networkscanner
+from scan_mods.device_class import FoundDevice
+from scan_mods.output_sink import MultiSink, PerDeviceFileSink, RecordFileSink, create_sink
+from scan_mods.result_index import ResultIndex, index_location_for_run
+from scan_mods.config_store import ConfigStore, ConfigStoreArtifacts
 
 
 class TestNetworkScanner(unittest.TestCase):
@@ -44,6 +50,106 @@ class TestNetworkScanner(unittest.TestCase):
             "Finish testing that get_who_to_scan passes with arg_list of 0 arguments\n"
         )
 
+    def test_002_default_layout_run_is_read(self):
+        print("\nStart testing that configs, compliance and search read a run saved with the default layout")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scans_directory = os.path.join(temp_dir, "Output", "Scans")
+            os.makedirs(scans_directory)
+            config_location = os.path.join(temp_dir, "192.168.1.65_running.txt")
+            with open(config_location, "w") as config_file:
+                config_file.write("hostname R1\n!\ninterface GigabitEthernet0/0\n ip address 10.0.0.1 255.255.255.0\n")
+            device = FoundDevice("192.168.1.65", (1.1, 1.35, 1.82))
+            device.device_info = {
+                "Version_Info": ["Cisco IOS Software, IOSv Software, Version 15.6(2)T"],
+                "CONFIG": {
+                    "OS_Type": "ios",
+                    "Device_Information": {"Device_Running_Config_File_Location": config_location},
+                    "Show_Info": {"show_clock": [{"time": "12:00:00"}]},
+                },
+            }
+            with patch("scan_mods.output_sink._output_root", os.path.join(temp_dir, "Output")):
+                # Nothing saved yet is an error and not an empty report
+                with self.assertRaises(ValueError):
+                    networkscanner.load_compliance_items(networkscanner.resolve_run_location())
+                with create_sink() as output_sink:
+                    output_sink.write_device(device)
+                run_location = networkscanner.resolve_run_location()
+                self.assertTrue(os.path.basename(run_location).startswith("run_"))
+                self.assertEqual(networkscanner.resolve_run_location(scans_directory), run_location)
+                self.assertEqual(len(networkscanner.load_config_fleet(run_location)), 1)
+                device_items = networkscanner.load_compliance_items(run_location)
+                self.assertEqual(len(device_items), 1)
+                self.assertTrue(device_items[0][2].startswith("hostname R1"))
+                self.assertEqual(
+                    [item[1] for item in networkscanner.iter_search_documents(run_location)],
+                    ["192.168.1.65_running.txt", "show_clock"],
+                )
+        print("Finish testing that configs, compliance and search read a run saved with the default layout\n")
+
+    def test_003_query_reads_the_index_of_the_run(self):
+        print("\nStart testing that query reads the index of the run it is given")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scans_directory = os.path.join(temp_dir, "Output", "Scans")
+            os.makedirs(scans_directory)
+            run_locations = []
+            with patch("scan_mods.output_sink._output_root", os.path.join(temp_dir, "Output")):
+                for run_name, address in [("run_20210101_000000", "192.168.1.65"), ("run_20210102_000000", "192.168.1.66")]:
+                    device = FoundDevice(address, (1.1, 1.35, 1.82))
+                    device.all_ports = {"TCP": {"22": {"Return Information": "SSH-2.0-Cisco-1.25"}}, "UDP": {}}
+                    result_index = ResultIndex()
+                    with MultiSink(
+                        [RecordFileSink(os.path.join(scans_directory, f"{run_name}.ndjson")), PerDeviceFileSink()]
+                    ) as output_sink:
+                        output_sink.write_device(device)
+                        result_index.add_device(device)
+                    run_location = networkscanner.sink_run_location(output_sink)
+                    result_index.save(index_location_for_run(run_location))
+                    run_locations.append(run_location)
+                query_args = networkscanner.parse_query_args(["--port", "22", "--run", run_locations[0]])
+                self.assertEqual(networkscanner.run_query(query_args), ["192.168.1.65"])
+                query_args = networkscanner.parse_query_args(["--port", "22"])
+                self.assertEqual(networkscanner.run_query(query_args), ["192.168.1.66"])
+                with PerDeviceFileSink() as output_sink:
+                    self.assertEqual(networkscanner.sink_run_location(output_sink), scans_directory)
+        print("Finish testing that query reads the index of the run it is given\n")
+
+    def test_004_configs_read_from_the_store_of_the_run(self):
+        print("\nStart testing that configs are read from a config store in another directory")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scans_directory = os.path.join(temp_dir, "Output", "Scans")
+            os.makedirs(scans_directory)
+            store_directory = os.path.join(temp_dir, "store")
+            config_artifacts = ConfigStoreArtifacts(ConfigStore(store_directory))
+            config_location = config_artifacts.write_artifact(
+                "192.168.1.65", "192.168.1.65_running.txt", "hostname R1\n!\ninterface GigabitEthernet0/0\n"
+            )
+            device = FoundDevice("192.168.1.65", (1.1, 1.35, 1.82))
+            device.device_info = {
+                "CONFIG": {
+                    "OS_Type": "ios",
+                    "Device_Information": {"Device_Running_Config_File_Location": config_location},
+                },
+            }
+            with patch("scan_mods.output_sink._output_root", os.path.join(temp_dir, "Output")):
+                with create_sink() as output_sink:
+                    output_sink.write_device(device)
+                run_location = networkscanner.resolve_run_location()
+                # The default store does not have the config
+                self.assertEqual(len(networkscanner.load_config_fleet(run_location)), 0)
+                configs_args = networkscanner.parse_configs_args(["--type", "interface", "--store", store_directory])
+                results = networkscanner.run_configs(configs_args)
+                self.assertEqual(
+                    [(address, line.text) for address, line in results],
+                    [("192.168.1.65", "interface GigabitEthernet0/0")],
+                )
+                self.assertEqual(
+                    networkscanner.load_compliance_items(run_location, config_store=ConfigStore(store_directory))[0][2],
+                    "hostname R1\n!\ninterface GigabitEthernet0/0\n",
+                )
+                with self.assertRaises(ValueError):
+                    networkscanner.open_config_store(os.path.join(temp_dir, "missing"))
+        print("Finish testing that configs are read from a config store in another directory\n")
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,119 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.artifacts import (
+    FileArtifactStore,
+    artifact_exists,
+    close_pack_readers,
+    pack_reader,
+    read_artifact,
+    set_artifact_store,
+    split_location,
+    write_artifact,
+)
+from scan_mods.packfile import PackfileReader, PackfileWriter
+
+
+class TestArtifacts(unittest.TestCase):
+    """
+    Tests that device files are written through the artifact store
+    """
+
+    def test_001_file_store(self):
+        print("\nTest 001 - Start testing the file artifact store...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch("scan_mods.output_sink._output_root", temp_dir):
+                location = write_artifact("192.168.1.65", "192.168.1.65_running.txt", "hostname R1\n")
+                self.assertEqual(location, os.path.join(temp_dir, "Scans", "192.168.1.65", "192.168.1.65_running.txt"))
+                self.assertEqual(read_artifact(location), b"hostname R1\n")
+                location = write_artifact("192.168.1.65", "192.168.1.65_raw.bin", b"\x00\x01")
+                self.assertEqual(read_artifact(location), b"\x00\x01")
+        self.assertEqual(split_location("/tmp/run.pack::1.1.1.1/a.txt"), ("/tmp/run.pack", "1.1.1.1/a.txt"))
+        self.assertEqual(split_location("/tmp/a.txt"), ("/tmp/a.txt", None))
+        with self.assertRaises(TypeError):
+            write_artifact(None, "a.txt", "")
+        with self.assertRaises(TypeError):
+            read_artifact(None)
+        print("Test 001 - Finish testing the file artifact store\n")
+
+    def test_002_set_artifact_store(self):
+        print("\nTest 002 - Start testing that the artifact store can be changed...")
+
+        class MemoryStore:
+            def __init__(self):
+                self.files = {}
+
+            def write_artifact(self, address, file_name, data):
+                self.files[f"{address}/{file_name}"] = data
+                return f"memory::{address}/{file_name}"
+
+        memory_store = MemoryStore()
+        previous_store = set_artifact_store(memory_store)
+        try:
+            self.assertIsInstance(previous_store, FileArtifactStore)
+            self.assertEqual(write_artifact("192.168.1.65", "a.txt", "a"), "memory::192.168.1.65/a.txt")
+            self.assertEqual(memory_store.files, {"192.168.1.65/a.txt": "a"})
+        finally:
+            set_artifact_store(previous_store)
+        with self.assertRaises(TypeError):
+            set_artifact_store("not a store")
+        print("Test 002 - Finish testing that the artifact store can be changed\n")
+
+    def test_003_pack_readers_are_kept_open(self):
+        print("\nTest 003 - Start testing that packfiles are opened once for many reads...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pack_location = f"{temp_dir}/run.pack"
+            with PackfileWriter(pack_location) as writer:
+                locations = [
+                    writer.write_artifact(f"192.168.1.{host}", f"192.168.1.{host}_running.txt", f"hostname R{host}\n")
+                    for host in range(1, 21)
+                ]
+            try:
+                with patch("scan_mods.packfile.PackfileReader", wraps=PackfileReader) as mock_reader:
+                    for host, location in enumerate(locations, start=1):
+                        self.assertTrue(artifact_exists(location))
+                        self.assertEqual(read_artifact(location), f"hostname R{host}\n".encode())
+                    self.assertEqual(mock_reader.call_count, 1)
+                    self.assertFalse(artifact_exists(f"{pack_location}::192.168.1.99/missing.txt"))
+                    with pack_reader(pack_location) as pack:
+                        pass
+                    # A pack that changed is opened again and the old reader is closed
+                    os.utime(pack_location, ns=(0, 0))
+                    with pack_reader(pack_location) as new_pack:
+                        self.assertIsNot(new_pack, pack)
+                    self.assertEqual(mock_reader.call_count, 2)
+                    self.assertTrue(pack._map.closed)
+            finally:
+                close_pack_readers()
+            self.assertTrue(new_pack._map.closed)
+            other_location = f"{temp_dir}/other.pack"
+            with PackfileWriter(other_location) as writer:
+                other_artifact = writer.write_artifact("192.168.1.1", "192.168.1.1_running.txt", "hostname R1\n")
+            try:
+                with patch("scan_mods.artifacts.PACK_READER_CACHE_SIZE", 1):
+                    with pack_reader(pack_location) as pack:
+                        # Pushed out of the cache while it is being read so it is closed when the read is done
+                        self.assertEqual(read_artifact(other_artifact), b"hostname R1\n")
+                        self.assertFalse(pack._map.closed)
+                        self.assertEqual(pack.read("192.168.1.1/192.168.1.1_running.txt"), b"hostname R1\n")
+                    self.assertTrue(pack._map.closed)
+                    with pack_reader(other_location) as other_pack:
+                        pass
+                    self.assertEqual(read_artifact(locations[0]), b"hostname R1\n")
+                    # Pushed out while nothing was reading it so it was closed right away
+                    self.assertTrue(other_pack._map.closed)
+            finally:
+                close_pack_readers()
+        print("Test 003 - Finish testing that packfiles are opened once for many reads\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.compliance import (
+    RulePack,
+    device_platform,
+    evaluate_device,
+    evaluate_fleet,
+    load_rule_pack,
+)
+
+
+class TestCompliance(unittest.TestCase):
+    """
+    Tests that the compliance rule packs are checked the right way
+    """
+
+    good_config = """Building configuration...
+!
+hostname R1
+service password-encryption
+enable secret 9 $9$abc
+ip ssh version 2
+logging host 10.1.1.1
+ntp server 10.1.1.2
+!
+line con 0
+ exec-timeout 10 0
+line vty 0 4
+ exec-timeout 10 0
+ transport input ssh
+!
+end
+"""
+    bad_config = """hostname R2
+enable password cisco
+ip http server
+snmp-server community public RO
+username admin privilege 15 password 0 cisco
+!
+line con 0
+ exec-timeout 0 0
+line vty 0 4
+ transport input telnet ssh
+line vty 5 15
+ transport input ssh
+!
+end
+"""
+    show_info = {
+        "show_version": [{"VERSION": "15.2(4)M7", "HOSTNAME": "R1"}],
+        "show_ntp_associations": [{"SYNCED": ""}, {"SYNCED": "*"}],
+    }
+    command_pack = {
+        "name": "commands",
+        "rules": [
+            {
+                "id": "CMD-001",
+                "title": "Not running 12.x",
+                "command": {"name": "show_version", "field": "VERSION", "forbidden": "^12\\."},
+            },
+            {
+                "id": "CMD-002",
+                "title": "Synced to an NTP server",
+                "severity": "low",
+                "command": {"name": "show_ntp_associations", "field": "SYNCED", "required": "\\*", "any": True},
+            },
+            {
+                "id": "CMD-003",
+                "title": "Only on NX-OS",
+                "platforms": ["nxos"],
+                "command": {"name": "show_version", "required": "."},
+            },
+        ],
+    }
+
+    def get_pack_location(self):
+        return os.path.join(grandparentdir, "Compliance_Packs", "ios_baseline.json")
+
+    def test_001_rules(self):
+        print("\nTest 001 - Start testing the rules of the baseline pack...")
+        rule_packs = [load_rule_pack(self.get_pack_location())]
+        results = {
+            result["rule"]: result
+            for result in evaluate_device(rule_packs, "192.168.1.1", "ios", self.good_config)
+        }
+        self.assertEqual(len(results), 10)
+        self.assertEqual(
+            [rule for rule, result in results.items() if result["status"] != "pass"], []
+        )
+        results = {
+            result["rule"]: result
+            for result in evaluate_device(rule_packs, "192.168.1.2", "ios", self.bad_config)
+        }
+        self.assertEqual(
+            sorted(rule for rule, result in results.items() if result["status"] == "fail"),
+            ["IOS-001", "IOS-002", "IOS-003", "IOS-004", "IOS-005", "IOS-006", "IOS-007", "IOS-008", "IOS-009", "IOS-010"],
+        )
+        self.assertEqual(
+            results["IOS-005"]["details"], ["line vty 0 4 : missing ^transport input ssh$"]
+        )
+        self.assertEqual(results["IOS-006"]["details"], ["line con 0 : has exec-timeout 0 0"])
+        self.assertEqual(
+            results["IOS-002"]["details"], ["missing ^enable secret ", "has enable password "]
+        )
+        # No config and another platform
+        results = evaluate_device(rule_packs, "192.168.1.3", "ios", None)
+        self.assertEqual({result["status"] for result in results}, {"no_data"})
+        self.assertEqual(evaluate_device(rule_packs, "192.168.1.4", "nxos", self.good_config), [])
+        # The compiled pack is reused
+        self.assertIs(load_rule_pack(self.get_pack_location()), rule_packs[0])
+        print("Test 001 - Finish testing the rules of the baseline pack\n")
+
+    def test_002_command_rules(self):
+        print("\nTest 002 - Start testing the rules on command outputs...")
+        rule_pack = RulePack.from_dict(self.command_pack)
+        results = {
+            result["rule"]: result["status"]
+            for result in evaluate_device([rule_pack], "192.168.1.1", "ios", None, self.show_info)
+        }
+        self.assertEqual(results, {"CMD-001": "pass", "CMD-002": "pass"})
+        old_show_info = {"show_version": [{"VERSION": "12.4(24)T"}]}
+        results = {
+            result["rule"]: result
+            for result in evaluate_device([rule_pack], "192.168.1.2", "ios", None, old_show_info)
+        }
+        self.assertEqual(results["CMD-001"]["status"], "fail")
+        self.assertEqual(results["CMD-002"]["status"], "no_data")
+        self.assertEqual(
+            device_platform({"CONFIG": {"Open_Close_Msg": "SSH is open and Device Type is known (nxos_ssh)."}}),
+            "nxos_ssh",
+        )
+        self.assertEqual(device_platform({"CONFIG": {"OS_Type": "ios"}}), "ios")
+        self.assertIsNone(device_platform(None))
+        for bad_pack in [
+            {"rules": [{"title": "no id", "required": ["x"]}]},
+            {"rules": [{"id": "1"}]},
+            {"rules": [{"id": "1", "required": ["("]}]},
+            {"rules": [{"id": "1", "required": ["x"], "severity": "huge"}]},
+            {"rules": [{"id": "1", "required": ["x"]}, {"id": "1", "required": ["y"]}]},
+        ]:
+            with self.assertRaises(ValueError):
+                RulePack.from_dict(bad_pack)
+        with self.assertRaises(TypeError):
+            RulePack.from_dict(["not a pack"])
+        print("Test 002 - Finish testing the rules on command outputs\n")
+
+    def test_003_fleet(self):
+        print("\nTest 003 - Start testing a compliance run over many devices...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            command_pack_location = os.path.join(temp_dir, "commands.json")
+            with open(command_pack_location, "w") as output_file:
+                json.dump(self.command_pack, output_file)
+            device_items = [
+                (f"192.168.1.{host}", "ios", self.good_config if host % 2 else self.bad_config, self.show_info)
+                for host in range(1, 9)
+            ]
+            report = evaluate_fleet(
+                [self.get_pack_location(), command_pack_location], device_items, processes=2
+            )
+            self.assertEqual(report.pack_names, ["ios_baseline", "commands"])
+            self.assertEqual(len(report), 8 * 12)
+            by_device = report.by_device()
+            self.assertEqual(by_device["192.168.1.1"]["fail"], 0)
+            self.assertEqual(by_device["192.168.1.2"]["fail"], 10)
+            self.assertEqual(by_device["192.168.1.2"]["pass"], 2)
+            by_rule = report.by_rule()
+            self.assertEqual(by_rule["IOS-003"]["failed_devices"], ["192.168.1.2", "192.168.1.4", "192.168.1.6", "192.168.1.8"])
+            self.assertEqual(by_rule["CMD-001"]["pass"], 8)
+            self.assertEqual(len(report.failures()), 40)
+            # The same results without the pool
+            single_report = evaluate_fleet(
+                [self.get_pack_location(), command_pack_location], device_items, processes=1
+            )
+            self.assertEqual(single_report.results, report.results)
+            report_location = report.save(os.path.join(temp_dir, "report.json"))
+            with open(report_location) as input_file:
+                saved_report = json.load(input_file)
+            self.assertEqual(saved_report["devices"]["192.168.1.2"]["fail"], 10)
+            with self.assertRaises(FileNotFoundError):
+                evaluate_fleet(os.path.join(temp_dir, "missing.json"), device_items)
+        print("Test 003 - Finish testing a compliance run over many devices\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+import scan_mods.compression
+from scan_mods.compression import (
+    compress,
+    compressed_file_name,
+    compression_for_file,
+    decompress,
+    get_compression,
+    open_compressed,
+    resolve_compression,
+    set_compression,
+)
+from scan_mods.artifacts import read_artifact_text, write_artifact
+from scan_mods.output_sink import PerDeviceFileSink, RecordFileSink
+from scan_mods.packfile import PackfileReader, PackfileWriter
+from scan_mods.serializers import format_for_file
+from scan_mods.device_class import FoundDevice, load_saved_devices
+
+
+class TestCompression(unittest.TestCase):
+    """
+    Tests that files are compressed and read back
+    """
+
+    test_config = "hostname R1\n" + "interface GigabitEthernet0/1\n no shutdown\n!\n" * 200
+
+    def available_compressions(self):
+        compressions = ["none", "gzip"]
+        if scan_mods.compression.zstandard is not None:
+            compressions.append("zstd")
+        return compressions
+
+    def build_devices(self):
+        device_list = []
+        for address in ["192.168.1.65", "192.168.1.66"]:
+            device = FoundDevice(address, (1.1, 1.35, 1.82))
+            device.all_ports = {
+                "TCP": {"22": {"Return Information": "SSH-1.99-Cisco-1.25"}},
+                "UDP": {},
+            }
+            device_list.append(device)
+        return device_list
+
+    def tearDown(self):
+        set_compression("none")
+
+    def test_001_compress_and_open(self):
+        print("\nTest 001 - Start testing compress and open_compressed...")
+        data = self.test_config.encode("utf-8")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for compression in self.available_compressions():
+                compressed = compress(data, compression)
+                if compression != "none":
+                    self.assertLess(len(compressed), len(data) / 5)
+                self.assertEqual(decompress(compressed, compression), data)
+                file_location = f"{temp_dir}/{compressed_file_name('config.txt', compression)}"
+                self.assertEqual(compression_for_file(file_location), compression)
+                with open_compressed(file_location, "wt") as output_file:
+                    output_file.write(self.test_config)
+                with open_compressed(file_location, "rt") as input_file:
+                    self.assertEqual(input_file.read(), self.test_config)
+        self.assertEqual(format_for_file("run_20210101.msgpack.zst"), "msgpack")
+        print("Test 001 - Finish testing compress and open_compressed\n")
+
+    def test_002_set_compression(self):
+        print("\nTest 002 - Start testing set_compression...")
+        self.assertEqual(get_compression(), "none")
+        self.assertEqual(set_compression("gzip"), "none")
+        self.assertEqual(get_compression(), "gzip")
+        with patch("scan_mods.compression.zstandard", None):
+            self.assertEqual(resolve_compression("auto"), "gzip")
+            with self.assertRaises(ImportError):
+                set_compression("zstd")
+        with self.assertRaises(ValueError):
+            set_compression("lzma")
+        print("Test 002 - Finish testing set_compression\n")
+
+    def test_003_writers_compress(self):
+        print("\nTest 003 - Start testing that the writers compress and the readers decompress...")
+        device_list = self.build_devices()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for compression in self.available_compressions():
+                set_compression(compression)
+                run_location = f"{temp_dir}/{compressed_file_name(f'run_{compression}.ndjson')}"
+                with RecordFileSink(run_location) as test_sink:
+                    for device in device_list:
+                        test_sink.write_device(device)
+                self.assertEqual(load_saved_devices(run_location), device_list)
+                with PerDeviceFileSink(f"{temp_dir}/{compression}") as test_sink:
+                    for device in device_list:
+                        test_sink.write_device(device)
+                self.assertEqual(load_saved_devices(f"{temp_dir}/{compression}"), device_list)
+                with patch("scan_mods.output_sink._output_root", f"{temp_dir}/{compression}_output"):
+                    location = write_artifact("192.168.1.65", "192.168.1.65_running.txt", self.test_config)
+                self.assertEqual(compression_for_file(location), compression)
+                self.assertEqual(read_artifact_text(location), self.test_config)
+                with PackfileWriter(f"{temp_dir}/run_{compression}.pack") as writer:
+                    location = writer.write_artifact("192.168.1.65", "192.168.1.65_running.txt", self.test_config)
+                self.assertEqual(read_artifact_text(location), self.test_config)
+            with PackfileReader(f"{temp_dir}/run_gzip.pack") as pack:
+                self.assertLess(
+                    os.path.getsize(f"{temp_dir}/run_gzip.pack"),
+                    os.path.getsize(f"{temp_dir}/run_none.pack") / 5,
+                )
+                self.assertEqual(pack.read_text("192.168.1.65/192.168.1.65_running.txt"), self.test_config)
+        print("Test 003 - Finish testing that the writers compress and the readers decompress\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+import os
+import sys
+import tempfile
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+import scan_mods.config_diff
+from scan_mods.config_parser import clean_config_lines
+from scan_mods.config_diff import (
+    ConfigHistory,
+    apply_opcodes,
+    diff_configs,
+    line_opcodes,
+    split_sections,
+    update_histories,
+)
+
+
+class TestConfigDiff(unittest.TestCase):
+    """
+    Tests that the config diff engine works
+    """
+
+    test_config01 = """Building configuration...
+
+Current configuration : 1234 bytes
+!
+! Last configuration change at 10:26:17 UTC Thu Feb 4 2021 by admin
+!
+version 15.6
+hostname R1
+!
+interface GigabitEthernet0/0
+ description Uplink
+ ip address 192.168.1.1 255.255.255.0
+!
+interface GigabitEthernet0/1
+ no ip address
+ shutdown
+!
+router bgp 65000
+ neighbor 192.168.1.2 remote-as 65001
+ address-family ipv4
+  network 10.0.0.0
+ exit-address-family
+!
+line vty 0 4
+ login local
+!
+end
+"""
+
+    def change_config(self, config_text, version):
+        config_text = config_text.replace("10:26:17", f"11:{version:02d}:00")
+        config_text = config_text.replace(" shutdown\n", f" description Port {version}\n")
+        return config_text
+
+    def test_001_sections_and_diff(self):
+        print("\nTest 001 - Start testing the sections and the diff...")
+        sections = split_sections(self.test_config01)
+        self.assertEqual(
+            [key for key, _ in sections],
+            [
+                "version 15.6",
+                "hostname R1",
+                "interface GigabitEthernet0/0",
+                "interface GigabitEthernet0/1",
+                "router bgp 65000",
+                "line vty 0 4",
+                "end",
+            ],
+        )
+        self.assertEqual(len(dict(sections)["router bgp 65000"]), 5)
+        self.assertEqual(split_sections("banner\nbanner\n")[1][0], "banner #2")
+        # Only the volatile lines changed
+        self.assertEqual(
+            diff_configs(self.test_config01, self.test_config01.replace("10:26:17", "12:00:00")),
+            {"added": [], "removed": [], "changed": {}},
+        )
+        new_config = self.test_config01.replace(" shutdown\n", "").replace(
+            "line vty 0 4\n login local\n!\n", "ntp server 192.168.1.5\n"
+        )
+        self.assertEqual(
+            diff_configs(self.test_config01, new_config),
+            {
+                "added": ["ntp server 192.168.1.5"],
+                "removed": ["line vty 0 4"],
+                "changed": {"interface GigabitEthernet0/1": ["@@ -2,2 +2 @@", "  no ip address", "- shutdown"]},
+            },
+        )
+        old_lines = ["a", "b", "c", "d"]
+        new_lines = ["a", "x", "c", "d", "e"]
+        self.assertEqual(apply_opcodes(old_lines, line_opcodes(old_lines, new_lines)), new_lines)
+        with self.assertRaises(TypeError):
+            split_sections(None)
+        print("Test 001 - Finish testing the sections and the diff\n")
+
+    def test_002_history_snapshots_and_deltas(self):
+        print("\nTest 002 - Start testing the config history...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_history = ConfigHistory(temp_dir)
+            first = config_history.add_version("192.168.1.65", "running", self.test_config01)
+            self.assertEqual((first["version"], first["changed"], first["differences"]), (0, True, None))
+            same = config_history.add_version(
+                "192.168.1.65", "running", self.test_config01.replace("10:26:17", "12:00:00")
+            )
+            self.assertEqual((same["version"], same["changed"]), (0, False))
+            configs = [self.test_config01]
+            original_interval = scan_mods.config_diff.SNAPSHOT_INTERVAL
+            scan_mods.config_diff.SNAPSHOT_INTERVAL = 4
+            try:
+                for version in range(1, 10):
+                    configs.append(self.change_config(self.test_config01, version))
+                    result = config_history.add_version("192.168.1.65", "running", configs[-1])
+                    self.assertEqual(result["version"], version)
+                    self.assertEqual(list(result["differences"]["changed"]), ["interface GigabitEthernet0/1"])
+            finally:
+                scan_mods.config_diff.SNAPSHOT_INTERVAL = original_interval
+            self.assertEqual(
+                [entry["type"] for entry in config_history.versions("192.168.1.65", "running")],
+                ["snapshot", "delta", "delta", "delta", "snapshot", "delta", "delta", "delta", "snapshot", "delta"],
+            )
+            for version, config_text in enumerate(configs):
+                self.assertEqual(
+                    config_history.get_version("192.168.1.65", "running", version),
+                    "\n".join(clean_config_lines(config_text)),
+                )
+            self.assertEqual(
+                config_history.diff_versions("192.168.1.65", "running", 0)["changed"],
+                {
+                    "interface GigabitEthernet0/1": [
+                        "@@ -2,2 +2,2 @@",
+                        "  no ip address",
+                        "- shutdown",
+                        "+ description Port 9",
+                    ]
+                },
+            )
+            self.assertEqual(config_history.get_version("192.168.1.66", "running"), "")
+        print("Test 002 - Finish testing the config history\n")
+
+    def test_003_update_histories(self):
+        print("\nTest 003 - Start testing that many histories update in a process pool...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_items = [
+                (f"192.168.1.{host}", "running", self.test_config01) for host in range(1, 41)
+            ]
+            results = update_histories(config_items, temp_dir, processes=2)
+            self.assertEqual([result["version"] for result in results], [0] * 40)
+            config_items = [
+                (address, kind, self.change_config(config_text, 1) if address.endswith("7") else config_text)
+                for address, kind, config_text in config_items
+            ]
+            results = update_histories(config_items, temp_dir, processes=2)
+            self.assertEqual(
+                [result["address"] for result in results if result["changed"]],
+                ["192.168.1.7", "192.168.1.17", "192.168.1.27", "192.168.1.37"],
+            )
+            with self.assertRaises(ValueError):
+                update_histories(config_items + config_items[:1], temp_dir)
+        print("Test 003 - Finish testing that many histories update in a process pool\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
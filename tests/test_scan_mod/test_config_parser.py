@@ -0,0 +1,154 @@
+import unittest
+import os
+import sys
+import tempfile
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.config_parser import (
+    ConfigFleet,
+    ConfigTree,
+    clean_config_lines,
+    hash_config,
+    section_type,
+)
+
+
+class TestConfigParser(unittest.TestCase):
+    """
+    Tests that the config parser and fleet queries work
+    """
+
+    ios_config = """Building configuration...
+
+Current configuration : 1234 bytes
+!
+hostname R1
+!
+interface GigabitEthernet0/0
+ description Uplink
+ ip address 192.168.1.1 255.255.255.0
+!
+interface GigabitEthernet0/1
+ no ip address
+ shutdown
+!
+interface GigabitEthernet0/2
+ ip address 10.1.1.1 255.255.255.0
+!
+router bgp 65000
+ neighbor 192.168.1.2 remote-as 65001
+ address-family ipv4
+  network 10.0.0.0
+ exit-address-family
+!
+line vty 0 4
+ login local
+ transport input ssh
+!
+end
+"""
+    iosxr_config = """Building configuration...
+!! IOS XR Configuration 6.1.3
+!! Last configuration change at Thu Feb  4 10:26:17 2021 by admin
+!
+hostname XR1
+interface GigabitEthernet0/0/0/0
+ description Core
+ ipv4 address 10.0.0.1 255.255.255.252
+!
+interface GigabitEthernet0/0/0/1
+ ipv4 address 10.0.0.5 255.255.255.252
+!
+router bgp 65000
+ address-family ipv4 unicast
+ !
+ neighbor 10.0.0.2
+  remote-as 65000
+  address-family ipv4 unicast
+  !
+ !
+!
+end
+"""
+
+    def test_001_tree(self):
+        print("\nTest 001 - Start testing the config tree...")
+        tree = ConfigTree.parse(self.ios_config, "ios")
+        self.assertEqual(
+            [config_line.text for config_line in tree.sections("interface")],
+            ["interface GigabitEthernet0/0", "interface GigabitEthernet0/1", "interface GigabitEthernet0/2"],
+        )
+        router = tree.sections("router bgp")[0]
+        self.assertEqual(
+            [child.text for child in router.children()],
+            [" neighbor 192.168.1.2 remote-as 65001", " address-family ipv4", " exit-address-family"],
+        )
+        address_family = tree.sections("address-family ipv4")[0]
+        self.assertEqual(address_family.parent(), router)
+        self.assertEqual(address_family.depth, 1)
+        self.assertEqual([child.text for child in address_family.children()], ["  network 10.0.0.0"])
+        self.assertTrue(router.has_child(r"^network 10\."))
+        self.assertEqual(tree.sections("line vty")[0].child_values("transport input"), ["ssh"])
+        self.assertEqual(tree.sections("interface")[0].child_values("ip address"), ["192.168.1.1 255.255.255.0"])
+        self.assertEqual([config_line.text for config_line in tree.find("^login")], [" login local"])
+        self.assertEqual(tree.top_level()[0].text, "hostname R1")
+        self.assertIsNone(tree.top_level()[0].parent())
+        xr_tree = ConfigTree.parse(self.iosxr_config, "iosxr")
+        neighbor = xr_tree.sections("neighbor")[0]
+        self.assertEqual(neighbor.parent().text, "router bgp 65000")
+        self.assertEqual([child.text for child in neighbor.children()], ["  remote-as 65000", "  address-family ipv4 unicast"])
+        self.assertEqual(section_type("no ip domain-lookup"), "ip domain-lookup")
+        with self.assertRaises(ValueError):
+            ConfigTree.parse(self.ios_config, "junos")
+        print("Test 001 - Finish testing the config tree\n")
+
+    def test_002_fleet_query_and_cache(self):
+        print("\nTest 002 - Start testing the fleet query and the parse cache...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_fleet = ConfigFleet(temp_dir)
+            config_items = [(f"192.168.1.{host}", self.ios_config, "ios") for host in range(1, 6)]
+            config_items.append(("192.168.1.9", self.iosxr_config, "iosxr"))
+            self.assertEqual(config_fleet.add_configs(config_items, processes=2), 2)
+            results = config_fleet.query("interface", missing=["^shutdown$", "^description "])
+            self.assertEqual(
+                [(address, config_line.text) for address, config_line in results],
+                [(f"192.168.1.{host}", "interface GigabitEthernet0/2") for host in range(1, 6)]
+                + [("192.168.1.9", "interface GigabitEthernet0/0/0/1")],
+            )
+            results = config_fleet.query("interface", match=r"0/0$", having=["^description Uplink$"])
+            self.assertEqual(len(results), 5)
+            self.assertEqual(config_fleet.query("router ospf"), [])
+            # A new fleet reads the parsed configs from the disk cache
+            new_fleet = ConfigFleet(temp_dir)
+            self.assertEqual(new_fleet.add_configs(config_items), 0)
+            self.assertEqual(len(new_fleet), 6)
+            self.assertEqual(len(new_fleet.query("line vty", having="^transport input ssh$")), 5)
+            with self.assertRaises(TypeError):
+                new_fleet.add_configs([("192.168.1.1", None)])
+        print("Test 002 - Finish testing the fleet query and the parse cache\n")
+
+    def test_003_volatile_lines(self):
+        print("\nTest 003 - Start testing that volatile lines are dropped...")
+        later_pull = self.iosxr_config.replace("Thu Feb  4 10:26:17 2021", "Fri Feb  5 08:00:00 2021")
+        self.assertEqual(clean_config_lines(self.iosxr_config)[:2], ["!! IOS XR Configuration 6.1.3", "hostname XR1"])
+        self.assertEqual(clean_config_lines(later_pull), clean_config_lines(self.iosxr_config))
+        self.assertEqual(hash_config(later_pull), hash_config(self.iosxr_config))
+        ios_pull = self.ios_config.replace(
+            "!\nhostname R1", "! Last configuration change at 10:26:17 UTC Thu Feb 4 2021 by admin\n!\nhostname R1"
+        )
+        self.assertEqual(hash_config(ios_pull), hash_config(self.ios_config))
+        self.assertNotEqual(hash_config(self.iosxr_config.replace("XR1", "XR2")), hash_config(self.iosxr_config))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_fleet = ConfigFleet(temp_dir)
+            self.assertEqual(config_fleet.add_configs([("192.168.1.9", self.iosxr_config, "iosxr")]), 1)
+            # Only the last change line is different so the parsed config comes from the cache
+            self.assertEqual(config_fleet.add_configs([("192.168.1.9", later_pull, "iosxr")]), 0)
+        print("Test 003 - Finish testing that volatile lines are dropped\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
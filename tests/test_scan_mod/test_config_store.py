@@ -0,0 +1,126 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.config_store import (
+    ConfigStore,
+    ConfigStoreArtifacts,
+    compare_manifests,
+    hash_config,
+)
+from scan_mods.artifacts import (
+    artifact_exists,
+    read_artifact_text,
+    set_artifact_store,
+    write_artifact,
+)
+from scan_mods.compression import set_compression
+
+
+class TestConfigStore(unittest.TestCase):
+    """
+    Tests that the content addressed config store works
+    """
+
+    test_config = "hostname R1\ninterface GigabitEthernet0/1\n no shutdown\n!\n"
+
+    def count_blobs(self, config_store):
+        return sum(len(file_names) for _, _, file_names in os.walk(config_store.objects_directory))
+
+    def test_001_put_and_get(self):
+        print("\nTest 001 - Start testing put and get...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_store = ConfigStore(temp_dir)
+            config_hash, written = config_store.put(self.test_config)
+            self.assertTrue(written)
+            self.assertEqual(config_hash, hash_config(self.test_config.encode("utf-8")))
+            self.assertEqual(config_store.put(self.test_config.encode("utf-8")), (config_hash, False))
+            self.assertEqual(self.count_blobs(config_store), 1)
+            self.assertEqual(config_store.get(config_hash).decode("utf-8"), self.test_config)
+            self.assertEqual(config_store.get(f"sha256:{config_hash}").decode("utf-8"), self.test_config)
+            set_compression("gzip")
+            try:
+                gzip_hash, written = config_store.put("hostname R2\n")
+            finally:
+                set_compression("none")
+            self.assertTrue(os.path.exists(f"{temp_dir}/objects/{gzip_hash[:2]}/{gzip_hash}.gz"))
+            self.assertEqual(config_store.get(gzip_hash), b"hostname R2\n")
+            with self.assertRaises(KeyError):
+                config_store.get("0" * 64)
+            with self.assertRaises(TypeError):
+                config_store.put(None)
+        print("Test 001 - Finish testing put and get\n")
+
+    def test_002_runs_and_manifests(self):
+        print("\nTest 002 - Start testing that runs only write manifests for unchanged configs...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_store = ConfigStore(temp_dir)
+            first_run = ConfigStoreArtifacts(config_store, "run_20210101_000000")
+            previous_store = set_artifact_store(first_run)
+            try:
+                for address in ["192.168.1.65", "192.168.1.66", "192.168.1.67"]:
+                    location = write_artifact(address, f"{address}_running.txt", self.test_config + address)
+                # Read back from the store that wrote it and not the default one
+                self.assertTrue(artifact_exists(location))
+                self.assertEqual(read_artifact_text(location), self.test_config + "192.168.1.67")
+            finally:
+                set_artifact_store(previous_store)
+            first_run.save_manifest()
+            self.assertEqual(first_run.blobs_written, 3)
+            self.assertEqual(read_artifact_text(location, config_store), self.test_config + "192.168.1.67")
+            with patch("scan_mods.output_sink._output_root", os.path.join(temp_dir, "Output")):
+                self.assertFalse(artifact_exists(location))
+                self.assertTrue(artifact_exists(location, config_store))
+            with self.assertRaises(TypeError):
+                read_artifact_text(location, temp_dir)
+
+            second_run = ConfigStoreArtifacts(config_store, "run_20210102_000000")
+            second_run.write_artifact("192.168.1.65", "192.168.1.65_running.txt", self.test_config + "192.168.1.65")
+            second_run.write_artifact("192.168.1.66", "192.168.1.66_running.txt", self.test_config + "changed")
+            second_run.write_artifact("192.168.1.68", "192.168.1.68_running.txt", self.test_config + "192.168.1.68")
+            second_run.save_manifest()
+            self.assertEqual(second_run.blobs_written, 2)
+            self.assertEqual(self.count_blobs(config_store), 5)
+            # A config that was not pulled again is added to the manifest from its old location
+            third_run = ConfigStoreArtifacts(config_store, "run_20210103_000000")
+            self.assertEqual(third_run.reference("192.168.1.65", "192.168.1.65_running.txt", location), location)
+            self.assertEqual(
+                third_run.manifest["192.168.1.65"]["192.168.1.65_running.txt"], location[len("sha256:") :]
+            )
+            self.assertEqual(third_run.blobs_written, 0)
+            with self.assertRaises(KeyError):
+                third_run.reference("192.168.1.65", "192.168.1.65_running.txt", "sha256:" + "0" * 64)
+            with open(f"{temp_dir}/192.168.1.69_running.txt", "w") as output_file:
+                output_file.write("hostname R9\n")
+            file_location = third_run.reference(
+                "192.168.1.69", "192.168.1.69_running.txt", f"{temp_dir}/192.168.1.69_running.txt"
+            )
+            self.assertEqual(config_store.get(file_location), b"hostname R9\n")
+            self.assertEqual(config_store.manifests(), ["run_20210101_000000", "run_20210102_000000"])
+            comparison = compare_manifests(
+                config_store.load_manifest("run_20210101_000000"),
+                config_store.load_manifest("run_20210102_000000"),
+            )
+            self.assertEqual(
+                comparison,
+                {
+                    "changed": ["192.168.1.66"],
+                    "unchanged": ["192.168.1.65"],
+                    "new": ["192.168.1.68"],
+                    "missing": ["192.168.1.67"],
+                },
+            )
+        with self.assertRaises(TypeError):
+            compare_manifests({}, None)
+        print("Test 002 - Finish testing that runs only write manifests for unchanged configs\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,14 +4,21 @@ import ipaddress
 import os
 import sys
 import json
+import tempfile
 from unittest.mock import patch
+from array import array
 
 currentdir = os.path.dirname(os.path.realpath(__file__))
 parentdir = os.path.dirname(currentdir)
 grandparentdir = os.path.dirname(parentdir)
 sys.path.append(grandparentdir)
 
-from scan_mods.device_class import FoundDevice
+from scan_mods.device_class import (
+    FoundDevice,
+    PortState,
+    RECORD_SCHEMA_VERSION,
+    load_saved_devices,
+)
 
 
 class TestFoundDevice(unittest.TestCase):
@@ -198,7 +205,7 @@ class TestFoundDevice(unittest.TestCase):
         self.assertIsInstance(test_class._response_time, tuple)
         self.assertEqual(test_class._response_time, self.test_time01)
         for test_item in [
-            test_class._all_ports,
+            test_class.all_ports,
             test_class._username,
             test_class._password,
             test_class._enable_password,
@@ -208,10 +215,10 @@ class TestFoundDevice(unittest.TestCase):
             self.assertIsNone(test_item)
 
         for test_item in [
-            test_class._open_tcp_ports,
-            test_class._open_udp_ports,
-            test_class._closed_tcp_ports,
-            test_class._closed_udp_ports,
+            test_class.open_tcp_ports,
+            test_class.open_udp_ports,
+            test_class.closed_tcp_ports,
+            test_class.closed_udp_ports,
         ]:
             self.assertEqual(len(test_item), 0)
             self.assertIsInstance(test_item, dict)
@@ -233,15 +240,15 @@ class TestFoundDevice(unittest.TestCase):
         self.assertIsInstance(test_class._response_time, tuple)
         self.assertEqual(test_class._response_time, self.test_time01)
         for test_item in [
-            test_class._all_ports,
+            test_class.all_ports,
             test_class.device_info,
         ]:
             self.assertIsNone(test_item)
         for test_item in [
-            test_class._open_tcp_ports,
-            test_class._open_udp_ports,
-            test_class._closed_tcp_ports,
-            test_class._closed_udp_ports,
+            test_class.open_tcp_ports,
+            test_class.open_udp_ports,
+            test_class.closed_tcp_ports,
+            test_class.closed_udp_ports,
         ]:
             self.assertEqual(len(test_item), 0)
             self.assertIsInstance(test_item, dict)
@@ -416,8 +423,11 @@ class TestFoundDevice(unittest.TestCase):
         print("\nTest 015 - Start testing that class ports getter works")
         test_class = FoundDevice(self.test_ip01, self.test_time01)
         self.assertIsNone(test_class.all_ports)
-        test_class._all_ports = {"a": {22: "Open"}}
-        self.assertEqual(test_class.all_ports, {"a": {22: "Open"}})
+        test_class.all_ports = {"TCP": {"22": {"Return Information": "Open"}}}
+        self.assertEqual(
+            test_class.all_ports,
+            {"TCP": {"22": {"Return Information": "Open"}}, "UDP": {}},
+        )
         print("Test 015 - Finish testing that class ports getter works\n")
 
     def test_016_get_ports_works(self):
@@ -488,14 +498,14 @@ class TestFoundDevice(unittest.TestCase):
                 },
             },
         }
-        self.assertEqual(test_class._all_ports, self.test_ports01)
-        self.assertEqual(test_class._closed_tcp_ports, self.test_closed_TCP_ports01)
-        self.assertEqual(test_class._closed_udp_ports, self.test_closed_UDP_ports01)
-        self.assertEqual(test_class._open_tcp_ports, self.test_open_TCP_ports01)
-        self.assertEqual(test_class._open_udp_ports, self.test_open_UDP_ports01)
+        self.assertEqual(test_class.all_ports, self.test_ports01)
+        self.assertEqual(test_class.closed_tcp_ports, self.test_closed_TCP_ports01)
+        self.assertEqual(test_class.closed_udp_ports, self.test_closed_UDP_ports01)
+        self.assertEqual(test_class.open_tcp_ports, self.test_open_TCP_ports01)
+        self.assertEqual(test_class.open_udp_ports, self.test_open_UDP_ports01)
 
         test_class.all_ports = self.test_ports02
-        self.assertEqual(test_class._all_ports, self.test_ports03)
+        self.assertEqual(test_class.all_ports, self.test_ports03)
         print("Test 017 - Finish testing that class all_ports setter works\n")
 
     def test_018_all_ports_errors(self):
@@ -541,15 +551,18 @@ class TestFoundDevice(unittest.TestCase):
         )
 
         test_class = FoundDevice(self.test_ip01, self.test_time01)
-        test_class._all_ports = self.test_ports01
+        test_class._tcp_ports = array("I")
+        test_class._udp_ports = array("I")
+        test_class.set_private_closed_open_ports(self.test_ports01)
 
-        self.assertEqual(test_class._all_ports, self.test_ports01)
-        test_class.set_private_closed_open_ports()
-
-        self.assertEqual(test_class._closed_tcp_ports, self.test_closed_TCP_ports01)
-        self.assertEqual(test_class._closed_udp_ports, self.test_closed_UDP_ports01)
-        self.assertEqual(test_class._open_tcp_ports, self.test_open_TCP_ports01)
-        self.assertEqual(test_class._open_udp_ports, self.test_open_UDP_ports01)
+        self.assertEqual(test_class.all_ports, self.test_ports01)
+        self.assertEqual(test_class.closed_tcp_ports, self.test_closed_TCP_ports01)
+        self.assertEqual(test_class.closed_udp_ports, self.test_closed_UDP_ports01)
+        self.assertEqual(test_class.open_tcp_ports, self.test_open_TCP_ports01)
+        self.assertEqual(test_class.open_udp_ports, self.test_open_UDP_ports01)
+        # Headers are only kept for the open ports
+        self.assertEqual(set(test_class._tcp_banners.keys()), {21, 22, 53, 80})
+        self.assertEqual(set(test_class._udp_banners.keys()), {53})
         print(
             "Test 019 - Finish testing that class set_private_closed_open_ports works\n"
         )
@@ -898,6 +911,170 @@ class TestFoundDevice(unittest.TestCase):
             "Test 036 - Finish testing that the print_json_long function works correctly\n"
         )
 
+    def test_037_port_state_and_slots(self):
+        """
+        Tests that the port states are kept in the compact representation
+        """
+        print("\nTest 037 - Start testing the compact port state representation...")
+        test_class = FoundDevice(self.test_ip01, self.test_time01)
+        with self.assertRaises(AttributeError):
+            test_class.some_new_attribute = 1
+        self.assertEqual(test_class.port_state("TCP", 22), PortState.NOT_SCANNED)
+        test_class.all_ports = self.test_ports01
+        self.assertEqual(test_class.port_state("TCP", "22"), PortState.OPEN)
+        self.assertEqual(test_class.port_state("TCP", 23), PortState.CLOSED)
+        self.assertEqual(test_class.port_state("UDP", 43), PortState.FILTERED)
+        self.assertEqual(test_class.port_state("UDP", 8443), PortState.NOT_SCANNED)
+
+        # A port that changes state only shows up in one place
+        test_class.all_ports = {"TCP": {"22": self.test_closed_TCP_ports01["20"]}}
+        self.assertEqual(test_class.port_state("TCP", 22), PortState.CLOSED)
+        self.assertNotIn("22", test_class.open_tcp_ports)
+        self.assertIn("22", test_class.closed_tcp_ports)
+        self.assertNotIn(22, test_class._tcp_banners)
+
+        with self.assertRaises(KeyError):
+            test_class.all_ports = {"TCP": {"not_a_port": {"ERROR": "Socket Timed Out"}}}
+        print("Test 037 - Finish testing the compact port state representation\n")
+
+    def test_038_merge_ports(self):
+        """
+        Tests that partial results can be merged and only changed ports are reported
+        """
+        print("\nTest 038 - Start testing that merge_ports works...")
+        test_class = FoundDevice(self.test_ip01, self.test_time01)
+        changed = test_class.merge_ports({"TCP": {"22": self.test_open_TCP_ports01["22"]}})
+        self.assertEqual(changed, [("TCP", 22)])
+        changed = test_class.merge_ports(self.test_ports01)
+        self.assertEqual(len(changed), 7)
+        self.assertNotIn(("TCP", 22), changed)
+        self.assertEqual(test_class.merge_ports(self.test_ports01), [])
+        self.assertEqual(test_class.all_ports, self.test_ports01)
+
+        self.assertTrue(
+            test_class.update_port("TCP", "20", {"Return Information": "220 Hello"})
+        )
+        self.assertFalse(
+            test_class.update_port("TCP", "20", {"Return Information": "220 Hello"})
+        )
+        self.assertIn("20", test_class.open_tcp_ports)
+        self.assertNotIn("20", test_class.closed_tcp_ports)
+        test_class.update_port("TCP", "20", self.test_closed_TCP_ports01["20"])
+        self.assertNotIn("20", test_class.open_tcp_ports)
+        self.assertIn("20", test_class.closed_tcp_ports)
+
+        def fake_port_scanner(address, domain_name, result_callback=None):
+            for protocol, ports in self.test_ports01.items():
+                for port, header in ports.items():
+                    result_callback({protocol: {port: header}})
+            return self.test_ports01
+
+        with patch("scan_mods.device_class.port_scanner") as mock_port_scanner:
+            mock_port_scanner.side_effect = fake_port_scanner
+            test_class = FoundDevice(self.test_ip01, self.test_time01)
+            with patch.object(
+                FoundDevice,
+                "set_private_closed_open_ports",
+                autospec=True,
+                side_effect=FoundDevice.set_private_closed_open_ports,
+            ) as mock_set_ports:
+                test_class.get_ports()
+            self.assertEqual(test_class.all_ports, self.test_ports01)
+            # Each port was looked at once, as it streamed in
+            merged_ports = [
+                (protocol, port)
+                for call in mock_set_ports.call_args_list
+                for protocol, ports in call.args[1].items()
+                for port in ports
+            ]
+            self.assertEqual(len(merged_ports), len(set(merged_ports)))
+            self.assertEqual(
+                len(merged_ports), sum(len(ports) for ports in self.test_ports01.values())
+            )
+        print("Test 038 - Finish testing that merge_ports works\n")
+
+    def test_039_to_record_from_json(self):
+        """
+        Tests that a device can be saved and read back
+        """
+        print("\nTest 039 - Start testing to_record and from_json...")
+        test_class = FoundDevice(
+            self.test_ip01,
+            self.test_time01,
+            "jmctsm",
+            "ciscocisco",
+            use_enable=True,
+            enable_password="ciscocisco",
+            domain_name="test.local",
+        )
+        test_class.all_ports = self.test_ports01
+        test_class.device_info = {"Version_Info": ["Cisco IOS"]}
+        test_record = test_class.to_record()
+        self.assertEqual(test_record["schema_version"], RECORD_SCHEMA_VERSION)
+        self.assertNotIn("ciscocisco", json.dumps(test_record))
+
+        for test_input in [test_record, json.dumps(test_record)]:
+            loaded_class = FoundDevice.from_json(test_input)
+            self.assertEqual(loaded_class, test_class)
+            self.assertEqual(loaded_class.username, "jmctsm")
+            self.assertEqual(loaded_class.domain_name, "test.local")
+            self.assertIsNone(loaded_class._password)
+            self.assertEqual(loaded_class.device_info, test_class.device_info)
+
+        loaded_class = FoundDevice.from_json(test_class.print_json_long())
+        self.assertEqual(loaded_class, test_class)
+        self.assertEqual(loaded_class.device_info, test_class.device_info)
+        loaded_class = FoundDevice.from_json(test_class.print_json_short())
+        self.assertEqual(loaded_class.open_tcp_ports.keys(), test_class.open_tcp_ports.keys())
+        self.assertEqual(
+            loaded_class.closed_udp_ports.keys(), test_class.closed_udp_ports.keys()
+        )
+        self.assertEqual(loaded_class.device_info, {"Version_Info": ["Cisco IOS"]})
+
+        test_record["schema_version"] = RECORD_SCHEMA_VERSION + 1
+        test_bad_list = [
+            (test_record, ValueError),
+            (1, TypeError),
+            ({"a": {}, "b": {}}, ValueError),
+        ]
+        for test_tuple in test_bad_list:
+            with self.assertRaises(test_tuple[1]):
+                FoundDevice.from_json(test_tuple[0])
+        print("Test 039 - Finish testing to_record and from_json\n")
+
+    def test_040_load_saved_devices(self):
+        """
+        Tests that the bulk loaders read directories, JSON files and NDJSON files
+        """
+        print("\nTest 040 - Start testing load_saved_devices...")
+        test_class01 = FoundDevice(self.test_ip01, self.test_time01)
+        test_class01.all_ports = self.test_ports01
+        test_class02 = FoundDevice("192.168.1.68", self.test_time02)
+        test_class02.all_ports = self.test_ports02
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for test_class in [test_class01, test_class02]:
+                os.makedirs(f"{temp_dir}/{test_class.IP}")
+                with open(f"{temp_dir}/{test_class.IP}/{test_class.IP}_json_long.txt", "w") as output_file:
+                    output_file.write(test_class.print_json_long())
+                with open(f"{temp_dir}/{test_class.IP}/{test_class.IP}_json_short.txt", "w") as output_file:
+                    output_file.write(test_class.print_json_short())
+            loaded_list = load_saved_devices(temp_dir)
+            self.assertEqual(len(loaded_list), 2)
+            self.assertIn(test_class01, loaded_list)
+            self.assertIn(test_class02, loaded_list)
+
+            with open(f"{temp_dir}/run.ndjson", "w") as output_file:
+                for test_class in [test_class01, test_class02]:
+                    output_file.write(json.dumps(test_class.to_record()) + "\n")
+            self.assertEqual(
+                load_saved_devices(f"{temp_dir}/run.ndjson"), [test_class01, test_class02]
+            )
+            self.assertEqual(
+                load_saved_devices(f"{temp_dir}/{test_class01.IP}/{test_class01.IP}_json_long.txt"),
+                [test_class01],
+            )
+        print("Test 040 - Finish testing load_saved_devices\n")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.grab_scheduler import GrabScheduler, platform_key, subnet_key
+from scan_mods.grabbing_mods.parse_pool import PendingParse, set_parse_pool
+
+
+class ConcurrencyCounter:
+    """
+    Keeps the most grabs that were running at once, overall and for each key
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = {}
+        self.highest = {}
+
+    def change(self, keys, amount):
+        with self.lock:
+            for key in keys:
+                self.running[key] = self.running.get(key, 0) + amount
+                self.highest[key] = max(self.highest.get(key, 0), self.running[key])
+
+
+class FakeDevice:
+    def __init__(self, address, counter, banner="SSH-2.0-Cisco-1.25", delay=0.05, fail=False):
+        self.IP = address
+        self.open_tcp_ports = {"22": {"name": banner}}
+        self.counter = counter
+        self.delay = delay
+        self.fail = fail
+        self.device_info = None
+
+    def device_info_grabber(self):
+        keys = ["all", subnet_key(self), platform_key(self)]
+        self.counter.change(keys, 1)
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise ConnectionError("login refused")
+            self.device_info = {"Version_Info": ["fake"]}
+        finally:
+            self.counter.change(keys, -1)
+
+
+class TestGrabScheduler(unittest.TestCase):
+    """
+    Tests the caps of the grab scheduler and that results come back as devices finish
+    """
+
+    def test_001_keys(self):
+        print("\nTest 001 - Start testing the subnet and platform keys...")
+        counter = ConcurrencyCounter()
+        self.assertEqual(subnet_key(FakeDevice("10.1.2.3", counter)), "10.1.2.0/24")
+        self.assertEqual(subnet_key(FakeDevice("10.1.2.3", counter), 16), "10.1.0.0/16")
+        self.assertEqual(platform_key(FakeDevice("10.1.2.3", counter)), "Cisco")
+        self.assertEqual(platform_key(FakeDevice("10.1.2.3", counter, "SSH-2.0-OpenSSH_8.2p1 Ubuntu")), "Linux")
+        device = FakeDevice("10.1.2.3", counter)
+        device.open_tcp_ports = {}
+        self.assertIsNone(platform_key(device))
+        with self.assertRaises(ValueError):
+            GrabScheduler(0)
+        with self.assertRaises(TypeError):
+            GrabScheduler(4, per_subnet="2")
+        print("Test 001 - Finish testing the subnet and platform keys\n")
+
+    def test_002_caps(self):
+        print("\nTest 002 - Start testing the global, subnet and platform caps...")
+        counter = ConcurrencyCounter()
+        devices = []
+        for site in range(4):
+            for host in range(1, 6):
+                banner = "SSH-2.0-Cisco-1.25" if host % 2 else "SSH-2.0-OpenSSH_8.2p1 Ubuntu"
+                devices.append(FakeDevice(f"10.0.{site}.{host}", counter, banner))
+        start_time = time.monotonic()
+        with GrabScheduler(8, per_subnet=2) as scheduler:
+            for device in devices:
+                scheduler.submit(device)
+        elapsed = time.monotonic() - start_time
+        self.assertEqual(scheduler.completed, 20)
+        self.assertLessEqual(counter.highest["all"], 8)
+        for site in range(4):
+            self.assertLessEqual(counter.highest[f"10.0.{site}.0/24"], 2)
+        # Devices in other subnets ran while one subnet was full, so it took far less than 20 grabs one at a time
+        self.assertGreater(counter.highest["all"], 2)
+        self.assertLess(elapsed, 20 * 0.05)
+        counter = ConcurrencyCounter()
+        with GrabScheduler(8, per_platform=3) as scheduler:
+            for device in devices:
+                device.counter = counter
+                scheduler.submit(device)
+        self.assertLessEqual(counter.highest["Cisco"], 3)
+        self.assertLessEqual(counter.highest["Linux"], 3)
+        print("Test 002 - Finish testing the global, subnet and platform caps\n")
+
+    def test_003_streaming_and_errors(self):
+        print("\nTest 003 - Start testing results as devices finish and failed grabs...")
+        counter = ConcurrencyCounter()
+        finished = []
+        callers = ConcurrencyCounter()
+
+        def on_done(device, error):
+            callers.change(["on_done"], 1)
+            finished.append((device.IP, error, time.monotonic()))
+            time.sleep(0.01)
+            callers.change(["on_done"], -1)
+
+        slow = FakeDevice("10.0.0.1", counter, delay=0.5)
+        broken = FakeDevice("10.0.1.1", counter, fail=True)
+        fast = FakeDevice("10.0.2.1", counter, delay=0.01)
+        start_time = time.monotonic()
+        with GrabScheduler(4, on_done=on_done) as scheduler:
+            for device in [slow, broken, fast]:
+                scheduler.submit(device)
+        self.assertEqual([item[0] for item in finished][-1], "10.0.0.1")
+        # The fast device was handed on before the slow one finished
+        fast_time = [item[2] for item in finished if item[0] == "10.0.2.1"][0]
+        self.assertLess(fast_time - start_time, 0.4)
+        self.assertEqual(callers.highest["on_done"], 1)
+        self.assertIn("10.0.1.1", scheduler.errors)
+        self.assertIsInstance(scheduler.errors["10.0.1.1"], ConnectionError)
+        self.assertTrue(broken.device_info["Version_Info"].startswith("[ERROR] ConnectionError"))
+        self.assertEqual(scheduler.completed, 3)
+        print("Test 003 - Finish testing results as devices finish and failed grabs\n")
+
+    def test_004_parses_after_the_session(self):
+        print("\nTest 004 - Start testing slots freed while output is parsed...")
+
+        class SlowResult:
+            def get(self, timeout=None):
+                time.sleep(0.3)
+                return [{"parsed": True}]
+
+        class ParsingDevice(FakeDevice):
+            def device_info_grabber(self, wait_for_parses=True):
+                super().device_info_grabber()
+                self.started = time.monotonic()
+                pending = PendingParse(SlowResult(), "cisco_ios", "show version", "")
+                self.device_info = {"CONFIG": {"Show_Info": {"show_version": pending}}}
+
+        counter = ConcurrencyCounter()
+        finished = []
+        devices = [ParsingDevice(f"10.0.0.{host}", counter, delay=0.01) for host in range(1, 4)]
+        previous_pool = set_parse_pool(object())
+        try:
+            with GrabScheduler(1, on_done=lambda device, error: finished.append(time.monotonic())) as scheduler:
+                for device in devices:
+                    scheduler.submit(device)
+        finally:
+            set_parse_pool(previous_pool)
+        self.assertEqual(scheduler.completed, 3)
+        self.assertEqual(counter.highest["all"], 1)
+        # Every device logged in before the first one was done parsing
+        self.assertLess(devices[2].started, min(finished))
+        for device in devices:
+            self.assertEqual(device.device_info["CONFIG"]["Show_Info"]["show_version"], [{"parsed": True}])
+        print("Test 004 - Finish testing slots freed while output is parsed\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+import time
+from unittest.mock import patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+greatgrandparentdir = os.path.dirname(grandparentdir)
+sys.path.append(greatgrandparentdir)
+
+from scan_mods.grabbing_mods.capability_cache import (
+    SUPPORTED,
+    TIMED_OUT,
+    UNSUPPORTED,
+    CapabilityCache,
+    os_version_key,
+    set_capability_cache,
+)
+from scan_mods.grabbing_mods.device_specific_info_getter import device_info_getter
+
+import netmiko
+
+
+class TestCapabilityCache(unittest.TestCase):
+    """
+    Tests learning which commands a platform and OS version answers
+    """
+
+    def test_001_os_version_key(self):
+        print("\nTest 001 - Start testing reading the OS version from Version_Info...")
+        self.assertEqual(
+            os_version_key(
+                [
+                    "Cisco IOS Software, IOSv Software (VIOS-ADVENTERPRISEK9-M), Version 15.6(2)T, RELEASE SOFTWARE (fc2)",
+                    "Technical Support: http://www.cisco.com/techsupport",
+                ]
+            ),
+            "15.6(2)T",
+        )
+        self.assertEqual(
+            os_version_key(["Cisco Nexus Operating System (NX-OS) Software", "NXOS: version 7.0(3)I7(4)"]),
+            "7.0(3)I7(4)",
+        )
+        self.assertEqual(
+            os_version_key(["Linux ubuntu 5.4.0-42-generic #46-Ubuntu SMP Fri Jul 10 00:24:02 UTC 2020 x86_64"]),
+            "5.4.0-42-generic",
+        )
+        self.assertIsNone(os_version_key("[ERROR] TimeoutError: Connection timed out"))
+        self.assertIsNone(os_version_key(["No Version information was available"]))
+        print("Test 001 - Finish testing reading the OS version from Version_Info\n")
+
+    def test_002_cache(self):
+        print("\nTest 002 - Start testing recording, skipping, expiring and saving...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_location = f"{temp_dir}/command_capabilities.json"
+            cache = CapabilityCache(cache_location)
+            cache.observe_device("10.0.0.1", "cisco_ios", "15.6(2)T")
+            cache.record("cisco_ios", "15.6(2)T", "show_version", SUPPORTED)
+            cache.record("cisco_ios", "15.6(2)T", "show_vpc", UNSUPPORTED)
+            cache.record("cisco_ios", "15.6(2)T", "show_ip_route", TIMED_OUT)
+            self.assertEqual(cache.commands_to_skip("cisco_ios", "15.6(2)T"), {"show_vpc"})
+            cache.record("cisco_ios", "15.6(2)T", "show_ip_route", TIMED_OUT)
+            self.assertEqual(cache.commands_to_skip("cisco_ios", "15.6(2)T"), {"show_vpc", "show_ip_route"})
+            # Output again starts the count over
+            cache.record("cisco_ios", "15.6(2)T", "show_ip_route", SUPPORTED)
+            self.assertEqual(cache.commands_to_skip("cisco_ios", "15.6(2)T"), {"show_vpc"})
+            self.assertEqual(cache.commands_to_skip("cisco_nxos", "15.6(2)T"), set())
+            with self.assertRaises(ValueError):
+                cache.record("cisco_ios", "15.6(2)T", "show_vpc", "broken")
+            cache.save()
+            cache = CapabilityCache(cache_location)
+            self.assertEqual(cache.commands_to_skip("cisco_ios", "15.6(2)T"), {"show_vpc"})
+            # Another device still on the old version keeps it
+            cache.observe_device("10.0.0.2", "cisco_ios", "15.6(2)T")
+            self.assertTrue(cache.observe_device("10.0.0.1", "cisco_ios", "15.9(3)M"))
+            self.assertEqual(cache.commands_to_skip("cisco_ios", "15.6(2)T"), {"show_vpc"})
+            self.assertFalse(cache.observe_device("10.0.0.2", "cisco_ios", "15.6(2)T"))
+            cache.observe_device("10.0.0.2", "cisco_ios", "15.9(3)M")
+            self.assertEqual(cache.commands_to_skip("cisco_ios", "15.6(2)T"), set())
+            # Entries that were not seen for too long are dropped when loaded
+            cache.record("cisco_xr", "6.1.2", "show_vpc", UNSUPPORTED)
+            cache.save()
+            with open(cache_location) as input_file:
+                state = json.load(input_file)
+            state["versions"]["cisco_xr|6.1.2"]["updated"] = time.time() - 100 * 86400
+            with open(cache_location, "w") as output_file:
+                json.dump(state, output_file)
+            cache = CapabilityCache(cache_location)
+            self.assertEqual(cache.commands_to_skip("cisco_xr", "6.1.2"), set())
+            with self.assertRaises(TypeError):
+                CapabilityCache(1)
+            with self.assertRaises(TypeError):
+                set_capability_cache({})
+        print("Test 002 - Finish testing recording, skipping, expiring and saving\n")
+
+    def test_003_device_info_getter(self):
+        print("\nTest 003 - Start testing device_info_getter skips known bad commands...")
+
+        def send_command(command):
+            if command == "show inventory":
+                return "                ^\n% Invalid input detected at '^' marker.\n"
+            if command == "show cdp neighbors detail":
+                raise netmiko.ssh_exception.NetmikoTimeoutException
+            return f"output of {command}\n"
+
+        def grab(os_version):
+            with patch(
+                "scan_mods.grabbing_mods.device_specific_info_getter.netmiko.ConnectHandler"
+            ) as mock_ssh:
+                mock_ssh.return_value.send_command.side_effect = send_command
+                device_info_getter(
+                    address="192.168.0.254",
+                    username="admin",
+                    password="password",
+                    device_type="ios",
+                    command_profile="minimal",
+                    os_version=os_version,
+                )
+                return [call.args[0] for call in mock_ssh.return_value.send_command.call_args_list]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = CapabilityCache(f"{temp_dir}/command_capabilities.json")
+            previous_cache = set_capability_cache(cache)
+            try:
+                self.assertEqual(len(grab("15.6(2)T")), 4)
+                self.assertEqual(
+                    grab("15.6(2)T"),
+                    ["show version", "show ip interface brief", "show cdp neighbors detail"],
+                )
+                self.assertEqual(grab("15.6(2)T"), ["show version", "show ip interface brief"])
+                self.assertEqual(cache.skipped, 3)
+                # Commands outside the profile are not counted as skipped
+                cache.record("cisco_ios", "15.6(2)T", "show_clock", UNSUPPORTED)
+                self.assertEqual(grab("15.6(2)T"), ["show version", "show ip interface brief"])
+                self.assertEqual(cache.skipped, 5)
+                # The device was upgraded so everything is tried again
+                self.assertEqual(len(grab("15.9(3)M")), 4)
+                # Nothing is cached when the version is not known
+                self.assertEqual(len(grab(None)), 4)
+            finally:
+                set_capability_cache(previous_cache)
+        print("Test 003 - Finish testing device_info_getter skips known bad commands\n")
+
+    def test_004_netmiko_read_timeout(self):
+        print("\nTest 004 - Start testing the OSError of a netmiko read timeout is a timeout...")
+
+        def send_command(command):
+            if command == "show inventory":
+                raise OSError("Search pattern never detected in send_command: R1\\#")
+            if command == "show cdp neighbors detail":
+                raise OSError("Socket is closed")
+            return f"output of {command}\n"
+
+        def grab():
+            with patch(
+                "scan_mods.grabbing_mods.device_specific_info_getter.netmiko.ConnectHandler"
+            ) as mock_ssh:
+                mock_ssh.return_value.send_command.side_effect = send_command
+                output = device_info_getter(
+                    address="192.168.0.254",
+                    username="admin",
+                    password="password",
+                    device_type="ios",
+                    command_profile="minimal",
+                    os_version="15.6(2)T",
+                )
+                sent = [call.args[0] for call in mock_ssh.return_value.send_command.call_args_list]
+                return output, sent
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = CapabilityCache(f"{temp_dir}/command_capabilities.json")
+            previous_cache = set_capability_cache(cache)
+            try:
+                output, sent = grab()
+                self.assertEqual(len(sent), 4)
+                self.assertEqual(
+                    output["show_inventory"],
+                    "Timed-out reading channel, data not available.",
+                )
+                commands = cache.versions["cisco_ios|15.6(2)T"]["commands"]
+                self.assertEqual(commands["show_inventory"]["status"], TIMED_OUT)
+                # An OSError that is not a read timeout is not taken as the device not answering
+                self.assertNotIn("show_cdp_neighbors_detail", commands)
+                self.assertEqual(len(grab()[1]), 4)
+                # It timed out TIMEOUT_SKIP_AFTER times in a row so it is not sent again
+                self.assertNotIn("show inventory", grab()[1])
+            finally:
+                set_capability_cache(previous_cache)
+        print("Test 004 - Finish testing the OSError of a netmiko read timeout is a timeout\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+greatgrandparentdir = os.path.dirname(grandparentdir)
+sys.path.append(greatgrandparentdir)
+
+from scan_mods.grabbing_mods.device_grabber import shell_show_version
+from scan_mods.grabbing_mods.channel_reader import (
+    ExpectShell,
+    PromptTimeout,
+    clean_command_output,
+    find_prompt,
+    read_until_prompt,
+)
+
+
+class FakeChannel:
+    """
+    Channel that answers each line sent with the chunks scripted for it, after a delay
+    """
+
+    def __init__(self, banner, answers, delay=0.0, enable_password="cisco"):
+        self.answers = answers
+        self.delay = delay
+        self.enable_password = enable_password
+        self.prompt = "R1>"
+        self.sent = []
+        self.closed = False
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._queue(banner)
+
+    def _queue(self, chunks, delay=0.0):
+        ready_time = time.monotonic() + delay
+        with self._lock:
+            for chunk in chunks:
+                self._buffer.append((ready_time, chunk.encode()))
+
+    def recv_ready(self):
+        with self._lock:
+            return bool(self._buffer) and self._buffer[0][0] <= time.monotonic()
+
+    def recv(self, size):
+        with self._lock:
+            return self._buffer.pop(0)[1]
+
+    def send(self, data):
+        self.sent.append(data)
+        line = data.rstrip("\n")
+        if self.sent[-2:-1] == ["enable\n"]:
+            if line == self.enable_password:
+                self.prompt = "R1#"
+                self._queue(["\r\n", self.prompt], self.delay)
+            else:
+                self._queue(["\r\n% Access denied\r\n", "Password: "], self.delay)
+        elif line == "enable":
+            self._queue(["enable\r\n", "Password: "], self.delay)
+        elif line in self.answers:
+            chunks = [f"{line}\r\n"] + self.answers[line]
+            # A device waits at the pager and does not print the prompt
+            if "More" not in chunks[-1]:
+                chunks.append(self.prompt)
+            self._queue(chunks, self.delay)
+        elif data == " ":
+            self._queue(self.answers.get("<more>", []) + [self.prompt], self.delay)
+        elif line == "":
+            self._queue(["\r\n", self.prompt], self.delay)
+        else:
+            self._queue([f"{line}\r\n% Invalid input detected at '^' marker.\r\n", self.prompt], self.delay)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    def __init__(self, channel):
+        self.channel = channel
+
+    def invoke_shell(self):
+        return self.channel
+
+
+class TestChannelReader(unittest.TestCase):
+    """
+    Tests that the shell is read until the prompt and not for a fixed time
+    """
+
+    show_version = [
+        "Cisco IOS Software, IOSv Software (VIOS-ADVENTERPRISEK9-M), Version 15.6(2)T\r\n",
+        "Technical Support: http://www.cisco.com/techsupport\r\n",
+        "ROM: Bootstrap program is IOSv\r\n",
+    ]
+
+    def test_001_prompts(self):
+        print("\nTest 001 - Start testing finding prompts...")
+        self.assertEqual(find_prompt("banner\r\nRouter>"), "Router>")
+        self.assertEqual(find_prompt("stuff\nRP/0/RSP0/CPU0:XR1#"), "RP/0/RSP0/CPU0:XR1#")
+        self.assertEqual(find_prompt("switch(config)# "), "switch(config)#")
+        self.assertIsNone(find_prompt("Cisco IOS Software, Version 15.6(2)T"))
+        self.assertEqual(
+            clean_command_output("show version\r\nline 1\r\n\r\nline 2\r\nR1#", "show version", "R1#"),
+            ["line 1", "line 2"],
+        )
+        print("Test 001 - Finish testing finding prompts\n")
+
+    def test_002_enable_and_command(self):
+        print("\nTest 002 - Start testing enable and a command...")
+        channel = FakeChannel(["\r\nWelcome\r\n", "R1>"], {"show version": self.show_version}, delay=0.02)
+        start_time = time.monotonic()
+        shell = ExpectShell(channel)
+        self.assertEqual(shell.prompt, "R1>")
+        self.assertTrue(shell.enable("cisco"))
+        self.assertEqual(shell.prompt, "R1#")
+        output = shell.send_command("show version")
+        # Three round trips of 20 ms and not 2.5 seconds of sleeps
+        self.assertLess(time.monotonic() - start_time, 1.0)
+        self.assertEqual(len(output), 3)
+        self.assertTrue(output[0].startswith("Cisco IOS Software"))
+        self.assertEqual(channel.sent, ["enable\n", "cisco\n", "show version\n"])
+        # Already in enable mode so enable is not sent
+        channel = FakeChannel(["R1#"], {})
+        channel.prompt = "R1#"
+        shell = ExpectShell(channel)
+        self.assertTrue(shell.enable("cisco"))
+        self.assertEqual(channel.sent, [])
+        # Wrong password
+        channel = FakeChannel(["R1>"], {})
+        shell = ExpectShell(channel)
+        self.assertFalse(shell.enable("wrong"))
+        self.assertEqual(shell.prompt, "R1>")
+        print("Test 002 - Finish testing enable and a command\n")
+
+    def test_003_long_output_and_pager(self):
+        print("\nTest 003 - Start testing long output and the pager...")
+        long_output = [f"line {number}\r\n" for number in range(5000)]
+        channel = FakeChannel(
+            ["R1#"],
+            {"show running-config": long_output[:2500] + [" --More-- "], "<more>": long_output[2500:]},
+        )
+        channel.prompt = "R1#"
+        shell = ExpectShell(channel)
+        output = shell.send_command("show running-config")
+        self.assertEqual(len(output), 5000)
+        self.assertEqual(output[-1], "line 4999")
+        self.assertIn(" ", channel.sent)
+        print("Test 003 - Finish testing long output and the pager\n")
+
+    def test_004_timeouts(self):
+        print("\nTest 004 - Start testing the deadline and idle output...")
+        channel = FakeChannel([], {})
+        start_time = time.monotonic()
+        with self.assertRaises(PromptTimeout):
+            read_until_prompt(channel, timeout=0.1)
+        self.assertLess(time.monotonic() - start_time, 0.5)
+        # Output that never ends in a prompt is returned once it goes idle
+        channel = FakeChannel(["no prompt here\r\n"], {})
+        self.assertEqual(read_until_prompt(channel, timeout=5, idle_timeout=0.1), "no prompt here\r\n")
+        print("Test 004 - Finish testing the deadline and idle output\n")
+
+    def test_005_shell_show_version(self):
+        print("\nTest 005 - Start testing show version from device_grabber...")
+        channel = FakeChannel(["R1>"], {"show version": self.show_version, "terminal length 0": []})
+        output_list = shell_show_version(FakeClient(channel), "cisco")
+        self.assertEqual(output_list[0], self.show_version[0].strip())
+        self.assertEqual(len(output_list), 3)
+        print("Test 005 - Finish testing show version from device_grabber\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+greatgrandparentdir = os.path.dirname(grandparentdir)
+sys.path.append(greatgrandparentdir)
+
+from scan_mods.grabbing_mods.command_profiles import (
+    COMMAND_PROFILES,
+    STANDARD_COMMANDS,
+    get_command_profile,
+    prioritize_commands,
+    set_command_profile,
+)
+from scan_mods.grabbing_mods.device_specific_info_getter import (
+    device_info_getter,
+    find_commands,
+)
+
+
+class TestCommandProfiles(unittest.TestCase):
+    """
+    Tests that only the commands of the profile are sent, in priority order and within the budget
+    """
+
+    def test_001_prioritize_commands(self):
+        print("\nTest 001 - Start testing picking and ordering commands...")
+        available = ["show_vlan", "show_clock", "show_version", "show_ip_route", "dir"]
+        self.assertEqual(
+            prioritize_commands(available, "cisco_ios", "standard"),
+            ["show_version", "show_ip_route", "show_vlan"],
+        )
+        self.assertEqual(prioritize_commands(available, "cisco_ios", "minimal"), ["show_version"])
+        self.assertEqual(
+            prioritize_commands(available, "cisco_ios", "all"),
+            ["show_version", "show_ip_route", "show_vlan", "dir", "show_clock"],
+        )
+        self.assertEqual(prioritize_commands(available, "cisco_ios", "all", 2), ["show_version", "show_ip_route"])
+        self.assertEqual(prioritize_commands(available, "juniper_junos", "standard"), [])
+        with self.assertRaises(ValueError):
+            prioritize_commands(available, "cisco_ios", "everything")
+        with self.assertRaises(ValueError):
+            prioritize_commands(available, "cisco_ios", "standard", 0)
+        with self.assertRaises(TypeError):
+            set_command_profile("standard", "10")
+        print("Test 001 - Finish testing picking and ordering commands\n")
+
+    def test_002_templates(self):
+        print("\nTest 002 - Start testing the profiles against the NTC templates...")
+        for platform, commands in STANDARD_COMMANDS.items():
+            every_command = find_commands(platform)
+            # Every command in the profiles has a template
+            self.assertEqual(list(find_commands(platform, "standard")), list(commands))
+            self.assertEqual(list(every_command)[: len(commands)], list(commands))
+            for profile in COMMAND_PROFILES.values():
+                if profile is not None:
+                    self.assertTrue(set(profile[platform]) <= set(every_command))
+        self.assertEqual(len(find_commands("cisco_ios", "standard")), 15)
+        self.assertEqual(find_commands("cisco_ios", "standard", 2), {"show_version": "show version", "show_inventory": "show inventory"})
+        print("Test 002 - Finish testing the profiles against the NTC templates\n")
+
+    def test_003_device_info_getter(self):
+        print("\nTest 003 - Start testing the commands device_info_getter sends...")
+        previous_setting = set_command_profile("minimal", 3)
+        try:
+            self.assertEqual(get_command_profile(), ("minimal", 3))
+            with patch(
+                "scan_mods.grabbing_mods.device_specific_info_getter.netmiko.ConnectHandler"
+            ) as mock_ssh:
+                mock_ssh.return_value.send_command.return_value = [{"version": "15.6"}]
+                result = device_info_getter(
+                    address="192.168.0.254",
+                    username="admin",
+                    password="password",
+                    device_type="ios",
+                )
+                sent = [item.args[0] for item in mock_ssh.return_value.send_command.call_args_list]
+                self.assertEqual(sent, ["show version", "show inventory", "show ip interface brief"])
+                self.assertEqual(list(result), ["show_version", "show_inventory", "show_ip_interface_brief"])
+                mock_ssh.return_value.send_command.reset_mock()
+                device_info_getter(
+                    address="192.168.0.254",
+                    username="admin",
+                    password="password",
+                    device_type="ios",
+                    command_profile="standard",
+                    command_budget=5,
+                )
+                self.assertEqual(mock_ssh.return_value.send_command.call_count, 5)
+                # An explicit budget of 0 is not taken as the run budget
+                mock_ssh.reset_mock()
+                with self.assertRaises(ValueError):
+                    device_info_getter(
+                        address="192.168.0.254",
+                        username="admin",
+                        password="password",
+                        device_type="ios",
+                        command_budget=0,
+                    )
+                mock_ssh.assert_not_called()
+        finally:
+            set_command_profile(*previous_setting)
+        print("Test 003 - Finish testing the commands device_info_getter sends\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import MagicMock, patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+greatgrandparentdir = os.path.dirname(grandparentdir)
+sys.path.append(greatgrandparentdir)
+
+import scan_mods.grabbing_mods.device_grabber
+from scan_mods.artifacts import set_artifact_store
+from scan_mods.config_store import ConfigStore, ConfigStoreArtifacts, compare_manifests
+from scan_mods.grabbing_mods.config_precheck import (
+    ConfigPrecheck,
+    probe_config_change,
+    set_config_precheck,
+)
+
+
+class TestConfigPrecheck(unittest.TestCase):
+    """
+    Tests that the config change pre-check works
+    """
+
+    ios_probe_output = "! Last configuration change at 10:26:17 UTC Thu Feb 4 2021 by admin\n"
+
+    def build_device(self, probe_output, uptime=1000):
+        device = MagicMock()
+        device.__enter__.return_value = device
+        device.cli.side_effect = lambda commands: {commands[0]: probe_output}
+        device.get_facts.return_value = {"hostname": "R1", "uptime": uptime}
+        device.get_config.return_value = {
+            "startup": "hostname R1\n",
+            "running": "hostname R1\n",
+            "candidate": "",
+        }
+        return device
+
+    def test_001_probe(self):
+        print("\nTest 001 - Start testing the config change probe...")
+        self.assertEqual(
+            probe_config_change(self.build_device(self.ios_probe_output), "ios"),
+            "Last configuration change at 10:26:17 UTC Thu Feb 4 2021 by admin",
+        )
+        self.assertEqual(
+            probe_config_change(
+                self.build_device("!Running configuration last done at: Thu Feb  4 10:26:17 2021\n"),
+                "nxos_ssh",
+            ),
+            "Running configuration last done at: Thu Feb  4 10:26:17 2021",
+        )
+        # Saving to startup changes the IOS probe
+        self.assertEqual(
+            probe_config_change(
+                self.build_device(
+                    self.ios_probe_output + "! NVRAM config last updated at 10:30:00 UTC Thu Feb 4 2021 by admin\n"
+                ),
+                "ios",
+            ),
+            "Last configuration change at 10:26:17 UTC Thu Feb 4 2021 by admin / "
+            "NVRAM config last updated at 10:30:00 UTC Thu Feb 4 2021 by admin",
+        )
+        self.assertIsNone(probe_config_change(self.build_device(""), "ios"))
+        self.assertIsNone(probe_config_change(self.build_device(self.ios_probe_output), "eos"))
+        failing_device = self.build_device("")
+        failing_device.cli.side_effect = NotImplementedError
+        self.assertIsNone(probe_config_change(failing_device, "ios"))
+        print("Test 001 - Finish testing the config change probe\n")
+
+    def test_002_is_unchanged(self):
+        print("\nTest 002 - Start testing is_unchanged and the state file...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(f"{temp_dir}/running.txt", "w") as output_file:
+                output_file.write("hostname R1\n")
+            locations = {"Device_Running_Config_File_Location": f"{temp_dir}/running.txt"}
+            config_precheck = ConfigPrecheck(f"{temp_dir}/config_precheck.json")
+            self.assertIsNone(config_precheck.is_unchanged("192.168.1.65", "ios", "a", 100))
+            config_precheck.record("192.168.1.65", "ios", "a", locations, 100)
+            config_precheck.record("192.168.1.66", "ios", None, locations, 100)
+            config_precheck.save()
+            config_precheck = ConfigPrecheck(f"{temp_dir}/config_precheck.json")
+            self.assertEqual(config_precheck.is_unchanged("192.168.1.65", "ios", "a", 200), locations)
+            self.assertIsNone(config_precheck.is_unchanged("192.168.1.65", "ios", "b", 300))
+            # A reboot always causes a pull
+            self.assertIsNone(config_precheck.is_unchanged("192.168.1.65", "ios", "a", 10))
+            self.assertIsNone(config_precheck.is_unchanged("192.168.1.65", "ios", None, 300))
+            self.assertIsNone(config_precheck.is_unchanged("192.168.1.66", "ios", None, 300))
+            os.remove(f"{temp_dir}/running.txt")
+            self.assertIsNone(config_precheck.is_unchanged("192.168.1.65", "ios", "a", 300))
+            self.assertEqual(config_precheck.skipped, 1)
+            with self.assertRaises(TypeError):
+                config_precheck.record("192.168.1.65", "ios", "a", [], 100)
+        print("Test 002 - Finish testing is_unchanged and the state file\n")
+
+    def test_003_get_config_napalm_skips_pull(self):
+        print("\nTest 003 - Start testing that get_config_napalm skips the pull when nothing changed...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_precheck = ConfigPrecheck(f"{temp_dir}/config_precheck.json")
+            set_config_precheck(config_precheck)
+            try:
+                with patch("scan_mods.output_sink._output_root", temp_dir):
+                    with patch("scan_mods.grabbing_mods.device_grabber.napalm.get_network_driver") as mock_driver:
+                        first_device = self.build_device(self.ios_probe_output)
+                        mock_driver.return_value = MagicMock(return_value=first_device)
+                        first_result = scan_mods.grabbing_mods.device_grabber.get_config_napalm(
+                            dev_driver="ios", host="192.168.1.65", port=22, usern="admin", passw="admin"
+                        )
+                        self.assertEqual(first_device.get_config.call_count, 2)
+                        self.assertNotIn("Config_Unchanged", first_result)
+
+                        second_device = self.build_device(self.ios_probe_output, uptime=2000)
+                        mock_driver.return_value = MagicMock(return_value=second_device)
+                        second_result = scan_mods.grabbing_mods.device_grabber.get_config_napalm(
+                            dev_driver="ios", host="192.168.1.65", port=22, usern="admin", passw="admin"
+                        )
+                        second_device.get_config.assert_not_called()
+                        self.assertTrue(second_result["Config_Unchanged"])
+                        self.assertEqual(
+                            second_result["Device_Running_Config_Full_File_Location"],
+                            first_result["Device_Running_Config_Full_File_Location"],
+                        )
+
+                        third_device = self.build_device(
+                            "! Last configuration change at 11:00:00 UTC Thu Feb 4 2021 by admin\n",
+                            uptime=3000,
+                        )
+                        mock_driver.return_value = MagicMock(return_value=third_device)
+                        scan_mods.grabbing_mods.device_grabber.get_config_napalm(
+                            dev_driver="ios", host="192.168.1.65", port=22, usern="admin", passw="admin"
+                        )
+                        self.assertEqual(third_device.get_config.call_count, 2)
+            finally:
+                set_config_precheck(None)
+        with self.assertRaises(TypeError):
+            set_config_precheck("not a pre-check")
+        print("Test 003 - Finish testing that get_config_napalm skips the pull when nothing changed\n")
+
+    def test_004_startup_pulled_when_not_in_probe(self):
+        print("\nTest 004 - Start testing that the startup config is still pulled when the probe does not cover it...")
+        nxos_probe_output = "!Running configuration last done at: Thu Feb  4 10:26:17 2021\n"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_precheck = ConfigPrecheck(f"{temp_dir}/config_precheck.json")
+            set_config_precheck(config_precheck)
+            try:
+                with patch("scan_mods.output_sink._output_root", temp_dir):
+                    with patch("scan_mods.grabbing_mods.device_grabber.napalm.get_network_driver") as mock_driver:
+                        first_device = self.build_device(nxos_probe_output)
+                        mock_driver.return_value = MagicMock(return_value=first_device)
+                        first_result = scan_mods.grabbing_mods.device_grabber.get_config_napalm(
+                            dev_driver="nxos_ssh", host="192.168.1.65", port=22, usern="admin", passw="admin"
+                        )
+                        # copy run start was done on the device since the first run
+                        second_device = self.build_device(nxos_probe_output, uptime=2000)
+                        second_device.get_config.return_value = {
+                            "startup": "hostname R1\ninterface Ethernet1/1\n",
+                            "running": "",
+                            "candidate": "",
+                        }
+                        mock_driver.return_value = MagicMock(return_value=second_device)
+                        second_result = scan_mods.grabbing_mods.device_grabber.get_config_napalm(
+                            dev_driver="nxos_ssh", host="192.168.1.65", port=22, usern="admin", passw="admin"
+                        )
+                        self.assertTrue(second_result["Config_Unchanged"])
+                        self.assertEqual(second_device.get_config.call_count, 2)
+                        for call in second_device.get_config.call_args_list:
+                            self.assertEqual(call.kwargs["retrieve"], "startup")
+                        self.assertEqual(
+                            second_result["Device_Running_Config_File_Location"],
+                            first_result["Device_Running_Config_File_Location"],
+                        )
+                        with open(second_result["Device_Startup_Config_File_Location"]) as input_file:
+                            self.assertEqual(input_file.read(), "hostname R1\ninterface Ethernet1/1\n")
+            finally:
+                set_config_precheck(None)
+        print("Test 004 - Finish testing that the startup config is still pulled when the probe does not cover it\n")
+
+    def test_005_skipped_pull_in_config_store_manifest(self):
+        print("\nTest 005 - Start testing that a skipped pull is in the manifest of the config store...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_precheck = ConfigPrecheck(f"{temp_dir}/config_precheck.json")
+            set_config_precheck(config_precheck)
+            try:
+                with patch("scan_mods.output_sink._output_root", temp_dir):
+                    config_store = ConfigStore()
+                    with patch("scan_mods.grabbing_mods.device_grabber.napalm.get_network_driver") as mock_driver:
+                        for run_name, uptime in [("run_20210101_000000", 1000), ("run_20210102_000000", 2000)]:
+                            config_artifacts = ConfigStoreArtifacts(config_store, run_name)
+                            previous_store = set_artifact_store(config_artifacts)
+                            try:
+                                device = self.build_device(self.ios_probe_output, uptime=uptime)
+                                mock_driver.return_value = MagicMock(return_value=device)
+                                result = scan_mods.grabbing_mods.device_grabber.get_config_napalm(
+                                    dev_driver="ios", host="192.168.1.65", port=22, usern="admin", passw="admin"
+                                )
+                            finally:
+                                set_artifact_store(previous_store)
+                            config_artifacts.save_manifest()
+                    self.assertTrue(result["Config_Unchanged"])
+                    device.get_config.assert_not_called()
+                    self.assertTrue(result["Device_Running_Config_File_Location"].startswith("sha256:"))
+                    self.assertEqual(config_artifacts.blobs_written, 0)
+                    previous_manifest = config_store.load_manifest("run_20210101_000000")
+                    current_manifest = config_store.load_manifest("run_20210102_000000")
+                    self.assertEqual(current_manifest, previous_manifest)
+                    self.assertEqual(
+                        compare_manifests(previous_manifest, current_manifest),
+                        {"changed": [], "unchanged": ["192.168.1.65"], "new": [], "missing": []},
+                    )
+            finally:
+                set_config_precheck(None)
+        print("Test 005 - Finish testing that a skipped pull is in the manifest of the config store\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
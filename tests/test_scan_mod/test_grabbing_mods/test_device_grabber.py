@@ -437,25 +437,16 @@ class TestFoundDevice(unittest.TestCase):
         with self.assertRaises(ValueError):
             scan_mods.grabbing_mods.device_grabber.directory_checker(None)
 
-        with patch("scan_mods.grabbing_mods.device_grabber.os") as mock_os:
-            mock_os.getcwd.return_value = "/root/test/"
-            mock_os.listdir.return_value = ["Output"]
-            mock_os.path.exists.retur_value = True
-            result = scan_mods.grabbing_mods.device_grabber.directory_checker(
-                "192.168.0.254"
-            )
-            self.assertIsInstance(result, str)
-            self.assertEqual(result, "/root/test//Output/Scans/192.168.0.254")
-
-        with patch("scan_mods.grabbing_mods.device_grabber.os") as mock_os:
-            mock_os.getcwd.return_value = "/root/Output/test1/test2/test3/test"
-            mock_os.listdir.side_effect = ["test", "test3", "test2", "test1", "Output"]
-            mock_os.path.exists.retur_value = True
-            result = scan_mods.grabbing_mods.device_grabber.directory_checker(
-                "192.168.0.254"
-            )
-            self.assertIsInstance(result, str)
-            self.assertEqual(result, "../../../..//Output/Scans/192.168.0.254")
+        with patch("scan_mods.output_sink._output_root", "/root/test/Output"):
+            with patch("scan_mods.output_sink.os.makedirs") as mock_makedirs:
+                result = scan_mods.grabbing_mods.device_grabber.directory_checker(
+                    "192.168.0.254"
+                )
+                self.assertIsInstance(result, str)
+                self.assertEqual(result, "/root/test/Output/Scans/192.168.0.254")
+                mock_makedirs.assert_called_once_with(
+                    "/root/test/Output/Scans/192.168.0.254", exist_ok=True
+                )
 
         print(
             "Test 09 - Finished the test that directory_checker function passes correctly\n"
@@ -0,0 +1,207 @@
+import unittest
+import contextlib
+import os
+import sys
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+greatgrandparentdir = os.path.dirname(grandparentdir)
+sys.path.append(greatgrandparentdir)
+
+from scan_mods.artifacts import set_artifact_store
+from scan_mods.grabbing_mods.device_grabber import get_config_napalm
+from scan_mods.grabbing_mods.getter_profiles import (
+    GETTER_PROFILES,
+    NAPALM_GETTERS,
+    LazyGetters,
+    check_getter_profile,
+    get_getter_timeouts,
+    set_getter_consumer,
+    set_getter_timeouts,
+)
+
+
+class FakeNapalmDevice:
+    """
+    napalm driver that records which getters were called
+    """
+
+    def __init__(self, delays=None, failures=()):
+        self.called = []
+        self.delays = delays or {}
+        self.failures = failures
+
+    def __getattr__(self, name):
+        if not name.startswith("get_"):
+            raise AttributeError(name)
+
+        def getter(full=False):
+            self.called.append(name)
+            time.sleep(self.delays.get(name, 0))
+            if name in self.failures:
+                raise RuntimeError(f"{name} broke")
+            if name == "get_optics":
+                raise NotImplementedError
+            if name == "get_config":
+                return {"running": "hostname R1\n", "startup": "hostname R1\n", "candidate": ""}
+            if name == "get_facts":
+                return {"hostname": "R1", "uptime": 3600}
+            return {"from": name}
+
+        return getter
+
+
+class FakeSession:
+    def __init__(self, device):
+        self.device = device
+
+    @contextlib.contextmanager
+    def napalm_device(self, dev_driver, optional_args=None):
+        yield self.device
+
+
+class MemoryArtifactStore:
+    def __init__(self):
+        self.files = {}
+
+    def write_artifact(self, address, file_name, data):
+        self.files[f"{address}/{file_name}"] = data
+        return f"memory/{address}/{file_name}"
+
+
+class TestGetterProfiles(unittest.TestCase):
+    """
+    Tests that only the getters of the profile are called and the rest only when looked up
+    """
+
+    def test_001_lazy_getters(self):
+        print("\nTest 001 - Start testing lazy getters...")
+        self.assertEqual(check_getter_profile(None), "full")
+        self.assertEqual(check_getter_profile(""), "full")
+        self.assertEqual(check_getter_profile("topology"), "topology")
+        with self.assertRaises(ValueError):
+            check_getter_profile("everything")
+        with self.assertRaises(TypeError):
+            check_getter_profile(7)
+        device = FakeNapalmDevice()
+        getters = LazyGetters(device, "inventory")
+        self.assertEqual(device.called, ["get_facts", "get_interfaces", "get_optics", "get_environment", "get_users"])
+        self.assertEqual(getters["Device_Optics"], {"Not_Implemented": "Not_Implemented"})
+        # Looking up whether a getter was fetched does not fetch it
+        self.assertNotIn("Device_LLDP", getters)
+        self.assertEqual(len(device.called), 5)
+        self.assertEqual(getters["Device_LLDP"], {"from": "get_lldp_neighbors"})
+        self.assertEqual(getters["Device_LLDP"], {"from": "get_lldp_neighbors"})
+        self.assertEqual(device.called.count("get_lldp_neighbors"), 1)
+        self.assertEqual(set(dict(getters)), set(GETTER_PROFILES["inventory"]) | {"Device_LLDP"})
+        getters.close()
+        with self.assertRaises(KeyError):
+            getters["Device_Users_Missing"]
+        with self.assertRaises(KeyError):
+            getters["Device_SNMP_Information"]
+        self.assertEqual(LazyGetters(FakeNapalmDevice(), "full").fetched().keys(), NAPALM_GETTERS.keys())
+        print("Test 001 - Finish testing lazy getters\n")
+
+    def test_002_get_config_napalm(self):
+        print("\nTest 002 - Start testing the profile in get_config_napalm...")
+        store = MemoryArtifactStore()
+        previous_store = set_artifact_store(store)
+        try:
+            device = FakeNapalmDevice()
+            information = get_config_napalm(
+                "ios", "192.168.1.1", 22, "admin", "password", session=FakeSession(device),
+                getter_profile="config-only",
+            )
+            self.assertEqual(device.called, ["get_config", "get_config"])
+            self.assertNotIn("Device_Facts", information)
+            self.assertEqual(information["Device_Running_Config_File_Location"], "memory/192.168.1.1/192.168.1.1_running.txt")
+            device = FakeNapalmDevice()
+            information = get_config_napalm(
+                "ios", "192.168.1.1", 22, "admin", "password", session=FakeSession(device),
+            )
+            self.assertEqual(len(device.called), len(NAPALM_GETTERS) + 2)
+            self.assertEqual(information["Device_Facts"]["hostname"], "R1")
+            # Getters outside the profile are fetched when a consumer looks them up
+            device = FakeNapalmDevice()
+            information = get_config_napalm(
+                "ios", "192.168.1.1", 22, "admin", "password", session=FakeSession(device),
+                getter_profile="config-only",
+                getter_consumer=lambda address, getters: getters["Device_Users"],
+            )
+            self.assertEqual(device.called, ["get_users", "get_config", "get_config"])
+            self.assertIn("Device_Users", information)
+            seen = []
+            previous_consumer = set_getter_consumer(
+                lambda address, getters: seen.append((address, getters.get("Device_LLDP") is not None))
+            )
+            try:
+                device = FakeNapalmDevice()
+                information = get_config_napalm(
+                    "ios", "192.168.1.1", 22, "admin", "password", session=FakeSession(device),
+                    getter_profile="config-only",
+                )
+            finally:
+                set_getter_consumer(previous_consumer)
+            self.assertEqual(seen, [("192.168.1.1", True)])
+            self.assertEqual(device.called, ["get_lldp_neighbors", "get_config", "get_config"])
+            # A consumer that fails does not stop the grab
+            information = get_config_napalm(
+                "ios", "192.168.1.1", 22, "admin", "password", session=FakeSession(FakeNapalmDevice()),
+                getter_profile="config-only",
+                getter_consumer=lambda address, getters: 1 / 0,
+            )
+            self.assertIn("Device_Running_Config_File_Location", information)
+            with self.assertRaises(TypeError):
+                set_getter_consumer("not callable")
+        finally:
+            set_artifact_store(previous_store)
+        print("Test 002 - Finish testing the profile in get_config_napalm\n")
+
+    def test_003_deadlines_and_errors(self):
+        print("\nTest 003 - Start testing getter deadlines and partial results...")
+        reconnects = []
+        device = FakeNapalmDevice(delays={"get_environment": 5}, failures=("get_users",))
+        start_time = time.monotonic()
+        getters = LazyGetters(device, "inventory", timeout=0.2, reconnect=lambda: reconnects.append(1))
+        # The hung getter cost its deadline and not 5 seconds
+        self.assertLess(time.monotonic() - start_time, 2)
+        self.assertEqual(reconnects, [1])
+        self.assertEqual(set(getters), {"Device_Facts", "Device_Interfaces", "Device_Optics"})
+        self.assertTrue(getters.errors["Device_Environment"]["Timed_Out"])
+        self.assertEqual(getters.errors["Device_Environment"]["Error_Type"], "GetterTimeout")
+        self.assertEqual(getters.errors["Device_Users"]["Error_Type"], "RuntimeError")
+        self.assertFalse(getters.errors["Device_Users"]["Timed_Out"])
+        self.assertEqual(set(getters.timings), set(GETTER_PROFILES["inventory"]))
+        self.assertIsNone(getters.get("Device_Users"))
+        # With no way to reconnect nothing more is sent after a time out
+        device = FakeNapalmDevice(delays={"get_facts": 5})
+        getters = LazyGetters(device, "topology", timeout=0.1)
+        self.assertFalse(getters.connected)
+        self.assertEqual(device.called, ["get_facts"])
+        self.assertEqual(getters.errors["Device_Interfaces"]["Error_Type"], "NotConnected")
+        previous_timeouts = set_getter_timeouts(0.1, 0.2)
+        store = MemoryArtifactStore()
+        previous_store = set_artifact_store(store)
+        try:
+            self.assertEqual(get_getter_timeouts(), (0.1, 0.2))
+            with self.assertRaises(ValueError):
+                set_getter_timeouts(0)
+            device = FakeNapalmDevice(delays={"get_config": 5})
+            information = get_config_napalm(
+                "ios", "192.168.1.1", 22, "admin", "password", session=FakeSession(device),
+                getter_profile="inventory",
+            )
+            self.assertEqual(information["Getter_Errors"]["Config"]["Error_Type"], "GetterTimeout")
+            self.assertNotIn("Device_Running_Config_File_Location", information)
+            self.assertEqual(information["Device_Facts"]["hostname"], "R1")
+            self.assertIn("Config", information["Getter_Timings"])
+        finally:
+            set_getter_timeouts(*previous_timeouts)
+            set_artifact_store(previous_store)
+        print("Test 003 - Finish testing getter deadlines and partial results\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
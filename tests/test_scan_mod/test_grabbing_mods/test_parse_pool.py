@@ -0,0 +1,86 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+greatgrandparentdir = os.path.dirname(grandparentdir)
+sys.path.append(greatgrandparentdir)
+
+from scan_mods.grabbing_mods.device_specific_info_getter import device_info_getter
+from scan_mods.grabbing_mods.parse_pool import (
+    ParsePool,
+    PendingParse,
+    has_pending_parses,
+    resolve_parse_results,
+    set_parse_pool,
+)
+from scan_mods.grabbing_mods.template_registry import parse_command_output
+
+
+HEADER = "Interface              IP-Address      OK? Method Status                Protocol\n"
+BIG_OUTPUT = HEADER + "".join(
+    f"GigabitEthernet0/{number:<8}    10.0.{number // 250}.{number % 250:<6} YES NVRAM  up                    up\n"
+    for number in range(400)
+)
+SMALL_OUTPUT = HEADER + "GigabitEthernet0/0     192.168.89.253  YES NVRAM  up                    up\n"
+
+
+class TestParsePool(unittest.TestCase):
+    """
+    Tests parsing command output in other processes after the session is closed
+    """
+
+    def test_001_pool(self):
+        print("\nTest 001 - Start testing the parse pool...")
+        with ParsePool(2, inline_size=1024) as parse_pool:
+            pending = parse_pool.parse("cisco_ios", "show ip interface brief", BIG_OUTPUT)
+            self.assertIsInstance(pending, PendingParse)
+            rows = parse_pool.parse("cisco_ios", "show ip interface brief", SMALL_OUTPUT)
+            # Small outputs are parsed on the spot
+            self.assertEqual(rows[0]["status"], "up")
+            parsed = pending.get()
+            self.assertEqual(parsed, parse_command_output("cisco_ios", "show ip interface brief", BIG_OUTPUT))
+            self.assertEqual(len(parsed), 400)
+            self.assertEqual(parse_pool.submitted, 1)
+        with self.assertRaises(ValueError):
+            ParsePool(0)
+        print("Test 001 - Finish testing the parse pool\n")
+
+    def test_002_device_info_getter(self):
+        print("\nTest 002 - Start testing output resolved after the session is closed...")
+        parse_pool = ParsePool(2, inline_size=1024)
+        previous_pool = set_parse_pool(parse_pool)
+        try:
+            with patch(
+                "scan_mods.grabbing_mods.device_specific_info_getter.find_commands",
+                return_value={"show_ip_interface_brief": "show ip interface brief", "show_clock": "show clock"},
+            ):
+                with patch(
+                    "scan_mods.grabbing_mods.device_specific_info_getter.netmiko.ConnectHandler"
+                ) as mock_ssh:
+                    mock_ssh.return_value.send_command.side_effect = [BIG_OUTPUT, "*10:00:00.000 UTC Mon Oct 19 2026\n"]
+                    show_info = device_info_getter(
+                        address="192.168.0.254",
+                        username="admin",
+                        password="password",
+                        device_type="ios",
+                    )
+                    mock_ssh.return_value.disconnect.assert_called_once()
+            device_info = {"CONFIG": {"Show_Info": show_info}}
+            self.assertTrue(has_pending_parses(device_info))
+            self.assertIsInstance(show_info["show_clock"], list)
+            self.assertEqual(resolve_parse_results(device_info, "192.168.0.254"), 1)
+            self.assertFalse(has_pending_parses(device_info))
+            self.assertEqual(len(show_info["show_ip_interface_brief"]), 400)
+            self.assertEqual(resolve_parse_results({"Version_Info": "[ERROR]"}), 0)
+        finally:
+            set_parse_pool(previous_pool)
+            parse_pool.close()
+        print("Test 002 - Finish testing output resolved after the session is closed\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import unittest
+import os
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+greatgrandparentdir = os.path.dirname(grandparentdir)
+sys.path.append(greatgrandparentdir)
+
+from scan_mods.grabbing_mods.device_grabber import get_device_type
+from scan_mods.grabbing_mods.session_broker import DeviceSession
+import netmiko
+
+
+class FakeDeviceChannel:
+    """
+    Shell on a Cisco device.  Every line sent is echoed, answered and followed by the prompt
+    """
+
+    answers = {
+        "show version": "Cisco IOS Software, IOSv Software (VIOS-ADVENTERPRISEK9-M), Version 15.6(2)T\r\n"
+        "R1 uptime is 1 hour, 2 minutes\r\n",
+    }
+
+    def __init__(self):
+        self.prompt = "R1>"
+        self.sent = []
+        self.closed = False
+        self._output = "R1>"
+        self._lock = threading.Lock()
+        self._asked_password = False
+
+    def recv_ready(self):
+        with self._lock:
+            return bool(self._output)
+
+    def recv(self, size):
+        with self._lock:
+            data, self._output = self._output[:size], self._output[size:]
+        return data.encode()
+
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, data):
+        self.send(data.decode() if isinstance(data, bytes) else data)
+
+    def send(self, data):
+        self.sent.append(data)
+        for line in data.split("\n")[:-1] or [data]:
+            line = line.rstrip("\r")
+            with self._lock:
+                if self._asked_password:
+                    self._asked_password = False
+                    if line == "cisco":
+                        self.prompt = "R1#"
+                    self._output += f"\r\n{self.prompt}"
+                elif line.strip() == "enable" and self.prompt == "R1>":
+                    self._asked_password = True
+                    self._output += f"{line}\r\nPassword: "
+                elif line.strip() in self.answers:
+                    self._output += f"{line}\r\n{self.answers[line.strip()]}{self.prompt}"
+                else:
+                    self._output += f"{line}\r\n{self.prompt}"
+
+    def close(self):
+        self.closed = True
+
+
+class TestSessionBroker(unittest.TestCase):
+    """
+    Tests that every stage of a grab uses the one login
+    """
+
+    def build_client(self):
+        client = MagicMock()
+        client.channel = FakeDeviceChannel()
+        client.invoke_shell.return_value = client.channel
+        return client
+
+    def test_001_one_login(self):
+        print("\nTest 001 - Start testing that the stages share one login...")
+        client = self.build_client()
+        with patch("scan_mods.grabbing_mods.session_broker.paramiko.SSHClient", return_value=client):
+            session = DeviceSession("192.168.1.1", 22, "admin", "password", "cisco")
+            device_type = get_device_type("192.168.1.1", 22, "admin", "password", "cisco", "Cisco", session)
+            self.assertEqual(device_type["OS Type"], "ios")
+            self.assertTrue(device_type["Version Info"][0].startswith("Cisco IOS Software"))
+            self.assertTrue(session.shell().enabled)
+            connection = session.netmiko("cisco_ios")
+            self.assertIn("IOSv", connection.send_command("show version"))
+            self.assertIs(session.netmiko("cisco_ios"), connection)
+            with session.napalm_device("ios", {"secret": "cisco"}) as device:
+                self.assertIs(device.device, connection)
+                self.assertIn("IOSv", device.cli(["show version"])["show version"])
+            # napalm did not close the shared connection
+            self.assertFalse(client.channel.closed)
+            session.close()
+        self.assertEqual(client.connect.call_count, 1)
+        self.assertEqual(session.logins, 1)
+        self.assertEqual(client.invoke_shell.call_count, 1)
+        client.close.assert_called()
+        print("Test 001 - Finish testing that the stages share one login\n")
+
+    def test_002_not_shared(self):
+        print("\nTest 002 - Start testing drivers that can not share the session...")
+        session = DeviceSession("192.168.1.1", 22, "admin", "password")
+        driver = MagicMock()
+        driver.return_value.__enter__.return_value = driver.return_value
+        with patch("scan_mods.grabbing_mods.session_broker.napalm.get_network_driver", return_value=driver):
+            with session.napalm_device("eos") as device:
+                self.assertIs(device, driver.return_value)
+        driver.return_value.__exit__.assert_called()
+        self.assertEqual(session.logins, 0)
+        with self.assertRaises(TypeError):
+            DeviceSession("192.168.1.1", 22, None, "password")
+        print("Test 002 - Finish testing drivers that can not share the session\n")
+
+
+    def test_003_reconnect(self):
+        print("\nTest 003 - Start testing a new shared connection after a time out...")
+        clients = [self.build_client(), self.build_client()]
+        with patch("scan_mods.grabbing_mods.session_broker.paramiko.SSHClient", side_effect=clients):
+            session = DeviceSession("192.168.1.1", 22, "admin", "password", "cisco")
+            with session.napalm_device("ios", {"secret": "cisco"}) as device:
+                first_connection = device.device
+                session.reconnect_napalm(device, "ios")
+                self.assertIsNot(device.device, first_connection)
+                self.assertIs(device.device, session.netmiko("cisco_ios"))
+                self.assertIn("IOSv", device.cli(["show version"])["show version"])
+            session.close()
+        self.assertEqual(session.logins, 2)
+        clients[0].close.assert_called()
+        driver = MagicMock()
+        session.reconnect_napalm(driver, "eos")
+        driver.close.assert_called_once()
+        driver.open.assert_called_once()
+        print("Test 003 - Finish testing a new shared connection after a time out\n")
+
+    def test_004_connection_per_device_type(self):
+        print("\nTest 004 - Start testing a netmiko connection for each device type...")
+        client = self.build_client()
+        other_channel = FakeDeviceChannel()
+        client.invoke_shell.side_effect = [client.channel, other_channel]
+        with patch("scan_mods.grabbing_mods.session_broker.paramiko.SSHClient", return_value=client):
+            session = DeviceSession("192.168.1.1", 22, "admin", "password", "cisco")
+            connection = session.netmiko("cisco_ios")
+            # Another device type does not get the cisco_ios connection
+            other_connection = session.netmiko("cisco_xe")
+            self.assertIsNot(other_connection, connection)
+            self.assertEqual(other_connection.device_type, "cisco_xe")
+            self.assertIs(other_connection.remote_conn, other_channel)
+            self.assertIs(session.netmiko("cisco_ios"), connection)
+            self.assertIn("IOSv", other_connection.send_command("show version"))
+            session.close()
+        self.assertEqual(session.logins, 1)
+        self.assertEqual(client.invoke_shell.call_count, 2)
+        print("Test 004 - Finish testing a netmiko connection for each device type\n")
+
+    def test_005_session_preparation_fallback(self):
+        print("\nTest 005 - Start testing the public session preparation on other netmiko releases...")
+        client = self.build_client()
+        with patch("scan_mods.grabbing_mods.session_broker.paramiko.SSHClient", return_value=client):
+            with patch("scan_mods.grabbing_mods.session_broker.NETMIKO_VERSION", (9, 0)):
+                with patch.object(
+                    netmiko.base_connection.BaseConnection, "_try_session_preparation"
+                ) as mock_private:
+                    session = DeviceSession("192.168.1.1", 22, "admin", "password", "cisco")
+                    connection = session.netmiko("cisco_ios")
+                    mock_private.assert_not_called()
+                    self.assertIn("IOSv", connection.send_command("show version"))
+                    session.close()
+        print("Test 005 - Finish testing the public session preparation on other netmiko releases\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
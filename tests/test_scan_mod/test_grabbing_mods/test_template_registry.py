@@ -0,0 +1,120 @@
+import unittest
+import os
+import sys
+import threading
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+greatgrandparentdir = os.path.dirname(grandparentdir)
+sys.path.append(greatgrandparentdir)
+
+from scan_mods.grabbing_mods.template_registry import (
+    TemplateRegistry,
+    find_template_directory,
+    get_template_registry,
+    parse_command_output,
+    set_template_registry,
+    template_commands,
+)
+
+
+SHOW_IP_INTERFACE_BRIEF = """Interface              IP-Address      OK? Method Status                Protocol
+GigabitEthernet0/0     192.168.89.253  YES NVRAM  up                    up
+GigabitEthernet0/1     unassigned      YES NVRAM  administratively down down
+"""
+SHOW_MODULE = """Mod Ports Card Type                              Model              Serial No.
+--- ----- -------------------------------------- ------------------ -----------
+  1   48  48-port 10/100/1000 RJ45 EtherModule   WS-X6148A-GE-TX    SAL1234ABCD
+  5    2  Supervisor Engine 720 (Active)         WS-SUP720-3BXL     SAD1234EFGH
+
+Mod MAC addresses                       Hw    Fw           Sw           Status
+--- ---------------------------------- ------ ------------ ------------ -------
+  1  0014.a9b3.1234 to 0014.a9b3.1263   1.1   12.2(14r)S5  12.2(33)SXI Ok
+  5  0017.0f4a.1111 to 0017.0f4a.1113   5.3   8.5(2)       12.2(33)SXI Ok
+"""
+
+
+class TestTemplateRegistry(unittest.TestCase):
+    """
+    Tests the index lookups and the compiled templates shared by every device
+    """
+
+    registry = TemplateRegistry(find_template_directory())
+
+    def test_001_lookup(self):
+        print("\nTest 001 - Start testing template lookups from the index...")
+        self.assertEqual(
+            self.registry.lookup("cisco_ios", "show ip interface brief"),
+            ("cisco_ios_show_ip_interface_brief.textfsm",),
+        )
+        # Short forms from the index completions and extra spaces
+        self.assertEqual(
+            self.registry.lookup("cisco_ios", "sh  ip int br"),
+            ("cisco_ios_show_ip_interface_brief.textfsm",),
+        )
+        self.assertEqual(len(self.registry.lookup("cisco_ios", "show module")), 4)
+        self.assertEqual(self.registry.lookup("cisco_ios", "show nonsense"), ())
+        self.assertEqual(self.registry.lookup("not_a_platform", "show version"), ())
+        self.assertIn("show_ip_interface_brief", self.registry.commands("cisco_ios"))
+        self.assertEqual(template_commands("linux", find_template_directory()), ["arp_-a"])
+        # The commands are listed from the directory the registry parses with
+        previous_registry = set_template_registry(self.registry)
+        try:
+            self.assertEqual(template_commands("linux"), ["arp_-a"])
+        finally:
+            set_template_registry(previous_registry)
+        self.assertEqual(
+            template_commands("cisco_ios"),
+            template_commands("cisco_ios", get_template_registry().template_directory),
+        )
+        print("Test 001 - Finish testing template lookups from the index\n")
+
+    def test_002_parse(self):
+        print("\nTest 002 - Start testing parsing with the compiled templates...")
+        rows = self.registry.parse("cisco_ios", "show ip int brief", SHOW_IP_INTERFACE_BRIEF)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["intf"], "GigabitEthernet0/0")
+        self.assertEqual(rows[1]["status"], "administratively down")
+        template = self.registry.template("cisco_ios_show_ip_interface_brief.textfsm")
+        self.registry.parse("cisco_ios", "show ip interface brief", SHOW_IP_INTERFACE_BRIEF)
+        # Compiled once and reset for each parse
+        self.assertIs(self.registry.template("cisco_ios_show_ip_interface_brief.textfsm"), template)
+        self.assertEqual(
+            self.registry.parse("cisco_ios", "show ip int brief", SHOW_IP_INTERFACE_BRIEF), rows
+        )
+        # The module templates are merged on the module number
+        rows = self.registry.parse("cisco_ios", "show module", SHOW_MODULE)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["model"], "WS-X6148A-GE-TX")
+        self.assertEqual(rows[1]["status"], "Ok")
+        # The output comes back as is when there is no template or nothing was parsed
+        self.assertEqual(self.registry.parse("cisco_ios", "show nonsense", "% Invalid input\n"), "% Invalid input\n")
+        self.assertEqual(self.registry.parse("cisco_ios", "show ip int brief", ""), "")
+        self.assertEqual(self.registry.parse("cisco_ios", "show version", [{"a": 1}]), [{"a": 1}])
+        self.assertIs(get_template_registry(), get_template_registry())
+        self.assertIsInstance(parse_command_output("cisco_ios", "show ip int brief", SHOW_IP_INTERFACE_BRIEF), list)
+        print("Test 002 - Finish testing parsing with the compiled templates\n")
+
+    def test_003_threads(self):
+        print("\nTest 003 - Start testing threads sharing a template...")
+        expected = self.registry.parse("cisco_ios", "show ip int brief", SHOW_IP_INTERFACE_BRIEF)
+        results = []
+
+        def parse_many():
+            for _ in range(50):
+                results.append(self.registry.parse("cisco_ios", "show ip int brief", SHOW_IP_INTERFACE_BRIEF))
+
+        threads = [threading.Thread(target=parse_many) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 200)
+        for result in results:
+            self.assertEqual(result, expected)
+        print("Test 003 - Finish testing threads sharing a template\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+greatgrandparentdir = os.path.dirname(grandparentdir)
+sys.path.append(greatgrandparentdir)
+
+from scan_mods.grabbing_mods.device_specific_info_getter import device_info_getter
+from scan_mods.grabbing_mods.template_registry import parse_command_output
+from scan_mods.grabbing_mods.transcripts import (
+    TranscriptRecorder,
+    record_transcript,
+    reparse_transcripts,
+    set_transcript_recorder,
+    take_transcripts,
+)
+
+
+SHOW_IP_INTERFACE_BRIEF = """Interface              IP-Address      OK? Method Status                Protocol
+GigabitEthernet0/0     192.168.89.253  YES NVRAM  up                    up
+GigabitEthernet0/1     unassigned      YES NVRAM  administratively down down
+"""
+
+
+class TestTranscripts(unittest.TestCase):
+    """
+    Tests recording the commands sent to devices and parsing them again
+    """
+
+    def test_001_recorder(self):
+        print("\nTest 001 - Start testing the transcript recorder...")
+        # Nothing is recorded without a recorder
+        record_transcript("192.168.0.254", "netmiko", "show clock", "12:00\n")
+        self.assertEqual(take_transcripts("192.168.0.254"), [])
+        recorder = TranscriptRecorder()
+        previous_recorder = set_transcript_recorder(recorder)
+        try:
+            record_transcript("192.168.0.254", "netmiko", "show clock", "12:00\n", prompt=object())
+            record_transcript("192.168.0.254", "netmiko", "show version", ["not", "a", "string"])
+            record_transcript("192.168.0.253", "paramiko", "uname -a", "Linux\n")
+            self.assertEqual(recorder.recorded, 2)
+            transcripts = take_transcripts("192.168.0.254")
+            self.assertEqual(len(transcripts), 1)
+            self.assertEqual(transcripts[0]["output"], "12:00\n")
+            self.assertIsNone(transcripts[0]["prompt"])
+            self.assertEqual(take_transcripts("192.168.0.254"), [])
+            self.assertEqual(len(recorder), 1)
+        finally:
+            set_transcript_recorder(previous_recorder)
+        print("Test 001 - Finish testing the transcript recorder\n")
+
+    def test_002_device_info_getter(self):
+        print("\nTest 002 - Start testing the commands of device_info_getter are recorded...")
+        recorder = TranscriptRecorder()
+        previous_recorder = set_transcript_recorder(recorder)
+        try:
+            with patch(
+                "scan_mods.grabbing_mods.device_specific_info_getter.find_commands",
+                return_value={
+                    "show_ip_interface_brief": "show ip interface brief",
+                    "show_nonsense": "show nonsense",
+                },
+            ):
+                with patch(
+                    "scan_mods.grabbing_mods.device_specific_info_getter.netmiko.ConnectHandler"
+                ) as mock_ssh:
+                    mock_ssh.return_value.base_prompt = "R1"
+                    mock_ssh.return_value.send_command.side_effect = [
+                        SHOW_IP_INTERFACE_BRIEF,
+                        "% Invalid input detected at '^' marker.\n",
+                    ]
+                    show_info = device_info_getter(
+                        address="192.168.0.254",
+                        username="admin",
+                        password="password",
+                        device_type="ios",
+                    )
+        finally:
+            set_transcript_recorder(previous_recorder)
+        self.assertEqual(list(show_info), ["show_ip_interface_brief"])
+        transcripts = recorder.take("192.168.0.254")
+        # Rejected commands are recorded too
+        self.assertEqual([item["command_key"] for item in transcripts], ["show_ip_interface_brief", "show_nonsense"])
+        self.assertEqual(transcripts[0]["output"], SHOW_IP_INTERFACE_BRIEF)
+        self.assertEqual(transcripts[0]["platform"], "cisco_ios")
+        self.assertEqual(transcripts[0]["prompt"], "R1")
+        print("Test 002 - Finish testing the commands of device_info_getter are recorded\n")
+
+    def test_003_reparse(self):
+        print("\nTest 003 - Start testing parsing saved transcripts again...")
+        transcripts = [
+            {"platform": "cisco_ios", "command": "show ip interface brief", "output": SHOW_IP_INTERFACE_BRIEF},
+            {"platform": None, "command": "show version", "output": "Cisco IOS Software\n"},
+        ] + [
+            {"platform": "cisco_ios", "command": "show ip int brief", "output": SHOW_IP_INTERFACE_BRIEF}
+        ] * 40
+        expected = parse_command_output("cisco_ios", "show ip interface brief", SHOW_IP_INTERFACE_BRIEF)
+        inline_results = reparse_transcripts(transcripts, processes=1)
+        pool_results = reparse_transcripts(transcripts, processes=2)
+        # The transcript without a platform is skipped
+        self.assertEqual(len(inline_results), 41)
+        self.assertEqual(len(pool_results), 41)
+        for result in inline_results + pool_results:
+            self.assertEqual(result["parsed"], expected)
+            self.assertIsNone(result["error"])
+            self.assertGreaterEqual(result["seconds"], 0)
+        self.assertEqual(reparse_transcripts([]), [])
+        with self.assertRaises(ValueError):
+            reparse_transcripts(transcripts, processes=0)
+        print("Test 003 - Finish testing parsing saved transcripts again\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+from unittest.mock import patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+import scan_mods.output_sink
+from scan_mods.output_sink import (
+    NDJSONSink,
+    PerDeviceFileSink,
+    MultiSink,
+    create_sink,
+    find_latest_run,
+)
+from scan_mods.device_class import FoundDevice, load_saved_devices
+
+
+class TestOutputSink(unittest.TestCase):
+    """
+    Tests that the output sinks work
+    """
+
+    test_ports01 = {
+        "TCP": {
+            "21": {"Return Information": "220 (vsFTPd 3.0.3)"},
+            "23": {
+                "ERROR": "ConnectionRefusedError -- No connection could be made because the target machine actively refused it"
+            },
+        },
+        "UDP": {"43": {"ERROR": "Socket Timed Out"}},
+    }
+
+    def build_devices(self):
+        device_list = []
+        for address in ["192.168.1.65", "192.168.1.66", "192.168.1.67"]:
+            device = FoundDevice(address, (1.1, 1.35, 1.82))
+            device.all_ports = self.test_ports01
+            device_list.append(device)
+        return device_list
+
+    def test_001_find_output_root(self):
+        print("\nTest 001 - Start testing that the Output directory is found once...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            os.makedirs(f"{temp_dir}/Output")
+            os.makedirs(f"{temp_dir}/a/b")
+            with patch("scan_mods.output_sink._output_root", None):
+                with patch("scan_mods.output_sink.os.getcwd") as mock_getcwd:
+                    mock_getcwd.return_value = f"{temp_dir}/a/b"
+                    self.assertEqual(
+                        scan_mods.output_sink.find_output_root(), f"{temp_dir}/Output"
+                    )
+                    mock_getcwd.return_value = "/"
+                    # Second call does not walk again
+                    self.assertEqual(
+                        scan_mods.output_sink.find_output_root(), f"{temp_dir}/Output"
+                    )
+                    self.assertEqual(
+                        scan_mods.output_sink.get_device_directory("192.168.1.65"),
+                        f"{temp_dir}/Output/Scans/192.168.1.65",
+                    )
+                    self.assertTrue(os.path.isdir(f"{temp_dir}/Output/Scans/192.168.1.65"))
+            with patch("scan_mods.output_sink._output_root", None):
+                with patch("scan_mods.output_sink.os.getcwd") as mock_getcwd:
+                    mock_getcwd.return_value = f"{temp_dir}/a"
+                    with patch("scan_mods.output_sink.os.listdir") as mock_listdir:
+                        mock_listdir.return_value = []
+                        with self.assertRaises(FileNotFoundError):
+                            scan_mods.output_sink.find_output_root()
+        print("Test 001 - Finish testing that the Output directory is found once\n")
+
+    def test_002_ndjson_sink(self):
+        print("\nTest 002 - Start testing the NDJSON sink...")
+        device_list = self.build_devices()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with NDJSONSink(f"{temp_dir}/run.ndjson") as test_sink:
+                for device in device_list:
+                    test_sink.write_device(device)
+            with open(f"{temp_dir}/run.ndjson") as input_file:
+                lines = input_file.read().splitlines()
+            self.assertEqual(len(lines), 3)
+            self.assertEqual(json.loads(lines[0]), device_list[0].to_record())
+            self.assertEqual(load_saved_devices(f"{temp_dir}/run.ndjson"), device_list)
+            with self.assertRaises(ValueError):
+                test_sink.write_device(device_list[0])
+        print("Test 002 - Finish testing the NDJSON sink\n")
+
+    def test_003_per_device_sink(self):
+        print("\nTest 003 - Start testing the per device sink...")
+        device_list = self.build_devices()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with MultiSink(
+                [PerDeviceFileSink(temp_dir), NDJSONSink(f"{temp_dir}/run.ndjson")]
+            ) as test_sink:
+                for device in device_list:
+                    test_sink.write_device(device)
+            for device in device_list:
+                with open(f"{temp_dir}/{device.IP}/{device.IP}_json_long.txt") as input_file:
+                    self.assertEqual(input_file.read(), device.print_json_long())
+                with open(f"{temp_dir}/{device.IP}/{device.IP}_json_short.txt") as input_file:
+                    self.assertEqual(input_file.read(), device.print_json_short())
+        with self.assertRaises(ValueError):
+            create_sink("xml")
+        print("Test 003 - Finish testing the per device sink\n")
+
+    def test_004_writer_errors_are_raised(self):
+        print("\nTest 004 - Start testing that writer errors are raised on close...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_sink = NDJSONSink(f"{temp_dir}/run.ndjson")
+            with patch.object(FoundDevice, "to_record") as mock_to_record:
+                mock_to_record.return_value = {"not_json": object()}
+                test_sink.write_device(self.build_devices()[0])
+            with self.assertRaises(TypeError):
+                test_sink.close()
+        print("Test 004 - Finish testing that writer errors are raised on close\n")
+
+    def test_005_find_latest_run(self):
+        print("\nTest 005 - Start testing that the newest run file is found...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.assertIsNone(find_latest_run(temp_dir))
+            os.makedirs(f"{temp_dir}/192.168.1.65")
+            for file_name, modified in [
+                ("run_20260101_000000.ndjson", 100),
+                ("run_20260102_000000.msgpack.gz", 200),
+                ("run_20260103_000000.pack", 300),
+                ("run_20260104_000000.pack.tmp", 400),
+                ("config_precheck.json", 500),
+            ]:
+                with open(f"{temp_dir}/{file_name}", "w") as output_file:
+                    output_file.write("")
+                os.utime(f"{temp_dir}/{file_name}", (modified, modified))
+            self.assertEqual(find_latest_run(temp_dir), f"{temp_dir}/run_20260103_000000.pack")
+            os.remove(f"{temp_dir}/run_20260103_000000.pack")
+            self.assertEqual(find_latest_run(temp_dir), f"{temp_dir}/run_20260102_000000.msgpack.gz")
+        print("Test 005 - Finish testing that the newest run file is found\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
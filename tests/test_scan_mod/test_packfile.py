@@ -0,0 +1,119 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.packfile import (
+    PackfileReader,
+    PackfileSink,
+    PackfileWriter,
+    entry_name,
+)
+from scan_mods.artifacts import (
+    FileArtifactStore,
+    get_artifact_store,
+    read_artifact_text,
+    write_artifact,
+)
+from scan_mods.device_class import FoundDevice, load_saved_devices
+
+
+class TestPackfile(unittest.TestCase):
+    """
+    Tests that the packfile archive works
+    """
+
+    test_ports01 = {
+        "TCP": {
+            "22": {"Return Information": "SSH-1.99-Cisco-1.25"},
+            "23": {
+                "ERROR": "ConnectionRefusedError -- No connection could be made because the target machine actively refused it"
+            },
+        },
+        "UDP": {"43": {"ERROR": "Socket Timed Out"}},
+    }
+
+    def test_001_write_and_read(self):
+        print("\nTest 001 - Start testing that a packfile writes and reads...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pack_location = f"{temp_dir}/run.pack"
+            with PackfileWriter(pack_location) as writer:
+                writer.add("a/one.txt", "hostname R1\n")
+                location = writer.write_artifact("192.168.1.65", "192.168.1.65_running.txt", b"interface Gi0/0\n")
+                writer.add("a/one.txt", "hostname R2\n")
+            self.assertEqual(location, f"{pack_location}::192.168.1.65/192.168.1.65_running.txt")
+            with PackfileReader(pack_location) as pack:
+                self.assertTrue(pack.complete)
+                self.assertEqual(pack.names(), ["192.168.1.65/192.168.1.65_running.txt", "a/one.txt"])
+                self.assertEqual(pack.read_text("a/one.txt"), "hostname R2\n")
+                with self.assertRaises(KeyError):
+                    pack.read("b/two.txt")
+            self.assertEqual(read_artifact_text(location), "interface Gi0/0\n")
+            with self.assertRaises(ValueError):
+                writer.add("a/three.txt", "")
+            with open(f"{temp_dir}/not.pack", "wb") as output_file:
+                output_file.write(b"hello world")
+            with self.assertRaises(ValueError):
+                PackfileReader(f"{temp_dir}/not.pack")
+        with self.assertRaises(TypeError):
+            entry_name("192.168.1.65", None)
+        print("Test 001 - Finish testing that a packfile writes and reads\n")
+
+    def test_002_pack_that_was_not_closed(self):
+        print("\nTest 002 - Start testing that a pack that was not closed can be read...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pack_location = f"{temp_dir}/run.pack"
+            writer = PackfileWriter(pack_location)
+            writer.add("a/one.txt", "one")
+            writer.add("a/two.txt", "two")
+            writer._output_file.flush()
+            with open(pack_location, "rb") as input_file:
+                data = input_file.read()
+            # Cut the last entry short like a crash in the middle of a write
+            with open(pack_location, "wb") as output_file:
+                output_file.write(data[:-1])
+            with PackfileReader(pack_location) as pack:
+                self.assertFalse(pack.complete)
+                self.assertEqual(pack.names(), ["a/one.txt"])
+                self.assertEqual(pack.read_text("a/one.txt"), "one")
+            writer.close()
+        print("Test 002 - Finish testing that a pack that was not closed can be read\n")
+
+    def test_003_packfile_sink(self):
+        print("\nTest 003 - Start testing the packfile sink...")
+        device_list = []
+        for address in ["192.168.1.65", "192.168.1.66"]:
+            device = FoundDevice(address, (1.1, 1.35, 1.82))
+            device.all_ports = self.test_ports01
+            device_list.append(device)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pack_location = f"{temp_dir}/run.pack"
+            with PackfileSink(pack_location) as test_sink:
+                self.assertIs(get_artifact_store(), test_sink.writer)
+                for device in device_list:
+                    location = write_artifact(device.IP, f"{device.IP}_running.txt", "hostname R1\n")
+                    device.device_info = {"CONFIG": {"Device_Information": {"Device_Running_Config_File_Location": location}}}
+                    test_sink.write_device(device)
+            self.assertIsInstance(get_artifact_store(), FileArtifactStore)
+            with PackfileReader(pack_location) as pack:
+                self.assertEqual(len(pack), 4)
+                record = json.loads(pack.read("192.168.1.66/record.json"))
+                self.assertEqual(record, device_list[1].to_record())
+                self.assertEqual(
+                    read_artifact_text(
+                        record["device_info"]["CONFIG"]["Device_Information"]["Device_Running_Config_File_Location"]
+                    ),
+                    "hostname R1\n",
+                )
+            self.assertEqual(load_saved_devices(pack_location), device_list)
+        print("Test 003 - Finish testing the packfile sink\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
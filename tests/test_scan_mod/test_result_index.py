@@ -0,0 +1,132 @@
+import unittest
+import os
+import sys
+import tempfile
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.result_index import (
+    ResultIndex,
+    extract_products,
+    index_location_for_run,
+    tokenize,
+)
+
+
+class TestResultIndex(unittest.TestCase):
+    """
+    Tests that the result index works
+    """
+
+    linux_ports = {
+        "TCP": {
+            "21": {"Return Information": "220 (vsFTPd 3.0.3)"},
+            "22": {"Return Information": "SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.1"},
+            "80": {"Server": "Apache/2.4.41 (Ubuntu)", "Connection": "Keep-Alive"},
+        },
+        "UDP": {},
+    }
+    cisco_ports = {
+        "TCP": {
+            "22": {"Return Information": "SSH-1.99-Cisco-1.25"},
+            "23": {"Return Information": "User Access Verification"},
+        },
+        "UDP": {"161": {"Return Information": "public"}},
+    }
+
+    def build_index(self):
+        test_index = ResultIndex()
+        test_index.add_ports("192.168.89.80", self.linux_ports)
+        test_index.add_ports("192.168.89.254", self.cisco_ports)
+        test_index.add_ports("192.168.89.253", self.cisco_ports)
+        return test_index
+
+    def test_001_tokenize_and_products(self):
+        print("\nTest 001 - Start testing tokenize and extract_products...")
+        self.assertEqual(tokenize("SSH-1.99-Cisco-1.25"), ["ssh", "1.99", "cisco", "1.25"])
+        self.assertEqual(
+            extract_products(22, {"Return Information": "SSH-1.99-Cisco-1.25"}),
+            {"ssh", "cisco-1.25", "cisco"},
+        )
+        self.assertEqual(
+            extract_products(
+                22, {"Return Information": "SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.1"}
+            ),
+            {"ssh", "openssh_8.2p1", "openssh"},
+        )
+        self.assertEqual(
+            extract_products(21, {"Return Information": "220 (vsFTPd 3.0.3)"}),
+            {"ftp", "vsftpd", "vsftpd/3.0.3"},
+        )
+        self.assertEqual(
+            extract_products(80, {"Server": "Apache/2.4.41 (Ubuntu)"}),
+            {"http", "apache", "apache/2.4.41"},
+        )
+        print("Test 001 - Finish testing tokenize and extract_products\n")
+
+    def test_002_queries(self):
+        print("\nTest 002 - Start testing the index queries...")
+        test_index = self.build_index()
+        self.assertEqual(len(test_index), 3)
+        self.assertEqual(
+            test_index.hosts_with_port("TCP", 23), ["192.168.89.253", "192.168.89.254"]
+        )
+        self.assertEqual(test_index.hosts_with_port("tcp", "80"), ["192.168.89.80"])
+        self.assertEqual(test_index.hosts_with_port("UDP", 53), [])
+        self.assertEqual(test_index.hosts_with_product("OpenSSH"), ["192.168.89.80"])
+        self.assertEqual(len(test_index.hosts_with_product("ssh")), 3)
+        self.assertEqual(
+            test_index.hosts_with_banner("Cisco-1.25"),
+            ["192.168.89.253", "192.168.89.254"],
+        )
+        self.assertEqual(test_index.hosts_with_banner("Cisco-9.99"), [])
+        self.assertEqual(
+            test_index.query(port=22, product="apache"), ["192.168.89.80"]
+        )
+        self.assertEqual(
+            test_index.query(protocol="UDP", port=161, banner="cisco"),
+            ["192.168.89.253", "192.168.89.254"],
+        )
+        with self.assertRaises(ValueError):
+            test_index.query()
+        with self.assertRaises(TypeError):
+            test_index.add_ports(1, self.cisco_ports)
+        print("Test 002 - Finish testing the index queries\n")
+
+    def test_003_save_and_load(self):
+        print("\nTest 003 - Start testing that the index saves and loads...")
+        test_index = self.build_index()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index_location = test_index.save(f"{temp_dir}/result_index.json")
+            loaded_index = ResultIndex.load(index_location)
+        self.assertEqual(loaded_index.to_dict()["ports"], test_index.to_dict()["ports"])
+        self.assertEqual(
+            loaded_index.hosts_with_banner("cisco 1.25"),
+            test_index.hosts_with_banner("cisco 1.25"),
+        )
+        bad_dict = test_index.to_dict()
+        bad_dict["version"] = 0
+        with self.assertRaises(ValueError):
+            ResultIndex.from_dict(bad_dict)
+        print("Test 003 - Finish testing that the index saves and loads\n")
+
+    def test_004_index_location_for_run(self):
+        print("\nTest 004 - Start testing that each run gets its own index...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.assertEqual(
+                index_location_for_run(f"{temp_dir}/run_20210101_120000.ndjson.gz"),
+                f"{temp_dir}/run_20210101_120000.index.json",
+            )
+            self.assertEqual(
+                index_location_for_run(f"{temp_dir}/run_20210102_120000.pack"),
+                f"{temp_dir}/run_20210102_120000.index.json",
+            )
+            self.assertEqual(index_location_for_run(temp_dir), f"{temp_dir}/result_index.json")
+        print("Test 004 - Finish testing that each run gets its own index\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
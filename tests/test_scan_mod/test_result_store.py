@@ -0,0 +1,192 @@
+import unittest
+import os
+import sys
+import sqlite3
+import tempfile
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.result_store import (
+    ResultStore,
+    SQLiteSink,
+    record_to_rows,
+)
+from scan_mods.device_class import FoundDevice, PortState
+from scan_mods.grabbing_mods.transcripts import TranscriptRecorder, set_transcript_recorder
+
+
+class TestResultStore(unittest.TestCase):
+    """
+    Tests that the SQLite result store works
+    """
+
+    test_ports01 = {
+        "TCP": {
+            "22": {"Return Information": "SSH-1.99-Cisco-1.25"},
+            "23": {
+                "ERROR": "ConnectionRefusedError -- No connection could be made because the target machine actively refused it"
+            },
+        },
+        "UDP": {"43": {"ERROR": "Socket Timed Out"}},
+    }
+    test_ports02 = {
+        "TCP": {
+            "22": {"ERROR": "TimeoutError -- timed out"},
+            "23": {"Return Information": "User Access Verification"},
+        },
+        "UDP": {},
+    }
+    test_device_info = {
+        "Version_Info": ["Cisco IOS Software, IOSv Software"],
+        "CONFIG": {
+            "Open_Close": True,
+            "Device_Information": {
+                "Device_Facts": {"hostname": "R1", "os_version": "15.6(2)T"},
+            },
+            "Show_Info": {"show_clock": [{"time": "12:00:00"}]},
+        },
+    }
+
+    def build_device(self, address, ports):
+        device = FoundDevice(address, (1.1, 1.35, 1.82))
+        device.all_ports = ports
+        return device
+
+    def test_001_record_to_rows(self):
+        print("\nTest 001 - Start testing that records split into rows...")
+        device = self.build_device("192.168.1.65", self.test_ports01)
+        device.device_info = self.test_device_info
+        rows = record_to_rows(device.to_record())
+        self.assertEqual(rows["host"][:4], ("192.168.1.65", 1.1, 1.35, 1.82))
+        self.assertEqual(
+            sorted((row[0], row[1], row[2]) for row in rows["ports"]),
+            [
+                ("TCP", 22, int(PortState.OPEN)),
+                ("TCP", 23, int(PortState.CLOSED)),
+                ("UDP", 43, int(PortState.FILTERED)),
+            ],
+        )
+        self.assertEqual([row[0] for row in rows["device_facts"]], ["Device_Facts"])
+        self.assertEqual([row[0] for row in rows["command_outputs"]], ["show_clock"])
+        with self.assertRaises(TypeError):
+            record_to_rows("192.168.1.65")
+        print("Test 001 - Finish testing that records split into rows\n")
+
+    def test_002_sink_and_queries(self):
+        print("\nTest 002 - Start testing the SQLite sink and queries...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            database_location = f"{temp_dir}/results.db"
+            first_device = self.build_device("192.168.1.65", self.test_ports01)
+            first_device.device_info = self.test_device_info
+            with SQLiteSink(database_location, batch_size=2) as test_sink:
+                for device in [
+                    first_device,
+                    self.build_device("192.168.1.66", self.test_ports01),
+                    self.build_device("192.168.1.67", self.test_ports02),
+                ]:
+                    test_sink.write_device(device)
+            with SQLiteSink(database_location) as test_sink:
+                test_sink.write_device(self.build_device("192.168.1.65", self.test_ports02))
+            with ResultStore(database_location) as result_store:
+                runs = result_store.runs()
+                self.assertEqual([run["host_count"] for run in runs], [3, 1])
+                self.assertEqual(result_store.latest_run(), 2)
+                self.assertEqual(
+                    result_store.hosts_with_port("tcp", 22),
+                    [(1, "192.168.1.65"), (1, "192.168.1.66")],
+                )
+                self.assertEqual(
+                    result_store.hosts_with_port("TCP", 22, PortState.FILTERED, run_id=2),
+                    [(2, "192.168.1.65")],
+                )
+                history = result_store.port_history("192.168.1.65", "TCP", 22)
+                self.assertEqual(
+                    [entry["state"] for entry in history],
+                    [PortState.OPEN, PortState.FILTERED],
+                )
+                self.assertEqual(
+                    history[0]["banner"], {"Return Information": "SSH-1.99-Cisco-1.25"}
+                )
+                self.assertEqual(history[1]["reason"], "TimeoutError -- timed out")
+                self.assertEqual(
+                    result_store.device_facts("192.168.1.65", "Device_Facts")["hostname"],
+                    "R1",
+                )
+                self.assertEqual(
+                    result_store.command_output("192.168.1.65", "show_clock"),
+                    [{"time": "12:00:00"}],
+                )
+                self.assertIsNone(result_store.device_facts("192.168.1.66", "Device_Facts"))
+        print("Test 002 - Finish testing the SQLite sink and queries\n")
+
+    def test_003_device_written_twice_is_replaced(self):
+        print("\nTest 003 - Start testing that a device written twice in a run is replaced...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            database_location = f"{temp_dir}/results.db"
+            with SQLiteSink(database_location) as test_sink:
+                test_sink.write_device(self.build_device("192.168.1.65", self.test_ports01))
+                test_sink.write_device(self.build_device("192.168.1.65", self.test_ports02))
+            connection = sqlite3.connect(database_location)
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM hosts").fetchone()[0], 1)
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM ports").fetchone()[0], 2)
+            connection.close()
+        with self.assertRaises(ValueError):
+            SQLiteSink(":memory:", batch_size=0)
+        with self.assertRaises(TypeError):
+            ResultStore(1)
+        print("Test 003 - Finish testing that a device written twice in a run is replaced\n")
+
+    def test_004_transcripts(self):
+        print("\nTest 004 - Start testing that transcripts are saved and outputs updated...")
+        recorder = TranscriptRecorder()
+        previous_recorder = set_transcript_recorder(recorder)
+        try:
+            recorder.record("192.168.1.65", "paramiko", "show version", "Cisco IOS Software\n")
+            recorder.record(
+                "192.168.1.65",
+                "netmiko",
+                "show clock",
+                "*12:00:00.000 UTC Mon Oct 19 2026\n",
+                platform="cisco_ios",
+                command_key="show_clock",
+                prompt="R1",
+            )
+            recorder.record("192.168.1.66", "netmiko", "show clock", "*13:00:00.000 UTC Mon Oct 19 2026\n")
+            with tempfile.TemporaryDirectory() as temp_dir:
+                database_location = f"{temp_dir}/results.db"
+                device = self.build_device("192.168.1.65", self.test_ports01)
+                device.device_info = self.test_device_info
+                with SQLiteSink(database_location) as test_sink:
+                    test_sink.write_device(device)
+                # Taken by the sink as the device was written
+                self.assertEqual(len(recorder), 1)
+                with ResultStore(database_location) as result_store:
+                    transcripts = result_store.transcripts()
+                    self.assertEqual([item["command"] for item in transcripts], ["show version", "show clock"])
+                    self.assertEqual(transcripts[1]["prompt"], "R1")
+                    self.assertEqual(transcripts[1]["platform"], "cisco_ios")
+                    self.assertIsNone(transcripts[0]["command_key"])
+                    self.assertEqual(result_store.transcripts(address="192.168.1.66"), [])
+                    self.assertEqual(
+                        result_store.update_command_outputs(
+                            1,
+                            [
+                                ("192.168.1.65", "show_clock", [{"time": "12:00:00.000"}]),
+                                ("192.168.1.99", "show_clock", []),
+                            ],
+                        ),
+                        1,
+                    )
+                    self.assertEqual(
+                        result_store.command_output("192.168.1.65", "show_clock"), [{"time": "12:00:00.000"}]
+                    )
+        finally:
+            set_transcript_recorder(previous_recorder)
+        print("Test 004 - Finish testing that transcripts are saved and outputs updated\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+from scan_mods.search_index import (
+    SearchIndex,
+    build_match_query,
+    get_search_index,
+    render_command_output,
+    set_search_index,
+)
+from scan_mods.artifacts import set_artifact_store, write_artifact
+
+
+class MemoryArtifactStore:
+    def __init__(self):
+        self.files = {}
+
+    def write_artifact(self, address, file_name, data):
+        self.files[f"{address}/{file_name}"] = data
+        return f"memory/{address}/{file_name}"
+
+
+class TestSearchIndex(unittest.TestCase):
+    """
+    Tests that the full text search index finds the right lines
+    """
+
+    config = """hostname R{host}
+!
+interface GigabitEthernet0/1
+ ip address 10.1.{host}.1 255.255.255.0
+ ip access-group ACL-MGMT in
+!
+ip access-list extended ACL-MGMT
+ permit tcp 10.0.0.0 0.255.255.255 any eq 22
+!
+snmp-server community S3cret{host} RO
+ntp server 10.1.1.254
+"""
+
+    def test_001_search(self):
+        print("\nTest 001 - Start testing the search index...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with SearchIndex(os.path.join(temp_dir, "index.db")) as search_index:
+                documents = [
+                    (f"192.168.1.{host}", f"192.168.1.{host}_running.txt", self.config.format(host=host), None)
+                    for host in range(1, 6)
+                ]
+                self.assertEqual(search_index.add_documents(documents), 5)
+                self.assertEqual(len(search_index), 5)
+                results = search_index.search("ACL-MGMT")
+                self.assertEqual(len(results), 10)
+                self.assertEqual(
+                    (results[0]["address"], results[0]["line_number"], results[0]["line"]),
+                    ("192.168.1.1", 5, " ip access-group ACL-MGMT in"),
+                )
+                self.assertEqual(results[1]["line_number"], 7)
+                results = search_index.search("10.1.3.1")
+                self.assertEqual([result["address"] for result in results], ["192.168.1.3"])
+                self.assertEqual(len(search_index.search("snmp-server S3cret*")), 5)
+                self.assertEqual(len(search_index.search("s3cret2")), 1)
+                self.assertEqual(len(search_index.search("access-list acl-mgmt", address="192.168.1.2")), 1)
+                self.assertEqual(len(search_index.search("ntp", limit=2)), 2)
+                self.assertEqual(len(search_index.search("ntp", name="startup")), 0)
+                self.assertEqual(len(search_index.search('"ACL-MGMT" NOT "access-group"', raw=True)), 5)
+                # A file that did not change is not indexed again
+                self.assertFalse(search_index.add_document(*documents[0]))
+                # A file that changed has its old lines dropped
+                self.assertTrue(
+                    search_index.add_document("192.168.1.1", "192.168.1.1_running.txt", "hostname R1\nntp server 10.9.9.9\n")
+                )
+                self.assertEqual(len(search_index.search("ACL-MGMT")), 8)
+                self.assertEqual(search_index.search("10.9.9.9")[0]["line_number"], 2)
+                self.assertTrue(search_index.remove_document("192.168.1.1", "192.168.1.1_running.txt"))
+                self.assertFalse(search_index.remove_document("192.168.1.1", "192.168.1.1_running.txt"))
+                self.assertEqual(search_index.search("10.9.9.9"), [])
+                self.assertEqual(len(search_index.documents()), 4)
+                with self.assertRaises(ValueError):
+                    search_index.search(" ")
+                with self.assertRaises(TypeError):
+                    search_index.add_document("192.168.1.1", None, "text")
+        self.assertEqual(build_match_query('ACL "x" 10.*'), '"ACL" AND """x""" AND "10."*')
+        print("Test 001 - Finish testing the search index\n")
+
+    def test_002_index_as_written(self):
+        print("\nTest 002 - Start testing indexing the files as they are written...")
+        self.assertEqual(
+            render_command_output([{"INTF": "Gi0/1", "IPADDR": ["10.1.1.1"], "STATUS": ""}]),
+            "INTF=Gi0/1  IPADDR=10.1.1.1",
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            search_index = SearchIndex(os.path.join(temp_dir, "index.db"))
+            previous_store = set_artifact_store(MemoryArtifactStore())
+            set_search_index(search_index)
+            try:
+                threads = [
+                    threading.Thread(
+                        target=write_artifact,
+                        args=(f"192.168.1.{host}", f"192.168.1.{host}_running.txt", self.config.format(host=host).encode()),
+                    )
+                    for host in range(1, 9)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            finally:
+                set_search_index(None)
+                set_artifact_store(previous_store)
+            self.assertIsNone(get_search_index())
+            results = search_index.search("S3cret4")
+            self.assertEqual(len(results), 1)
+            self.assertEqual(results[0]["location"], "memory/192.168.1.4/192.168.1.4_running.txt")
+            self.assertEqual(len(search_index), 8)
+            search_index.close()
+            with self.assertRaises(TypeError):
+                set_search_index("not an index")
+        print("Test 002 - Finish testing indexing the files as they are written\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+from unittest.mock import patch
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+grandparentdir = os.path.dirname(parentdir)
+sys.path.append(grandparentdir)
+
+import scan_mods.serializers
+from scan_mods.serializers import (
+    OUTPUT_FORMATS,
+    available_formats,
+    convert_record_file,
+    format_for_file,
+    get_serializer,
+    iter_record_file,
+)
+from scan_mods.output_sink import RecordFileSink
+from scan_mods.device_class import FoundDevice, load_saved_devices
+
+
+class TestSerializers(unittest.TestCase):
+    """
+    Tests that the record serializers work
+    """
+
+    test_ports01 = {
+        "TCP": {
+            "22": {"Return Information": "SSH-1.99-Cisco-1.25"},
+            "23": {
+                "ERROR": "ConnectionRefusedError -- No connection could be made because the target machine actively refused it"
+            },
+        },
+        "UDP": {"43": {"ERROR": "Socket Timed Out"}},
+    }
+
+    def build_devices(self):
+        device_list = []
+        for address in ["192.168.1.65", "192.168.1.66", "192.168.1.67"]:
+            device = FoundDevice(address, (1.1, 1.35, 1.82))
+            device.all_ports = self.test_ports01
+            device_list.append(device)
+        return device_list
+
+    def test_001_round_trip_every_format(self):
+        print("\nTest 001 - Start testing a round trip in every installed format...")
+        self.assertIn("json", available_formats())
+        device_list = self.build_devices()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for output_format in available_formats():
+                serializer = get_serializer(output_format)
+                file_location = f"{temp_dir}/run.{serializer.file_extension}"
+                with RecordFileSink(file_location, output_format) as test_sink:
+                    for device in device_list:
+                        test_sink.write_device(device)
+                self.assertEqual(format_for_file(file_location), output_format)
+                self.assertEqual(
+                    list(iter_record_file(file_location)),
+                    [device.to_record() for device in device_list],
+                )
+                self.assertEqual(load_saved_devices(file_location), device_list)
+        print("Test 001 - Finish testing a round trip in every installed format\n")
+
+    def test_002_convert(self):
+        print("\nTest 002 - Start testing that record files convert...")
+        device_list = self.build_devices()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with RecordFileSink(f"{temp_dir}/run.ndjson") as test_sink:
+                for device in device_list:
+                    test_sink.write_device(device)
+            input_location = f"{temp_dir}/run.ndjson"
+            for output_format in available_formats():
+                if output_format == "json":
+                    continue
+                extension = get_serializer(output_format).file_extension
+                self.assertEqual(
+                    convert_record_file(input_location, f"{temp_dir}/run.{extension}"), 3
+                )
+                self.assertEqual(
+                    convert_record_file(
+                        f"{temp_dir}/run.{extension}", f"{temp_dir}/back.out", "json"
+                    ),
+                    3,
+                )
+                with open(f"{temp_dir}/back.out") as input_file:
+                    lines = input_file.read().splitlines()
+                self.assertEqual(json.loads(lines[0]), device_list[0].to_record())
+            with self.assertRaises(ValueError):
+                convert_record_file(input_location, f"{temp_dir}/run.txt")
+        print("Test 002 - Finish testing that record files convert\n")
+
+    def test_003_errors(self):
+        print("\nTest 003 - Start testing the serializer errors...")
+        self.assertEqual(OUTPUT_FORMATS, ("json", "msgpack", "cbor"))
+        self.assertIsNone(format_for_file("192.168.1.65_json_long.txt"))
+        self.assertEqual(format_for_file("run_20210101.CBOR"), "cbor")
+        with self.assertRaises(ValueError):
+            get_serializer("xml")
+        with patch("scan_mods.serializers.msgpack", None):
+            self.assertNotIn("msgpack", available_formats())
+            with self.assertRaises(ImportError):
+                get_serializer("msgpack")
+        with patch("scan_mods.serializers.orjson", None):
+            serializer = get_serializer("json")
+            self.assertEqual(serializer.dumps({"a": [1, 2]}), b'{"a":[1,2]}')
+            self.assertEqual(serializer.loads(b'{"a":[1,2]}'), {"a": [1, 2]})
+        print("Test 003 - Finish testing the serializer errors\n")
+
+
+if __name__ == "__main__":
+    unittest.main()